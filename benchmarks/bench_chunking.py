@@ -0,0 +1,80 @@
+"""
+Benchmark for the REPL's chunk_context helper.
+
+Builds a synthetic Markdown-like corpus (headers, paragraphs of varying length), then measures
+chunking throughput per boundary for a str, a MappedText of the same text, and the text split
+into a list of documents, plus a text without any breaks (the worst case). Also reports the
+spread of chunk sizes against the target.
+
+Usage:
+    python -m benchmarks.bench_chunking [--mb 200] [--max-tokens 25000]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from rlm.core.mapped_text import MappedText
+from rlm.utils.chunking import CHARS_PER_TOKEN, chunk_documents
+
+
+def _corpus(mb: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(5_000)]
+    pool = " ".join(rng.choices(words, k=200_000))
+    parts, size = [], 0
+    while size < mb * 1_000_000:
+        if rng.random() < 0.05:
+            part = f"## Section {len(parts)}\n"
+        else:
+            start = rng.randrange(len(pool) - 4_000)
+            part = pool[start : start + rng.randint(200, 4_000)] + "\n\n"
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def _timed(mb: float, run) -> tuple[float, list]:
+    start = time.perf_counter()
+    chunks = run()
+    return mb / (time.perf_counter() - start), chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mb", type=int, default=200)
+    parser.add_argument("--max-tokens", type=int, default=25_000)
+    args = parser.parse_args()
+
+    text = _corpus(args.mb)
+    mb = len(text) / 1_000_000
+    limit = args.max_tokens * CHARS_PER_TOKEN
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "corpus.md"
+        path.write_text(text)
+        mapped = MappedText(path)
+        documents = text.split("\n\n")
+
+        for boundary in ["paragraph", "header", "line"]:
+            for label, context in [("str", text), ("mapped", mapped), ("documents", documents)]:
+                rate, chunks = _timed(
+                    mb, lambda c=context, b=boundary: chunk_documents(c, args.max_tokens, 0, b)
+                )
+                sizes = [len(chunk) for chunk in chunks]
+                print(
+                    f"{boundary:>9} {label:>9}: {rate:7.1f} MB/s, {len(chunks)} chunks, "
+                    f"size {min(sizes) / limit:.0%}-{max(sizes) / limit:.0%} of max"
+                )
+
+        rate, _ = _timed(mb, lambda: [str(chunk) for chunk in chunk_documents(text)])
+        print(f"paragraph str + materialized text: {rate:.1f} MB/s")
+        # Worst case: no boundary to cut at, so every fallback scans half a chunk
+        rate, _ = _timed(mb, lambda: chunk_documents("x" * len(text), args.max_tokens))
+        print(f"paragraph str without any breaks: {rate:.1f} MB/s")
+        mapped.close()
+
+
+if __name__ == "__main__":
+    main()
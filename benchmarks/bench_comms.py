@@ -0,0 +1,105 @@
+"""
+Micro-benchmark for the comms_utils socket protocol.
+
+Measures encode + decode throughput of each codec, and a full send/recv over a local
+socket pair, for frames shaped like LM requests carrying large context.
+
+Usage:
+    python -m benchmarks.bench_comms [--sizes 100000,1000000,8000000] [--repeat 5]
+"""
+
+import argparse
+import json
+import socket
+import struct
+import threading
+import time
+
+from rlm.core.comms_utils import (
+    _decode,
+    _parse_header,
+    encode_frame,
+    msgpack,
+    socket_recv,
+    socket_send,
+)
+
+
+def _frame(size: int) -> dict:
+    """A batched-request-shaped frame with about `size` bytes of prompt text."""
+    chunk = "The quick brown fox jumps over the lazy dog. " * 20
+    prompts = [(chunk * (size // len(chunk) // 4 + 1))[: size // 4] for _ in range(4)]
+    return {"prompts": prompts, "model": "gpt-5-mini", "depth": 1, "request_id": 7}
+
+
+def _legacy_socket_recv(sock: socket.socket) -> dict:
+    """The previous receive loop (bytes concatenation + JSON), for comparison."""
+    raw_len = sock.recv(4)
+    length = struct.unpack(">I", raw_len)[0]
+    payload = b""
+    while len(payload) < length:
+        chunk = sock.recv(length - len(payload))
+        payload += chunk
+    return json.loads(payload.decode("utf-8"))
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_codec(data: dict, codec: str, repeat: int) -> tuple[int, float]:
+    frame = encode_frame(data, codec)
+
+    def roundtrip():
+        encoded = encode_frame(data, codec)
+        length, frame_codec = _parse_header(encoded[:4])
+        _decode(encoded[4:], frame_codec)
+
+    return len(frame), _best_of(repeat, roundtrip)
+
+
+def bench_socket(data: dict, codec: str, repeat: int, recv=socket_recv) -> float:
+    def transfer():
+        a, b = socket.socketpair()
+        with a, b:
+            sender = threading.Thread(target=socket_send, args=(a, data, codec))
+            sender.start()
+            recv(b)
+            sender.join()
+
+    return _best_of(repeat, transfer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="100000,1000000,8000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = ["json"] + (["msgpack"] if msgpack is not None else [])
+    if msgpack is None:
+        print("msgpack not installed; only benchmarking JSON (pip install msgpack)\n")
+
+    print(f"{'size':>10} {'codec':>8} {'frame MB':>9} {'codec MB/s':>11} {'socket MB/s':>12}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        data = _frame(size)
+        for codec in codecs:
+            frame_bytes, codec_time = bench_codec(data, codec, args.repeat)
+            socket_time = bench_socket(data, codec, args.repeat)
+            mb = frame_bytes / 1e6
+            print(
+                f"{size:>10} {codec:>8} {mb:>9.2f} {mb / codec_time:>11.1f} "
+                f"{mb / socket_time:>12.1f}"
+            )
+        legacy_time = bench_socket(data, "json", args.repeat, recv=_legacy_socket_recv)
+        mb = len(encode_frame(data)) / 1e6
+        print(f"{size:>10} {'legacy':>8} {mb:>9.2f} {'':>11} {mb / legacy_time:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
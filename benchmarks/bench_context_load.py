@@ -0,0 +1,115 @@
+"""
+Benchmark for loading large contexts into a LocalREPL.
+
+Compares the previous loader (temp file + read back through execute_code) with binding the
+payload directly (copied or shared) and with a MappedText over a file. Each run happens in a
+fresh subprocess so that peak RSS is measured per case; "peak MB" is the growth of peak RSS
+over the process with the payload already built.
+
+Usage:
+    python -m benchmarks.bench_context_load [--mb 100] [--kind str,docs]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from rlm.core.mapped_text import MappedText
+from rlm.environments.local_repl import LocalREPL
+
+MODES = ["legacy", "copy", "shared", "mapped"]
+
+
+def _payload(kind: str, mb: int) -> str | list:
+    line = "The quick brown fox jumps over the lazy dog. " * 20 + "\n"
+    if kind == "str":
+        return line * (mb * 1_000_000 // len(line))
+    doc = {"title": "doc", "body": line * 10}
+    return [dict(doc, id=i) for i in range(mb * 1_000_000 // len(json.dumps(doc)))]
+
+
+def _legacy_load(repl: LocalREPL, payload: str | list) -> None:
+    """The previous add_context: write to the temp dir, then read back in the REPL."""
+    if isinstance(payload, str):
+        path = os.path.join(repl.temp_dir, "context_0.txt")
+        with open(path, "w") as f:
+            f.write(payload)
+        repl.execute_code(f"with open(r'{path}', 'r') as f:\n    context_0 = f.read()")
+    else:
+        path = os.path.join(repl.temp_dir, "context_0.json")
+        with open(path, "w") as f:
+            json.dump(payload, f)
+        repl.execute_code(
+            f"import json\nwith open(r'{path}', 'r') as f:\n    context_0 = json.load(f)"
+        )
+    repl.execute_code("context = context_0")
+
+
+def _peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(kind: str, mb: int, mode: str) -> tuple[float, float]:
+    """Load one context; returns (seconds, peak RSS growth in MB)."""
+    payload = _payload(kind, mb)
+    path = None
+    if mode == "mapped":
+        # The file stands in for a context that already lives on disk
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+        del payload
+    repl = LocalREPL(share_context=mode == "shared")
+    baseline = _peak_mb()
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        _legacy_load(repl, payload)
+    elif mode == "mapped":
+        repl.load_context(MappedText(path))
+    else:
+        repl.load_context(payload)
+    elapsed = time.perf_counter() - start
+
+    growth = _peak_mb() - baseline
+    repl.cleanup()
+    if path is not None:
+        os.remove(path)
+    return elapsed, growth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mb", type=int, default=100)
+    parser.add_argument("--kind", default="str,docs")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        kind, mode = args.case.split(":")
+        print(*run_case(kind, args.mb, mode))
+        return
+
+    print(f"{'kind':>6} {'mode':>8} {'load s':>9} {'peak MB':>9}")
+    for kind in args.kind.split(","):
+        for mode in MODES:
+            if mode == "mapped" and kind != "str":
+                continue
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_context_load", "--mb", str(args.mb)]
+                + ["--case", f"{kind}:{mode}"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            elapsed, growth = map(float, out.split())
+            print(f"{kind:>6} {mode:>8} {elapsed:>9.4f} {growth:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
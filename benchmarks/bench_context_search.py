@@ -0,0 +1,81 @@
+"""
+Benchmark for the REPL's context search index.
+
+Builds a synthetic corpus (Zipf-distributed words in paragraphs), then measures building the
+index, BM25 queries, and index-assisted regex search against a plain `re` scan of the whole
+context. Peak RSS growth covers the index only (the corpus is built before measuring).
+
+Usage:
+    python -m benchmarks.bench_context_search [--mb 200] [--queries 20] [--kind str|docs]
+"""
+
+import argparse
+import random
+import re
+import resource
+import time
+
+from rlm.utils.context_search import SearchIndex
+
+
+def _corpus(mb: int, kind: str, seed: int = 0) -> str | list[str]:
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(50_000)]
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+    # Sample one large pool of words and slice it, instead of sampling per paragraph
+    pool = rng.choices(vocab, weights, k=200_000)
+    paragraphs, size = [], 0
+    while size < mb * 1_000_000:
+        start = rng.randrange(len(pool) - 200)
+        paragraph = " ".join(pool[start : start + rng.randint(40, 200)])
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    if kind == "docs":
+        return ["\n\n".join(paragraphs[i : i + 20]) for i in range(0, len(paragraphs), 20)]
+    return "\n\n".join(paragraphs)
+
+
+def _peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mb", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--kind", choices=["str", "docs"], default="str")
+    args = parser.parse_args()
+
+    context = _corpus(args.mb, args.kind)
+    baseline = _peak_mb()
+    start = time.perf_counter()
+    index = SearchIndex(context)
+    build = time.perf_counter() - start
+    print(
+        f"build: {build:.1f}s ({args.mb / build:.1f} MB/s), {len(index.passages)} passages, "
+        f"{len(index._postings)} words, peak RSS +{_peak_mb() - baseline:.0f} MB"
+    )
+
+    rng = random.Random(1)
+    queries = [" ".join(f"w{rng.randrange(100, 20_000)}" for _ in range(3)) for _ in range(50)]
+    start = time.perf_counter()
+    for query in queries[: args.queries]:
+        index.search(query, k=10)
+    print(f"search: {(time.perf_counter() - start) / args.queries * 1000:.2f} ms/query")
+
+    texts = context if isinstance(context, list) else [context]
+    for label, pattern in [("rare word", r"\bw4321\b \w+"), ("no literal", r"w4321\d \w+")]:
+        start = time.perf_counter()
+        hits = index.grep(pattern, max_results=10**9)
+        indexed = time.perf_counter() - start
+        start = time.perf_counter()
+        scanned = sum(len(re.findall(pattern, text)) for text in texts)
+        scan = time.perf_counter() - start
+        print(
+            f"grep ({label}): index {indexed * 1000:.1f} ms, re scan {scan * 1000:.1f} ms, "
+            f"{len(hits)} / {scanned} matches"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -150,13 +150,8 @@ environment_kwargs={"setup_code": "import numpy as np"}`} />
               <span className="text-xs px-2 py-1 rounded-md bg-muted text-muted-foreground font-mono">int</span>
               <span className="text-xs px-2 py-1 rounded-md bg-blue-100 text-blue-700 font-mono">default: 1</span>
             </div>
-            <div className="mb-2 p-3 bg-amber-50 border border-amber-200 rounded-md">
-              <p className="text-sm text-amber-800">
-                <strong>Note:</strong> This is a TODO. Only <code className="px-1.5 py-0.5 rounded bg-amber-100 text-amber-900 text-xs font-semibold">max_depth=1</code> is currently supported.
-              </p>
-            </div>
             <p className="text-muted-foreground">
-              Maximum recursion depth. When <code className="px-1.5 py-0.5 rounded bg-muted text-foreground text-sm">depth {">="} max_depth</code>, falls back to regular LM completion.
+              Maximum recursion depth. When <code className="px-1.5 py-0.5 rounded bg-muted text-foreground text-sm">depth {">="} max_depth</code>, falls back to regular LM completion. Below <code className="px-1.5 py-0.5 rounded bg-muted text-foreground text-sm">max_depth</code>, sub-calls run child RLM trajectories that share the root&apos;s LM handler.
             </p>
           </div>
 
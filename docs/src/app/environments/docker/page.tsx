@@ -48,6 +48,7 @@ export default function DockerPage() {
           [<code key="4">setup_code</code>, <code key="5">str</code>, <code key="6">None</code>, "Code to run at initialization"],
           [<code key="7">context_payload</code>, <code key="8">str | dict | list</code>, "Auto", "Initial context (set by RLM)"],
           [<code key="9">lm_handler_address</code>, <code key="10">tuple</code>, "Auto", "Socket address (set by RLM)"],
+          [<code key="11">cache_dependencies_image</code>, <code key="12">bool</code>, <code key="13">False</code>, "Save a local image with dill and requests installed (tagged rlm-repl-deps:<image>), so later containers skip the install. The image is left on the host."],
         ]}
       />
 
@@ -56,7 +57,7 @@ export default function DockerPage() {
       <h2 className="text-2xl font-semibold mb-4">How It Works</h2>
       <ol className="list-decimal list-inside text-muted-foreground space-y-1 mb-6">
         <li>Starts Docker container with volume mount to temp directory</li>
-        <li>Installs <code>dill</code> and <code>requests</code> in container</li>
+        <li>Installs <code>dill</code> and <code>requests</code> in container, if the image lacks them</li>
         <li>Host runs HTTP proxy server on random port</li>
         <li>Container calls proxy via <code>host.docker.internal</code></li>
         <li>Proxy forwards <code>llm_query()</code> to LM Handler via socket</li>
@@ -34,7 +34,8 @@ export default function LocalPage() {
         headers={["Argument", "Type", "Default", "Description"]}
         rows={[
           [<code key="1">setup_code</code>, <code key="2">str</code>, <code key="3">None</code>, "Code to run at initialization"],
-          [<code key="4">context_payload</code>, <code key="5">str | dict | list</code>, "Auto", "Initial context (set by RLM)"],
+          [<code key="4">context_payload</code>, <code key="5">str | dict | list | MappedText</code>, "Auto", "Initial context (set by RLM)"],
+          [<code key="8">share_context</code>, <code key="9">bool</code>, <code key="10">False</code>, "Bind dict and list contexts without copying them"],
           [<code key="6">lm_handler_address</code>, <code key="7">tuple</code>, "Auto", "Socket address (set by RLM)"],
         ]}
       />
@@ -44,7 +45,7 @@ export default function LocalPage() {
       <h2 className="text-2xl font-semibold mb-4">How It Works</h2>
       <ol className="list-decimal list-inside text-muted-foreground space-y-1">
         <li>Creates sandboxed <code>globals</code> with restricted <code>__builtins__</code></li>
-        <li>Injects <code>context</code>, <code>llm_query()</code>, <code>llm_query_batched()</code>, <code>FINAL_VAR()</code></li>
+        <li>Injects <code>context</code>, <code>llm_query()</code>, <code>llm_query_batched()</code>, <code>FINAL_VAR()</code>, <code>chunk_context()</code>, <code>llm_map()</code>, and the <code>search_context()</code> / <code>grep_context()</code> search helpers</li>
         <li>Executes each code block via <code>exec()</code></li>
         <li><code>llm_query()</code> sends TCP requests to LM Handler</li>
         <li>Variables persist across code blocks in <code>locals</code></li>
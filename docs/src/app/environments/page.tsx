@@ -106,7 +106,11 @@ export default function EnvironmentsPage() {
                 "Concurrent sub-LM queries. Returns a list of completion strings."
               ],
               [
-                <code key="4" className="text-sm font-semibold">FINAL_VAR(var_name)</code>, 
+                <code key="4" className="text-sm font-semibold">llm_query_batched_iter(prompts, model=None)</code>, 
+                "Concurrent sub-LM queries. Yields (index, completion) pairs as each one finishes."
+              ],
+              [
+                <code key="5" className="text-sm font-semibold">FINAL_VAR(var_name)</code>, 
                 "Mark a variable as the final answer to return from the RLM"
               ],
             ]}
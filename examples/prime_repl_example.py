@@ -9,7 +9,7 @@ load_dotenv()
 
 logger = RLMLogger(log_dir="./logs")
 
-rlm = RLM(
+with RLM(
     backend="openai",
     backend_kwargs={
         "api_key": os.getenv("OPENAI_API_KEY"),
@@ -24,7 +24,6 @@ rlm = RLM(
     max_depth=1,
     logger=logger,
     verbose=True,
-)
-
-result = rlm.completion("Using your code, solve 2^(2^(2^(2))). Show your work in Python.")
+) as rlm:
+    result = rlm.completion("Using your code, solve 2^(2^(2^(2))). Show your work in Python.")
 print(result.response)
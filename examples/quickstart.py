@@ -9,7 +9,7 @@ load_dotenv()
 
 logger = RLMLogger(log_dir="./logs")
 
-rlm = RLM(
+with RLM(
     backend="openai",  # or "portkey", etc.
     backend_kwargs={
         "model_name": "gpt-5-nano",
@@ -20,8 +20,7 @@ rlm = RLM(
     max_depth=1,
     logger=logger,
     verbose=True,  # For printing to console with rich, disabled by default.
-)
-
-result = rlm.completion("Print me the first 5 powers of two, each on a newline.")
+) as rlm:
+    result = rlm.completion("Print me the first 5 powers of two, each on a newline.")
 
 print(result)
@@ -1,15 +1,24 @@
 from collections import defaultdict
+from types import SimpleNamespace
 from typing import Any
 
 import anthropic
 
-from rlm.clients.base_lm import BaseLM
+from rlm.clients.base_lm import BaseLM, CompletionStream
 from rlm.core.types import ModelUsageSummary, UsageSummary
+from rlm.utils.rlm_utils import estimate_tokens
+
+CACHE_CONTROL = {"type": "ephemeral"}
 
 
 class AnthropicClient(BaseLM):
     """
     LM Client for running models with the Anthropic API.
+
+    With prompt_caching (the default), message-list prompts get cache_control breakpoints on
+    the system prompt and on the last message before the final one. An RLM's root prompt is
+    its append-only history plus a short per-iteration suffix, so each iteration reads the
+    previous iteration's prefix from the cache.
     """
 
     def __init__(
@@ -17,6 +26,7 @@ class AnthropicClient(BaseLM):
         api_key: str,
         model_name: str | None = None,
         max_tokens: int = 32768,
+        prompt_caching: bool = True,
         **kwargs,
     ):
         super().__init__(model_name=model_name, **kwargs)
@@ -24,14 +34,27 @@ class AnthropicClient(BaseLM):
         self.async_client = anthropic.AsyncAnthropic(api_key=api_key)
         self.model_name = model_name
         self.max_tokens = max_tokens
+        self.prompt_caching = prompt_caching
 
         # Per-model usage tracking
         self.model_call_counts: dict[str, int] = defaultdict(int)
         self.model_input_tokens: dict[str, int] = defaultdict(int)
         self.model_output_tokens: dict[str, int] = defaultdict(int)
         self.model_total_tokens: dict[str, int] = defaultdict(int)
+        self.model_cached_input_tokens: dict[str, int] = defaultdict(int)
+        self.model_cache_write_tokens: dict[str, int] = defaultdict(int)
+
+        # Last call tracking
+        self.last_cached_tokens = 0
+        self.last_cache_write_tokens = 0
 
     def completion(self, prompt: str | list[dict[str, Any]], model: str | None = None) -> str:
+        content, _ = self.completion_with_usage(prompt, model)
+        return content
+
+    def completion_with_usage(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
         messages, system = self._prepare_messages(prompt)
 
         model = model or self.model_name
@@ -43,12 +66,18 @@ class AnthropicClient(BaseLM):
             kwargs["system"] = system
 
         response = self.client.messages.create(**kwargs)
-        self._track_cost(response, model)
-        return response.content[0].text
+        usage = self._track_cost(response, model)
+        return response.content[0].text, usage
 
     async def acompletion(
         self, prompt: str | list[dict[str, Any]], model: str | None = None
     ) -> str:
+        content, _ = await self.acompletion_with_usage(prompt, model)
+        return content
+
+    async def acompletion_with_usage(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
         messages, system = self._prepare_messages(prompt)
 
         model = model or self.model_name
@@ -60,8 +89,53 @@ class AnthropicClient(BaseLM):
             kwargs["system"] = system
 
         response = await self.async_client.messages.create(**kwargs)
-        self._track_cost(response, model)
-        return response.content[0].text
+        usage = self._track_cost(response, model)
+        return response.content[0].text, usage
+
+    def stream_completion(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> CompletionStream:
+        messages, system = self._prepare_messages(prompt)
+
+        model = model or self.model_name
+        if not model:
+            raise ValueError("Model name is required for Anthropic client.")
+
+        kwargs = {"model": model, "max_tokens": self.max_tokens, "messages": messages}
+        if system:
+            kwargs["system"] = system
+
+        stream = CompletionStream()
+        return stream.attach(self._stream_chunks(stream, kwargs, model))
+
+    def _stream_chunks(self, stream: CompletionStream, kwargs: dict[str, Any], model: str):
+        text: list[str] = []
+        message = None
+        finished = False
+        try:
+            with self.client.messages.stream(**kwargs) as response:
+                try:
+                    for chunk in response.text_stream:
+                        text.append(chunk)
+                        yield chunk
+                    finished = True
+                finally:
+                    try:
+                        message = response.current_message_snapshot
+                    except Exception:  # no events received
+                        message = None
+        finally:
+            # Output tokens are only final in the last event; estimate if stopped earlier
+            output_tokens = estimate_tokens("".join(text)) if text else 0
+            if message is None:
+                usage = SimpleNamespace(
+                    input_tokens=estimate_tokens(kwargs["messages"]), output_tokens=output_tokens
+                )
+            else:
+                usage = message.usage.model_copy()
+                if not finished:
+                    usage.output_tokens = max(usage.output_tokens, output_tokens)
+            stream.usage = self._track_cost(SimpleNamespace(usage=usage), model)
 
     def _prepare_messages(
         self, prompt: str | list[dict[str, Any]]
@@ -82,17 +156,51 @@ class AnthropicClient(BaseLM):
         else:
             raise ValueError(f"Invalid prompt type: {type(prompt)}")
 
+        if self.prompt_caching and isinstance(prompt, list):
+            if system:
+                system = [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}]
+            if len(messages) >= 2:
+                messages[-2] = self._with_cache_control(messages[-2])
+
         return messages, system
 
-    def _track_cost(self, response: anthropic.types.Message, model: str):
-        self.model_call_counts[model] += 1
-        self.model_input_tokens[model] += response.usage.input_tokens
-        self.model_output_tokens[model] += response.usage.output_tokens
-        self.model_total_tokens[model] += response.usage.input_tokens + response.usage.output_tokens
+    @staticmethod
+    def _with_cache_control(message: dict[str, Any]) -> dict[str, Any]:
+        """Copy of `message` with a cache breakpoint after its last content block."""
+        content = message.get("content")
+        if isinstance(content, str):
+            blocks = [{"type": "text", "text": content}]
+        else:
+            blocks = [dict(block) for block in content]
+        blocks[-1]["cache_control"] = CACHE_CONTROL
+        return {**message, "content": blocks}
+
+    def _track_cost(self, response: anthropic.types.Message, model: str) -> ModelUsageSummary:
+        # input_tokens excludes the tokens read from and written to the prompt cache
+        usage = response.usage
+        cached_tokens = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write_tokens = getattr(usage, "cache_creation_input_tokens", None) or 0
+        input_tokens = usage.input_tokens + cached_tokens + cache_write_tokens
 
-        # Track last call for handler to read
-        self.last_prompt_tokens = response.usage.input_tokens
-        self.last_completion_tokens = response.usage.output_tokens
+        self.model_call_counts[model] += 1
+        self.model_input_tokens[model] += input_tokens
+        self.model_output_tokens[model] += usage.output_tokens
+        self.model_total_tokens[model] += input_tokens + usage.output_tokens
+        self.model_cached_input_tokens[model] += cached_tokens
+        self.model_cache_write_tokens[model] += cache_write_tokens
+
+        # Track last call for get_last_usage()
+        self.last_prompt_tokens = input_tokens
+        self.last_completion_tokens = usage.output_tokens
+        self.last_cached_tokens = cached_tokens
+        self.last_cache_write_tokens = cache_write_tokens
+        return ModelUsageSummary(
+            total_calls=1,
+            total_input_tokens=input_tokens,
+            total_output_tokens=usage.output_tokens,
+            cached_input_tokens=cached_tokens,
+            cache_write_tokens=cache_write_tokens,
+        )
 
     def get_usage_summary(self) -> UsageSummary:
         model_summaries = {}
@@ -101,6 +209,8 @@ class AnthropicClient(BaseLM):
                 total_calls=self.model_call_counts[model],
                 total_input_tokens=self.model_input_tokens[model],
                 total_output_tokens=self.model_output_tokens[model],
+                cached_input_tokens=self.model_cached_input_tokens[model],
+                cache_write_tokens=self.model_cache_write_tokens[model],
             )
         return UsageSummary(model_usage_summaries=model_summaries)
 
@@ -109,4 +219,6 @@ class AnthropicClient(BaseLM):
             total_calls=1,
             total_input_tokens=self.last_prompt_tokens,
             total_output_tokens=self.last_completion_tokens,
+            cached_input_tokens=self.last_cached_tokens,
+            cache_write_tokens=self.last_cache_write_tokens,
         )
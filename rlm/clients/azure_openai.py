@@ -68,8 +68,18 @@ class AzureOpenAIClient(BaseLM):
         self.model_input_tokens: dict[str, int] = defaultdict(int)
         self.model_output_tokens: dict[str, int] = defaultdict(int)
         self.model_total_tokens: dict[str, int] = defaultdict(int)
+        self.model_cached_input_tokens: dict[str, int] = defaultdict(int)
+
+        # Last call tracking
+        self.last_cached_tokens = 0
 
     def completion(self, prompt: str | list[dict[str, Any]], model: str | None = None) -> str:
+        content, _ = self.completion_with_usage(prompt, model)
+        return content
+
+    def completion_with_usage(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
         if isinstance(prompt, str):
             messages = [{"role": "user", "content": prompt}]
         elif isinstance(prompt, list) and all(isinstance(item, dict) for item in prompt):
@@ -85,12 +95,18 @@ class AzureOpenAIClient(BaseLM):
             model=model,
             messages=messages,
         )
-        self._track_cost(response, model)
-        return response.choices[0].message.content
+        usage = self._track_cost(response, model)
+        return response.choices[0].message.content, usage
 
     async def acompletion(
         self, prompt: str | list[dict[str, Any]], model: str | None = None
     ) -> str:
+        content, _ = await self.acompletion_with_usage(prompt, model)
+        return content
+
+    async def acompletion_with_usage(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
         if isinstance(prompt, str):
             messages = [{"role": "user", "content": prompt}]
         elif isinstance(prompt, list) and all(isinstance(item, dict) for item in prompt):
@@ -106,10 +122,10 @@ class AzureOpenAIClient(BaseLM):
             model=model,
             messages=messages,
         )
-        self._track_cost(response, model)
-        return response.choices[0].message.content
+        usage = self._track_cost(response, model)
+        return response.choices[0].message.content, usage
 
-    def _track_cost(self, response: openai.ChatCompletion, model: str):
+    def _track_cost(self, response: openai.ChatCompletion, model: str) -> ModelUsageSummary:
         self.model_call_counts[model] += 1
 
         usage = getattr(response, "usage", None)
@@ -119,10 +135,20 @@ class AzureOpenAIClient(BaseLM):
         self.model_input_tokens[model] += usage.prompt_tokens
         self.model_output_tokens[model] += usage.completion_tokens
         self.model_total_tokens[model] += usage.total_tokens
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        self.model_cached_input_tokens[model] += cached_tokens
 
-        # Track last call for handler to read
+        # Track last call for get_last_usage()
         self.last_prompt_tokens = usage.prompt_tokens
         self.last_completion_tokens = usage.completion_tokens
+        self.last_cached_tokens = cached_tokens
+        return ModelUsageSummary(
+            total_calls=1,
+            total_input_tokens=usage.prompt_tokens,
+            total_output_tokens=usage.completion_tokens,
+            cached_input_tokens=cached_tokens,
+        )
 
     def get_usage_summary(self) -> UsageSummary:
         model_summaries = {}
@@ -131,6 +157,7 @@ class AzureOpenAIClient(BaseLM):
                 total_calls=self.model_call_counts[model],
                 total_input_tokens=self.model_input_tokens[model],
                 total_output_tokens=self.model_output_tokens[model],
+                cached_input_tokens=self.model_cached_input_tokens[model],
             )
         return UsageSummary(model_usage_summaries=model_summaries)
 
@@ -139,4 +166,5 @@ class AzureOpenAIClient(BaseLM):
             total_calls=1,
             total_input_tokens=self.last_prompt_tokens,
             total_output_tokens=self.last_completion_tokens,
+            cached_input_tokens=self.last_cached_tokens,
         )
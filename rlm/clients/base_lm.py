@@ -1,9 +1,35 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
 from typing import Any
 
 from rlm.core.types import ModelUsageSummary, UsageSummary
 
 
+class CompletionStream(Iterator[str]):
+    """Text chunks of a streamed completion.
+
+    Closing the stream stops generation. Once it is exhausted or closed, `usage` holds the
+    usage of exactly this call (clients estimate output tokens if generation was stopped
+    before the provider reported them).
+    """
+
+    def __init__(self):
+        self.usage: ModelUsageSummary | None = None
+        self._chunks: Iterator[str] = iter(())
+
+    def attach(self, chunks: Iterator[str]) -> "CompletionStream":
+        """Stream `chunks`, a generator that sets this stream's usage when it finishes."""
+        self._chunks = chunks
+        return self
+
+    def __next__(self) -> str:
+        return next(self._chunks)
+
+    def close(self) -> None:
+        if hasattr(self._chunks, "close"):
+            self._chunks.close()
+
+
 class BaseLM(ABC):
     """
     Base class for all language model routers / clients. When the RLM makes sub-calls, it currently
@@ -22,6 +48,38 @@ class BaseLM(ABC):
     async def acompletion(self, prompt: str | dict[str, Any]) -> str:
         raise NotImplementedError
 
+    def completion_with_usage(self, prompt: str | dict[str, Any]) -> tuple[str, ModelUsageSummary]:
+        """Synchronous counterpart of acompletion_with_usage(), with the same caveat."""
+        content = self.completion(prompt)
+        return content, self.get_last_usage()
+
+    async def acompletion_with_usage(
+        self, prompt: str | dict[str, Any]
+    ) -> tuple[str, ModelUsageSummary]:
+        """Completion plus the usage of exactly this call.
+
+        Used by the LMHandler so concurrent calls each get their own token counts. The default
+        reads get_last_usage() after acompletion(), which is only accurate when calls do not
+        overlap; clients should override it to return usage from their own response.
+        """
+        content = await self.acompletion(prompt)
+        return content, self.get_last_usage()
+
+    def stream_completion(self, prompt: str | dict[str, Any]) -> CompletionStream:
+        """Stream the completion in text chunks as they are generated.
+
+        The default yields completion() as a single chunk; clients override it to stream
+        from their provider.
+        """
+        stream = CompletionStream()
+
+        def chunks():
+            content = self.completion(prompt)
+            stream.usage = self.get_last_usage()
+            yield content
+
+        return stream.attach(chunks())
+
     @abstractmethod
     def get_usage_summary(self) -> UsageSummary:
         """Get cost summary for all model calls."""
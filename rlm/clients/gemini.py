@@ -1,13 +1,17 @@
 import os
+import threading
+import time
 from collections import defaultdict
+from types import SimpleNamespace
 from typing import Any
 
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
-from rlm.clients.base_lm import BaseLM
+from rlm.clients.base_lm import BaseLM, CompletionStream
 from rlm.core.types import ModelUsageSummary, UsageSummary
+from rlm.utils.rlm_utils import prompt_hash
 
 load_dotenv()
 
@@ -18,12 +22,20 @@ class GeminiClient(BaseLM):
     """
     LM Client for running models with the Google Gemini API.
     Uses the official google-genai SDK.
+
+    Gemini caches repeated prompt prefixes implicitly. With prompt_caching, system
+    instructions are also put in explicit cached contents (created once per model and
+    instruction, and renewed when their `cache_ttl` runs out). Explicit caches are billed for
+    storage, so this is off by default; instructions below the model's minimum cacheable size
+    are sent as usual.
     """
 
     def __init__(
         self,
         api_key: str | None = None,
         model_name: str | None = "gemini-2.5-flash",
+        prompt_caching: bool = False,
+        cache_ttl: int = 3600,
         **kwargs,
     ):
         super().__init__(model_name=model_name, **kwargs)
@@ -38,40 +50,87 @@ class GeminiClient(BaseLM):
 
         self.client = genai.Client(api_key=api_key)
         self.model_name = model_name
+        self.prompt_caching = prompt_caching
+        self.cache_ttl = cache_ttl
+
+        # (model, instruction hash) -> (cached content name or None if not cacheable, expiry)
+        self._caches: dict[tuple[str, str], tuple[str | None, float]] = {}
+        self._caches_lock = threading.Lock()
 
         # Per-model usage tracking
         self.model_call_counts: dict[str, int] = defaultdict(int)
         self.model_input_tokens: dict[str, int] = defaultdict(int)
         self.model_output_tokens: dict[str, int] = defaultdict(int)
         self.model_total_tokens: dict[str, int] = defaultdict(int)
+        self.model_cached_input_tokens: dict[str, int] = defaultdict(int)
 
         # Last call tracking
         self.last_prompt_tokens = 0
         self.last_completion_tokens = 0
+        self.last_cached_tokens = 0
 
     def completion(self, prompt: str | list[dict[str, Any]], model: str | None = None) -> str:
+        content, _ = self.completion_with_usage(prompt, model)
+        return content
+
+    def completion_with_usage(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
         contents, system_instruction = self._prepare_contents(prompt)
 
         model = model or self.model_name
         if not model:
             raise ValueError("Model name is required for Gemini client.")
 
-        config = None
-        if system_instruction:
-            config = types.GenerateContentConfig(system_instruction=system_instruction)
-
         response = self.client.models.generate_content(
             model=model,
             contents=contents,
-            config=config,
+            config=self._config(model, system_instruction),
         )
 
-        self._track_cost(response, model)
-        return response.text
+        usage = self._track_cost(response, model)
+        return response.text, usage
+
+    def stream_completion(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> CompletionStream:
+        contents, system_instruction = self._prepare_contents(prompt)
+
+        model = model or self.model_name
+        if not model:
+            raise ValueError("Model name is required for Gemini client.")
+
+        stream = CompletionStream()
+        return stream.attach(self._stream_chunks(stream, contents, system_instruction, model))
+
+    def _stream_chunks(
+        self,
+        stream: CompletionStream,
+        contents: list[types.Content] | str,
+        system_instruction: str | None,
+        model: str,
+    ):
+        last = None
+        try:
+            for chunk in self.client.models.generate_content_stream(
+                model=model, contents=contents, config=self._config(model, system_instruction)
+            ):
+                last = chunk
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            # The last chunk received carries the usage so far
+            stream.usage = self._track_cost(last or SimpleNamespace(usage_metadata=None), model)
 
     async def acompletion(
         self, prompt: str | list[dict[str, Any]], model: str | None = None
     ) -> str:
+        content, _ = await self.acompletion_with_usage(prompt, model)
+        return content
+
+    async def acompletion_with_usage(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
         contents, system_instruction = self._prepare_contents(prompt)
 
         model = model or self.model_name
@@ -80,7 +139,16 @@ class GeminiClient(BaseLM):
 
         config = None
         if system_instruction:
-            config = types.GenerateContentConfig(system_instruction=system_instruction)
+            cache_key = self._cache_key(model, system_instruction)
+            if cache_key is not None:
+                try:
+                    cache = await self.client.aio.caches.create(
+                        model=model, config=self._cache_config(system_instruction)
+                    )
+                    self._store_cache(cache_key, cache.name)
+                except Exception:
+                    self._store_cache(cache_key, None)
+            config = self._generate_config(model, system_instruction)
 
         # google-genai SDK supports async via aio interface
         response = await self.client.aio.models.generate_content(
@@ -89,8 +157,55 @@ class GeminiClient(BaseLM):
             config=config,
         )
 
-        self._track_cost(response, model)
-        return response.text
+        usage = self._track_cost(response, model)
+        return response.text, usage
+
+    def _config(
+        self, model: str, system_instruction: str | None
+    ) -> types.GenerateContentConfig | None:
+        if not system_instruction:
+            return None
+        cache_key = self._cache_key(model, system_instruction)
+        if cache_key is not None:
+            try:
+                cache = self.client.caches.create(
+                    model=model, config=self._cache_config(system_instruction)
+                )
+                self._store_cache(cache_key, cache.name)
+            except Exception:
+                self._store_cache(cache_key, None)
+        return self._generate_config(model, system_instruction)
+
+    def _cache_key(self, model: str, system_instruction: str) -> tuple[str, str] | None:
+        """Key of a cached content to create for this instruction, or None if there is one
+        (or caching is off)."""
+        if not self.prompt_caching:
+            return None
+        key = (model, prompt_hash(system_instruction))
+        with self._caches_lock:
+            entry = self._caches.get(key)
+        if entry is not None and time.monotonic() < entry[1]:
+            return None
+        return key
+
+    def _cache_config(self, system_instruction: str) -> types.CreateCachedContentConfig:
+        return types.CreateCachedContentConfig(
+            system_instruction=system_instruction, ttl=f"{self.cache_ttl}s"
+        )
+
+    def _store_cache(self, key: tuple[str, str], name: str | None) -> None:
+        # Renew a minute early so calls never reference an expired cache
+        with self._caches_lock:
+            self._caches[key] = (name, time.monotonic() + max(self.cache_ttl - 60, 0))
+
+    def _generate_config(self, model: str, system_instruction: str) -> types.GenerateContentConfig:
+        name = None
+        if self.prompt_caching:
+            with self._caches_lock:
+                name, _ = self._caches.get((model, prompt_hash(system_instruction)), (None, 0.0))
+        if name:
+            return types.GenerateContentConfig(cached_content=name)
+        return types.GenerateContentConfig(system_instruction=system_instruction)
 
     def _prepare_contents(
         self, prompt: str | list[dict[str, Any]]
@@ -124,25 +239,32 @@ class GeminiClient(BaseLM):
 
         raise ValueError(f"Invalid prompt type: {type(prompt)}")
 
-    def _track_cost(self, response: types.GenerateContentResponse, model: str):
+    def _track_cost(self, response: types.GenerateContentResponse, model: str) -> ModelUsageSummary:
         self.model_call_counts[model] += 1
 
         # Extract token usage from response
         usage = response.usage_metadata
+        input_tokens = output_tokens = cached_tokens = 0
         if usage:
             input_tokens = usage.prompt_token_count or 0
             output_tokens = usage.candidates_token_count or 0
+            cached_tokens = usage.cached_content_token_count or 0
 
             self.model_input_tokens[model] += input_tokens
             self.model_output_tokens[model] += output_tokens
             self.model_total_tokens[model] += input_tokens + output_tokens
+            self.model_cached_input_tokens[model] += cached_tokens
 
-            # Track last call for handler to read
-            self.last_prompt_tokens = input_tokens
-            self.last_completion_tokens = output_tokens
-        else:
-            self.last_prompt_tokens = 0
-            self.last_completion_tokens = 0
+        # Track last call for get_last_usage()
+        self.last_prompt_tokens = input_tokens
+        self.last_completion_tokens = output_tokens
+        self.last_cached_tokens = cached_tokens
+        return ModelUsageSummary(
+            total_calls=1,
+            total_input_tokens=input_tokens,
+            total_output_tokens=output_tokens,
+            cached_input_tokens=cached_tokens,
+        )
 
     def get_usage_summary(self) -> UsageSummary:
         model_summaries = {}
@@ -151,6 +273,7 @@ class GeminiClient(BaseLM):
                 total_calls=self.model_call_counts[model],
                 total_input_tokens=self.model_input_tokens[model],
                 total_output_tokens=self.model_output_tokens[model],
+                cached_input_tokens=self.model_cached_input_tokens[model],
             )
         return UsageSummary(model_usage_summaries=model_summaries)
 
@@ -159,4 +282,5 @@ class GeminiClient(BaseLM):
             total_calls=1,
             total_input_tokens=self.last_prompt_tokens,
             total_output_tokens=self.last_completion_tokens,
+            cached_input_tokens=self.last_cached_tokens,
         )
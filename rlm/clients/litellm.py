@@ -32,6 +32,12 @@ class LiteLLMClient(BaseLM):
         self.model_total_tokens: dict[str, int] = defaultdict(int)
 
     def completion(self, prompt: str | list[dict[str, Any]], model: str | None = None) -> str:
+        content, _ = self.completion_with_usage(prompt, model)
+        return content
+
+    def completion_with_usage(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
         if isinstance(prompt, str):
             messages = [{"role": "user", "content": prompt}]
         elif isinstance(prompt, list) and all(isinstance(item, dict) for item in prompt):
@@ -50,12 +56,18 @@ class LiteLLMClient(BaseLM):
             kwargs["api_base"] = self.api_base
 
         response = litellm.completion(**kwargs)
-        self._track_cost(response, model)
-        return response.choices[0].message.content
+        usage = self._track_cost(response, model)
+        return response.choices[0].message.content, usage
 
     async def acompletion(
         self, prompt: str | list[dict[str, Any]], model: str | None = None
     ) -> str:
+        content, _ = await self.acompletion_with_usage(prompt, model)
+        return content
+
+    async def acompletion_with_usage(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
         if isinstance(prompt, str):
             messages = [{"role": "user", "content": prompt}]
         elif isinstance(prompt, list) and all(isinstance(item, dict) for item in prompt):
@@ -74,18 +86,23 @@ class LiteLLMClient(BaseLM):
             kwargs["api_base"] = self.api_base
 
         response = await litellm.acompletion(**kwargs)
-        self._track_cost(response, model)
-        return response.choices[0].message.content
+        usage = self._track_cost(response, model)
+        return response.choices[0].message.content, usage
 
-    def _track_cost(self, response, model: str):
+    def _track_cost(self, response, model: str) -> ModelUsageSummary:
         self.model_call_counts[model] += 1
         self.model_input_tokens[model] += response.usage.prompt_tokens
         self.model_output_tokens[model] += response.usage.completion_tokens
         self.model_total_tokens[model] += response.usage.total_tokens
 
-        # Track last call for handler to read
+        # Track last call for get_last_usage()
         self.last_prompt_tokens = response.usage.prompt_tokens
         self.last_completion_tokens = response.usage.completion_tokens
+        return ModelUsageSummary(
+            total_calls=1,
+            total_input_tokens=response.usage.prompt_tokens,
+            total_output_tokens=response.usage.completion_tokens,
+        )
 
     def get_usage_summary(self) -> UsageSummary:
         model_summaries = {}
@@ -4,9 +4,11 @@ from typing import Any
 
 import openai
 from dotenv import load_dotenv
+from openai.types import CompletionUsage
 
-from rlm.clients.base_lm import BaseLM
+from rlm.clients.base_lm import BaseLM, CompletionStream
 from rlm.core.types import ModelUsageSummary, UsageSummary
+from rlm.utils.rlm_utils import estimate_tokens, prompt_hash
 
 load_dotenv()
 
@@ -20,6 +22,11 @@ DEFAULT_PRIME_INTELLECT_BASE_URL = "https://api.pinference.ai/api/v1/"
 class OpenAIClient(BaseLM):
     """
     LM Client for running models with the OpenAI API. Works with vLLM as well.
+
+    OpenAI caches long prompt prefixes automatically. With prompt_caching (the default) and
+    the OpenAI API, message-list prompts also send a prompt_cache_key derived from their
+    first two messages (an RLM's system prompt and context metadata), so the iterations of
+    one trajectory are routed to the same cache.
     """
 
     def __init__(
@@ -27,6 +34,7 @@ class OpenAIClient(BaseLM):
         api_key: str | None = None,
         model_name: str | None = None,
         base_url: str | None = None,
+        prompt_caching: bool = True,
         **kwargs,
     ):
         super().__init__(model_name=model_name, **kwargs)
@@ -43,14 +51,26 @@ class OpenAIClient(BaseLM):
         self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
         self.async_client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url)
         self.model_name = model_name
+        # Other OpenAI-compatible servers may reject prompt_cache_key
+        self.prompt_caching = prompt_caching and base_url in (None, "https://api.openai.com/v1")
 
         # Per-model usage tracking
         self.model_call_counts: dict[str, int] = defaultdict(int)
         self.model_input_tokens: dict[str, int] = defaultdict(int)
         self.model_output_tokens: dict[str, int] = defaultdict(int)
         self.model_total_tokens: dict[str, int] = defaultdict(int)
+        self.model_cached_input_tokens: dict[str, int] = defaultdict(int)
+
+        # Last call tracking
+        self.last_cached_tokens = 0
 
     def completion(self, prompt: str | list[dict[str, Any]], model: str | None = None) -> str:
+        content, _ = self.completion_with_usage(prompt, model)
+        return content
+
+    def completion_with_usage(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
         if isinstance(prompt, str):
             messages = [{"role": "user", "content": prompt}]
         elif isinstance(prompt, list) and all(isinstance(item, dict) for item in prompt):
@@ -67,14 +87,20 @@ class OpenAIClient(BaseLM):
             extra_body["usage"] = {"include": True}
 
         response = self.client.chat.completions.create(
-            model=model, messages=messages, extra_body=extra_body
+            model=model, messages=messages, extra_body=extra_body, **self._cache_kwargs(messages)
         )
-        self._track_cost(response, model)
-        return response.choices[0].message.content
+        usage = self._track_cost(response, model)
+        return response.choices[0].message.content, usage
 
     async def acompletion(
         self, prompt: str | list[dict[str, Any]], model: str | None = None
     ) -> str:
+        content, _ = await self.acompletion_with_usage(prompt, model)
+        return content
+
+    async def acompletion_with_usage(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
         if isinstance(prompt, str):
             messages = [{"role": "user", "content": prompt}]
         elif isinstance(prompt, list) and all(isinstance(item, dict) for item in prompt):
@@ -91,25 +117,93 @@ class OpenAIClient(BaseLM):
             extra_body["usage"] = {"include": True}
 
         response = await self.async_client.chat.completions.create(
-            model=model, messages=messages, extra_body=extra_body
+            model=model, messages=messages, extra_body=extra_body, **self._cache_kwargs(messages)
         )
-        self._track_cost(response, model)
-        return response.choices[0].message.content
+        usage = self._track_cost(response, model)
+        return response.choices[0].message.content, usage
 
-    def _track_cost(self, response: openai.ChatCompletion, model: str):
-        self.model_call_counts[model] += 1
+    def stream_completion(
+        self, prompt: str | list[dict[str, Any]], model: str | None = None
+    ) -> CompletionStream:
+        if isinstance(prompt, str):
+            messages = [{"role": "user", "content": prompt}]
+        elif isinstance(prompt, list) and all(isinstance(item, dict) for item in prompt):
+            messages = prompt
+        else:
+            raise ValueError(f"Invalid prompt type: {type(prompt)}")
 
+        model = model or self.model_name
+        if not model:
+            raise ValueError("Model name is required for OpenAI client.")
+
+        stream = CompletionStream()
+        return stream.attach(self._stream_chunks(stream, messages, model))
+
+    def _stream_chunks(self, stream: CompletionStream, messages: list[dict[str, Any]], model: str):
+        extra_body = {}
+        if self.client.base_url == DEFAULT_PRIME_INTELLECT_BASE_URL:
+            extra_body["usage"] = {"include": True}
+
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            extra_body=extra_body,
+            stream=True,
+            stream_options={"include_usage": True},
+            **self._cache_kwargs(messages),
+        )
+        text: list[str] = []
+        usage = None
+        try:
+            for chunk in response:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text.append(chunk.choices[0].delta.content)
+                    yield text[-1]
+        finally:
+            response.close()
+            if usage is None:  # stopped before the final chunk; estimate
+                prompt_tokens = estimate_tokens(messages)
+                completion_tokens = estimate_tokens("".join(text))
+                usage = CompletionUsage(
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens,
+                    total_tokens=prompt_tokens + completion_tokens,
+                )
+            stream.usage = self._track_usage(usage, model)
+
+    def _cache_kwargs(self, messages: list[dict[str, Any]]) -> dict[str, Any]:
+        if not self.prompt_caching or len(messages) < 2:
+            return {}
+        return {"prompt_cache_key": prompt_hash(messages[:2])[:32]}
+
+    def _track_cost(self, response: openai.ChatCompletion, model: str) -> ModelUsageSummary:
         usage = getattr(response, "usage", None)
         if usage is None:
+            self.model_call_counts[model] += 1
             raise ValueError("No usage data received. Tracking tokens not possible.")
+        return self._track_usage(usage, model)
 
+    def _track_usage(self, usage: CompletionUsage, model: str) -> ModelUsageSummary:
+        self.model_call_counts[model] += 1
         self.model_input_tokens[model] += usage.prompt_tokens
         self.model_output_tokens[model] += usage.completion_tokens
         self.model_total_tokens[model] += usage.total_tokens
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        self.model_cached_input_tokens[model] += cached_tokens
 
-        # Track last call for handler to read
+        # Track last call for get_last_usage()
         self.last_prompt_tokens = usage.prompt_tokens
         self.last_completion_tokens = usage.completion_tokens
+        self.last_cached_tokens = cached_tokens
+        return ModelUsageSummary(
+            total_calls=1,
+            total_input_tokens=usage.prompt_tokens,
+            total_output_tokens=usage.completion_tokens,
+            cached_input_tokens=cached_tokens,
+        )
 
     def get_usage_summary(self) -> UsageSummary:
         model_summaries = {}
@@ -118,6 +212,7 @@ class OpenAIClient(BaseLM):
                 total_calls=self.model_call_counts[model],
                 total_input_tokens=self.model_input_tokens[model],
                 total_output_tokens=self.model_output_tokens[model],
+                cached_input_tokens=self.model_cached_input_tokens[model],
             )
         return UsageSummary(model_usage_summaries=model_summaries)
 
@@ -126,4 +221,5 @@ class OpenAIClient(BaseLM):
             total_calls=1,
             total_input_tokens=self.last_prompt_tokens,
             total_output_tokens=self.last_completion_tokens,
+            cached_input_tokens=self.last_cached_tokens,
         )
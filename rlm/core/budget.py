@@ -0,0 +1,156 @@
+"""
+Per-trajectory budgets.
+
+A Budget caps what one RLM completion (including any child RLMs) may spend: sub-calls, input
+and output tokens, dollars and wall-clock time. The LMHandler keeps a BudgetTracker per
+trajectory; sub-calls tagged with its id are refused once any limit is reached, and the RLM
+stops iterating and asks for its final answer.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+from rlm.core.types import BudgetUsage, ModelUsageSummary
+
+
+@dataclass
+class ModelPricing:
+    """Dollars per million tokens. Cached input defaults to the input price."""
+
+    input: float
+    output: float
+    cached_input: float | None = None
+
+    def cost(self, usage: ModelUsageSummary) -> float:
+        cached = usage.cached_input_tokens
+        cached_price = self.input if self.cached_input is None else self.cached_input
+        return (
+            (usage.total_input_tokens - cached) * self.input
+            + cached * cached_price
+            + usage.total_output_tokens * self.output
+        ) / 1_000_000
+
+
+# List prices (USD per million tokens); models are matched by name or longest name prefix.
+DEFAULT_PRICING: dict[str, ModelPricing] = {
+    "gpt-5": ModelPricing(1.25, 10.0, 0.125),
+    "gpt-5-mini": ModelPricing(0.25, 2.0, 0.025),
+    "gpt-5-nano": ModelPricing(0.05, 0.40, 0.005),
+    "gpt-4.1": ModelPricing(2.0, 8.0, 0.50),
+    "gpt-4.1-mini": ModelPricing(0.40, 1.60, 0.10),
+    "gpt-4o": ModelPricing(2.50, 10.0, 1.25),
+    "gpt-4o-mini": ModelPricing(0.15, 0.60, 0.075),
+    "claude-opus-4": ModelPricing(15.0, 75.0, 1.50),
+    "claude-sonnet-4": ModelPricing(3.0, 15.0, 0.30),
+    "claude-3-5-haiku": ModelPricing(0.80, 4.0, 0.08),
+    "gemini-2.5-pro": ModelPricing(1.25, 10.0, 0.31),
+    "gemini-2.5-flash": ModelPricing(0.30, 2.50, 0.075),
+}
+
+
+class BudgetExceededError(RuntimeError):
+    """A sub-call was refused because its trajectory's budget is used up."""
+
+
+@dataclass
+class Budget:
+    """Limits for one trajectory; None means unlimited.
+
+    Args:
+        max_subcalls: Sub-calls (llm_query prompts, child RLMs) the trajectory may make.
+        max_input_tokens: Input tokens across root calls and sub-calls.
+        max_output_tokens: Output tokens across root calls and sub-calls.
+        max_cost: Dollars across all calls, priced with `pricing`.
+        max_wall_time: Seconds from the start of the completion.
+        pricing: Model name (or name prefix) -> ModelPricing, overriding DEFAULT_PRICING.
+            Calls to models without a price are reported in BudgetUsage.unpriced_models.
+    """
+
+    max_subcalls: int | None = None
+    max_input_tokens: int | None = None
+    max_output_tokens: int | None = None
+    max_cost: float | None = None
+    max_wall_time: float | None = None
+    pricing: dict[str, ModelPricing] = field(default_factory=dict)
+
+    def price_for(self, model: str) -> ModelPricing | None:
+        table = {**DEFAULT_PRICING, **self.pricing}
+        if model in table:
+            return table[model]
+        prefixes = [name for name in table if model.startswith(name)]
+        return table[max(prefixes, key=len)] if prefixes else None
+
+
+class BudgetTracker:
+    """What one trajectory has spent against its Budget. Thread-safe."""
+
+    def __init__(self, budget: Budget):
+        self.budget = budget
+        self.usage = BudgetUsage()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def remaining_time(self) -> float | None:
+        if self.budget.max_wall_time is None:
+            return None
+        return max(self.budget.max_wall_time - (time.perf_counter() - self._start), 0.0)
+
+    def _exhausted(self) -> str | None:
+        budget, usage = self.budget, self.usage
+        if budget.max_subcalls is not None and usage.subcalls >= budget.max_subcalls:
+            return f"max_subcalls ({budget.max_subcalls})"
+        if budget.max_input_tokens is not None and usage.input_tokens >= budget.max_input_tokens:
+            return f"max_input_tokens ({budget.max_input_tokens})"
+        if budget.max_output_tokens is not None and usage.output_tokens >= budget.max_output_tokens:
+            return f"max_output_tokens ({budget.max_output_tokens})"
+        if budget.max_cost is not None and usage.cost >= budget.max_cost:
+            return f"max_cost (${budget.max_cost:g})"
+        if self.remaining_time() == 0.0:
+            return f"max_wall_time ({budget.max_wall_time:g}s)"
+        return None
+
+    def exhausted(self) -> str | None:
+        """The limit that has been reached, if any."""
+        with self._lock:
+            reason = self._exhausted()
+            if reason is not None and self.usage.exhausted is None:
+                self.usage.exhausted = reason
+            return reason
+
+    def admit(self) -> None:
+        """Count one sub-call, or raise BudgetExceededError if the budget is used up."""
+        with self._lock:
+            reason = self._exhausted()
+            if reason is not None:
+                if self.usage.exhausted is None:
+                    self.usage.exhausted = reason
+                self.usage.refused_subcalls += 1
+                raise BudgetExceededError(f"Budget exhausted: {reason} reached")
+            self.usage.subcalls += 1
+
+    def charge(self, model: str, usage: ModelUsageSummary) -> None:
+        """Add the tokens and cost of one call to `model`."""
+        pricing = self.budget.price_for(model)
+        with self._lock:
+            self.usage.input_tokens += usage.total_input_tokens
+            self.usage.output_tokens += usage.total_output_tokens
+            if pricing is not None:
+                self.usage.cost += pricing.cost(usage)
+            elif model not in self.usage.unpriced_models and usage.total_calls:
+                self.usage.unpriced_models.append(model)
+
+    def report(self) -> BudgetUsage:
+        """A snapshot of the usage, with the elapsed wall-clock time."""
+        self.exhausted()
+        with self._lock:
+            return BudgetUsage(
+                subcalls=self.usage.subcalls,
+                refused_subcalls=self.usage.refused_subcalls,
+                input_tokens=self.usage.input_tokens,
+                output_tokens=self.usage.output_tokens,
+                cost=self.usage.cost,
+                wall_time=time.perf_counter() - self._start,
+                exhausted=self.usage.exhausted,
+                unpriced_models=list(self.usage.unpriced_models),
+            )
@@ -0,0 +1,154 @@
+"""
+ResponseCache - Content-addressed cache for sub-LM responses.
+
+Keys are a hash of (model, normalized prompt, sampling params), so re-running the same
+workload (evals, retries, persistent multi-turn sessions) does not pay for identical
+llm_query calls twice. Entries live in an in-memory LRU tier and, optionally, in a SQLite
+file that survives across processes, with size- and age-based eviction.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+
+def _normalize_prompt(prompt: str | list | dict[str, Any]) -> Any:
+    """Canonical form of a prompt: a plain string equals a single user message."""
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt.strip()}]
+    if isinstance(prompt, list):
+        return [
+            {**message, "content": message["content"].strip()}
+            if isinstance(message, dict) and isinstance(message.get("content"), str)
+            else message
+            for message in prompt
+        ]
+    return prompt
+
+
+def cache_key(
+    model: str | None, prompt: str | list | dict[str, Any], params: dict | None = None
+) -> str:
+    """Hash (model, normalized prompt, sampling params) into a cache key."""
+    payload = {"model": model, "prompt": _normalize_prompt(prompt), "params": params or {}}
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional SQLite) cache of sub-LM responses.
+
+    Args:
+        max_entries: Size of the in-memory LRU tier.
+        path: SQLite file for the on-disk tier (None = memory only).
+        max_disk_entries: Evict least recently used rows beyond this many (None = unbounded).
+        max_age: Seconds after which an entry is stale and evicted (None = never).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        path: str | None = None,
+        max_disk_entries: int | None = 100_000,
+        max_age: float | None = None,
+    ):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.max_age = max_age
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.max_age is not None and now - created_at > self.max_age
+
+    def get(self, key: str) -> str | None:
+        """Return the cached response for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                del self._memory[key]
+
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if self._expired(created_at, now):
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember(key, response, created_at)
+            return response
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response in both tiers, evicting old entries as needed."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, response, now, now)
+            )
+            self._evict_disk(now)
+            self._db.commit()
+
+    def _remember(self, key: str, response: str, created_at: float) -> None:
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float) -> None:
+        if self.max_age is not None:
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age,))
+        if self.max_disk_entries is not None:
+            self._db.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_disk_entries,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._db is None:
+                return len(self._memory)
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self) -> None:
+        """Close the SQLite connection (the memory tier stays usable)."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
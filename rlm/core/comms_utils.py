@@ -3,16 +3,36 @@ Communication utilities for RLM socket protocol.
 
 Protocol: 4-byte big-endian length prefix + JSON payload.
 Used for communication between LMHandler and environment subprocesses.
+
+If msgpack is installed, clients send msgpack frames instead, flagged by the high bit of the
+length prefix; the handler answers each frame in the codec it arrived in, so JSON-only
+clients keep working.
+
+Two connection modes share the same framing:
+- One-shot: open a socket, send one request frame, read one response frame, close.
+- Multiplexed: keep one socket open (see LMConnection) and tag every request with a
+  request_id. Many requests can be in flight at once and responses may arrive out of order.
 """
 
+import asyncio
+import itertools
 import json
+import queue
 import socket
 import struct
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future
 from dataclasses import dataclass
 from typing import Any
 
 from rlm.core.types import RLMChatCompletion
 
+try:
+    import msgpack
+except ImportError:  # optional: pip install msgpack
+    msgpack = None
+
 # =============================================================================
 # Message Dataclasses
 # =============================================================================
@@ -23,12 +43,21 @@ class LMRequest:
     """Request message sent to the LM Handler.
 
     Supports both single prompt (prompt field) and batched prompts (prompts field).
+    With compact=True the handler does not echo prompts back: each returned
+    RLMChatCompletion carries a prompt_hash instead. deadline is a per-call time budget in
+    seconds. budget_id names the trajectory Budget the call counts against (see
+    LMHandler.open_budget).
     """
 
     prompt: str | dict[str, Any] | None = None
     prompts: list[str | dict[str, Any]] | None = None
     model: str | None = None
     depth: int = 0
+    request_id: int | None = None
+    stream: bool = False
+    compact: bool = False
+    deadline: float | None = None
+    budget_id: str | None = None
 
     @property
     def is_batched(self) -> bool:
@@ -45,6 +74,16 @@ class LMRequest:
         if self.model is not None:
             d["model"] = self.model
         d["depth"] = self.depth
+        if self.request_id is not None:
+            d["request_id"] = self.request_id
+        if self.stream:
+            d["stream"] = True
+        if self.compact:
+            d["compact"] = True
+        if self.deadline is not None:
+            d["deadline"] = self.deadline
+        if self.budget_id is not None:
+            d["budget_id"] = self.budget_id
         return d
 
     @classmethod
@@ -55,6 +94,11 @@ class LMRequest:
             prompts=data.get("prompts"),
             model=data.get("model"),
             depth=data.get("depth", -1),  # TODO: Default should throw an error
+            request_id=data.get("request_id"),
+            stream=data.get("stream", False),
+            compact=data.get("compact", False),
+            deadline=data.get("deadline"),
+            budget_id=data.get("budget_id"),
         )
 
 
@@ -63,11 +107,15 @@ class LMResponse:
     """Response message from the LM Handler.
 
     Supports both single response (chat_completion) and batched responses (chat_completions).
+    For streamed batched requests, each frame carries one chat_completion (or error) and the
+    index of its prompt in the batch.
     """
 
     error: str | None = None
     chat_completion: RLMChatCompletion | None = None
     chat_completions: list[RLMChatCompletion] | None = None
+    request_id: int | None = None
+    index: int | None = None
 
     @property
     def success(self) -> bool:
@@ -82,28 +130,34 @@ class LMResponse:
     def to_dict(self) -> dict:
         """Convert to dict, excluding None values."""
         if self.error is not None:
-            return {
+            d = {
                 "error": self.error,
                 "chat_completion": None,
                 "chat_completions": None,
             }
-        if self.chat_completions is not None:
-            return {
+        elif self.chat_completions is not None:
+            d = {
                 "chat_completions": [c.to_dict() for c in self.chat_completions],
                 "chat_completion": None,
                 "error": None,
             }
-        if self.chat_completion is not None:
-            return {
+        elif self.chat_completion is not None:
+            d = {
                 "chat_completion": self.chat_completion.to_dict(),
                 "chat_completions": None,
                 "error": None,
             }
-        return {
-            "error": "No chat completion or error provided.",
-            "chat_completion": None,
-            "chat_completions": None,
-        }
+        else:
+            d = {
+                "error": "No chat completion or error provided.",
+                "chat_completion": None,
+                "chat_completions": None,
+            }
+        if self.request_id is not None:
+            d["request_id"] = self.request_id
+        if self.index is not None:
+            d["index"] = self.index
+        return d
 
     @classmethod
     def from_dict(cls, data: dict) -> "LMResponse":
@@ -120,6 +174,8 @@ class LMResponse:
             error=data.get("error"),
             chat_completion=chat_completion,
             chat_completions=chat_completions,
+            request_id=data.get("request_id"),
+            index=data.get("index"),
         )
 
     @classmethod
@@ -143,48 +199,136 @@ class LMResponse:
 # =============================================================================
 
 
-def socket_send(sock: socket.socket, data: dict) -> None:
-    """Send a length-prefixed JSON message over socket.
+_MSGPACK_FLAG = 0x80000000  # high bit of the length prefix marks a msgpack payload
+
+
+def default_codec() -> str:
+    """The codec clients send by default: msgpack if installed, else JSON."""
+    return "msgpack" if msgpack is not None else "json"
+
+
+def encode_frame(data: dict, codec: str = "json") -> bytes:
+    """Encode a message as a length-prefixed frame in the given codec ("json" or "msgpack")."""
+    if codec == "msgpack":
+        payload = msgpack.packb(data, use_bin_type=True)
+    else:
+        payload = json.dumps(data).encode("utf-8")
+    if len(payload) >= _MSGPACK_FLAG:
+        raise ValueError(f"Frame too large: {len(payload)} bytes")
+    header = len(payload) | (_MSGPACK_FLAG if codec == "msgpack" else 0)
+    return struct.pack(">I", header) + payload
+
+
+def _parse_header(raw_len: bytes) -> tuple[int, str]:
+    header = struct.unpack(">I", raw_len)[0]
+    if header & _MSGPACK_FLAG:
+        if msgpack is None:
+            raise ConnectionError("Received a msgpack frame but msgpack is not installed")
+        return header & ~_MSGPACK_FLAG, "msgpack"
+    return header, "json"
+
+
+def _decode(payload: bytes | bytearray, codec: str) -> Any:
+    if codec == "msgpack":
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+def _recv_exactly(sock: socket.socket, n: int) -> bytearray | None:
+    """Read exactly n bytes into one preallocated buffer. Returns None on EOF before any byte.
+
+    Raises:
+        ConnectionError: If the connection closes after part of the bytes arrived.
+    """
+    buf = bytearray(n)
+    view = memoryview(buf)
+    received = 0
+    while received < n:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return None
+            raise ConnectionError("Connection closed before message complete")
+        received += count
+    return buf
+
+
+def socket_send(sock: socket.socket, data: dict, codec: str = "json") -> None:
+    """Send a length-prefixed message over socket.
+
+    Protocol: 4-byte big-endian length prefix + UTF-8 JSON payload (or msgpack payload with
+    the high bit of the prefix set).
+    """
+    sock.sendall(encode_frame(data, codec))
+
+
+def socket_recv_frame(sock: socket.socket) -> tuple[Any, str | None]:
+    """Receive one frame from socket and return (message, codec).
+
+    Returns ({}, None) if the connection closed before a frame started.
 
-    Protocol: 4-byte big-endian length prefix + UTF-8 JSON payload.
+    Raises:
+        ConnectionError: If connection closes mid-message.
     """
-    payload = json.dumps(data).encode("utf-8")
-    sock.sendall(struct.pack(">I", len(payload)) + payload)
+    raw_len = _recv_exactly(sock, 4)
+    if raw_len is None:
+        return {}, None
+
+    length, codec = _parse_header(raw_len)
+    payload = _recv_exactly(sock, length) if length else bytearray()
+    if payload is None:
+        raise ConnectionError("Connection closed before message complete")
+    return _decode(payload, codec), codec
 
 
 def socket_recv(sock: socket.socket) -> dict:
-    """Receive a length-prefixed JSON message from socket.
+    """Receive a length-prefixed message (JSON or msgpack) from socket.
 
-    Protocol: 4-byte big-endian length prefix + UTF-8 JSON payload.
     Returns empty dict if connection closed before length received.
 
     Raises:
         ConnectionError: If connection closes mid-message.
     """
-    raw_len = sock.recv(4)
-    if not raw_len:
-        return {}
-
-    length = struct.unpack(">I", raw_len)[0]
-    payload = b""
-    while len(payload) < length:
-        chunk = sock.recv(length - len(payload))
-        if not chunk:
-            raise ConnectionError("Connection closed before message complete")
-        payload += chunk
+    return socket_recv_frame(sock)[0]
+
+
+async def stream_recv(reader: asyncio.StreamReader) -> tuple[Any, str | None]:
+    """Receive one frame from an asyncio stream and return (message, codec).
+
+    Same protocol as socket_recv. Returns ({}, None) if the stream closed cleanly
+    between messages.
+
+    Raises:
+        ConnectionError: If the stream closes mid-message.
+    """
+    try:
+        raw_len = await reader.readexactly(4)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return {}, None
+        raise ConnectionError("Connection closed before message complete") from e
+
+    length, codec = _parse_header(raw_len)
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError as e:
+        raise ConnectionError("Connection closed before message complete") from e
 
-    return json.loads(payload.decode("utf-8"))
+    return _decode(payload, codec), codec
 
 
-def socket_request(address: tuple[str, int], data: dict, timeout: int = 300) -> dict:
+def socket_request(
+    address: tuple[str, int], data: dict, timeout: int = 300, codec: str = "json"
+) -> dict:
     """Send a request and receive a response over a new socket connection.
 
     Opens a new TCP connection, sends the request, waits for response, then closes.
 
     Args:
         address: (host, port) tuple to connect to.
-        data: Dictionary to send as JSON.
+        data: Dictionary to send.
         timeout: Socket timeout in seconds (default 300).
+        codec: Wire encoding for the request ("json" or "msgpack").
 
     Returns:
         Response dictionary.
@@ -192,17 +336,184 @@ def socket_request(address: tuple[str, int], data: dict, timeout: int = 300) ->
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
         sock.settimeout(timeout)
         sock.connect(address)
-        socket_send(sock, data)
+        socket_send(sock, data, codec)
         return socket_recv(sock)
 
 
+class _FrameStream:
+    """Queue of response frames for one streamed request on an LMConnection."""
+
+    def __init__(self, expected: int):
+        self.remaining = expected
+        self._frames: queue.Queue = queue.Queue()
+
+    def put(self, frame: dict | Exception) -> None:
+        self._frames.put(frame)
+
+    def get(self, timeout: float) -> dict:
+        frame = self._frames.get(timeout=timeout)
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+
+class LMConnection:
+    """Long-lived, multiplexed connection to an LM Handler.
+
+    Every request sent through this connection is tagged with a request_id, so many
+    requests (from any number of threads) can be in flight on one socket at once and the
+    handler may answer them out of order. A background reader thread routes each response
+    frame to the caller waiting on that request_id.
+
+    Streamed requests (see stream()) receive several frames under one request_id.
+
+    The socket is opened lazily and re-opened on the next request if the handler closes it.
+    Frames are sent with `codec` (default: msgpack if installed, else JSON).
+    """
+
+    def __init__(self, address: tuple[str, int], timeout: int = 300, codec: str | None = None):
+        self.address = address
+        self.timeout = timeout
+        self.codec = codec or default_codec()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._sock: socket.socket | None = None
+        self._pending: dict[int, Future | _FrameStream] = {}
+
+    def _connect(self) -> tuple[socket.socket, dict[int, "Future | _FrameStream"]]:
+        """Return the live socket and its pending-request table, connecting if needed."""
+        with self._lock:
+            if self._sock is None:
+                sock = socket.create_connection(self.address, timeout=self.timeout)
+                # The reader thread blocks until a frame arrives or the peer closes.
+                sock.settimeout(None)
+                self._sock = sock
+                self._pending = {}
+                reader = threading.Thread(
+                    target=self._read_loop, args=(sock, self._pending), daemon=True
+                )
+                reader.start()
+            return self._sock, self._pending
+
+    def _read_loop(self, sock: socket.socket, pending: dict[int, "Future | _FrameStream"]) -> None:
+        """Route response frames to their waiting callers until the socket closes."""
+        error: Exception = ConnectionError("Connection closed by LM Handler")
+        try:
+            while True:
+                data = socket_recv(sock)
+                if not data:
+                    break
+                request_id = data.get("request_id")
+                with self._lock:
+                    waiter = pending.get(request_id)
+                    if isinstance(waiter, _FrameStream):
+                        waiter.remaining -= 1
+                        if waiter.remaining <= 0 or data.get("index") is None:
+                            del pending[request_id]
+                    elif waiter is not None:
+                        del pending[request_id]
+                if isinstance(waiter, _FrameStream):
+                    waiter.put(data)
+                elif waiter is not None:
+                    waiter.set_result(data)
+        except Exception as e:
+            error = e
+        finally:
+            with self._lock:
+                if self._sock is sock:
+                    self._sock = None
+                orphaned = list(pending.values())
+                pending.clear()
+            for waiter in orphaned:
+                if isinstance(waiter, _FrameStream):
+                    waiter.put(error)
+                else:
+                    waiter.set_exception(error)
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def submit(self, data: dict) -> Future:
+        """Send a request frame and return a Future resolving to the response dict."""
+        future: Future = Future()
+        self._send(data, future)
+        return future
+
+    def stream(self, data: dict, expected: int, timeout: float | None = None) -> Iterator[dict]:
+        """Send a streamed request and yield its `expected` response frames as they arrive.
+
+        Stops early if the handler answers with a frame that has no index (a whole-request
+        error).
+        """
+        frames = _FrameStream(expected)
+        self._send(data, frames)
+        for _ in range(expected):
+            frame = frames.get(timeout=timeout or self.timeout)
+            yield frame
+            if frame.get("index") is None:
+                return
+
+    def _send(self, data: dict, waiter: "Future | _FrameStream") -> None:
+        sock, pending = self._connect()
+        request_id = next(self._ids)
+        with self._lock:
+            pending[request_id] = waiter
+        try:
+            with self._send_lock:
+                socket_send(sock, {**data, "request_id": request_id}, self.codec)
+        except Exception:
+            with self._lock:
+                pending.pop(request_id, None)
+                if self._sock is sock:
+                    self._sock = None
+            sock.close()
+            raise
+
+    def request(self, data: dict, timeout: float | None = None) -> dict:
+        """Send a request and block until its response arrives."""
+        return self.submit(data).result(timeout=timeout or self.timeout)
+
+    def close(self) -> None:
+        """Close the socket. In-flight requests fail with ConnectionError."""
+        with self._lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def __enter__(self) -> "LMConnection":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        self.close()
+        return False
+
+
 # =============================================================================
 # Typed Request Helpers
 # =============================================================================
 
 
+def _request(
+    address: tuple[str, int], data: dict, timeout: int, connection: LMConnection | None
+) -> dict:
+    """Send over a multiplexed connection if given, otherwise over a one-shot socket."""
+    if connection is not None:
+        return connection.request(data, timeout)
+    return socket_request(address, data, timeout, default_codec())
+
+
 def send_lm_request(
-    address: tuple[str, int], request: LMRequest, timeout: int = 300, depth: int | None = None
+    address: tuple[str, int],
+    request: LMRequest,
+    timeout: int = 300,
+    depth: int | None = None,
+    connection: LMConnection | None = None,
 ) -> LMResponse:
     """Send an LM request and return typed response.
 
@@ -211,6 +522,7 @@ def send_lm_request(
         request: LMRequest to send.
         timeout: Socket timeout in seconds.
         depth: Optional depth to override request depth.
+        connection: Optional long-lived LMConnection to reuse instead of opening a new socket.
 
     Returns:
         LMResponse with content or error.
@@ -218,7 +530,7 @@ def send_lm_request(
     try:
         if depth is not None:
             request.depth = depth
-        response_data = socket_request(address, request.to_dict(), timeout)
+        response_data = _request(address, request.to_dict(), timeout, connection)
         return LMResponse.from_dict(response_data)
     except Exception as e:
         return LMResponse.error_response(f"Request failed: {e}")
@@ -230,6 +542,10 @@ def send_lm_request_batched(
     model: str | None = None,
     timeout: int = 300,
     depth: int = 0,
+    connection: LMConnection | None = None,
+    compact: bool = False,
+    deadline: float | None = None,
+    budget_id: str | None = None,
 ) -> list[LMResponse]:
     """Send a batched LM request and return a list of typed responses.
 
@@ -239,13 +555,24 @@ def send_lm_request_batched(
         model: Optional model name to use.
         timeout: Socket timeout in seconds.
         depth: Depth for routing (default 0).
+        connection: Optional long-lived LMConnection to reuse instead of opening a new socket.
+        compact: Ask the handler to return prompt hashes instead of echoing the prompts.
+        deadline: Optional time budget in seconds for the handler to answer every prompt.
+        budget_id: Optional trajectory budget the prompts count against.
 
     Returns:
         List of LMResponse objects, one per prompt, in the same order.
     """
     try:
-        request = LMRequest(prompts=prompts, model=model, depth=depth)
-        response_data = socket_request(address, request.to_dict(), timeout)
+        request = LMRequest(
+            prompts=prompts,
+            model=model,
+            depth=depth,
+            compact=compact,
+            deadline=deadline,
+            budget_id=budget_id,
+        )
+        response_data = _request(address, request.to_dict(), timeout, connection)
         response = LMResponse.from_dict(response_data)
 
         if not response.success:
@@ -262,3 +589,79 @@ def send_lm_request_batched(
         ]
     except Exception as e:
         return [LMResponse.error_response(f"Request failed: {e}")] * len(prompts)
+
+
+def _socket_stream(address: tuple[str, int], data: dict, expected: int, timeout: int):
+    """Send a streamed request over a new socket and yield up to `expected` response frames."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        socket_send(sock, data, default_codec())
+        for _ in range(expected):
+            frame = socket_recv(sock)
+            if not frame:
+                raise ConnectionError("Connection closed before all responses arrived")
+            yield frame
+            if frame.get("index") is None:
+                return
+
+
+def send_lm_request_batched_iter(
+    address: tuple[str, int],
+    prompts: list[str | dict[str, Any]],
+    model: str | None = None,
+    timeout: int = 300,
+    depth: int = 0,
+    connection: LMConnection | None = None,
+    compact: bool = False,
+    deadline: float | None = None,
+    budget_id: str | None = None,
+) -> Iterator[tuple[int, LMResponse]]:
+    """Send a batched LM request and yield (index, LMResponse) pairs as prompts complete.
+
+    Unlike send_lm_request_batched, results arrive in completion order rather than input
+    order, so callers can start on early results while stragglers are still running.
+    Every index in range(len(prompts)) is yielded exactly once.
+
+    Args:
+        address: (host, port) tuple of LM Handler server.
+        prompts: List of prompts to send.
+        model: Optional model name to use.
+        timeout: Socket timeout in seconds (per frame).
+        depth: Depth for routing (default 0).
+        connection: Optional long-lived LMConnection to reuse instead of opening a new socket.
+        compact: Ask the handler to return prompt hashes instead of echoing the prompts.
+        deadline: Optional time budget in seconds per prompt; late prompts yield errors.
+        budget_id: Optional trajectory budget the prompts count against.
+    """
+    if not prompts:
+        return
+
+    remaining = set(range(len(prompts)))
+    request = LMRequest(
+        prompts=prompts,
+        model=model,
+        depth=depth,
+        stream=True,
+        compact=compact,
+        deadline=deadline,
+        budget_id=budget_id,
+    )
+    try:
+        if connection is not None:
+            frames = connection.stream(request.to_dict(), len(prompts), timeout)
+        else:
+            frames = _socket_stream(address, request.to_dict(), len(prompts), timeout)
+
+        for frame in frames:
+            response = LMResponse.from_dict(frame)
+            if response.index is None:
+                error = response.error or "No completions returned"
+                for index in sorted(remaining):
+                    yield index, LMResponse.error_response(error)
+                return
+            remaining.discard(response.index)
+            yield response.index, response
+    except Exception as e:
+        for index in sorted(remaining):
+            yield index, LMResponse.error_response(f"Request failed: {e}")
@@ -0,0 +1,138 @@
+"""
+Root message-history compaction.
+
+Every RLM iteration appends the root LM's response and the REPL outputs to the message
+history, and the whole history is resent on the next iteration, so prompt tokens (and
+latency) grow with every iteration. A HistoryCompactor rewrites the oldest iterations once
+the history exceeds a token budget, keeping the last few verbatim. The REPL keeps its
+variables, so the root LM can still get at anything the dropped text showed.
+"""
+
+from typing import Any
+
+from rlm.utils.rlm_utils import estimate_tokens
+
+Messages = list[dict[str, Any]]
+
+REPL_OUTPUT_SEPARATOR = "\n\nREPL output:\n"
+OMITTED_SUFFIX = "; re-inspect REPL variables if needed]"
+
+
+class HistoryCompactor:
+    """Base strategy: when to compact, and how to rewrite the old iterations.
+
+    Args:
+        max_tokens: Compact once the (estimated) history exceeds this many tokens.
+        keep_last: Number of most recent iterations always kept verbatim.
+    """
+
+    name = "compactor"
+    model: str | None = None  # client that summary_prompt() is sent to
+
+    def __init__(self, max_tokens: int = 60_000, keep_last: int = 2):
+        self.max_tokens = max_tokens
+        self.keep_last = keep_last
+
+    def should_compact(self, messages: Messages) -> bool:
+        return estimate_tokens(messages) > self.max_tokens
+
+    def split(self, messages: Messages, start: int) -> tuple[Messages, Messages, Messages]:
+        """Split into (setup prefix, old iterations, last `keep_last` iterations).
+
+        `start` is the index of the first iteration message; each iteration begins with the
+        root LM's assistant message.
+        """
+        groups: list[Messages] = []
+        for message in messages[start:]:
+            if message["role"] == "assistant" or not groups:
+                groups.append([])
+            groups[-1].append(message)
+        cut = max(len(groups) - self.keep_last, 0)
+        old = [message for group in groups[:cut] for message in group]
+        recent = [message for group in groups[cut:] for message in group]
+        return messages[:start], old, recent
+
+    def summary_prompt(self, old: Messages) -> str | None:
+        """Prompt for a sub-model to summarize `old` with, or None if this strategy doesn't."""
+        return None
+
+    def rewrite(self, old: Messages, summary: str | None) -> Messages:
+        raise NotImplementedError
+
+
+class SlidingWindowCompactor(HistoryCompactor):
+    """Drop old iterations entirely, leaving a note that their results are in the REPL."""
+
+    name = "sliding_window"
+
+    def rewrite(self, old: Messages, summary: str | None) -> Messages:
+        return [
+            {
+                "role": "user",
+                "content": (
+                    f"[{len(old)} earlier messages were removed to save context. Variables "
+                    "you created are still in the REPL; use SHOW_VARS() to list them.]"
+                ),
+            }
+        ]
+
+
+class DropOutputsCompactor(HistoryCompactor):
+    """Keep old responses and code, but replace their REPL outputs with a placeholder."""
+
+    name = "drop_outputs"
+
+    def rewrite(self, old: Messages, summary: str | None) -> Messages:
+        rewritten = []
+        for message in old:
+            code, sep, output = message["content"].partition(REPL_OUTPUT_SEPARATOR)
+            if message["role"] == "user" and sep and not output.endswith(OMITTED_SUFFIX):
+                message = {
+                    **message,
+                    "content": (f"{code}{sep}[{len(output)} chars omitted{OMITTED_SUFFIX}"),
+                }
+            rewritten.append(message)
+        return rewritten
+
+
+class SummarizeCompactor(HistoryCompactor):
+    """Replace old iterations with a summary written by a (cheap) sub-model.
+
+    Args:
+        model: Registered client to summarize with (None = the default client).
+        max_summary_chars: Maximum length of the summary requested from the model.
+    """
+
+    name = "summarize"
+
+    def __init__(
+        self,
+        max_tokens: int = 60_000,
+        keep_last: int = 2,
+        model: str | None = None,
+        max_summary_chars: int = 4000,
+    ):
+        super().__init__(max_tokens, keep_last)
+        self.model = model
+        self.max_summary_chars = max_summary_chars
+
+    def summary_prompt(self, old: Messages) -> str:
+        transcript = "\n\n".join(f"[{m['role']}]\n{m['content']}" for m in old)
+        return (
+            "Below is the earlier part of a session in which a model answers a query by writing "
+            "Python code in a REPL. Summarize it for the model to continue from: what it has "
+            "learned, which REPL variables hold which results, what it tried that failed, and "
+            f"what remains to do. Be concise (at most {self.max_summary_chars} characters).\n\n"
+            f"{transcript}"
+        )
+
+    def rewrite(self, old: Messages, summary: str | None) -> Messages:
+        return [
+            {
+                "role": "user",
+                "content": (
+                    "Summary of earlier iterations (compacted to save context):\n"
+                    f"{(summary or '')[: self.max_summary_chars]}"
+                ),
+            }
+        ]
@@ -0,0 +1,53 @@
+"""
+Hedged sub-LM requests.
+
+A hedge is a duplicate of a slow call, sent to the same or an alternate client once the call
+has run longer than a latency percentile observed for its model. The LMHandler takes
+whichever attempt answers first and cancels the other, trading a little extra spend for a
+shorter tail (each RLM iteration waits on its slowest sub-call).
+"""
+
+import math
+from collections import deque
+from dataclasses import dataclass
+
+
+@dataclass
+class HedgePolicy:
+    """When and where to hedge a sub-call.
+
+    Args:
+        percentile: Hedge once a call outlives this percentile of recent latencies.
+        min_samples: Latencies to observe for a model before hedging its calls.
+        min_delay: Never hedge earlier than this many seconds into a call.
+        alternate_model: Registered client to send hedges to (None = the same client).
+        window: Number of recent latencies kept per model.
+    """
+
+    percentile: float = 95.0
+    min_samples: int = 20
+    min_delay: float = 0.0
+    alternate_model: str | None = None
+    window: int = 500
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per model."""
+
+    def __init__(self, policy: HedgePolicy):
+        self.policy = policy
+        self._latencies: dict[str, deque[float]] = {}
+
+    def record(self, model: str, latency: float) -> None:
+        if model not in self._latencies:
+            self._latencies[model] = deque(maxlen=self.policy.window)
+        self._latencies[model].append(latency)
+
+    def hedge_delay(self, model: str) -> float | None:
+        """Seconds into a call after which to hedge it, or None while there are too few samples."""
+        latencies = self._latencies.get(model)
+        if not latencies or len(latencies) < self.policy.min_samples:
+            return None
+        ordered = sorted(latencies)
+        rank = math.ceil(self.policy.percentile / 100 * len(ordered)) - 1
+        return max(self.policy.min_delay, ordered[min(max(rank, 0), len(ordered) - 1)])
@@ -0,0 +1,228 @@
+"""
+Lazily loaded contexts.
+
+A LazyContext is a read-only sequence of chunks that stay on disk until they are accessed.
+It is built from a JSONL file (one chunk per line), a list of files or a directory (one chunk
+per file). Building it scans the files once for an index of byte offsets and sizes; chunk
+lengths are reported from that index, and each access reads only the chunks it needs.
+
+RLM.completion accepts a LazyContext as its prompt. LocalREPL binds it as `context` as-is.
+Remote sandboxes bind a stand-in (SANDBOX_LAZY_CONTEXT) that fetches chunks from the host on
+access, through the same channel as llm_query.
+"""
+
+import json
+import mmap
+import os
+import re
+from array import array
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any, Literal
+
+# Chunks fetched per round trip when iterating over a remote LazyContext
+FETCH_BATCH_SIZE = 32
+
+# Anything but whitespace, as bytes.strip() sees it
+_NON_BLANK = re.compile(rb"\S")
+
+
+class LazyContext(Sequence):
+    """A read-only sequence of chunks, read from disk on access.
+
+    Use from_jsonl, from_files or from_directory to build one. Indexing returns one chunk
+    (a parsed JSON value for JSONL, a str for files); slicing returns a list of chunks.
+
+    Args:
+        paths: The files the chunks are read from.
+        files: For each chunk, the index of its file in `paths`.
+        offsets: For each chunk, its byte offset in its file.
+        sizes: For each chunk, its size in bytes.
+        kind: "jsonl" to parse chunks as JSON, "text" to decode them.
+        encoding: Used to decode text chunks.
+    """
+
+    def __init__(
+        self,
+        paths: list[str],
+        files: array,
+        offsets: array,
+        sizes: array,
+        kind: Literal["jsonl", "text"] = "text",
+        encoding: str = "utf-8",
+    ):
+        self.paths = paths
+        self.kind = kind
+        self.encoding = encoding
+        self._files = files
+        self._offsets = offsets
+        self._sizes = sizes
+
+    @classmethod
+    def from_jsonl(cls, path: str | os.PathLike, encoding: str = "utf-8") -> "LazyContext":
+        """One chunk per non-empty line of a JSONL file."""
+        path = os.fspath(path)
+        offsets, sizes = array("q"), array("q")
+        with open(path, "rb") as f:
+            # mmap refuses empty files
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    start, end_of_file = 0, len(data)
+                    while start < end_of_file:
+                        end = data.find(b"\n", start)
+                        if end == -1:
+                            end = end_of_file
+                        # Searched in place, so long lines aren't copied
+                        if _NON_BLANK.search(data, start, end):
+                            offsets.append(start)
+                            sizes.append(end - start)
+                        start = end + 1
+        files = array("i", bytes(4 * len(offsets)))
+        return cls([path], files, offsets, sizes, kind="jsonl", encoding=encoding)
+
+    @classmethod
+    def from_files(cls, paths: list[str | os.PathLike], encoding: str = "utf-8") -> "LazyContext":
+        """One text chunk per file."""
+        paths = [os.fspath(path) for path in paths]
+        sizes = array("q", [os.path.getsize(path) for path in paths])
+        files = array("i", range(len(paths)))
+        offsets = array("q", bytes(8 * len(paths)))
+        return cls(paths, files, offsets, sizes, kind="text", encoding=encoding)
+
+    @classmethod
+    def from_directory(
+        cls,
+        path: str | os.PathLike,
+        pattern: str = "*",
+        recursive: bool = False,
+        encoding: str = "utf-8",
+    ) -> "LazyContext":
+        """One text chunk per file matching `pattern` in a directory, in path order."""
+        matches = Path(path).rglob(pattern) if recursive else Path(path).glob(pattern)
+        return cls.from_files(sorted(p for p in matches if p.is_file()), encoding=encoding)
+
+    @property
+    def lengths(self) -> list[int]:
+        """The size of each chunk in bytes, from the index."""
+        return self._sizes.tolist()
+
+    @property
+    def total_length(self) -> int:
+        return sum(self._sizes)
+
+    def chunks(self, start: int, stop: int) -> list[Any]:
+        """Read chunks start..stop-1, reusing the open file across consecutive chunks."""
+        chunks: list[Any] = []
+        handle, handle_file = None, -1
+        try:
+            for i in range(start, stop):
+                if self._files[i] != handle_file:
+                    if handle is not None:
+                        handle.close()
+                    handle_file = self._files[i]
+                    handle = open(self.paths[handle_file], "rb")
+                handle.seek(self._offsets[i])
+                chunks.append(self._parse(handle.read(self._sizes[i])))
+        finally:
+            if handle is not None:
+                handle.close()
+        return chunks
+
+    def _parse(self, data: bytes) -> Any:
+        if self.kind == "jsonl":
+            return json.loads(data)
+        return data.decode(self.encoding, errors="replace")
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def __getitem__(self, key: int | slice) -> Any:
+        if isinstance(key, slice):
+            indices = range(*key.indices(len(self)))
+            if not indices:
+                return []
+            low = min(indices)
+            chunks = self.chunks(low, max(indices) + 1)
+            return [chunks[i - low] for i in indices]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("LazyContext index out of range")
+        return self.chunks(key, key + 1)[0]
+
+    def __iter__(self) -> Iterator[Any]:
+        for start in range(0, len(self), FETCH_BATCH_SIZE):
+            yield from self.chunks(start, min(start + FETCH_BATCH_SIZE, len(self)))
+
+    def __repr__(self) -> str:
+        return f"LazyContext({len(self)} {self.kind} chunks, {self.total_length} bytes)"
+
+    def __deepcopy__(self, memo: dict) -> "LazyContext":
+        # Read-only, so copies can share the index
+        return self
+
+    def metadata(self) -> dict[str, Any]:
+        """What a remote sandbox needs to build its stand-in (see SANDBOX_LAZY_CONTEXT)."""
+        return {"lengths": self.lengths, "kind": self.kind}
+
+
+# Defines LazyContext inside a sandbox's exec script. The script must define
+# LAZY_CONTEXT_FILE, where the host writes LazyContext.metadata() as JSON, and
+# _fetch_context(start, stop), which returns chunks start..stop-1 from the host. Saved state
+# holds a marker in place of each LazyContext (see _persistable / _restore_lazy_contexts).
+SANDBOX_LAZY_CONTEXT = f'''
+_LAZY_CONTEXT_MARKER = "<rlm LazyContext>"
+
+class LazyContext:
+    """The host's context; chunks are fetched from the host on access."""
+
+    def __init__(self, lengths, kind):
+        self.lengths = lengths
+        self.kind = kind
+
+    @classmethod
+    def from_host(cls):
+        with open(LAZY_CONTEXT_FILE) as f:
+            metadata = json.load(f)
+        return cls(metadata["lengths"], metadata["kind"])
+
+    @property
+    def total_length(self):
+        return sum(self.lengths)
+
+    def chunks(self, start, stop):
+        return _fetch_context(start, stop)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            indices = range(*key.indices(len(self)))
+            if not indices:
+                return []
+            low = min(indices)
+            chunks = self.chunks(low, max(indices) + 1)
+            return [chunks[i - low] for i in indices]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("LazyContext index out of range")
+        return self.chunks(key, key + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), {FETCH_BATCH_SIZE}):
+            yield from self.chunks(start, min(start + {FETCH_BATCH_SIZE}, len(self)))
+
+    def __repr__(self):
+        return f"LazyContext({{len(self)}} {{self.kind}} chunks, {{self.total_length}} bytes)"
+
+def _persistable(value):
+    return _LAZY_CONTEXT_MARKER if isinstance(value, LazyContext) else value
+
+def _restore_lazy_contexts(state):
+    for key, value in state.items():
+        if type(value) is str and value == _LAZY_CONTEXT_MARKER:
+            state[key] = LazyContext.from_host()
+    return state
+'''
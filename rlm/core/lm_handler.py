@@ -1,113 +1,301 @@
 """
 LMHandler - Routes LLM requests from the RLM process and environment subprocesses.
 
-Uses a multi-threaded socket server. Protocol: 4-byte length prefix + JSON payload.
+Uses a single asyncio event loop (in a background thread) that serves every environment
+connection and awaits BaseLM.acompletion directly. Protocol: 4-byte length prefix + JSON
+(or msgpack) payload. Connections may be one-shot or long-lived and multiplexed
+(see comms_utils.LMConnection).
 """
 
 import asyncio
+import dataclasses
 import time
-from socketserver import StreamRequestHandler, ThreadingTCPServer
-from threading import Thread
+import uuid
+from collections.abc import Awaitable, Callable, Coroutine
+from threading import Lock, Thread, current_thread
+from typing import Any, TypeVar
 
-from rlm.clients.base_lm import BaseLM
-from rlm.core.comms_utils import LMRequest, LMResponse, socket_recv, socket_send
-from rlm.core.types import RLMChatCompletion, UsageSummary
+from rlm.clients.base_lm import BaseLM, CompletionStream
+from rlm.core.budget import Budget, BudgetExceededError, BudgetTracker
+from rlm.core.cache import ResponseCache, cache_key
+from rlm.core.comms_utils import LMRequest, LMResponse, encode_frame, stream_recv
+from rlm.core.hedging import HedgePolicy, LatencyTracker
+from rlm.core.scheduler import RateLimit, RequestScheduler
+from rlm.core.types import (
+    BudgetUsage,
+    HandlerStats,
+    ModelUsageSummary,
+    RLMChatCompletion,
+    UsageSummary,
+)
+from rlm.utils.rlm_utils import estimate_tokens, prompt_hash
 
+# Runs a child RLM trajectory for a sub-call: (prompt, model, depth, budget_id) -> its completion
+ChildRunner = Callable[[str | dict, str, int, str | None], Awaitable[RLMChatCompletion]]
 
-class LMRequestHandler(StreamRequestHandler):
-    """Socket handler for LLM completion requests."""
+T = TypeVar("T")
 
-    def handle(self):
+
+def _local_usage(root_model: str, client: BaseLM, stats: HandlerStats) -> UsageSummary:
+    """Usage for a call answered without reaching the provider (cache hit or coalesced)."""
+    return UsageSummary(
+        model_usage_summaries={root_model: ModelUsageSummary(0, 0, 0)},
+        handler_stats={client.model_name: stats},
+    )
+
+
+class _Upstream:
+    """A provider call shared by every caller waiting on the same prompt."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    """Mark a shared task's exception as retrieved even if every caller gave up on it."""
+    if not task.cancelled():
+        task.exception()
+
+
+class LMRequestHandler:
+    """Serves LLM completion requests on one client connection.
+
+    Reads frames until the peer closes the connection. Frames without a request_id are
+    answered inline (one-shot clients send exactly one). Frames with a request_id come
+    from a multiplexed LMConnection and are processed as concurrent tasks, so their
+    responses may be written back out of order.
+    """
+
+    def __init__(
+        self, handler: "LMHandler", reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        self.handler = handler
+        self.reader = reader
+        self.writer = writer
+        self._send_lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def handle(self):
+        try:
+            while True:
+                try:
+                    request_data, codec = await stream_recv(self.reader)
+                except (ConnectionError, OSError):
+                    break
+                if not request_data:
+                    break
+
+                if isinstance(request_data, dict) and request_data.get("request_id") is not None:
+                    task = asyncio.create_task(self._respond(request_data, codec))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                else:
+                    await self._respond(request_data, codec)
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            self.writer.close()
+
+    async def _respond(self, request_data: dict, codec: str = "json"):
+        """Process one request frame and write its response frame(s) in the same codec."""
+        request_id = request_data.get("request_id") if isinstance(request_data, dict) else None
         try:
-            request_data = socket_recv(self.connection)
             if not isinstance(request_data, dict):
                 response = LMResponse.error_response("Request must be a JSON object")
-                socket_send(self.connection, response.to_dict())
-                return
-
-            request = LMRequest.from_dict(request_data)
-            handler: LMHandler = self.server.lm_handler  # type: ignore
-
-            if request.is_batched:
-                # Batched request: process multiple prompts concurrently
-                response = self._handle_batched(request, handler)
-            elif request.prompt:
-                # Single request: process one prompt
-                response = self._handle_single(request, handler)
             else:
-                response = LMResponse.error_response("Missing 'prompt' or 'prompts' in request.")
-
-            socket_send(self.connection, response.to_dict())
-
+                request = LMRequest.from_dict(request_data)
+
+                if request.is_batched and request.stream:
+                    # Streamed batch: one frame per prompt, written as each one finishes
+                    await self._stream_batched(request, request_id, codec)
+                    return
+                elif request.is_batched:
+                    # Batched request: process multiple prompts concurrently
+                    response = await self._handle_batched(request)
+                elif request.prompt:
+                    # Single request: process one prompt
+                    response = await self._handle_single(request)
+                else:
+                    response = LMResponse.error_response(
+                        "Missing 'prompt' or 'prompts' in request."
+                    )
         except Exception as e:
             response = LMResponse.error_response(str(e))
-            socket_send(self.connection, response.to_dict())
 
-    def _handle_single(self, request: LMRequest, handler: "LMHandler") -> LMResponse:
-        """Handle a single prompt request."""
-        client = handler.get_client(request.model, request.depth)
+        response.request_id = request_id
+        await self._write(response, codec)
+
+    async def _write(self, response: LMResponse, codec: str = "json") -> None:
+        try:
+            async with self._send_lock:
+                self.writer.write(encode_frame(response.to_dict(), codec))
+                await self.writer.drain()
+        except (ConnectionError, OSError):
+            # Peer went away before the response was ready.
+            pass
+
+    async def _complete(
+        self, client: BaseLM, root_model: str, prompt, group: object, request: LMRequest
+    ) -> RLMChatCompletion:
+        """Run one prompt of `request` through the response cache (if any) and the scheduler.
+
+        Identical prompts already in flight share one upstream call; only the caller that
+        started it reports provider usage. Compact results leave the prompt in the handler's
+        prompt store and return its hash instead. If the deadline (seconds) passes first, this
+        caller gets a TimeoutError, and the upstream call is cancelled unless others still
+        wait on it. Sub-calls at a depth served by child RLMs (see LMHandler.serve_children)
+        run a child trajectory instead. Sub-calls with a budget_id are admitted and charged
+        against that trajectory's budget, and refused once it is used up.
+        """
+        deadline = request.deadline
+        if deadline is None:
+            deadline = self.handler.default_deadline
+        budget = self.handler.budget_tracker(request.budget_id)
+        if budget is not None:
+            budget.admit()
+            remaining = budget.remaining_time()
+            if remaining is not None and (deadline is None or remaining < deadline):
+                deadline = remaining
+        if self.handler.serves_children_at(request.depth):
+            return await self._complete_child(root_model, prompt, request, deadline)
+
+        cache = self.handler.cache
+        key = cache_key(client.model_name, prompt, client.kwargs)
+        stats = self.handler.scheduler.stats_for(client.model_name)
 
         start_time = time.perf_counter()
-        content = client.completion(request.prompt)
+        content = cache.get(key) if cache is not None else None
+        if content is not None:
+            # Served locally: report zero provider usage and count the hit separately.
+            stats.cache_hits += 1
+            usage_summary = _local_usage(root_model, client, HandlerStats(cache_hits=1))
+        else:
+            upstream, owner = self.handler._upstream(client, prompt, key, group)
+            upstream.waiters += 1
+            try:
+                content, model_usage, served_by = await asyncio.wait_for(
+                    asyncio.shield(upstream.task), deadline
+                )
+            except TimeoutError:
+                stats.deadline_exceeded += 1
+                raise self._deadline_error(deadline, budget) from None
+            finally:
+                upstream.waiters -= 1
+                if upstream.waiters == 0 and not upstream.task.done():
+                    upstream.task.cancel()
+            if owner:
+                # A hedge answered by an alternate client is billed under that model.
+                usage_key = root_model if served_by == client.model_name else served_by
+                usage_summary = UsageSummary(model_usage_summaries={usage_key: model_usage})
+                if budget is not None:
+                    budget.charge(served_by, model_usage)
+            else:
+                stats.coalesced_calls += 1
+                usage_summary = _local_usage(root_model, client, HandlerStats(coalesced_calls=1))
         end_time = time.perf_counter()
 
-        model_usage = client.get_last_usage()
-        root_model = request.model or client.model_name
-        usage_summary = UsageSummary(model_usage_summaries={root_model: model_usage})
-        return LMResponse.success_response(
-            chat_completion=RLMChatCompletion(
-                root_model=root_model,
-                prompt=request.prompt,
-                response=content,
-                usage_summary=usage_summary,
-                execution_time=end_time - start_time,
-            )
+        return RLMChatCompletion(
+            root_model=root_model,
+            prompt=None if request.compact else prompt,
+            response=content,
+            usage_summary=usage_summary,
+            execution_time=end_time - start_time,
+            prompt_hash=self.handler.store_prompt(prompt) if request.compact else None,
         )
 
-    def _handle_batched(self, request: LMRequest, handler: "LMHandler") -> LMResponse:
-        """Handle a batched prompts request using async for concurrency."""
-        client = handler.get_client(request.model, request.depth)
+    async def _complete_child(
+        self, root_model: str, prompt, request: LMRequest, deadline: float | None
+    ) -> RLMChatCompletion:
+        """Answer one prompt with a child RLM trajectory; its usage is nested as a child.
 
+        The child's own calls are charged to the same budget as they are made.
+        """
         start_time = time.perf_counter()
+        try:
+            child = await asyncio.wait_for(
+                self.handler.run_child(prompt, root_model, request.depth, request.budget_id),
+                deadline,
+            )
+        except TimeoutError:
+            self.handler.scheduler.stats_for(root_model).deadline_exceeded += 1
+            budget = self.handler.budget_tracker(request.budget_id)
+            raise self._deadline_error(deadline, budget) from None
+
+        return RLMChatCompletion(
+            root_model=root_model,
+            prompt=None if request.compact else prompt,
+            response=child.response,
+            usage_summary=child.usage_summary.as_child(),
+            execution_time=time.perf_counter() - start_time,
+            prompt_hash=self.handler.store_prompt(prompt) if request.compact else None,
+        )
 
-        async def run_all():
-            tasks = [client.acompletion(prompt) for prompt in request.prompts]
-            return await asyncio.gather(*tasks)
+    @staticmethod
+    def _deadline_error(deadline: float, budget: BudgetTracker | None) -> Exception:
+        reason = budget.exhausted() if budget is not None else None
+        if reason is not None:
+            return BudgetExceededError(f"Budget exhausted: {reason} reached")
+        return TimeoutError(f"Sub-call deadline of {deadline}s exceeded")
 
-        results = asyncio.run(run_all())
-        end_time = time.perf_counter()
+    async def _handle_single(self, request: LMRequest) -> LMResponse:
+        """Handle a single prompt request."""
+        client = self.handler.get_client(request.model, request.depth)
+        root_model = request.model or client.model_name
+        chat_completion = await self._complete(
+            client, root_model, request.prompt, object(), request
+        )
+        return LMResponse.success_response(chat_completion=chat_completion)
 
-        total_time = end_time - start_time
-        model_usage = client.get_last_usage()
+    async def _handle_batched(self, request: LMRequest) -> LMResponse:
+        """Handle a batched prompts request, awaiting all prompts concurrently."""
+        client = self.handler.get_client(request.model, request.depth)
         root_model = request.model or client.model_name
-        usage_summary = UsageSummary(model_usage_summaries={root_model: model_usage})
-
-        chat_completions = [
-            RLMChatCompletion(
-                root_model=root_model,
-                prompt=prompt,
-                response=content,
-                usage_summary=usage_summary,
-                execution_time=total_time / len(request.prompts),  # approximate per-prompt time
-            )
-            for prompt, content in zip(request.prompts, results, strict=True)
-        ]
 
-        return LMResponse.batched_success_response(chat_completions=chat_completions)
+        # The whole batch is one scheduling group, so it is interleaved fairly with other
+        # requests instead of being admitted all at once.
+        group = object()
+        chat_completions = await asyncio.gather(
+            *[
+                self._complete(client, root_model, prompt, group, request)
+                for prompt in request.prompts
+            ]
+        )
+        return LMResponse.batched_success_response(chat_completions=list(chat_completions))
+
+    async def _stream_batched(
+        self, request: LMRequest, request_id: int | None, codec: str = "json"
+    ) -> None:
+        """Handle a streamed batched request, writing each completion as soon as it is done.
 
+        Every frame carries the prompt's index in the batch; a failed prompt gets an error
+        frame with its index and does not affect the others.
+        """
+        client = self.handler.get_client(request.model, request.depth)
+        root_model = request.model or client.model_name
+        group = object()
 
-class ThreadingLMServer(ThreadingTCPServer):
-    """Multi-threaded TCP server for LM requests."""
+        async def run(index: int, prompt) -> None:
+            try:
+                chat_completion = await self._complete(client, root_model, prompt, group, request)
+                response = LMResponse.success_response(chat_completion=chat_completion)
+            except Exception as e:
+                response = LMResponse.error_response(str(e))
+            response.request_id = request_id
+            response.index = index
+            await self._write(response, codec)
 
-    daemon_threads = True
-    allow_reuse_address = True
+        await asyncio.gather(*[run(i, prompt) for i, prompt in enumerate(request.prompts)])
 
 
 class LMHandler:
     """
     Handles all LM calls from the RLM main process and environment subprocesses.
 
-    Uses a multi-threaded socket server for concurrent requests.
+    Runs one asyncio event loop in a background thread; every environment connection and
+    every sub-call is a task on that loop. Sub-calls are admitted through a RequestScheduler
+    that applies concurrency and rate limits and retries provider 429s, optionally behind a
+    ResponseCache.
     Protocol: 4-byte big-endian length prefix + JSON payload.
     """
 
@@ -117,14 +305,58 @@ class LMHandler:
         host: str = "127.0.0.1",
         port: int = 0,  # auto-assign available port
         other_backend_client: BaseLM | None = None,
+        max_concurrent_requests: int | None = None,
+        rate_limit: RateLimit | dict[str, RateLimit] | None = None,
+        cache: ResponseCache | None = None,
+        coalesce: bool = False,
+        hedge: HedgePolicy | None = None,
+        default_deadline: float | None = None,
     ):
+        """
+        Args:
+            client: Default client (depth 0 / root model).
+            host: Host to bind the socket server to.
+            port: Port to bind to (0 = auto-assign).
+            other_backend_client: Client used for depth-1 sub-calls, if any.
+            max_concurrent_requests: Cap on in-flight sub-calls across all clients.
+            rate_limit: RateLimit for every client, or a dict of model name -> RateLimit.
+            cache: Optional ResponseCache; identical sub-calls are answered from it.
+            coalesce: Share one upstream call between identical prompts that are in flight
+                at the same time. Off by default: clients sample at the provider's default
+                temperature, so duplicates usually are meant to be independent samples.
+            hedge: Optional HedgePolicy; slow sub-calls get a duplicate request and the first
+                answer wins.
+            default_deadline: Seconds a sub-call may take when the request sets no deadline.
+        """
         self.default_client = client
         self.other_backend_client = other_backend_client
         self.clients: dict[str, BaseLM] = {}
         self.host = host
-        self._server: ThreadingLMServer | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.Server | None = None
         self._thread: Thread | None = None
+        self._connections: set[asyncio.Task] = set()
         self._port = port
+        self.cache = cache
+        self.coalesce = coalesce
+        self.hedge = hedge
+        self.default_deadline = default_deadline
+        self._latency = LatencyTracker(hedge) if hedge is not None else None
+        self._in_flight: dict[str, _Upstream] = {}
+        self._upstream_tasks: set[asyncio.Task] = set()
+        # Compact-response prompt store: hash -> [prompt, number of records referring to it]
+        self._prompts: dict[str, list] = {}
+        self._prompts_lock = Lock()
+        self.scheduler = RequestScheduler(
+            max_concurrent=max_concurrent_requests, rate_limit=rate_limit
+        )
+        # Child RLM trajectories for sub-calls below max_depth (see serve_children())
+        self._child_runner: ChildRunner | None = None
+        self._child_max_depth = 0
+        self._max_concurrent_children = 0
+        self._child_slots: dict[int, asyncio.Semaphore] = {}
+        # Per-trajectory budgets (see open_budget())
+        self._budgets: dict[str, BudgetTracker] = {}
 
         self.register_client(client.model_name, client)
 
@@ -149,11 +381,59 @@ class LMHandler:
 
         return self.default_client
 
+    def serve_children(self, runner: ChildRunner, max_depth: int, max_concurrent: int = 8) -> None:
+        """Answer sub-calls made at depth < max_depth with `runner(prompt, model, depth)`, a
+        child RLM trajectory, instead of a plain LM call.
+
+        At most `max_concurrent` children run at once at each depth. The limit is per depth
+        because a shared one could deadlock, with every slot held by a parent waiting on
+        its children.
+        """
+        self._child_runner = runner
+        self._child_max_depth = max_depth
+        self._max_concurrent_children = max_concurrent
+
+    def serves_children_at(self, depth: int) -> bool:
+        return self._child_runner is not None and 0 < depth < self._child_max_depth
+
+    async def run_child(
+        self, prompt, model: str, depth: int, budget_id: str | None = None
+    ) -> RLMChatCompletion:
+        """Run a child trajectory once a slot at its depth is free (on the handler's loop)."""
+        if depth not in self._child_slots:
+            self._child_slots[depth] = asyncio.Semaphore(self._max_concurrent_children)
+        async with self._child_slots[depth]:
+            return await self._child_runner(prompt, model, depth, budget_id)
+
+    def open_budget(self, budget: Budget) -> str:
+        """Start tracking a trajectory's budget; its clock starts now. Returns the budget id
+        that the trajectory's sub-calls carry."""
+        budget_id = uuid.uuid4().hex
+        self._budgets[budget_id] = BudgetTracker(budget)
+        return budget_id
+
+    def close_budget(self, budget_id: str) -> BudgetUsage:
+        """Stop tracking a budget and report what was spent."""
+        return self._budgets.pop(budget_id).report()
+
+    def budget_tracker(self, budget_id: str | None) -> BudgetTracker | None:
+        return self._budgets.get(budget_id) if budget_id is not None else None
+
+    def budget_exhausted(self, budget_id: str | None) -> bool:
+        budget = self.budget_tracker(budget_id)
+        return budget is not None and budget.exhausted() is not None
+
+    def charge_budget(self, budget_id: str | None, model: str, usage: ModelUsageSummary) -> None:
+        """Charge a call made outside the handler's sub-call path (e.g. a streamed root call)."""
+        budget = self.budget_tracker(budget_id)
+        if budget is not None:
+            budget.charge(model, usage)
+
     @property
     def port(self) -> int:
         """Get the actual port (useful when auto-assigned)."""
         if self._server:
-            return self._server.server_address[1]
+            return self._server.sockets[0].getsockname()[1]
         return self._port
 
     @property
@@ -162,29 +442,247 @@ class LMHandler:
         return (self.host, self.port)
 
     def start(self) -> tuple[str, int]:
-        """Start the socket server in a background thread. Returns (host, port)."""
+        """Start the event loop and socket server in a background thread. Returns (host, port)."""
         if self._server is not None:
             return self.address
 
-        self._server = ThreadingLMServer((self.host, self._port), LMRequestHandler)
-        self._server.lm_handler = self  # type: ignore
-
-        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever, daemon=True)
         self._thread.start()
 
+        self._server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle_connection, self.host, self._port), self._loop
+        ).result()
+
         return self.address
 
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            await LMRequestHandler(self, reader, writer).handle()
+        except asyncio.CancelledError:
+            # Handler is shutting down. Finish normally: asyncio's stream callback calls
+            # task.exception(), which raises on a cancelled task.
+            pass
+        finally:
+            self._connections.discard(task)
+
+    async def _shutdown(self) -> None:
+        """Stop accepting connections and close the ones that are still open."""
+        self._server.close()
+        tasks = [*self._connections, *self._upstream_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._server.wait_closed()
+
     def stop(self):
-        """Stop the socket server."""
+        """Stop the socket server and its event loop."""
         if self._server:
-            self._server.shutdown()
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
             self._server = None
+            self._loop = None
             self._thread = None
 
+    def _upstream(
+        self, client: BaseLM, prompt, key: str, group: object
+    ) -> tuple["_Upstream", bool]:
+        """Return the upstream call for `key`, and whether this caller started it.
+
+        The call runs as its own task, so one caller giving up does not fail the others that
+        joined it; it is cancelled once no caller waits on it.
+        """
+        if self.coalesce and key in self._in_flight:
+            return self._in_flight[key], False
+
+        async def call() -> tuple[str, ModelUsageSummary, str]:
+            content, usage, served_by = await self._hedged(client, prompt, group)
+            if self.cache is not None:
+                self.cache.put(key, content)
+            return content, usage, served_by
+
+        task = asyncio.ensure_future(call())
+        upstream = _Upstream(task)
+        self._upstream_tasks.add(task)
+        task.add_done_callback(self._upstream_tasks.discard)
+        if self.coalesce:
+            self._in_flight[key] = upstream
+            task.add_done_callback(lambda t: self._in_flight.pop(key, None))
+        task.add_done_callback(_consume_exception)
+        return upstream, True
+
+    async def _attempt(
+        self, client: BaseLM, prompt, group: object, started: asyncio.Event | None = None
+    ) -> tuple[str, ModelUsageSummary, str]:
+        """One provider call through the scheduler, recording its latency once admitted."""
+
+        async def timed():
+            if started is not None:
+                started.set()
+            start_time = time.perf_counter()
+            content, usage = await client.acompletion_with_usage(prompt)
+            if self._latency is not None:
+                self._latency.record(client.model_name, time.perf_counter() - start_time)
+            return content, usage
+
+        content, usage = await self.scheduler.submit(
+            client.model_name, group=group, call=timed, tokens=estimate_tokens(prompt)
+        )
+        return content, usage, client.model_name
+
+    async def _hedged(
+        self, client: BaseLM, prompt, group: object
+    ) -> tuple[str, ModelUsageSummary, str]:
+        """Call the provider, hedging once the call outlives the policy's latency percentile."""
+        if self.hedge is None:
+            return await self._attempt(client, prompt, group)
+
+        started = asyncio.Event()
+        primary = asyncio.ensure_future(self._attempt(client, prompt, group, started))
+        admitted = asyncio.ensure_future(started.wait())
+        attempts = {primary, admitted}
+        try:
+            # Only time the call itself, not its wait in the scheduler queue.
+            await asyncio.wait([primary, admitted], return_when=asyncio.FIRST_COMPLETED)
+            delay = self._latency.hedge_delay(client.model_name)
+            if not primary.done() and delay is not None:
+                await asyncio.wait([primary], timeout=delay)
+            if primary.done():
+                return primary.result()
+
+            stats = self.scheduler.stats_for(client.model_name)
+            stats.hedged_requests += 1
+            alternate = self.clients.get(self.hedge.alternate_model, client)
+            hedge = asyncio.ensure_future(self._attempt(alternate, prompt, group))
+            attempts.add(hedge)
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is hedge:
+                            stats.hedge_wins += 1
+                        # The losing attempt is cancelled below; its input was likely billed.
+                        stats.hedge_estimated_input_tokens += estimate_tokens(prompt)
+                        return attempt.result()
+            return primary.result()  # both failed: surface the original error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def store_prompt(self, prompt) -> str:
+        """Keep a prompt handler-side (for compact responses) and return its hash.
+
+        Each call adds a reference, dropped again by release_prompts().
+        """
+        key = prompt_hash(prompt)
+        with self._prompts_lock:
+            entry = self._prompts.setdefault(key, [prompt, 0])
+            entry[1] += 1
+        return key
+
+    def get_prompt(self, key: str):
+        """Look up a prompt stored for a compact response, or None if unknown."""
+        entry = self._prompts.get(key)
+        return entry[0] if entry is not None else None
+
+    def resolve_prompts(self, calls: list[RLMChatCompletion]) -> None:
+        """Fill in prompts of compact RLMChatCompletions in place (e.g. before logging)."""
+        for call in calls:
+            if call.prompt is None and call.prompt_hash is not None:
+                call.prompt = self.get_prompt(call.prompt_hash)
+
+    def release_prompts(self, calls: list[RLMChatCompletion]) -> None:
+        """Drop the prompt-store references held by compact RLMChatCompletions.
+
+        A prompt is forgotten once no call record refers to it, so a long-lived handler
+        only keeps prompts of records that have not been processed yet.
+        """
+        with self._prompts_lock:
+            for call in calls:
+                entry = self._prompts.get(call.prompt_hash) if call.prompt_hash else None
+                if entry is not None:
+                    entry[1] -= 1
+                    if entry[1] <= 0:
+                        del self._prompts[call.prompt_hash]
+
     def completion(self, prompt: str, model: str | None = None) -> str:
         """Direct completion call (for main process use)."""
         return self.get_client(model).completion(prompt)
 
+    def completion_with_usage(
+        self, prompt: str, model: str | None = None, budget_id: str | None = None
+    ) -> tuple[str, ModelUsageSummary]:
+        """Like completion(), also returning the usage of this call alone, which is charged
+        to the budget `budget_id` if given."""
+        client = self.get_client(model)
+        content, usage = client.completion_with_usage(prompt)
+        self.charge_budget(budget_id, client.model_name, usage)
+        return content, usage
+
+    def stream_completion(self, prompt: str, model: str | None = None) -> CompletionStream:
+        """Direct streaming completion call; the stream's usage is set once it is done."""
+        return self.get_client(model).stream_completion(prompt)
+
+    async def acompletion(self, prompt: str, model: str | None = None) -> str:
+        """Direct completion call from another event loop (for main process use)."""
+        content, _ = await self.acompletion_with_usage(prompt, model)
+        return content
+
+    async def acompletion_with_usage(
+        self,
+        prompt: str,
+        model: str | None = None,
+        scheduled: bool = False,
+        budget_id: str | None = None,
+    ) -> tuple[str, ModelUsageSummary]:
+        """Like acompletion(), also returning the usage of this call alone.
+
+        The call runs on the handler's loop, so a client's async transport is only ever
+        used from one loop, and is cancelled if the awaiting task is. If `scheduled`, it is
+        admitted through the scheduler like a sub-call (used by child RLMs). The usage is
+        charged to the budget `budget_id` if given.
+        """
+        if self._loop is None:
+            raise RuntimeError("LMHandler is not running; call start() first")
+        client = self.get_client(model)
+
+        async def call() -> tuple[str, ModelUsageSummary]:
+            if scheduled:
+                content, usage, _ = await self._attempt(client, prompt, object())
+            else:
+                content, usage = await client.acompletion_with_usage(prompt)
+            self.charge_budget(budget_id, client.model_name, usage)
+            return content, usage
+
+        future = asyncio.run_coroutine_threadsafe(call(), self._loop)
+        return await asyncio.wrap_future(future)
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the handler's loop from another thread and return its result.
+
+        The coroutine is cancelled if the caller is interrupted while waiting for it.
+        """
+        if self._loop is None:
+            coro.close()
+            raise RuntimeError("LMHandler is not running; call start() first")
+        if self._thread is current_thread():
+            coro.close()
+            raise RuntimeError("LMHandler.run() would block the handler's own loop")
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
     def __enter__(self):
         self.start()
         return self
@@ -207,4 +705,7 @@ class LMHandler:
         for client in self.clients.values():
             client_summary = client.get_usage_summary()
             merged.update(client_summary.model_usage_summaries)
-        return UsageSummary(model_usage_summaries=merged)
+        handler_stats = {
+            model: dataclasses.replace(stats) for model, stats in self.scheduler.get_stats().items()
+        }
+        return UsageSummary(model_usage_summaries=merged, handler_stats=handler_stats)
@@ -0,0 +1,119 @@
+"""
+Memory-mapped text contexts.
+
+MappedText maps a text file read-only, so a large context can be handed to a LocalREPL
+without reading it into memory. Pages are loaded by the OS as the REPL code touches them.
+"""
+
+import mmap
+import os
+from typing import Any
+
+
+class MappedText:
+    """A read-only text file mapped into memory, usable in most places a str is.
+
+    Lengths and offsets are in bytes of the encoded file, which equal characters for ASCII
+    text. Slicing, `find`, `rfind`, `count`, `in` and `lines()` work on the mapping without
+    decoding the rest of the file. Other str methods (`split`, `lower`, ...) and `str()` decode
+    the whole text first. `buffer` is a zero-copy memoryview of the raw bytes.
+
+    Args:
+        path: The text file to map.
+        encoding: Used to decode slices and encode search strings.
+    """
+
+    def __init__(self, path: str | os.PathLike, encoding: str = "utf-8"):
+        self.path = os.fspath(path)
+        self.encoding = encoding
+        with open(self.path, "rb") as f:
+            # mmap refuses empty files
+            if os.fstat(f.fileno()).st_size:
+                self._map: mmap.mmap | bytes = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._map = b""
+
+    @property
+    def buffer(self) -> memoryview:
+        return memoryview(self._map)
+
+    def _encode(self, sub: "str | bytes") -> bytes:
+        return sub.encode(self.encoding) if isinstance(sub, str) else sub
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def __getitem__(self, key: int | slice) -> str:
+        if isinstance(key, slice):
+            return self._map[key].decode(self.encoding, errors="replace")
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("MappedText index out of range")
+        return self._map[key : key + 1].decode(self.encoding, errors="replace")
+
+    def __contains__(self, sub: "str | bytes") -> bool:
+        return self._map.find(self._encode(sub)) != -1
+
+    def find(self, sub: "str | bytes", start: int = 0, end: int | None = None) -> int:
+        return self._map.find(self._encode(sub), start, len(self) if end is None else end)
+
+    def rfind(self, sub: "str | bytes", start: int = 0, end: int | None = None) -> int:
+        return self._map.rfind(self._encode(sub), start, len(self) if end is None else end)
+
+    def count(self, sub: "str | bytes", start: int = 0, end: int | None = None) -> int:
+        needle = self._encode(sub)
+        end = len(self) if end is None else end
+        found, pos = 0, self._map.find(needle, start, end)
+        while pos != -1:
+            found += 1
+            pos = self._map.find(needle, pos + max(len(needle), 1), end)
+        return found
+
+    def lines(self):
+        """Yield the lines of the text, without line endings, one at a time."""
+        start, size = 0, len(self)
+        while start < size:
+            end = self._map.find(b"\n", start)
+            if end == -1:
+                end = size
+            yield self._map[start:end].decode(self.encoding, errors="replace").rstrip("\r")
+            start = end + 1
+
+    def __str__(self) -> str:
+        return self._map[:].decode(self.encoding, errors="replace")
+
+    def __repr__(self) -> str:
+        return f"MappedText({self.path!r}, {len(self)} bytes)"
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, MappedText):
+            return self._map[:] == other._map[:]
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __add__(self, other: str) -> str:
+        return str(self) + other
+
+    def __radd__(self, other: str) -> str:
+        return other + str(self)
+
+    def __getattr__(self, name: str) -> Any:
+        # Everything else behaves like the decoded str
+        if name.startswith("_") or not hasattr(str, name):
+            raise AttributeError(f"'MappedText' object has no attribute '{name}'")
+        return getattr(str(self), name)
+
+    def __deepcopy__(self, memo: dict) -> "MappedText":
+        # Read-only, so copies can share the mapping
+        return self
+
+    def __reduce__(self):
+        return (MappedText, (self.path, self.encoding))
+
+    def close(self) -> None:
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
@@ -1,21 +1,41 @@
+import asyncio
+import threading
 import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import contextmanager
 from typing import Any
 
 from rlm.clients import BaseLM, get_client
+from rlm.core.budget import Budget
+from rlm.core.compaction import HistoryCompactor
+from rlm.core.lazy_context import LazyContext
 from rlm.core.lm_handler import LMHandler
 from rlm.core.types import (
+    BudgetUsage,
     ClientBackend,
     CodeBlock,
+    CompletionTiming,
     EnvironmentType,
+    HistoryCompaction,
     REPLResult,
+    RLMBatchCompletion,
     RLMChatCompletion,
     RLMIteration,
     RLMMetadata,
+    UsageSummary,
+)
+from rlm.environments import (
+    BaseEnv,
+    EnvironmentPool,
+    SupportsParallelExecution,
+    SupportsPersistence,
+    get_environment,
 )
-from rlm.environments import BaseEnv, SupportsPersistence, get_environment
 from rlm.logger import RLMLogger, VerbosePrinter
+from rlm.utils.code_analysis import schedule_code_blocks
 from rlm.utils.parsing import (
+    StreamingResponseParser,
     find_code_blocks,
     find_final_answer,
     format_iteration,
@@ -26,15 +46,27 @@ from rlm.utils.prompts import (
     build_rlm_system_prompt,
     build_user_prompt,
 )
-from rlm.utils.rlm_utils import filter_sensitive_keys
+from rlm.utils.rlm_utils import estimate_tokens, filter_sensitive_keys
+
+
+def _stop_lm_handler(lm_handler: LMHandler) -> None:
+    """Stop an RLM's LM handler, from close() or once the RLM is garbage collected."""
+    if lm_handler._thread is threading.current_thread():
+        # Collected on the handler's own loop, which can't wait for itself to stop
+        threading.Thread(target=lm_handler.stop, daemon=True).start()
+    else:
+        lm_handler.stop()
 
 
 class RLM:
     """
     Recursive Language Model class that the user instantiates and runs on their tasks.
 
-    Each completion() call spawns its own environment and LM handler, which are
-    cleaned up when the call completes.
+    The LM clients and LM handler are created on first use and shared by every completion;
+    use the RLM as a context manager (or call close()) to shut them down. An RLM that is
+    garbage collected without being closed still stops its handler. Each completion()
+    call gets its own environment unless persistent=True, and its usage summary only counts
+    that call.
     """
 
     def __init__(
@@ -43,6 +75,7 @@ class RLM:
         backend_kwargs: dict[str, Any] | None = None,
         environment: EnvironmentType = "local",
         environment_kwargs: dict[str, Any] | None = None,
+        lm_handler_kwargs: dict[str, Any] | None = None,
         depth: int = 0,
         max_depth: int = 1,
         max_iterations: int = 30,
@@ -52,6 +85,12 @@ class RLM:
         logger: RLMLogger | None = None,
         verbose: bool = False,
         persistent: bool = False,
+        environment_pool_kwargs: dict[str, Any] | None = None,
+        history_compactor: HistoryCompactor | None = None,
+        streaming: bool = False,
+        parallel_code_blocks: bool = False,
+        max_concurrent_children: int = 8,
+        budget: Budget | None = None,
     ):
         """
         Args:
@@ -59,8 +98,10 @@ class RLM:
             backend_kwargs: The kwargs to pass to the backend.
             environment: The environment to use for the RLM.
             environment_kwargs: The kwargs to pass to the environment.
+            lm_handler_kwargs: The kwargs to pass to the LMHandler (e.g. max_concurrent_requests, rate_limit).
             depth: The current depth of the RLM (0-indexed).
-            max_depth: The maximum depth of the RLM. Currently, only depth 1 is supported.
+            max_depth: The maximum depth of the RLM. With max_depth > 1, sub-calls made below max_depth run a
+                child RLM trajectory (sharing this RLM's LM handler) instead of a plain LM call.
             max_iterations: The maximum number of iterations of the RLM.
             custom_system_prompt: The custom system prompt to use for the RLM.
             other_backends: A list of other client backends that the environments can use to make sub-calls.
@@ -68,6 +109,20 @@ class RLM:
             logger: The logger to use for the RLM.
             verbose: Whether to print verbose output in rich to console.
             persistent: If True, reuse the environment across completion() calls for multi-turn conversations.
+            environment_pool_kwargs: If set, lease environments from a warm EnvironmentPool created with
+                these kwargs (e.g. size, max_uses, max_age) instead of creating one per completion.
+            history_compactor: If set, compacts the root message history (e.g. SlidingWindowCompactor,
+                SummarizeCompactor) whenever it exceeds the compactor's token budget.
+            streaming: If True, stream root LM responses, running each code block as soon as it is complete
+                and stopping generation once a complete FINAL(...) / FINAL_VAR(...) has arrived.
+            parallel_code_blocks: If True, run code blocks of one (non-streamed) response that do not read or
+                write each other's variables concurrently, in environments that support it (e.g. local). Only
+                their sub-calls overlap in local, where the working directory is held by one block at a time.
+            max_concurrent_children: Maximum number of child RLM trajectories running at once at each depth
+                (only used when max_depth > 1).
+            budget: Limits on sub-calls, tokens, cost and wall-clock time for each completion (including
+                its child RLMs). Once a limit is reached, sub-calls fail with an error and the RLM asks for
+                its final answer; what was spent is reported in the result's `budget`.
         """
         # Store config for spawning per-completion
         self.backend = backend
@@ -76,6 +131,7 @@ class RLM:
         self.environment_kwargs = (
             environment_kwargs.copy() if environment_kwargs is not None else {}
         )
+        self.lm_handler_kwargs = lm_handler_kwargs.copy() if lm_handler_kwargs is not None else {}
         # Validate other_backends: currently only support one additional backend
         if other_backends is not None:
             if len(other_backends) != 1:
@@ -93,11 +149,34 @@ class RLM:
         self.system_prompt = custom_system_prompt if custom_system_prompt else RLM_SYSTEM_PROMPT
         self.logger = logger
         self.verbose = VerbosePrinter(enabled=verbose)
+        self.history_compactor = history_compactor
+        self.streaming = streaming
+        self.parallel_code_blocks = parallel_code_blocks
+        self.max_concurrent_children = max_concurrent_children
+        self.budget = budget
 
         # Persistence support
         self.persistent = persistent
         self._persistent_env: SupportsPersistence | None = None
 
+        # Long-lived clients + handler, created on first use (child RLMs share their root's)
+        self._lm_handler: LMHandler | None = None
+        self._lm_handler_lock = threading.Lock()
+        # Set for a handler this RLM created (and so stops); children share their root's
+        self._lm_handler_finalizer: weakref.finalize | None = None
+
+        # Child RLMs serving sub-calls when max_depth > 1, by (depth, model)
+        self._root_model: str | None = None  # None: the handler's default client
+        self._children: dict[tuple[int, str], RLM] = {}
+        self._children_lock = threading.Lock()
+
+        # Warm environment pool, created on first use if configured
+        self.environment_pool_kwargs = (
+            environment_pool_kwargs.copy() if environment_pool_kwargs is not None else None
+        )
+        self._environment_pool: EnvironmentPool | None = None
+        self._environment_pool_lock = threading.Lock()
+
         # Validate persistence support at initialization
         if self.persistent:
             self._validate_persistent_environment_support()
@@ -125,28 +204,14 @@ class RLM:
     @contextmanager
     def _spawn_completion_context(self, prompt: str | dict[str, Any]):
         """
-        Spawn an LM handler and environment for a single completion call.
+        Get the shared LM handler and an environment for a single completion call.
 
         When persistent=True, the environment is reused across calls.
-        When persistent=False (default), creates fresh environment each call.
+        When persistent=False (default), creates fresh environment each call, or leases one
+        from the environment pool if environment_pool_kwargs is set.
         """
-        # Create client and wrap in handler
-        client: BaseLM = get_client(self.backend, self.backend_kwargs)
-
-        # Create other_backend_client if provided (for depth=1 routing)
-        other_backend_client: BaseLM | None = None
-        if self.other_backends and self.other_backend_kwargs:
-            other_backend_client = get_client(self.other_backends[0], self.other_backend_kwargs[0])
-
-        lm_handler = LMHandler(client, other_backend_client=other_backend_client)
-
-        # Register other clients to be available as sub-call options (by model name)
-        if self.other_backends and self.other_backend_kwargs:
-            for backend, kwargs in zip(self.other_backends, self.other_backend_kwargs, strict=True):
-                other_client: BaseLM = get_client(backend, kwargs)
-                lm_handler.register_client(other_client.model_name, other_client)
-
-        lm_handler.start()
+        lm_handler = self._get_lm_handler()
+        pool = None
 
         # Environment: reuse if persistent, otherwise create fresh
         if self.persistent and self._persistent_env is not None:
@@ -160,12 +225,11 @@ class RLM:
                 )
             environment.update_handler_address((lm_handler.host, lm_handler.port))
             environment.add_context(prompt)
+        elif not self.persistent and self.environment_pool_kwargs is not None:
+            pool = self._get_environment_pool(lm_handler)
+            environment = pool.lease(prompt)
         else:
-            env_kwargs = self.environment_kwargs.copy()
-            env_kwargs["lm_handler_address"] = (lm_handler.host, lm_handler.port)
-            env_kwargs["context_payload"] = prompt
-            env_kwargs["depth"] = self.depth + 1  # Environment depth is RLM depth + 1
-            environment: BaseEnv = get_environment(self.environment_type, env_kwargs)
+            environment = self._create_environment(prompt, lm_handler)
 
             if self.persistent:
                 self._persistent_env = environment
@@ -173,10 +237,124 @@ class RLM:
         try:
             yield lm_handler, environment
         finally:
-            lm_handler.stop()
-            if not self.persistent and hasattr(environment, "cleanup"):
+            if pool is not None:
+                pool.release(environment)
+            elif not self.persistent and hasattr(environment, "cleanup"):
                 environment.cleanup()
 
+    def _get_lm_handler(self) -> LMHandler:
+        """Return the long-lived LM handler, creating its clients and starting it on first use."""
+        with self._lm_handler_lock:
+            if self._lm_handler is None:
+                self._lm_handler = self._create_lm_handler()
+                # Stops the handler if this RLM is garbage collected (or the interpreter
+                # exits) without close()
+                self._lm_handler_finalizer = weakref.finalize(
+                    self, _stop_lm_handler, self._lm_handler
+                )
+            return self._lm_handler
+
+    def _create_lm_handler(self) -> LMHandler:
+        """Create the clients and start an LM handler serving them."""
+        # Create client and wrap in handler
+        client: BaseLM = get_client(self.backend, self.backend_kwargs)
+
+        # Create each other backend once; the first is also the depth=1 routing client
+        other_clients: list[BaseLM] = []
+        if self.other_backends and self.other_backend_kwargs:
+            other_clients = [
+                get_client(backend, kwargs)
+                for backend, kwargs in zip(
+                    self.other_backends, self.other_backend_kwargs, strict=True
+                )
+            ]
+
+        lm_handler = LMHandler(
+            client,
+            other_backend_client=other_clients[0] if other_clients else None,
+            **self.lm_handler_kwargs,
+        )
+
+        # Register other clients to be available as sub-call options (by model name)
+        for other_client in other_clients:
+            lm_handler.register_client(other_client.model_name, other_client)
+
+        if self.max_depth > self.depth + 1:
+            # Weakly, so the running handler does not keep this RLM (and its finalizer) alive
+            arun_child = weakref.WeakMethod(self._arun_child)
+
+            async def run_child(*args) -> RLMChatCompletion:
+                method = arun_child()
+                if method is None:
+                    raise RuntimeError("The RLM serving this sub-call was garbage collected")
+                return await method(*args)
+
+            lm_handler.serve_children(run_child, self.max_depth, self.max_concurrent_children)
+
+        lm_handler.start()
+        return lm_handler
+
+    async def _arun_child(
+        self, prompt: str | dict[str, Any], model: str, depth: int, budget_id: str | None
+    ) -> RLMChatCompletion:
+        """Answer a sub-call at `depth` with a child RLM trajectory (runs on the handler's loop),
+        counting against its parent's budget."""
+        return await self._child_rlm(depth, model).acompletion(prompt, budget_id=budget_id)
+
+    def _child_rlm(self, depth: int, model: str) -> "RLM":
+        """The RLM serving sub-calls at `depth` routed to `model`, created on first use.
+
+        Children share this RLM's LM handler (and so its cache, scheduler and rate limits) and
+        lease their environments from their own pool.
+        """
+        with self._children_lock:
+            child = self._children.get((depth, model))
+            if child is None:
+                child = RLM(
+                    backend=self.backend,
+                    backend_kwargs=self.backend_kwargs,
+                    environment=self.environment_type,
+                    environment_kwargs=self.environment_kwargs,
+                    lm_handler_kwargs=self.lm_handler_kwargs,
+                    depth=depth,
+                    max_depth=self.max_depth,
+                    max_iterations=self.max_iterations,
+                    custom_system_prompt=self.system_prompt,
+                    environment_pool_kwargs={"warm": False, **(self.environment_pool_kwargs or {})},
+                    history_compactor=self.history_compactor,
+                    streaming=self.streaming,
+                    parallel_code_blocks=self.parallel_code_blocks,
+                    max_concurrent_children=self.max_concurrent_children,
+                )
+                child._lm_handler = self._lm_handler
+                child._root_model = model
+                self._children[(depth, model)] = child
+            return child
+
+    def _get_environment_pool(self, lm_handler: LMHandler) -> EnvironmentPool:
+        """Return the configured environment pool, creating (and warming) it on first use."""
+        with self._environment_pool_lock:
+            if self._environment_pool is None:
+                self._environment_pool = EnvironmentPool(
+                    self.environment_type,
+                    self._environment_kwargs(lm_handler),
+                    **self.environment_pool_kwargs,
+                )
+            return self._environment_pool
+
+    def _environment_kwargs(self, lm_handler: LMHandler) -> dict[str, Any]:
+        """Environment kwargs connecting it to `lm_handler`, without a context."""
+        env_kwargs = self.environment_kwargs.copy()
+        env_kwargs["lm_handler_address"] = (lm_handler.host, lm_handler.port)
+        env_kwargs["depth"] = self.depth + 1  # Environment depth is RLM depth + 1
+        return env_kwargs
+
+    def _create_environment(self, prompt: str | dict[str, Any], lm_handler: LMHandler) -> BaseEnv:
+        """Create a fresh environment connected to `lm_handler`, with `prompt` as its context."""
+        env_kwargs = self._environment_kwargs(lm_handler)
+        env_kwargs["context_payload"] = prompt
+        return get_environment(self.environment_type, env_kwargs)
+
     def _setup_prompt(self, prompt: str | dict[str, Any]) -> list[dict[str, Any]]:
         """
         Setup the system prompt for the RLM. Also include metadata about the prompt and build
@@ -190,169 +368,541 @@ class RLM:
         return message_history
 
     def completion(
-        self, prompt: str | dict[str, Any], root_prompt: str | None = None
+        self, prompt: str | dict[str, Any] | LazyContext, root_prompt: str | None = None
     ) -> RLMChatCompletion:
         """
         Recursive Language Model completion call. This is the main entry point for querying an RLM, and
         can replace a regular LM completion call.
 
-        Spawns its own environment and LM handler for the duration of this call.
+        Runs in its own environment (unless persistent=True) against the RLM's shared LM
+        handler. The usage summary counts only the root calls and sub-calls of this call.
+        This runs acompletion() on the handler's event loop and waits for it, so it can be called
+        from any thread, including one that is running its own event loop.
 
         Args:
-            prompt: A single string or dictionary of messages to pass as context to the model.
+            prompt: A single string or dictionary of messages to pass as context to the model,
+                or a LazyContext that keeps a large corpus on disk until the REPL reads it.
             root_prompt: We allow the RLM's root LM to see a (small) prompt that the user specifies. A common example of this
             is if the user is asking the RLM to answer a question, we can pass the question as the root prompt.
         Returns:
             A final answer as a string.
         """
+        return self._get_lm_handler().run(self.acompletion(prompt, root_prompt))
+
+    async def acompletion(
+        self,
+        prompt: str | dict[str, Any] | LazyContext,
+        root_prompt: str | None = None,
+        *,
+        budget_id: str | None = None,
+    ) -> RLMChatCompletion:
+        """
+        Async version of completion(), for running many RLM completions on one event loop.
+
+        Root LM calls are awaited; environment setup, code execution and teardown run in
+        worker threads so they never block the loop. Concurrent calls share the RLM's LM
+        handler; calls on a persistent RLM also share one environment and must not overlap.
+
+        Args:
+            prompt: A single string or dictionary of messages to pass as context to the model,
+                or a LazyContext that keeps a large corpus on disk until the REPL reads it.
+            root_prompt: A (small) prompt shown to the root LM, e.g. the user's question.
+            budget_id: Run against this open LMHandler budget instead of the RLM's own budget
+                (used for child RLMs).
+        Returns:
+            A final answer as a string.
+        """
         time_start = time.perf_counter()
 
-        # If we're at max depth, the RLM is an LM, so we fallback to the regular LM.
         if self.depth >= self.max_depth:
-            return self._fallback_answer(prompt)
+            return await self._afallback_answer(prompt)
+
+        context = self._spawn_completion_context(prompt)
+        lm_handler, environment = await asyncio.to_thread(context.__enter__)
+        try:
+            completion, _ = await self._arun(
+                prompt, root_prompt, lm_handler, environment, time_start, budget_id
+            )
+            return completion
+        finally:
+            await asyncio.to_thread(context.__exit__, None, None, None)
+
+    def completion_many(
+        self,
+        prompts: list[str | dict[str, Any]],
+        root_prompts: list[str | None] | str | None = None,
+        concurrency: int = 8,
+    ) -> RLMBatchCompletion:
+        """
+        Run a completion for each prompt, up to `concurrency` at a time, sharing one LM
+        handler and a pool of environments. See acompletion_many().
+
+        Args:
+            prompts: The contexts, one per completion.
+            root_prompts: One root prompt per completion, or a single one shared by all.
+            concurrency: Maximum number of trajectories running at once.
+        Returns:
+            The completions in input order, with per-item timings and the batch usage.
+        """
+        return asyncio.run(self.acompletion_many(prompts, root_prompts, concurrency))
+
+    async def acompletion_many(
+        self,
+        prompts: list[str | dict[str, Any]],
+        root_prompts: list[str | None] | str | None = None,
+        concurrency: int = 8,
+    ) -> RLMBatchCompletion:
+        """
+        Async version of completion_many().
+
+        Every trajectory uses the RLM's shared LM handler and leases its environment from the
+        RLM's environment pool if environment_pool_kwargs is set, otherwise from a pool that
+        lives for the batch. Environments that can be reset (e.g. LocalREPL) are reused across
+        trajectories; others are created per trajectory. Each completion's usage_summary
+        counts only its own root calls and sub-calls; the batch usage_summary is their sum.
+        """
+        if self.persistent:
+            raise ValueError("completion_many() does not support persistent=True")
+        if root_prompts is None or isinstance(root_prompts, str):
+            root_prompts = [root_prompts] * len(prompts)
+        if len(root_prompts) != len(prompts):
+            raise ValueError("root_prompts must have one entry per prompt")
+
+        time_start = time.perf_counter()
+        slots = asyncio.Semaphore(concurrency)
+        lm_handler = await asyncio.to_thread(self._get_lm_handler)
+        if self.environment_pool_kwargs is not None:
+            pool = await asyncio.to_thread(self._get_environment_pool, lm_handler)
+            batch_pool = None
+        else:
+            pool = batch_pool = EnvironmentPool(
+                self.environment_type,
+                self._environment_kwargs(lm_handler),
+                size=max(min(concurrency, len(prompts)), 1),
+                max_uses=None,
+                max_age=None,
+                warm=False,
+            )
+
+        async def run_one(prompt, root_prompt) -> tuple[RLMChatCompletion, CompletionTiming]:
+            queued_at = time.perf_counter()
+            async with slots:
+                timing = CompletionTiming(queue_time=time.perf_counter() - queued_at)
+                item_start = time.perf_counter()
+                if self.depth >= self.max_depth:
+                    completion = await self._afallback_completion(prompt, lm_handler)
+                    timing.lm_time = timing.total_time = time.perf_counter() - item_start
+                    return completion, timing
+
+                environment = await asyncio.to_thread(pool.lease, prompt)
+                timing.setup_time = time.perf_counter() - item_start
+                try:
+                    completion, iterations = await self._arun(
+                        prompt, root_prompt, lm_handler, environment, item_start
+                    )
+                finally:
+                    await asyncio.to_thread(pool.release, environment)
+
+                for iteration in iterations:
+                    code_time = sum(
+                        block.result.execution_time or 0.0 for block in iteration.code_blocks
+                    )
+                    timing.code_time += code_time
+                    timing.lm_time += (iteration.iteration_time or 0.0) - code_time
+                timing.iterations = len(iterations)
+                timing.total_time = time.perf_counter() - item_start
+                return completion, timing
+
+        try:
+            results = await asyncio.gather(
+                *(run_one(p, r) for p, r in zip(prompts, root_prompts, strict=True))
+            )
+        finally:
+            if batch_pool is not None:
+                await asyncio.to_thread(batch_pool.close)
+
+        completions = [completion for completion, _ in results]
+        return RLMBatchCompletion(
+            completions=completions,
+            timings=[timing for _, timing in results],
+            usage_summary=UsageSummary.merge(c.usage_summary for c in completions),
+            execution_time=time.perf_counter() - time_start,
+        )
 
-        with self._spawn_completion_context(prompt) as (lm_handler, environment):
-            message_history = self._setup_prompt(prompt)
+    async def _arun(
+        self,
+        prompt: str | dict[str, Any],
+        root_prompt: str | None,
+        lm_handler: LMHandler,
+        environment: BaseEnv,
+        time_start: float,
+        budget_id: str | None = None,
+    ) -> tuple[RLMChatCompletion, list[RLMIteration]]:
+        """The async iteration loop; also returns the iterations it ran.
+
+        Runs against the budget `budget_id` if given (a child RLM's parent budget), otherwise
+        against its own budget if the RLM has one.
+        """
+        own_budget = budget_id is None and self.budget is not None
+        if own_budget:
+            budget_id = lm_handler.open_budget(self.budget)
+        environment.budget_id = budget_id
+        message_history = self._setup_prompt(prompt)
+        history_start = len(message_history)
+        iterations: list[RLMIteration] = []
+        usage: list[UsageSummary] = []
+        final_answer = None
 
+        try:
             for i in range(self.max_iterations):
-                # Current prompt = message history + additional prompt suffix
-                context_count = (
-                    environment.get_context_count()
-                    if isinstance(environment, SupportsPersistence)
-                    else 1
+                if lm_handler.budget_exhausted(budget_id):
+                    break
+                message_history, compaction = await self._acompact_history(
+                    message_history, history_start, lm_handler, usage, budget_id
                 )
-                history_count = (
-                    environment.get_history_count()
-                    if isinstance(environment, SupportsPersistence)
-                    else 0
+                # A summary call may have used the budget up; don't start (or stream) a root call
+                if lm_handler.budget_exhausted(budget_id):
+                    break
+                current_prompt = self._turn_prompt(message_history, root_prompt, i, environment)
+                iteration = await self._acompletion_turn(
+                    current_prompt, lm_handler, environment, usage, budget_id
                 )
-                current_prompt = message_history + [
-                    build_user_prompt(root_prompt, i, context_count, history_count)
-                ]
-
-                iteration: RLMIteration = self._completion_turn(
-                    prompt=current_prompt,
-                    lm_handler=lm_handler,
-                    environment=environment,
+                iteration.compaction = compaction
+                iterations.append(iteration)
+                final_answer = await asyncio.to_thread(
+                    self._record_iteration, iteration, i, lm_handler, environment
                 )
 
-                # Check if RLM is done and has a final answer.
-                final_answer = find_final_answer(iteration.response, environment=environment)
-                iteration.final_answer = final_answer
+                if final_answer is not None:
+                    break
 
-                # If logger is used, log the iteration.
-                if self.logger:
-                    self.logger.log(iteration)
+                message_history.extend(format_iteration(iteration))
 
-                # Verbose output for this iteration
-                self.verbose.print_iteration(iteration, i + 1)
+            if final_answer is None:
+                final_answer = await self._adefault_answer(
+                    message_history, lm_handler, usage, budget_id
+                )
+        finally:
+            budget = lm_handler.close_budget(budget_id) if own_budget else None
+
+        completion = await asyncio.to_thread(
+            self._finish,
+            prompt,
+            final_answer,
+            len(iterations),
+            time_start,
+            message_history,
+            environment,
+            UsageSummary.merge(usage),
+            budget,
+        )
+        return completion, iterations
 
-                if final_answer is not None:
-                    time_end = time.perf_counter()
-                    usage = lm_handler.get_usage_summary()
-                    self.verbose.print_final_answer(final_answer)
-                    self.verbose.print_summary(i + 1, time_end - time_start, usage.to_dict())
-
-                    # Store message history in persistent environment
-                    if self.persistent and isinstance(environment, SupportsPersistence):
-                        environment.add_history(message_history)
-
-                    return RLMChatCompletion(
-                        root_model=self.backend_kwargs.get("model_name", "unknown")
-                        if self.backend_kwargs
-                        else "unknown",
-                        prompt=prompt,
-                        response=final_answer,
-                        usage_summary=usage,
-                        execution_time=time_end - time_start,
-                    )
+    def _turn_prompt(
+        self,
+        message_history: list[dict[str, Any]],
+        root_prompt: str | None,
+        iteration: int,
+        environment: BaseEnv,
+    ) -> list[dict[str, Any]]:
+        """Current prompt = message history + additional prompt suffix."""
+        context_count = (
+            environment.get_context_count() if isinstance(environment, SupportsPersistence) else 1
+        )
+        history_count = (
+            environment.get_history_count() if isinstance(environment, SupportsPersistence) else 0
+        )
+        return message_history + [
+            build_user_prompt(root_prompt, iteration, context_count, history_count)
+        ]
+
+    async def _acompact_history(
+        self,
+        message_history: list[dict[str, Any]],
+        start: int,
+        lm_handler: LMHandler,
+        usage: list[UsageSummary],
+        budget_id: str | None = None,
+    ) -> tuple[list[dict[str, Any]], HistoryCompaction | None]:
+        """Compact the iterations in `message_history` (from index `start`) with the
+        history_compactor if it is over budget; a summarizing compactor's call is added to `usage`."""
+        compactor = self.history_compactor
+        if compactor is None or not compactor.should_compact(message_history):
+            return message_history, None
+        time_start = time.perf_counter()
+        prefix, old, recent = compactor.split(message_history, start)
+        if not old:
+            return message_history, None
+
+        summary = None
+        summary_prompt = compactor.summary_prompt(old)
+        if summary_prompt is not None:
+            summary, call_usage = await lm_handler.acompletion_with_usage(
+                summary_prompt, compactor.model, budget_id=budget_id
+            )
+            model = lm_handler.get_client(compactor.model).model_name
+            usage.append(UsageSummary(model_usage_summaries={model: call_usage}))
+        compacted = prefix + compactor.rewrite(old, summary) + recent
+        if compacted == message_history:
+            return message_history, None
+        return compacted, self._compaction_record(message_history, compacted, time_start)
+
+    def _compaction_record(
+        self, before: list[dict[str, Any]], after: list[dict[str, Any]], time_start: float
+    ) -> HistoryCompaction:
+        compaction = HistoryCompaction(
+            strategy=self.history_compactor.name,
+            messages_before=len(before),
+            messages_after=len(after),
+            tokens_before=estimate_tokens(before),
+            tokens_after=estimate_tokens(after),
+            compaction_time=time.perf_counter() - time_start,
+        )
+        self.verbose.print_compaction(compaction)
+        return compaction
+
+    def _record_iteration(
+        self, iteration: RLMIteration, i: int, lm_handler: LMHandler, environment: BaseEnv
+    ) -> str | None:
+        """Check an iteration for a final answer, then log and print it."""
+        # Check if RLM is done and has a final answer.
+        final_answer = find_final_answer(iteration.response, environment=environment)
+        iteration.final_answer = final_answer
+
+        # Environments get compact sub-call records; restore prompts for logging.
+        calls = [call for block in iteration.code_blocks for call in block.result.rlm_calls]
+        if self.logger or self.verbose.enabled:
+            lm_handler.resolve_prompts(calls)
+
+        # If logger is used, log the iteration.
+        if self.logger:
+            self.logger.log(iteration)
 
-                # Format the iteration for the next prompt.
-                new_messages = format_iteration(iteration)
+        # Verbose output for this iteration
+        self.verbose.print_iteration(iteration, i + 1)
 
-                # Update message history with the new messages.
-                message_history.extend(new_messages)
+        # The shared handler no longer needs to keep these prompts.
+        lm_handler.release_prompts(calls)
+        return final_answer
 
-            # Default behavior: we run out of iterations, provide one final answer
-            time_end = time.perf_counter()
-            final_answer = self._default_answer(message_history, lm_handler)
-            usage = lm_handler.get_usage_summary()
-            self.verbose.print_final_answer(final_answer)
-            self.verbose.print_summary(self.max_iterations, time_end - time_start, usage.to_dict())
+    def _finish(
+        self,
+        prompt: str | dict[str, Any],
+        final_answer: str,
+        iterations: int,
+        time_start: float,
+        message_history: list[dict[str, Any]],
+        environment: BaseEnv,
+        usage: UsageSummary,
+        budget: BudgetUsage | None = None,
+    ) -> RLMChatCompletion:
+        """Build the completion result, printing the summary and saving persistent history."""
+        time_end = time.perf_counter()
+        self.verbose.print_final_answer(final_answer)
+        self.verbose.print_summary(iterations, time_end - time_start, usage.to_dict())
+
+        # Store message history in persistent environment
+        if self.persistent and isinstance(environment, SupportsPersistence):
+            environment.add_history(message_history)
+
+        if self._root_model is not None:
+            root_model = self._root_model
+        elif self.backend_kwargs:
+            root_model = self.backend_kwargs.get("model_name", "unknown")
+        else:
+            root_model = "unknown"
+        return RLMChatCompletion(
+            root_model=root_model,
+            prompt=prompt,
+            response=final_answer,
+            usage_summary=usage,
+            execution_time=time_end - time_start,
+            budget=budget,
+        )
 
-            # Store message history in persistent environment
-            if self.persistent and isinstance(environment, SupportsPersistence):
-                environment.add_history(message_history)
+    def _execute_code_blocks(
+        self, code_block_strs: list[str], environment: BaseEnv, usage: list[UsageSummary]
+    ) -> list[CodeBlock]:
+        """
+        Execute a response's code blocks, in order unless parallel_code_blocks is set, in which
+        case each wave of independent blocks (see schedule_code_blocks) runs concurrently.
+        The usage of the blocks' sub-calls is added to `usage` in block order.
+        """
+        if (
+            self.parallel_code_blocks
+            and len(code_block_strs) > 1
+            and isinstance(environment, SupportsParallelExecution)
+        ):
+            waves = schedule_code_blocks(code_block_strs)
+        else:
+            waves = [[i] for i in range(len(code_block_strs))]
 
-            return RLMChatCompletion(
-                root_model=self.backend_kwargs.get("model_name", "unknown")
-                if self.backend_kwargs
-                else "unknown",
-                prompt=prompt,
-                response=final_answer,
-                usage_summary=usage,
-                execution_time=time_end - time_start,
-            )
+        results: dict[int, REPLResult] = {}
+        for wave in waves:
+            if len(wave) == 1:
+                results[wave[0]] = environment.execute_code(code_block_strs[wave[0]])
+            else:
+                wave_results = environment.execute_code_parallel([code_block_strs[i] for i in wave])
+                results.update(zip(wave, wave_results, strict=True))
 
-    def _completion_turn(
+        code_blocks = []
+        for i, code_block_str in enumerate(code_block_strs):
+            code_blocks.append(CodeBlock(code=code_block_str, result=results[i]))
+            usage.extend(call.usage_summary for call in results[i].rlm_calls)
+        return code_blocks
+
+    def _streaming_completion_turn(
         self,
         prompt: str | dict[str, Any],
         lm_handler: LMHandler,
         environment: BaseEnv,
+        usage: list[UsageSummary],
+        budget_id: str | None = None,
     ) -> RLMIteration:
         """
-        Perform a single iteration of the RLM, including prompting the model
-        and code execution + tool execution.
+        _acompletion_turn() with a streamed root response (run in a worker thread). Code blocks run in order on a worker
+        thread, each starting as soon as its closing fence arrives, while the rest of the
+        response is generated; generation stops once the final answer is complete.
         """
         iter_start = time.perf_counter()
-        response = lm_handler.completion(prompt)
-        code_block_strs = find_code_blocks(response)
-        code_blocks = []
+        parser = StreamingResponseParser()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rlm-code")
+        running: list[tuple[str, Future[REPLResult]]] = []
 
-        for code_block_str in code_block_strs:
-            code_result: REPLResult = environment.execute_code(code_block_str)
+        stream = lm_handler.stream_completion(prompt, self._root_model)
+        try:
+            for chunk in stream:
+                for code_block_str in parser.feed(chunk):
+                    future = executor.submit(environment.execute_code, code_block_str)
+                    running.append((code_block_str, future))
+                if parser.final_complete:
+                    break
+        finally:
+            stream.close()
+            executor.shutdown(wait=True)
+
+        if stream.usage is not None:
+            model = lm_handler.get_client(self._root_model).model_name
+            usage.append(UsageSummary(model_usage_summaries={model: stream.usage}))
+            lm_handler.charge_budget(budget_id, model, stream.usage)
+
+        code_blocks = []
+        for code_block_str, future in running:
+            code_result = future.result()
             code_blocks.append(CodeBlock(code=code_block_str, result=code_result))
+            usage.extend(call.usage_summary for call in code_result.rlm_calls)
+
+        return RLMIteration(
+            prompt=prompt,
+            response=parser.text,
+            code_blocks=code_blocks,
+            iteration_time=time.perf_counter() - iter_start,
+        )
+
+    async def _acompletion_turn(
+        self,
+        prompt: str | dict[str, Any],
+        lm_handler: LMHandler,
+        environment: BaseEnv,
+        usage: list[UsageSummary],
+        budget_id: str | None = None,
+    ) -> RLMIteration:
+        """
+        Perform a single iteration of the RLM, including prompting the model
+        and code execution + tool execution. The usage of every LM call made is added to `usage`.
+        Code blocks run in a worker thread.
+        """
+        if self.streaming:
+            return await asyncio.to_thread(
+                self._streaming_completion_turn, prompt, lm_handler, environment, usage, budget_id
+            )
+
+        iter_start = time.perf_counter()
+        response = await self._aroot_completion(prompt, lm_handler, usage, budget_id)
+        code_blocks = await asyncio.to_thread(
+            self._execute_code_blocks, find_code_blocks(response), environment, usage
+        )
 
-        iteration_time = time.perf_counter() - iter_start
         return RLMIteration(
             prompt=prompt,
             response=response,
             code_blocks=code_blocks,
-            iteration_time=iteration_time,
+            iteration_time=time.perf_counter() - iter_start,
+        )
+
+    async def _aroot_completion(
+        self,
+        prompt: str | list[dict[str, Any]],
+        lm_handler: LMHandler,
+        usage: list[UsageSummary],
+        budget_id: str | None = None,
+    ) -> str:
+        """Root LM call, recording its usage into `usage`; a child RLM's calls go through the
+        scheduler."""
+        response, call_usage = await lm_handler.acompletion_with_usage(
+            prompt, self._root_model, scheduled=self.depth > 0, budget_id=budget_id
         )
+        model = lm_handler.get_client(self._root_model).model_name
+        usage.append(UsageSummary(model_usage_summaries={model: call_usage}))
+        return response
 
-    def _default_answer(self, message_history: list[dict[str, Any]], lm_handler: LMHandler) -> str:
+    async def _adefault_answer(
+        self,
+        message_history: list[dict[str, Any]],
+        lm_handler: LMHandler,
+        usage: list[UsageSummary],
+        budget_id: str | None = None,
+    ) -> str:
         """
         Default behavior if the RLM runs out of iterations and does not find a final answer.
         It will take the message history, and try to generate a final answer from it.
         """
-        current_prompt = message_history + [
+        current_prompt = self._default_answer_prompt(message_history)
+        response = await self._aroot_completion(current_prompt, lm_handler, usage, budget_id)
+        await asyncio.to_thread(self._log_default_answer, current_prompt, response)
+        return response
+
+    @staticmethod
+    def _default_answer_prompt(message_history: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        return message_history + [
             {
                 "role": "assistant",
                 "content": "Please provide a final answer to the user's question based on the information provided.",
             }
         ]
-        response = lm_handler.completion(current_prompt)
 
+    def _log_default_answer(self, prompt: list[dict[str, Any]], response: str) -> None:
         if self.logger:
             self.logger.log(
                 RLMIteration(
-                    prompt=current_prompt,
+                    prompt=prompt,
                     response=response,
                     final_answer=response,
                     code_blocks=[],
                 )
             )
 
-        return response
-
-    def _fallback_answer(self, message: str | dict[str, Any]) -> str:
+    async def _afallback_answer(self, message: str | dict[str, Any]) -> str:
         """
         Fallback behavior if the RLM is actually at max depth, and should be treated as an LM.
         """
-        client: BaseLM = get_client(self.backend, self.backend_kwargs)
-        response = client.completion(message)
-        return response
+        lm_handler = await asyncio.to_thread(self._get_lm_handler)
+        return await lm_handler.acompletion(message)
+
+    async def _afallback_completion(
+        self, message: str | dict[str, Any], lm_handler: LMHandler
+    ) -> RLMChatCompletion:
+        """Fallback at max depth for a batch item, as a plain LM call through the handler."""
+        time_start = time.perf_counter()
+        usage: list[UsageSummary] = []
+        response = await self._aroot_completion(message, lm_handler, usage)
+        return RLMChatCompletion(
+            root_model=lm_handler.default_client.model_name,
+            prompt=message,
+            response=response,
+            usage_summary=UsageSummary.merge(usage),
+            execution_time=time.perf_counter() - time_start,
+        )
 
     def _validate_persistent_environment_support(self) -> None:
         """
@@ -385,11 +935,26 @@ class RLM:
         return isinstance(env, SupportsPersistence)
 
     def close(self) -> None:
-        """Clean up persistent environment. Call when done with multi-turn conversations."""
+        """Clean up the persistent environment and environment pool (if any), close child
+        RLMs and stop the shared LM handler."""
+        with self._children_lock:
+            children = list(self._children.values())
+            self._children.clear()
+        for child in children:
+            child.close()
         if self._persistent_env is not None:
             if hasattr(self._persistent_env, "cleanup"):
                 self._persistent_env.cleanup()
             self._persistent_env = None
+        with self._environment_pool_lock:
+            if self._environment_pool is not None:
+                self._environment_pool.close()
+                self._environment_pool = None
+        with self._lm_handler_lock:
+            if self._lm_handler_finalizer is not None:
+                self._lm_handler_finalizer()  # stops the handler, once
+                self._lm_handler_finalizer = None
+            self._lm_handler = None
 
     def __enter__(self) -> "RLM":
         return self
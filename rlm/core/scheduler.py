@@ -0,0 +1,278 @@
+"""
+RequestScheduler - Admission control for sub-LM calls inside the LMHandler.
+
+Caps in-flight requests globally and per model, enforces per-model requests-per-minute and
+tokens-per-minute budgets, and retries provider rate-limit (429) errors with exponential
+backoff. Waiting requests are grouped (one group per request frame, so a whole batch is one
+group) and groups are served round-robin, so a 2,000-prompt batch cannot starve a single
+llm_query that arrives after it.
+
+All methods must be called from the LMHandler's event loop.
+"""
+
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import TypeVar
+
+from rlm.core.types import HandlerStats
+
+T = TypeVar("T")
+
+_WINDOW = 60.0  # seconds, for per-minute limits
+
+
+@dataclass
+class RateLimit:
+    """Limits for one model. None means unlimited."""
+
+    max_concurrent: int | None = None
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+    max_retries: int = 5
+    initial_backoff: float = 1.0
+    max_backoff: float = 60.0
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether an exception raised by a client SDK is a provider rate-limit (HTTP 429)."""
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    return "RateLimit" in type(error).__name__
+
+
+def _retry_after(error: BaseException) -> float | None:
+    """Read a Retry-After header (in seconds) from an SDK error, if it carries one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future
+    tokens: int
+    enqueued_at: float
+
+
+class _ModelQueue:
+    """Waiting requests, in-flight count and rate windows for one model."""
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.groups: OrderedDict[Hashable, deque[_Waiter]] = OrderedDict()
+        self.in_flight = 0
+        self.request_times: deque[float] = deque()
+        self.token_events: deque[tuple[float, int]] = deque()
+        self.window_tokens = 0
+        self.stats = HandlerStats()
+
+    @property
+    def depth(self) -> int:
+        return sum(len(waiters) for waiters in self.groups.values())
+
+    def expire(self, now: float) -> None:
+        while self.request_times and now - self.request_times[0] >= _WINDOW:
+            self.request_times.popleft()
+        while self.token_events and now - self.token_events[0][0] >= _WINDOW:
+            self.window_tokens -= self.token_events.popleft()[1]
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a request of `tokens` fits the per-minute windows (0 if it fits now)."""
+        limit = self.limit
+        delay = 0.0
+        rpm = limit.requests_per_minute
+        if rpm is not None and len(self.request_times) >= rpm:
+            delay = max(delay, self.request_times[0] + _WINDOW - now)
+        tpm = limit.tokens_per_minute
+        if tpm is not None and self.token_events and self.window_tokens + tokens > tpm:
+            # Find how many of the oldest events must expire before this request fits.
+            freed = self.window_tokens
+            expires_at = now
+            for event_time, event_tokens in self.token_events:
+                freed -= event_tokens
+                expires_at = event_time + _WINDOW
+                if freed + tokens <= tpm:
+                    break
+            # A request larger than the whole budget waits for an empty window.
+            delay = max(delay, expires_at - now)
+        return delay
+
+    def peek(self) -> _Waiter | None:
+        """Return the next waiter to admit, dropping ones whose callers gave up."""
+        while self.groups:
+            group, waiters = next(iter(self.groups.items()))
+            while waiters and waiters[0].future.done():
+                waiters.popleft()
+            if waiters:
+                return waiters[0]
+            del self.groups[group]
+        return None
+
+    def pop(self) -> _Waiter:
+        """Pop the waiter returned by peek() and rotate its group to the back (round-robin)."""
+        group, waiters = next(iter(self.groups.items()))
+        waiter = waiters.popleft()
+        if waiters:
+            self.groups.move_to_end(group)
+        else:
+            del self.groups[group]
+        return waiter
+
+
+class RequestScheduler:
+    """Fair, rate-limited admission of LM calls, with retry on provider 429s.
+
+    Args:
+        max_concurrent: Cap on in-flight requests across all models (None = unlimited).
+        rate_limit: A RateLimit for every model, or a dict of model name -> RateLimit.
+            Models missing from the dict get RateLimit() (no caps, but 429 retries).
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int | None = None,
+        rate_limit: RateLimit | dict[str, RateLimit] | None = None,
+    ):
+        self.max_concurrent = max_concurrent
+        self.rate_limit = rate_limit
+        self.in_flight = 0
+        self._queues: dict[str, _ModelQueue] = {}
+        self._timer: asyncio.TimerHandle | None = None
+
+    def _limit_for(self, model: str) -> RateLimit:
+        if isinstance(self.rate_limit, RateLimit):
+            return self.rate_limit
+        if isinstance(self.rate_limit, dict) and model in self.rate_limit:
+            return self.rate_limit[model]
+        return RateLimit()
+
+    def _queue(self, model: str) -> _ModelQueue:
+        if model not in self._queues:
+            self._queues[model] = _ModelQueue(self._limit_for(model))
+        return self._queues[model]
+
+    async def submit(
+        self,
+        model: str,
+        group: Hashable,
+        call: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+    ) -> T:
+        """Run `call()` once admitted under the limits for `model`, retrying on 429s.
+
+        Args:
+            model: Key for per-model limits and stats (usually the client's model name).
+            group: Requests sharing a group are served FIFO; groups are served round-robin.
+            call: Zero-argument factory returning a fresh awaitable for each attempt.
+            tokens: Estimated tokens for tokens-per-minute accounting.
+        """
+        queue = self._queue(model)
+        limit = queue.limit
+        attempt = 0
+        while True:
+            await self._acquire(queue, group, tokens, front=attempt > 0)
+            try:
+                return await call()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= limit.max_retries:
+                    raise
+                backoff = min(limit.max_backoff, limit.initial_backoff * 2**attempt)
+                delay = _retry_after(e) or backoff * (0.5 + random.random() / 2)
+                attempt += 1
+                queue.stats.rate_limit_retries += 1
+            finally:
+                self._release(queue)
+            await asyncio.sleep(delay)
+
+    async def _acquire(self, queue: _ModelQueue, group: Hashable, tokens: int, front: bool):
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(future=loop.create_future(), tokens=tokens, enqueued_at=time.monotonic())
+        waiters = queue.groups.setdefault(group, deque())
+        if front:
+            waiters.appendleft(waiter)
+        else:
+            waiters.append(waiter)
+        queue.stats.max_queue_depth = max(queue.stats.max_queue_depth, queue.depth)
+
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just before being cancelled: give the slot back.
+                self._release(queue)
+            raise
+
+    def _release(self, queue: _ModelQueue) -> None:
+        queue.in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit as many waiters as the limits allow, round-robin across models."""
+        now = time.monotonic()
+        next_wakeup: float | None = None
+        progressed = True
+        while progressed:
+            progressed = False
+            for queue in list(self._queues.values()):
+                if self.max_concurrent is not None and self.in_flight >= self.max_concurrent:
+                    return
+                limit = queue.limit
+                if limit.max_concurrent is not None and queue.in_flight >= limit.max_concurrent:
+                    continue
+                head = queue.peek()
+                if head is None:
+                    continue
+                tokens = head.tokens
+                queue.expire(now)
+                delay = queue.wait_time(tokens, now)
+                if delay > 0:
+                    next_wakeup = delay if next_wakeup is None else min(next_wakeup, delay)
+                    continue
+
+                waiter = queue.pop()
+                queue.in_flight += 1
+                self.in_flight += 1
+                queue.request_times.append(now)
+                if tokens:
+                    queue.token_events.append((now, tokens))
+                    queue.window_tokens += tokens
+                wait = now - waiter.enqueued_at
+                queue.stats.queued_requests += 1
+                queue.stats.total_queue_wait_time += wait
+                waiter.future.set_result(None)
+                progressed = True
+
+        if next_wakeup is not None:
+            self._schedule_wakeup(next_wakeup)
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        if self._timer is not None and not self._timer.cancelled() and self._timer.when() <= when:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def stats_for(self, model: str) -> HandlerStats:
+        """The live HandlerStats for `model`, for the handler to record its own counters."""
+        return self._queue(model).stats
+
+    def get_stats(self) -> dict[str, HandlerStats]:
+        """Per-model queueing stats (queue depth, wait time, rate-limit retries)."""
+        return {model: queue.stats for model, queue in self._queues.items()}
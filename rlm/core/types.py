@@ -1,7 +1,12 @@
-from dataclasses import dataclass
+import operator
+from collections.abc import Iterable
+from dataclasses import dataclass, field, fields
 from types import ModuleType
 from typing import Any, Literal
 
+from rlm.core.lazy_context import LazyContext
+from rlm.core.mapped_text import MappedText
+
 ClientBackend = Literal[
     "openai",
     "portkey",
@@ -45,12 +50,17 @@ class ModelUsageSummary:
     total_calls: int
     total_input_tokens: int
     total_output_tokens: int
+    # Of total_input_tokens: read from / written to the provider's prompt cache
+    cached_input_tokens: int = 0
+    cache_write_tokens: int = 0
 
     def to_dict(self):
         return {
             "total_calls": self.total_calls,
             "total_input_tokens": self.total_input_tokens,
             "total_output_tokens": self.total_output_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
         }
 
     @classmethod
@@ -59,20 +69,114 @@ class ModelUsageSummary:
             total_calls=data.get("total_calls"),
             total_input_tokens=data.get("total_input_tokens"),
             total_output_tokens=data.get("total_output_tokens"),
+            cached_input_tokens=data.get("cached_input_tokens", 0),
+            cache_write_tokens=data.get("cache_write_tokens", 0),
+        )
+
+
+@dataclass
+class HandlerStats:
+    """How the LM Handler served calls for one model, beyond what the provider bills for."""
+
+    queued_requests: int = 0
+    max_queue_depth: int = 0
+    total_queue_wait_time: float = 0.0
+    rate_limit_retries: int = 0
+    cache_hits: int = 0
+    coalesced_calls: int = 0
+    hedged_requests: int = 0
+    hedge_wins: int = 0
+    hedge_estimated_input_tokens: int = 0
+    deadline_exceeded: int = 0
+
+    def to_dict(self):
+        return {
+            "queued_requests": self.queued_requests,
+            "max_queue_depth": self.max_queue_depth,
+            "total_queue_wait_time": self.total_queue_wait_time,
+            "rate_limit_retries": self.rate_limit_retries,
+            "cache_hits": self.cache_hits,
+            "coalesced_calls": self.coalesced_calls,
+            "hedged_requests": self.hedged_requests,
+            "hedge_wins": self.hedge_wins,
+            "hedge_estimated_input_tokens": self.hedge_estimated_input_tokens,
+            "deadline_exceeded": self.deadline_exceeded,
+        }
+
+    def add(self, other: "HandlerStats") -> None:
+        """Accumulate another set of stats into this one (in place)."""
+        for f in fields(self):
+            combine = max if f.name == "max_queue_depth" else operator.add
+            setattr(self, f.name, combine(getattr(self, f.name), getattr(other, f.name)))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HandlerStats":
+        return cls(
+            queued_requests=data.get("queued_requests", 0),
+            max_queue_depth=data.get("max_queue_depth", 0),
+            total_queue_wait_time=data.get("total_queue_wait_time", 0.0),
+            rate_limit_retries=data.get("rate_limit_retries", 0),
+            cache_hits=data.get("cache_hits", 0),
+            coalesced_calls=data.get("coalesced_calls", 0),
+            hedged_requests=data.get("hedged_requests", 0),
+            hedge_wins=data.get("hedge_wins", 0),
+            hedge_estimated_input_tokens=data.get("hedge_estimated_input_tokens", 0),
+            deadline_exceeded=data.get("deadline_exceeded", 0),
         )
 
 
 @dataclass
 class UsageSummary:
     model_usage_summaries: dict[str, ModelUsageSummary]
+    handler_stats: dict[str, HandlerStats] = field(default_factory=dict)
+    # Usage of the child RLM trajectories (max_depth > 1) included in the totals above
+    children: list["UsageSummary"] = field(default_factory=list)
 
     def to_dict(self):
-        return {
+        d = {
             "model_usage_summaries": {
                 model: usage_summary.to_dict()
                 for model, usage_summary in self.model_usage_summaries.items()
             },
         }
+        if self.handler_stats:
+            d["handler_stats"] = {
+                model: stats.to_dict() for model, stats in self.handler_stats.items()
+            }
+        if self.children:
+            d["children"] = [child.to_dict() for child in self.children]
+        return d
+
+    @classmethod
+    def merge(cls, summaries: "Iterable[UsageSummary]") -> "UsageSummary":
+        """Sum several usage summaries, e.g. the per-call usage of one trajectory."""
+        merged = cls(model_usage_summaries={})
+        for summary in summaries:
+            for model, usage in summary.model_usage_summaries.items():
+                total = merged.model_usage_summaries.setdefault(model, ModelUsageSummary(0, 0, 0))
+                total.total_calls += usage.total_calls
+                total.total_input_tokens += usage.total_input_tokens
+                total.total_output_tokens += usage.total_output_tokens
+                total.cached_input_tokens += usage.cached_input_tokens
+                total.cache_write_tokens += usage.cache_write_tokens
+            for model, stats in summary.handler_stats.items():
+                merged.handler_stats.setdefault(model, HandlerStats()).add(stats)
+            merged.children.extend(summary.children)
+        return merged
+
+    def token_totals(self) -> tuple[int, int]:
+        """(input tokens, output tokens) summed over every model."""
+        usages = self.model_usage_summaries.values()
+        return (
+            sum(usage.total_input_tokens for usage in usages),
+            sum(usage.total_output_tokens for usage in usages),
+        )
+
+    def as_child(self) -> "UsageSummary":
+        """This trajectory's totals, with its usage tree nested one level down."""
+        rolled_up = UsageSummary.merge([self])
+        rolled_up.children = [self]
+        return rolled_up
 
     @classmethod
     def from_dict(cls, data: dict) -> "UsageSummary":
@@ -81,30 +185,75 @@ class UsageSummary:
                 model: ModelUsageSummary.from_dict(usage_summary)
                 for model, usage_summary in data.get("model_usage_summaries", {}).items()
             },
+            handler_stats={
+                model: HandlerStats.from_dict(stats)
+                for model, stats in data.get("handler_stats", {}).items()
+            },
+            children=[cls.from_dict(child) for child in data.get("children", [])],
         )
 
 
+@dataclass
+class BudgetUsage:
+    """What a trajectory spent against its Budget (see rlm.core.budget)."""
+
+    subcalls: int = 0
+    refused_subcalls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+    wall_time: float = 0.0
+    exhausted: str | None = None  # the limit that was reached, if any
+    unpriced_models: list[str] = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "subcalls": self.subcalls,
+            "refused_subcalls": self.refused_subcalls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost": self.cost,
+            "wall_time": self.wall_time,
+            "exhausted": self.exhausted,
+            "unpriced_models": self.unpriced_models,
+        }
+
+
 ########################################################
 ########   Types for REPL and RLM Iterations   #########
 ########################################################
 @dataclass
 class RLMChatCompletion:
-    """Record of a single LLM call made from within the environment."""
+    """Record of a single LLM call made from within the environment.
+
+    Compact records (see LMRequest.compact) leave prompt as None and carry prompt_hash
+    instead; LMHandler.resolve_prompts() restores the prompt where it is needed for logging.
+    """
 
     root_model: str
-    prompt: str | dict[str, Any]
+    prompt: str | dict[str, Any] | None
     response: str
     usage_summary: UsageSummary
     execution_time: float
+    prompt_hash: str | None = None
+    budget: BudgetUsage | None = None  # set on completions run with a Budget
 
     def to_dict(self):
-        return {
+        d = {
             "root_model": self.root_model,
-            "prompt": self.prompt,
+            # File-backed contexts are logged by their description, not their contents
+            "prompt": repr(self.prompt)
+            if isinstance(self.prompt, MappedText | LazyContext)
+            else self.prompt,
             "response": self.response,
             "usage_summary": self.usage_summary.to_dict(),
             "execution_time": self.execution_time,
         }
+        if self.prompt_hash is not None:
+            d["prompt_hash"] = self.prompt_hash
+        if self.budget is not None:
+            d["budget"] = self.budget.to_dict()
+        return d
 
     @classmethod
     def from_dict(cls, data: dict) -> "RLMChatCompletion":
@@ -114,9 +263,55 @@ class RLMChatCompletion:
             response=data.get("response"),
             usage_summary=UsageSummary.from_dict(data.get("usage_summary")),
             execution_time=data.get("execution_time"),
+            prompt_hash=data.get("prompt_hash"),
+            budget=BudgetUsage(**data["budget"]) if data.get("budget") else None,
         )
 
 
+@dataclass
+class CompletionTiming:
+    """Where one trajectory of a batch spent its time, in seconds."""
+
+    queue_time: float = 0.0  # waiting for a concurrency slot
+    setup_time: float = 0.0  # acquiring an environment and loading the context
+    lm_time: float = 0.0  # root LM calls (iteration time not spent executing code)
+    code_time: float = 0.0  # executing code blocks, including their sub-calls
+    total_time: float = 0.0
+    iterations: int = 0
+
+    def to_dict(self):
+        return {
+            "queue_time": self.queue_time,
+            "setup_time": self.setup_time,
+            "lm_time": self.lm_time,
+            "code_time": self.code_time,
+            "total_time": self.total_time,
+            "iterations": self.iterations,
+        }
+
+
+@dataclass
+class RLMBatchCompletion:
+    """Results of RLM.completion_many(), in input order.
+
+    Each completion's usage_summary covers only its own trajectory; usage_summary here is
+    the total for the batch.
+    """
+
+    completions: list[RLMChatCompletion]
+    timings: list[CompletionTiming]
+    usage_summary: UsageSummary
+    execution_time: float
+
+    def to_dict(self):
+        return {
+            "completions": [completion.to_dict() for completion in self.completions],
+            "timings": [timing.to_dict() for timing in self.timings],
+            "usage_summary": self.usage_summary.to_dict(),
+            "execution_time": self.execution_time,
+        }
+
+
 @dataclass
 class REPLResult:
     stdout: str
@@ -161,6 +356,33 @@ class CodeBlock:
         return {"code": self.code, "result": self.result.to_dict()}
 
 
+@dataclass
+class HistoryCompaction:
+    """A compaction of the root message history, done before an iteration's root call."""
+
+    strategy: str
+    messages_before: int
+    messages_after: int
+    tokens_before: int
+    tokens_after: int
+    compaction_time: float
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def to_dict(self):
+        return {
+            "strategy": self.strategy,
+            "messages_before": self.messages_before,
+            "messages_after": self.messages_after,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+            "compaction_time": self.compaction_time,
+        }
+
+
 @dataclass
 class RLMIteration:
     prompt: str | dict[str, Any]
@@ -168,6 +390,7 @@ class RLMIteration:
     code_blocks: list[CodeBlock]
     final_answer: str | None = None
     iteration_time: float | None = None
+    compaction: HistoryCompaction | None = None
 
     def to_dict(self):
         return {
@@ -176,6 +399,7 @@ class RLMIteration:
             "code_blocks": [code_block.to_dict() for code_block in self.code_blocks],
             "final_answer": self.final_answer,
             "iteration_time": self.iteration_time,
+            "compaction": self.compaction.to_dict() if self.compaction else None,
         }
 
 
@@ -223,10 +447,20 @@ class QueryMetadata:
     context_total_length: int
     context_type: str
 
-    def __init__(self, prompt: str | list[str] | dict[Any, Any] | list[dict[Any, Any]]):
+    def __init__(
+        self,
+        prompt: str | MappedText | LazyContext | list[str] | dict[Any, Any] | list[dict[Any, Any]],
+    ):
         if isinstance(prompt, str):
             self.context_lengths = [len(prompt)]
             self.context_type = "str"
+        elif isinstance(prompt, MappedText):
+            self.context_lengths = [len(prompt)]
+            self.context_type = "memory-mapped str"
+        elif isinstance(prompt, LazyContext):
+            # Sizes come from the index; nothing is read or serialized
+            self.context_lengths = prompt.lengths or [0]
+            self.context_type = f"LazyContext (a list of {prompt.kind} chunks, read on access)"
         elif isinstance(prompt, dict):
             self.context_type = "dict"
             self.context_lengths = []
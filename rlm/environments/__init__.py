@@ -1,9 +1,23 @@
 from typing import Any, Literal
 
-from rlm.environments.base_env import BaseEnv, SupportsPersistence
+from rlm.environments.base_env import (
+    BaseEnv,
+    SupportsParallelExecution,
+    SupportsPersistence,
+    SupportsReuse,
+)
 from rlm.environments.local_repl import LocalREPL
-
-__all__ = ["BaseEnv", "LocalREPL", "SupportsPersistence", "get_environment"]
+from rlm.environments.pool import EnvironmentPool
+
+__all__ = [
+    "BaseEnv",
+    "EnvironmentPool",
+    "LocalREPL",
+    "SupportsParallelExecution",
+    "SupportsPersistence",
+    "SupportsReuse",
+    "get_environment",
+]
 
 
 def get_environment(
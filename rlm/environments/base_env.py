@@ -14,6 +14,8 @@ class BaseEnv(ABC):
         self.persistent = persistent
         self.depth = depth
         self.kwargs = kwargs
+        # Trajectory budget (see LMHandler.open_budget) that sub-calls count against; set by the RLM
+        self.budget_id: str | None = None
 
     @abstractmethod
     def setup(self):
@@ -180,3 +182,44 @@ class SupportsPersistence(Protocol):
         are available.
         """
         ...
+
+
+@runtime_checkable
+class SupportsReuse(Protocol):
+    """Protocol for environments that can be reset and leased again (see EnvironmentPool).
+
+    CHECKING SUPPORT:
+        Use isinstance(env, SupportsReuse) to check if an environment can be pooled.
+
+    IMPLEMENTING THIS PROTOCOL:
+        reset() must leave the environment as if freshly created without a context:
+        no user variables, contexts or histories, and no pending LM calls, with its
+        setup_code run again. It should keep
+        whatever is expensive to recreate (sandbox, container, broker, LM connection).
+    """
+
+    def reset(self) -> None:
+        """Return to a clean namespace for reuse by another completion."""
+        ...
+
+    def is_healthy(self) -> bool:
+        """Cheap liveness check (e.g. sandbox still running, broker answering)."""
+        ...
+
+
+@runtime_checkable
+class SupportsParallelExecution(Protocol):
+    """Protocol for environments that can run independent code blocks concurrently.
+
+    CHECKING SUPPORT:
+        Use isinstance(env, SupportsParallelExecution) to check support.
+
+    IMPLEMENTING THIS PROTOCOL:
+        execute_code_parallel() runs each block in its own fork of the namespace and merges
+        the variables the blocks create or rebind back in block order. Results are returned
+        in block order, each with the sub-calls that block made.
+    """
+
+    def execute_code_parallel(self, code_blocks: list[str]) -> list[REPLResult]:
+        """Execute blocks that do not depend on each other concurrently."""
+        ...
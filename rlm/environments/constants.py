@@ -30,3 +30,6 @@ PIP_PACKAGES = [
     # For state serialization
     "dill>=0.3.7",
 ]
+
+# Broker requests (llm_query calls, streamed batches) an isolated REPL's host answers at once
+BROKER_REQUEST_WORKERS = 16
@@ -10,6 +10,7 @@ import os
 import textwrap
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from daytona import (
@@ -21,9 +22,18 @@ from daytona import (
     SessionExecuteRequest,
 )
 
-from rlm.core.comms_utils import LMRequest, send_lm_request, send_lm_request_batched
+from rlm.core.comms_utils import (
+    LMConnection,
+    LMRequest,
+    send_lm_request,
+    send_lm_request_batched,
+    send_lm_request_batched_iter,
+)
+from rlm.core.lazy_context import SANDBOX_LAZY_CONTEXT, LazyContext
 from rlm.core.types import REPLResult, RLMChatCompletion
 from rlm.environments.base_env import IsolatedEnv
+from rlm.environments.constants import BROKER_REQUEST_WORKERS
+from rlm.utils import chunking, map_reduce
 
 # =============================================================================
 # Default Daytona Image
@@ -85,6 +95,7 @@ app = Flask(__name__)
 # Request queue: {request_id: {"request": {...}, "response": None, "event": Event}}
 pending_requests = {}
 lock = threading.Lock()
+updated = threading.Condition(lock)
 
 @app.route("/health")
 def health():
@@ -137,6 +148,52 @@ def respond():
         if request_id in pending_requests:
             pending_requests[request_id]["response"] = response
             pending_requests[request_id]["event"].set()
+            updated.notify_all()
+            return jsonify({"status": "ok"})
+
+    return jsonify({"error": "Request not found"}), 404
+
+@app.route("/enqueue_stream", methods=["POST"])
+def enqueue_stream():
+    """Called by sandbox code to submit a streamed batch; results are read from /stream/<id>."""
+    request_id = str(uuid.uuid4())
+    with lock:
+        pending_requests[request_id] = {
+            "request": request.json,
+            "response": None,
+            "event": threading.Event(),
+            "items": [],
+        }
+    return jsonify({"id": request_id})
+
+@app.route("/stream/<request_id>")
+def stream(request_id):
+    """Long-poll for streamed results after `cursor`. Returns {"items": [...], "done": bool}."""
+    cursor = int(request.args.get("cursor", 0))
+    with updated:
+        updated.wait_for(
+            lambda: request_id not in pending_requests
+            or len(pending_requests[request_id]["items"]) > cursor
+            or pending_requests[request_id]["response"] is not None,
+            timeout=30,
+        )
+        entry = pending_requests.get(request_id)
+        if entry is None:
+            return jsonify({"error": "Request not found"}), 404
+        items = entry["items"][cursor:]
+        done = entry["response"] is not None
+        if done:
+            pending_requests.pop(request_id)
+    return jsonify({"items": items, "done": done})
+
+@app.route("/respond_partial", methods=["POST"])
+def respond_partial():
+    """Called by DaytonaREPL to add one result to a streamed batch."""
+    data = request.json
+    with updated:
+        if data.get("id") in pending_requests:
+            pending_requests[data["id"]]["items"].append(data.get("item"))
+            updated.notify_all()
             return jsonify({"status": "ok"})
 
     return jsonify({"error": "Request not found"}), 404
@@ -180,8 +237,8 @@ except ImportError:
 
 BROKER_URL = "http://127.0.0.1:{broker_port}"
 
-def llm_query(prompt, model=None):
-    """Query the LM via the broker."""
+def _llm_query_usage(prompt, model=None):
+    """Query the LM via the broker; returns (response, input tokens, output tokens)."""
     try:
         response = requests.post(
             f"{{BROKER_URL}}/enqueue",
@@ -190,10 +247,20 @@ def llm_query(prompt, model=None):
         )
         data = response.json()
         if data.get("error"):
-            return f"Error: {{data['error']}}"
-        return data.get("response", "Error: No response")
+            return f"Error: {{data['error']}}", None, None
+        usage = data.get("usage") or {{}}
+        return (
+            data.get("response", "Error: No response"),
+            usage.get("input_tokens"),
+            usage.get("output_tokens"),
+        )
     except Exception as e:
-        return f"Error: LM query failed - {{e}}"
+        return f"Error: LM query failed - {{e}}", None, None
+
+
+def llm_query(prompt, model=None):
+    """Query the LM via the broker."""
+    return _llm_query_usage(prompt, model)[0]
 
 
 def llm_query_batched(prompts, model=None):
@@ -212,6 +279,78 @@ def llm_query_batched(prompts, model=None):
         return [f"Error: LM query failed - {{e}}"] * len(prompts)
 
 
+def llm_query_batched_iter(prompts, model=None):
+    """Query the LM with multiple prompts, yielding (index, response) as each one finishes."""
+    done = set()
+    try:
+        response = requests.post(
+            f"{{BROKER_URL}}/enqueue_stream",
+            json={{"type": "batched_iter", "prompts": prompts, "model": model, "depth": {depth}}},
+            timeout=30,
+        )
+        stream_id = response.json()["id"]
+        cursor = 0
+        finished = False
+        while not finished:
+            data = requests.get(
+                f"{{BROKER_URL}}/stream/{{stream_id}}", params={{"cursor": cursor}}, timeout=60
+            ).json()
+            if data.get("error"):
+                raise RuntimeError(data["error"])
+            finished = data.get("done", False)
+            for item in data.get("items", []):
+                cursor += 1
+                done.add(item["index"])
+                if item.get("error"):
+                    yield item["index"], f"Error: {{item['error']}}"
+                else:
+                    yield item["index"], item["response"]
+    except Exception as e:
+        for i in range(len(prompts)):
+            if i not in done:
+                yield i, f"Error: LM query failed - {{e}}"
+
+
+# =============================================================================
+# Lazy Context (chunks fetched from the host via the broker)
+# =============================================================================
+
+LAZY_CONTEXT_FILE = "/tmp/rlm_lazy_context.json"
+
+def _fetch_context(start, stop):
+    response = requests.post(
+        f"{{BROKER_URL}}/enqueue",
+        json={{"type": "context", "start": start, "stop": stop}},
+        timeout=300,
+    )
+    data = response.json()
+    if "chunks" not in data:
+        raise RuntimeError(f"Could not fetch context chunks: {{data.get('error')}}")
+    return data["chunks"]
+{SANDBOX_LAZY_CONTEXT}
+
+# =============================================================================
+# Chunking
+# =============================================================================
+
+{chunking.sandbox_source()}
+def chunk_context(max_tokens=DEFAULT_MAX_TOKENS, overlap=0, boundary="paragraph", context=None):
+    if context is None:
+        if "context" not in combined:
+            raise ValueError("No context loaded")
+        context = combined["context"]
+    return chunk_documents(context, max_tokens, overlap, boundary)
+
+# =============================================================================
+# Map-Reduce
+# =============================================================================
+
+{map_reduce.sandbox_source()}
+def llm_map(prompt_template, items, reduce=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, reduce_max_tokens=DEFAULT_REDUCE_MAX_TOKENS, model=None, progress=True):
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        return map_reduce(lambda prompt: pool.submit(_llm_query_usage, prompt, model), lambda future: future.result(), prompt_template, items, reduce, max_concurrency, reduce_max_tokens, progress)
+
 # =============================================================================
 # State Management
 # =============================================================================
@@ -232,6 +371,7 @@ def save_state(state):
     for k, v in state.items():
         if k.startswith("_"):
             continue
+        v = _persistable(v)
         try:
             dill.dumps(v)
             clean_state[k] = v
@@ -255,7 +395,7 @@ def serialize_locals(state):
 # Execution
 # =============================================================================
 
-_locals = load_state()
+_locals = _restore_lazy_contexts(load_state())
 
 def FINAL_VAR(variable_name):
     variable_name = variable_name.strip().strip("\\"\\'")
@@ -277,8 +417,12 @@ _globals = {{
     "__name__": "__main__",
     "llm_query": llm_query,
     "llm_query_batched": llm_query_batched,
+    "llm_query_batched_iter": llm_query_batched_iter,
     "FINAL_VAR": FINAL_VAR,
     "SHOW_VARS": SHOW_VARS,
+    "LazyContext": LazyContext,
+    "chunk_context": chunk_context,
+    "llm_map": llm_map,
 }}
 
 code = base64.b64decode("{code_b64}").decode()
@@ -379,6 +523,7 @@ class DaytonaREPL(IsolatedEnv):
         self.auto_stop_interval = auto_stop_interval
         self.image = image or get_default_image()
         self.lm_handler_address = lm_handler_address
+        self.lm_connection = LMConnection(lm_handler_address) if lm_handler_address else None
 
         self.daytona = None
         self.sandbox = None
@@ -386,7 +531,9 @@ class DaytonaREPL(IsolatedEnv):
         self.broker_url: str | None = None
         self.poller_thread: threading.Thread | None = None
         self.poller_stop = threading.Event()
+        self._request_pool: ThreadPoolExecutor | None = None
         self.pending_llm_calls: list[RLMChatCompletion] = []
+        self._lazy_context: LazyContext | None = None
         self._calls_lock = threading.Lock()
 
         self.setup()
@@ -394,6 +541,7 @@ class DaytonaREPL(IsolatedEnv):
         if context_payload is not None:
             self.load_context(context_payload)
 
+        self.setup_code = setup_code
         if setup_code:
             self.execute_code(setup_code)
 
@@ -441,10 +589,7 @@ class DaytonaREPL(IsolatedEnv):
             ),
         )
 
-        # Wait for broker to be ready
-        time.sleep(3)
-
-        # Get the preview URL for the broker port
+        # Get the preview URL for the broker port and wait for the broker to answer on it
         try:
             preview_info = self.sandbox.get_preview_link(self.BROKER_PORT)
             self.broker_url = preview_info.url
@@ -452,10 +597,13 @@ class DaytonaREPL(IsolatedEnv):
         except Exception:
             self.broker_url = None
             self._preview_token = None
+        if self.broker_url:
+            self._wait_for_broker()
 
         # Start polling thread if we have an LM handler
         if self.lm_handler_address and self.broker_url:
             self.poller_stop.clear()
+            self._request_pool = ThreadPoolExecutor(BROKER_REQUEST_WORKERS)
             self.poller_thread = threading.Thread(target=self._poll_broker, daemon=True)
             self.poller_thread.start()
 
@@ -466,8 +614,49 @@ class DaytonaREPL(IsolatedEnv):
             headers["x-daytona-preview-token"] = self._preview_token
         return headers
 
+    def _wait_for_broker(self, timeout: float = 30.0, interval: float = 0.1):
+        """Poll the broker's health endpoint until it responds."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._broker_healthy():
+                return
+            time.sleep(interval)
+        raise RuntimeError(f"Broker did not become healthy within {timeout}s")
+
+    def _broker_healthy(self) -> bool:
+        try:
+            response = requests.get(
+                f"{self.broker_url}/health", headers=self._get_headers(), timeout=2
+            )
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def reset(self):
+        """Return to a clean namespace for reuse by another completion.
+
+        Deletes the saved REPL state and re-runs setup_code; the sandbox and broker are kept.
+        """
+        self.sandbox.process.exec("rm -f /tmp/rlm_state.dill /tmp/rlm_lazy_context.json")
+        with self._calls_lock:
+            self.pending_llm_calls.clear()
+        self._lazy_context = None
+        if self.setup_code:
+            self.execute_code(self.setup_code)
+
+    def is_healthy(self) -> bool:
+        """The sandbox exists and its broker responds."""
+        if self.sandbox is None:
+            return False
+        return self.broker_url is None or self._broker_healthy()
+
     def _poll_broker(self):
-        """Poll the broker for pending LLM requests and handle them."""
+        """Poll the broker for pending LLM requests and hand each to a worker thread.
+
+        The broker lists a request until it is answered, so requests already being handled
+        are skipped; a request drops out of that set once the broker stops listing it.
+        """
+        handling: set[str] = set()
         while not self.poller_stop.is_set():
             try:
                 # Get pending requests
@@ -478,20 +667,11 @@ class DaytonaREPL(IsolatedEnv):
                 )
                 pending = resp.json().get("pending", [])
 
+                handling &= {item["id"] for item in pending}
                 for item in pending:
-                    request_id = item["id"]
-                    req_data = item["request"]
-
-                    # Handle the request
-                    response = self._handle_llm_request(req_data)
-
-                    # Send response back
-                    requests.post(
-                        f"{self.broker_url}/respond",
-                        headers=self._get_headers(),
-                        json={"id": request_id, "response": response},
-                        timeout=10,
-                    )
+                    if item["id"] not in handling:
+                        handling.add(item["id"])
+                        self._request_pool.submit(self._answer_request, item["id"], item["request"])
 
             except requests.exceptions.RequestException:
                 pass
@@ -500,6 +680,48 @@ class DaytonaREPL(IsolatedEnv):
 
             time.sleep(0.1)
 
+    def _answer_request(self, request_id: str, req_data: dict) -> None:
+        """Handle one broker request on a worker thread and send the response back."""
+        try:
+            if req_data.get("type") == "batched_iter":
+                self._stream_llm_request(request_id, req_data)
+                response = {"done": True}
+            else:
+                response = self._handle_llm_request(req_data)
+
+            requests.post(
+                f"{self.broker_url}/respond",
+                headers=self._get_headers(),
+                json={"id": request_id, "response": response},
+                timeout=10,
+            )
+        except Exception:
+            pass
+
+    def _stream_llm_request(self, request_id: str, req_data: dict) -> None:
+        """Forward a streamed batch to the LM handler, posting each result to the broker."""
+        for index, resp in send_lm_request_batched_iter(
+            self.lm_handler_address,
+            req_data.get("prompts", []),
+            model=req_data.get("model"),
+            depth=self.depth,
+            budget_id=self.budget_id,
+            connection=self.lm_connection,
+            compact=True,
+        ):
+            if not resp.success:
+                item = {"index": index, "error": resp.error}
+            else:
+                with self._calls_lock:
+                    self.pending_llm_calls.append(resp.chat_completion)
+                item = {"index": index, "response": resp.chat_completion.response}
+            requests.post(
+                f"{self.broker_url}/respond_partial",
+                headers=self._get_headers(),
+                json={"id": request_id, "item": item},
+                timeout=10,
+            )
+
     def _handle_llm_request(self, req_data: dict) -> dict:
         """Handle an LLM request from the sandbox."""
         req_type = req_data.get("type")
@@ -507,8 +729,16 @@ class DaytonaREPL(IsolatedEnv):
 
         if req_type == "single":
             prompt = req_data.get("prompt")
-            request = LMRequest(prompt=prompt, model=model, depth=self.depth)
-            response = send_lm_request(self.lm_handler_address, request)
+            request = LMRequest(
+                prompt=prompt,
+                model=model,
+                depth=self.depth,
+                budget_id=self.budget_id,
+                compact=True,
+            )
+            response = send_lm_request(
+                self.lm_handler_address, request, connection=self.lm_connection
+            )
 
             if not response.success:
                 return {"error": response.error}
@@ -517,12 +747,22 @@ class DaytonaREPL(IsolatedEnv):
             with self._calls_lock:
                 self.pending_llm_calls.append(response.chat_completion)
 
-            return {"response": response.chat_completion.response}
+            input_tokens, output_tokens = response.chat_completion.usage_summary.token_totals()
+            return {
+                "response": response.chat_completion.response,
+                "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+            }
 
         elif req_type == "batched":
             prompts = req_data.get("prompts", [])
             responses = send_lm_request_batched(
-                self.lm_handler_address, prompts, model=model, depth=self.depth
+                self.lm_handler_address,
+                prompts,
+                model=model,
+                depth=self.depth,
+                budget_id=self.budget_id,
+                connection=self.lm_connection,
+                compact=True,
             )
 
             results = []
@@ -536,11 +776,26 @@ class DaytonaREPL(IsolatedEnv):
 
             return {"responses": results}
 
+        elif req_type == "context":
+            if self._lazy_context is None:
+                return {"error": "No lazy context loaded"}
+            return {"chunks": self._lazy_context.chunks(req_data["start"], req_data["stop"])}
+
         return {"error": "Unknown request type"}
 
-    def load_context(self, context_payload: dict | list | str):
-        """Load context into the sandbox environment."""
-        if isinstance(context_payload, str):
+    def load_context(self, context_payload: dict | list | str | LazyContext):
+        """Load context into the sandbox environment.
+
+        A LazyContext stays on the host; the sandbox fetches its chunks through the broker.
+        """
+        if isinstance(context_payload, LazyContext):
+            self._lazy_context = context_payload
+            metadata = json.dumps(context_payload.metadata())
+            context_code = (
+                f"with open(LAZY_CONTEXT_FILE, 'w') as f:\n    f.write({metadata!r})\n"
+                "context = LazyContext.from_host()"
+            )
+        elif isinstance(context_payload, str):
             escaped = context_payload.replace("\\", "\\\\").replace('"""', '\\"\\"\\"')
             context_code = f'context = """{escaped}"""'
         else:
@@ -611,6 +866,13 @@ class DaytonaREPL(IsolatedEnv):
             self.poller_stop.set()
             self.poller_thread.join(timeout=2)
             self.poller_thread = None
+        if self._request_pool is not None:
+            self._request_pool.shutdown(wait=False, cancel_futures=True)
+            self._request_pool = None
+
+        if getattr(self, "lm_connection", None) is not None:
+            self.lm_connection.close()
+            self.lm_connection = None
 
         # Delete the broker session
         if self.sandbox is not None:
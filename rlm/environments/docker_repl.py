@@ -5,30 +5,46 @@ Setup:
     docker build -t rlm-sandbox -f Dockerfile.sandbox .
 
 Or use any Python 3.11+ image with: pip install dill requests
+(if they are missing, DockerREPL installs them in each new container; with
+cache_dependencies_image=True it installs them once and snapshots the result as a local image).
 """
 
 import base64
 import json
 import os
+import re
+import shutil
 import subprocess
 import tempfile
 import textwrap
 import threading
 import time
-from http.server import BaseHTTPRequestHandler, HTTPServer
-
-from rlm.core.comms_utils import LMRequest, send_lm_request, send_lm_request_batched
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rlm.core.comms_utils import (
+    LMConnection,
+    LMRequest,
+    LMResponse,
+    send_lm_request,
+    send_lm_request_batched,
+    send_lm_request_batched_iter,
+)
+from rlm.core.lazy_context import SANDBOX_LAZY_CONTEXT, LazyContext
 from rlm.core.types import REPLResult, RLMChatCompletion
 from rlm.environments.base_env import NonIsolatedEnv
+from rlm.utils import chunking, map_reduce
 
 
 class LLMProxyHandler(BaseHTTPRequestHandler):
     """HTTP handler for LLM requests from the container."""
 
     lm_handler_address: tuple[str, int] | None = None
+    lm_connection: LMConnection | None = None
     pending_calls: list[RLMChatCompletion] = []
     lock: threading.Lock = threading.Lock()
     depth: int = 1
+    budget_id: str | None = None
+    lazy_context: LazyContext | None = None
 
     def log_message(self, *args):
         pass
@@ -40,6 +56,11 @@ class LLMProxyHandler(BaseHTTPRequestHandler):
             result = self._handle_single(body)
         elif self.path == "/llm_query_batched":
             result = self._handle_batched(body)
+        elif self.path == "/llm_query_batched_iter":
+            self._stream_batched(body)
+            return
+        elif self.path == "/context":
+            result = self._handle_context(body)
         else:
             self._respond(404, {"error": "Not found"})
             return
@@ -56,8 +77,14 @@ class LLMProxyHandler(BaseHTTPRequestHandler):
         if not self.lm_handler_address:
             return {"error": "No LM handler configured"}
 
-        request = LMRequest(prompt=body.get("prompt"), model=body.get("model"), depth=self.depth)
-        response = send_lm_request(self.lm_handler_address, request)
+        request = LMRequest(
+            prompt=body.get("prompt"),
+            model=body.get("model"),
+            depth=self.depth,
+            budget_id=self.budget_id,
+            compact=True,
+        )
+        response = send_lm_request(self.lm_handler_address, request, connection=self.lm_connection)
 
         if not response.success:
             return {"error": response.error}
@@ -65,7 +92,16 @@ class LLMProxyHandler(BaseHTTPRequestHandler):
         with self.lock:
             self.pending_calls.append(response.chat_completion)
 
-        return {"response": response.chat_completion.response}
+        input_tokens, output_tokens = response.chat_completion.usage_summary.token_totals()
+        return {
+            "response": response.chat_completion.response,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+
+    def _handle_context(self, body: dict) -> dict:
+        if self.lazy_context is None:
+            return {"error": "No lazy context loaded"}
+        return {"chunks": self.lazy_context.chunks(body["start"], body["stop"])}
 
     def _handle_batched(self, body: dict) -> dict:
         if not self.lm_handler_address:
@@ -73,7 +109,13 @@ class LLMProxyHandler(BaseHTTPRequestHandler):
 
         prompts = body.get("prompts", [])
         responses = send_lm_request_batched(
-            self.lm_handler_address, prompts, model=body.get("model"), depth=self.depth
+            self.lm_handler_address,
+            prompts,
+            model=body.get("model"),
+            depth=self.depth,
+            budget_id=self.budget_id,
+            connection=self.lm_connection,
+            compact=True,
         )
 
         results = []
@@ -87,6 +129,49 @@ class LLMProxyHandler(BaseHTTPRequestHandler):
 
         return {"responses": results}
 
+    def _stream_batched(self, body: dict) -> None:
+        """Stream one JSON line per prompt ({"index", "response"} or {"index", "error"})."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+        prompts = body.get("prompts", [])
+        if not self.lm_handler_address:
+            results = (
+                (i, LMResponse.error_response("No LM handler configured"))
+                for i in range(len(prompts))
+            )
+        else:
+            results = send_lm_request_batched_iter(
+                self.lm_handler_address,
+                prompts,
+                model=body.get("model"),
+                depth=self.depth,
+                budget_id=self.budget_id,
+                connection=self.lm_connection,
+                compact=True,
+            )
+
+        for index, resp in results:
+            if not resp.success:
+                line = {"index": index, "error": resp.error}
+            else:
+                with self.lock:
+                    self.pending_calls.append(resp.chat_completion)
+                line = {"index": index, "response": resp.chat_completion.response}
+            self.wfile.write(json.dumps(line).encode() + b"\n")
+            self.wfile.flush()
+
+
+_REQUIRED_PACKAGES = ["dill", "requests"]
+_images_lock = threading.Lock()
+_ready_images: dict[str, str] = {}  # requested image -> image that has the packages
+
+
+def _deps_image_tag(image: str) -> str:
+    """Local tag for `image` with the exec script's packages installed."""
+    return "rlm-repl-deps:" + re.sub(r"[^A-Za-z0-9_.-]", "-", image)[:128]
+
 
 def _build_exec_script(code: str, proxy_port: int, depth: int = 1) -> str:
     """Build execution script for the container."""
@@ -103,13 +188,20 @@ except ImportError:
 PROXY = "http://host.docker.internal:{proxy_port}"
 STATE = "/workspace/state.dill"
 
-def llm_query(prompt, model=None):
+def _llm_query_usage(prompt, model=None):
+    # (response, input tokens, output tokens); usage is None when the query failed
     try:
         r = requests.post(f"{{PROXY}}/llm_query", json={{"prompt": prompt, "model": model, "depth": {depth}}}, timeout=300)
         d = r.json()
-        return d.get("response") or f"Error: {{d.get('error')}}"
+        if not d.get("response"):
+            return f"Error: {{d.get('error')}}", None, None
+        usage = d.get("usage") or {{}}
+        return d["response"], usage.get("input_tokens"), usage.get("output_tokens")
     except Exception as e:
-        return f"Error: {{e}}"
+        return f"Error: {{e}}", None, None
+
+def llm_query(prompt, model=None):
+    return _llm_query_usage(prompt, model)[0]
 
 def llm_query_batched(prompts, model=None):
     try:
@@ -119,6 +211,43 @@ def llm_query_batched(prompts, model=None):
     except Exception as e:
         return [f"Error: {{e}}"] * len(prompts)
 
+def llm_query_batched_iter(prompts, model=None):
+    done = set()
+    try:
+        with requests.post(f"{{PROXY}}/llm_query_batched_iter", json={{"prompts": prompts, "model": model, "depth": {depth}}}, stream=True, timeout=300) as r:
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                d = json.loads(line)
+                done.add(d["index"])
+                yield d["index"], d["response"] if "response" in d else f"Error: {{d.get('error')}}"
+    except Exception as e:
+        for i in range(len(prompts)):
+            if i not in done:
+                yield i, f"Error: {{e}}"
+
+LAZY_CONTEXT_FILE = "/workspace/lazy_context.json"
+
+def _fetch_context(start, stop):
+    r = requests.post(f"{{PROXY}}/context", json={{"start": start, "stop": stop}}, timeout=300)
+    d = r.json()
+    if "chunks" not in d:
+        raise RuntimeError(f"Could not fetch context chunks: {{d.get('error')}}")
+    return d["chunks"]
+{SANDBOX_LAZY_CONTEXT}
+{chunking.sandbox_source()}
+def chunk_context(max_tokens=DEFAULT_MAX_TOKENS, overlap=0, boundary="paragraph", context=None):
+    if context is None:
+        if "context" not in combined:
+            raise ValueError("No context loaded")
+        context = combined["context"]
+    return chunk_documents(context, max_tokens, overlap, boundary)
+{map_reduce.sandbox_source()}
+def llm_map(prompt_template, items, reduce=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, reduce_max_tokens=DEFAULT_REDUCE_MAX_TOKENS, model=None, progress=True):
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        return map_reduce(lambda prompt: pool.submit(_llm_query_usage, prompt, model), lambda future: future.result(), prompt_template, items, reduce, max_concurrency, reduce_max_tokens, progress)
+
 def load_state():
     if os.path.exists(STATE):
         try:
@@ -129,7 +258,7 @@ def load_state():
     return {{}}
 
 def save_state(s):
-    clean = {{k: v for k, v in s.items() if not k.startswith("_")}}
+    clean = {{k: _persistable(v) for k, v in s.items() if not k.startswith("_")}}
     for k in list(clean.keys()):
         try:
             dill.dumps(clean[k])
@@ -138,7 +267,7 @@ def save_state(s):
     with open(STATE, "wb") as f:
         dill.dump(clean, f)
 
-_locals = load_state()
+_locals = _restore_lazy_contexts(load_state())
 
 def FINAL_VAR(name):
     name = name.strip().strip("\\"\\'")
@@ -155,7 +284,7 @@ def SHOW_VARS():
         return "No variables created yet. Use ```repl``` blocks to create variables."
     return f"Available variables: {{available}}"
 
-_globals = {{"__builtins__": __builtins__, "__name__": "__main__", "llm_query": llm_query, "llm_query_batched": llm_query_batched, "FINAL_VAR": FINAL_VAR, "SHOW_VARS": SHOW_VARS}}
+_globals = {{"__builtins__": __builtins__, "__name__": "__main__", "llm_query": llm_query, "llm_query_batched": llm_query_batched, "llm_query_batched_iter": llm_query_batched_iter, "FINAL_VAR": FINAL_VAR, "SHOW_VARS": SHOW_VARS, "LazyContext": LazyContext, "chunk_context": chunk_context, "llm_map": llm_map}}
 
 code = base64.b64decode("{code_b64}").decode()
 stdout_buf, stderr_buf = io.StringIO(), io.StringIO()
@@ -194,6 +323,7 @@ class DockerREPL(NonIsolatedEnv):
         setup_code: str | None = None,
         persistent: bool = False,
         depth: int = 1,
+        cache_dependencies_image: bool = False,
         **kwargs,
     ):
         if persistent:
@@ -203,9 +333,13 @@ class DockerREPL(NonIsolatedEnv):
         super().__init__(persistent=persistent, depth=depth, **kwargs)
 
         self.image = image
+        # Snapshot a container with the packages installed as a local image (left on the
+        # host), so later containers skip the install
+        self.cache_dependencies_image = cache_dependencies_image
         self.lm_handler_address = lm_handler_address
+        self.lm_connection = LMConnection(lm_handler_address) if lm_handler_address else None
         self.container_id: str | None = None
-        self.proxy_server: HTTPServer | None = None
+        self.proxy_server: ThreadingHTTPServer | None = None
         self.proxy_thread: threading.Thread | None = None
         self.proxy_port: int = 0
         base_dir = os.environ.get(
@@ -220,9 +354,21 @@ class DockerREPL(NonIsolatedEnv):
 
         if context_payload:
             self.load_context(context_payload)
+        self.setup_code = setup_code
         if setup_code:
             self.execute_code(setup_code)
 
+    @property
+    def budget_id(self) -> str | None:
+        return self._budget_id
+
+    @budget_id.setter
+    def budget_id(self, value: str | None) -> None:
+        # The proxy handler class forwards sub-calls, so it carries the budget too
+        self._budget_id = value
+        if getattr(self, "_proxy_handler", None) is not None:
+            self._proxy_handler.budget_id = value
+
     def setup(self):
         """Start the proxy server and Docker container."""
         # Start LLM proxy server
@@ -231,17 +377,29 @@ class DockerREPL(NonIsolatedEnv):
             (LLMProxyHandler,),
             {
                 "lm_handler_address": self.lm_handler_address,
+                "lm_connection": self.lm_connection,
                 "pending_calls": self.pending_calls,
                 "lock": self._calls_lock,
                 "depth": self.depth,
+                "budget_id": self.budget_id,
+                "lazy_context": None,
             },
         )
-        self.proxy_server = HTTPServer(("127.0.0.1", 0), handler)
+        self._proxy_handler = handler
+        self.proxy_server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
         self.proxy_port = self.proxy_server.server_address[1]
         self.proxy_thread = threading.Thread(target=self.proxy_server.serve_forever, daemon=True)
         self.proxy_thread.start()
 
-        # Start Docker container
+        # Start Docker container, from a cached image with the dependencies if there is one
+        with _images_lock:
+            image = _ready_images.get(self.image)
+        if (
+            image is None
+            and self.cache_dependencies_image
+            and self._image_exists(_deps_image_tag(self.image))
+        ):
+            image = _deps_image_tag(self.image)
         result = subprocess.run(
             [
                 "docker",
@@ -252,7 +410,7 @@ class DockerREPL(NonIsolatedEnv):
                 f"{self.temp_dir}:/workspace",
                 "--add-host",
                 "host.docker.internal:host-gateway",
-                self.image,
+                image or self.image,
                 "tail",
                 "-f",
                 "/dev/null",
@@ -264,16 +422,83 @@ class DockerREPL(NonIsolatedEnv):
             raise RuntimeError(f"Failed to start container: {result.stderr}")
 
         self.container_id = result.stdout.strip()
+        if image is None:
+            image = self._ensure_dependencies()
+        if image is not None:
+            with _images_lock:
+                _ready_images[self.image] = image
+
+    @staticmethod
+    def _image_exists(image: str) -> bool:
+        result = subprocess.run(["docker", "image", "inspect", image], capture_output=True)
+        return result.returncode == 0
+
+    def _ensure_dependencies(self) -> str | None:
+        """Install the exec script's packages in this container if the image lacks them.
+
+        Returns an image that has the packages, for later containers to start from: the image
+        itself if it already had them, a snapshot of this container if
+        cache_dependencies_image is set, else None (each container installs its own).
+        """
+        check = subprocess.run(
+            ["docker", "exec", self.container_id, "python", "-c", "import dill, requests"],
+            capture_output=True,
+        )
+        if check.returncode == 0:
+            return self.image
 
-        # Install dependencies
         subprocess.run(
-            ["docker", "exec", self.container_id, "pip", "install", "-q", "dill", "requests"],
+            ["docker", "exec", self.container_id, "pip", "install", "-q", *_REQUIRED_PACKAGES],
             capture_output=True,
         )
+        if not self.cache_dependencies_image:
+            return None
+        tag = _deps_image_tag(self.image)
+        committed = subprocess.run(
+            ["docker", "commit", self.container_id, tag], capture_output=True
+        )
+        return tag if committed.returncode == 0 else None
+
+    def reset(self):
+        """Return to a clean namespace for reuse by another completion.
 
-    def load_context(self, context_payload: dict | list | str):
-        """Load context by writing to a file in the mounted workspace."""
-        if isinstance(context_payload, str):
+        Removes the saved REPL state and context files and re-runs setup_code; the container
+        and proxy are kept.
+        """
+        with self._calls_lock:
+            self.pending_calls.clear()
+        self._proxy_handler.lazy_context = None
+        for name in os.listdir(self.temp_dir):
+            path = os.path.join(self.temp_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        if self.setup_code:
+            self.execute_code(self.setup_code)
+
+    def is_healthy(self) -> bool:
+        """The container is running and the LLM proxy is serving."""
+        if not self.container_id or self.proxy_thread is None or not self.proxy_thread.is_alive():
+            return False
+        result = subprocess.run(
+            ["docker", "inspect", "-f", "{{.State.Running}}", self.container_id],
+            capture_output=True,
+            text=True,
+        )
+        return result.returncode == 0 and result.stdout.strip() == "true"
+
+    def load_context(self, context_payload: dict | list | str | LazyContext):
+        """Load context by writing to a file in the mounted workspace.
+
+        A LazyContext stays on the host; the container fetches its chunks through the proxy.
+        """
+        if isinstance(context_payload, LazyContext):
+            self._proxy_handler.lazy_context = context_payload
+            with open(os.path.join(self.temp_dir, "lazy_context.json"), "w") as f:
+                json.dump(context_payload.metadata(), f)
+            self.execute_code("context = LazyContext.from_host()")
+        elif isinstance(context_payload, str):
             context_path = os.path.join(self.temp_dir, "context.txt")
             with open(context_path, "w") as f:
                 f.write(context_payload)
@@ -331,9 +556,10 @@ class DockerREPL(NonIsolatedEnv):
         if hasattr(self, "proxy_server") and self.proxy_server:
             self.proxy_server.shutdown()
             self.proxy_server = None
+        if getattr(self, "lm_connection", None) is not None:
+            self.lm_connection.close()
+            self.lm_connection = None
         if hasattr(self, "temp_dir") and os.path.exists(self.temp_dir):
-            import shutil
-
             shutil.rmtree(self.temp_dir, ignore_errors=True)
 
     def __enter__(self):
@@ -1,6 +1,5 @@
 import copy
 import io
-import json
 import os
 import shutil
 import sys
@@ -8,12 +7,26 @@ import tempfile
 import threading
 import time
 import uuid
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from contextlib import contextmanager
 from typing import Any
 
-from rlm.core.comms_utils import LMRequest, send_lm_request, send_lm_request_batched
+from rlm.core.comms_utils import (
+    LMConnection,
+    LMRequest,
+    LMResponse,
+    send_lm_request,
+    send_lm_request_batched,
+    send_lm_request_batched_iter,
+)
+from rlm.core.lazy_context import LazyContext
+from rlm.core.mapped_text import MappedText
 from rlm.core.types import REPLResult, RLMChatCompletion
 from rlm.environments.base_env import NonIsolatedEnv
+from rlm.utils.chunking import DEFAULT_MAX_TOKENS, Chunk, chunk_documents
+from rlm.utils.context_search import SearchIndexCache
+from rlm.utils.map_reduce import DEFAULT_MAX_CONCURRENCY, DEFAULT_REDUCE_MAX_TOKENS, map_reduce
 
 # =============================================================================
 # Safe Builtins
@@ -112,6 +125,105 @@ _SAFE_BUILTINS = {
 }
 
 
+# =============================================================================
+# Per-thread output capture and working directory
+# =============================================================================
+
+
+class _ThreadLocalStream:
+    """Routes writes to the current thread's capture buffer, or to the wrapped stream."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def _target(self):
+        buffer = getattr(self.local, "buffer", None)
+        return buffer if buffer is not None else self.stream
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+_capture_lock = threading.Lock()
+_capture_count = 0
+_capture_streams: tuple[_ThreadLocalStream, _ThreadLocalStream] | None = None
+
+_cwd_lock = threading.Lock()
+_cwd_local = threading.local()
+
+
+@contextmanager
+def _capture_output():
+    """Capture this thread's stdout/stderr, leaving other threads' output untouched.
+
+    While any capture is active, sys.stdout/sys.stderr are routers that send each thread's
+    writes to its own buffer, so concurrent executions (e.g. RLM.acompletion) stay separate.
+    """
+    global _capture_count, _capture_streams
+    with _capture_lock:
+        if _capture_count == 0:
+            _capture_streams = (_ThreadLocalStream(sys.stdout), _ThreadLocalStream(sys.stderr))
+            sys.stdout, sys.stderr = _capture_streams
+        _capture_count += 1
+        streams = _capture_streams
+
+    buffers = (io.StringIO(), io.StringIO())
+    previous = [getattr(stream.local, "buffer", None) for stream in streams]
+    for stream, buffer in zip(streams, buffers, strict=True):
+        stream.local.buffer = buffer
+    try:
+        yield buffers
+    finally:
+        for stream, buffer in zip(streams, previous, strict=True):
+            stream.local.buffer = buffer
+        with _capture_lock:
+            _capture_count -= 1
+            if _capture_count == 0:
+                sys.stdout, sys.stderr = streams[0].stream, streams[1].stream
+                _capture_streams = None
+
+
+@contextmanager
+def _working_dir(path: str):
+    """Run in `path`. The cwd is process-wide, so only one execution holds it at a time."""
+    outer = getattr(_cwd_local, "path", None)
+    if outer is None:
+        _cwd_lock.acquire()
+        _cwd_local.original = os.getcwd()
+    _cwd_local.path = path
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        _cwd_local.path = outer
+        os.chdir(outer if outer is not None else _cwd_local.original)
+        if outer is None:
+            _cwd_lock.release()
+
+
+@contextmanager
+def _working_dir_released():
+    """Hand the cwd to other executions while this thread blocks on a sub-call."""
+    path = getattr(_cwd_local, "path", None)
+    if path is None:
+        yield
+        return
+    os.chdir(_cwd_local.original)
+    _cwd_lock.release()
+    try:
+        yield
+    finally:
+        _cwd_lock.acquire()
+        os.chdir(path)
+
+
 class LocalREPL(NonIsolatedEnv):
     """
     Local REPL environment with persistent Python namespace.
@@ -121,18 +233,26 @@ class LocalREPL(NonIsolatedEnv):
     def __init__(
         self,
         lm_handler_address: tuple[str, int] | None = None,
-        context_payload: dict | list | str | None = None,
+        context_payload: dict | list | str | MappedText | LazyContext | None = None,
         setup_code: str | None = None,
         persistent: bool = False,
         depth: int = 1,
+        share_context: bool = False,
         **kwargs,
     ):
         super().__init__(persistent=persistent, depth=depth, **kwargs)
 
+        # Bind dict and list contexts without copying; REPL code can then mutate the caller's
+        # objects
+        self.share_context = share_context
+
         self.lm_handler_address = lm_handler_address
+        self._lm_connection: LMConnection | None = None
+        self._connection_lock = threading.Lock()
+        # Indexes for search_context / grep_context; they hold their contexts until cleanup
+        self._search_indexes = SearchIndexCache()
         self.original_cwd = os.getcwd()
         self.temp_dir = tempfile.mkdtemp(prefix=f"repl_env_{uuid.uuid4()}_")
-        self._lock = threading.Lock()
         self._context_count: int = 0
         self._history_count: int = 0
 
@@ -144,6 +264,7 @@ class LocalREPL(NonIsolatedEnv):
             self.load_context(context_payload)
 
         # Run setup code if provided
+        self.setup_code = setup_code
         if setup_code:
             self.execute_code(setup_code)
 
@@ -156,14 +277,38 @@ class LocalREPL(NonIsolatedEnv):
         }
         self.locals: dict[str, Any] = {}
 
-        # Track LLM calls made during code execution
+        # Track LLM calls made during code execution (per thread for parallel blocks)
         self._pending_llm_calls: list[RLMChatCompletion] = []
+        self._calls_local = threading.local()
 
         # Add helper functions
         self.globals["FINAL_VAR"] = self._final_var
         self.globals["SHOW_VARS"] = self._show_vars
         self.globals["llm_query"] = self._llm_query
         self.globals["llm_query_batched"] = self._llm_query_batched
+        self.globals["llm_query_batched_iter"] = self._llm_query_batched_iter
+        self.globals["search_context"] = self._search_context
+        self.globals["grep_context"] = self._grep_context
+        self.globals["chunk_context"] = self._chunk_context
+        self.globals["llm_map"] = self._llm_map
+
+    def reset(self):
+        """Return to a clean namespace for reuse by another completion.
+
+        Clears contexts, histories and the temp directory, then re-runs setup_code; the LM
+        connection is kept.
+        """
+        self.setup()
+        self._context_count = 0
+        self._history_count = 0
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        os.makedirs(self.temp_dir, exist_ok=True)
+        if self.setup_code:
+            self.execute_code(self.setup_code)
+
+    def is_healthy(self) -> bool:
+        """Usable as long as it has not been cleaned up."""
+        return os.path.isdir(self.temp_dir) and "llm_query" in self.globals
 
     def _final_var(self, variable_name: str) -> str:
         """Return the value of a variable as a final answer."""
@@ -192,38 +337,104 @@ class LocalREPL(NonIsolatedEnv):
             return "No variables created yet. Use ```repl``` blocks to create variables."
         return f"Available variables: {available}"
 
-    def _llm_query(self, prompt: str, model: str | None = None) -> str:
+    def _context_argument(self, context: Any) -> Any:
+        if context is not None:
+            return context
+        if "context" not in self.locals:
+            raise ValueError("No context loaded")
+        return self.locals["context"]
+
+    def _search_context(self, query: str, k: int = 10, context: Any = None) -> list[dict]:
+        """BM25 keyword search over `context` (or the given value).
+
+        Returns the k best passages as dicts with score, key (list index or dict key of the
+        document), start, end and text. The index is built on the first search and cached
+        per context until cleanup().
+        """
+        return self._search_indexes.get(self._context_argument(context)).search(query, k)
+
+    def _grep_context(
+        self, pattern: str, max_results: int = 100, flags: int = 0, context: Any = None
+    ) -> list[dict]:
+        """Regex search over `context` (or the given value), narrowed by the search index.
+
+        Returns matches in order as dicts with match, key, start, end and the passage text.
+        """
+        index = self._search_indexes.get(self._context_argument(context))
+        return index.grep(pattern, max_results, flags)
+
+    def _chunk_context(
+        self,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        overlap: int = 0,
+        boundary: str = "paragraph",
+        context: Any = None,
+    ) -> list[Chunk]:
+        """Split `context` (or the given value) into chunks of at most about `max_tokens` tokens.
+
+        Chunks end at a "paragraph", "header" or "line" boundary; small documents of a list or
+        dict are packed together. Each chunk is a view that formats as its text.
+        """
+        return chunk_documents(self._context_argument(context), max_tokens, overlap, boundary)
+
+    def _get_lm_connection(self) -> LMConnection:
+        """Return the long-lived connection to the LM handler, creating it on first use."""
+        with self._connection_lock:
+            if self._lm_connection is None:
+                self._lm_connection = LMConnection(self.lm_handler_address)
+            return self._lm_connection
+
+    def _record_call(self, chat_completion: RLMChatCompletion) -> None:
+        """Attribute a sub-call to the code block running on this thread."""
+        calls = getattr(self._calls_local, "calls", None)
+        (self._pending_llm_calls if calls is None else calls).append(chat_completion)
+
+    def _llm_query(
+        self, prompt: str, model: str | None = None, deadline: float | None = None
+    ) -> str:
         """Query the LM via socket connection to the handler.
 
         Args:
             prompt: The prompt to send to the LM.
             model: Optional model name to use (if handler has multiple clients).
+            deadline: Optional time budget in seconds; a late call returns an error string.
         """
         if not self.lm_handler_address:
             return "Error: No LM handler configured"
 
         try:
-            request = LMRequest(prompt=prompt, model=model, depth=self.depth)
-            response = send_lm_request(self.lm_handler_address, request)
+            request = LMRequest(
+                prompt=prompt,
+                model=model,
+                depth=self.depth,
+                budget_id=self.budget_id,
+                compact=True,
+                deadline=deadline,
+            )
+            with _working_dir_released():
+                response = send_lm_request(
+                    self.lm_handler_address, request, connection=self._get_lm_connection()
+                )
 
             if not response.success:
                 return f"Error: {response.error}"
 
             # Track this LLM call
-            self._pending_llm_calls.append(
-                response.chat_completion,
-            )
+            self._record_call(response.chat_completion)
 
             return response.chat_completion.response
         except Exception as e:
             return f"Error: LM query failed - {e}"
 
-    def _llm_query_batched(self, prompts: list[str], model: str | None = None) -> list[str]:
+    def _llm_query_batched(
+        self, prompts: list[str], model: str | None = None, deadline: float | None = None
+    ) -> list[str]:
         """Query the LM with multiple prompts concurrently.
 
         Args:
             prompts: List of prompts to send to the LM.
             model: Optional model name to use (if handler has multiple clients).
+            deadline: Optional time budget in seconds for the whole batch.
 
         Returns:
             List of responses in the same order as input prompts.
@@ -232,9 +443,17 @@ class LocalREPL(NonIsolatedEnv):
             return ["Error: No LM handler configured"] * len(prompts)
 
         try:
-            responses = send_lm_request_batched(
-                self.lm_handler_address, prompts, model=model, depth=self.depth
-            )
+            with _working_dir_released():
+                responses = send_lm_request_batched(
+                    self.lm_handler_address,
+                    prompts,
+                    model=model,
+                    depth=self.depth,
+                    budget_id=self.budget_id,
+                    connection=self._get_lm_connection(),
+                    compact=True,
+                    deadline=deadline,
+                )
 
             results = []
             for response in responses:
@@ -242,23 +461,123 @@ class LocalREPL(NonIsolatedEnv):
                     results.append(f"Error: {response.error}")
                 else:
                     # Track this LLM call in list of all calls -- we may want to do this hierarchically
-                    self._pending_llm_calls.append(response.chat_completion)
+                    self._record_call(response.chat_completion)
                     results.append(response.chat_completion.response)
 
             return results
         except Exception as e:
             return [f"Error: LM query failed - {e}"] * len(prompts)
 
-    def load_context(self, context_payload: dict | list | str):
+    def _llm_query_batched_iter(
+        self, prompts: list[str], model: str | None = None, deadline: float | None = None
+    ) -> Iterator[tuple[int, str]]:
+        """Query the LM with multiple prompts concurrently, yielding results as they finish.
+
+        Args:
+            prompts: List of prompts to send to the LM.
+            model: Optional model name to use (if handler has multiple clients).
+            deadline: Optional time budget in seconds per prompt.
+
+        Yields:
+            (index, response) pairs in completion order, one per prompt.
+        """
+        if not self.lm_handler_address:
+            for i in range(len(prompts)):
+                yield i, "Error: No LM handler configured"
+            return
+
+        responses = send_lm_request_batched_iter(
+            self.lm_handler_address,
+            prompts,
+            model=model,
+            depth=self.depth,
+            budget_id=self.budget_id,
+            connection=self._get_lm_connection(),
+            compact=True,
+            deadline=deadline,
+        )
+        while True:
+            with _working_dir_released():
+                item = next(responses, None)
+            if item is None:
+                return
+            index, response = item
+            if not response.success:
+                yield index, f"Error: {response.error}"
+            else:
+                self._record_call(response.chat_completion)
+                yield index, response.chat_completion.response
+
+    def _llm_map(
+        self,
+        prompt_template: str | Callable[[Any], str],
+        items: Iterable[Any],
+        reduce: str | Callable[[list[str]], str] | None = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        reduce_max_tokens: int = DEFAULT_REDUCE_MAX_TOKENS,
+        model: str | None = None,
+        progress: bool = True,
+    ) -> list[str] | str:
+        """Query the LM once per item, optionally reducing the results as a tree.
+
+        Prompts are sent over the handler connection as slots free up, with at most
+        `max_concurrency` in flight, and each stage prints its progress and token usage.
+        See rlm.utils.map_reduce.map_reduce.
+
+        Returns:
+            The responses in item order, or the final reduced response if `reduce` is given.
+        """
+
+        def submit(prompt: str) -> Future:
+            if not self.lm_handler_address:
+                raise RuntimeError("No LM handler configured")
+            request = LMRequest(
+                prompt=prompt, model=model, depth=self.depth, budget_id=self.budget_id, compact=True
+            )
+            return self._get_lm_connection().submit(request.to_dict())
+
+        def collect(future: Future) -> tuple[str, int | None, int | None]:
+            response = LMResponse.from_dict(future.result())
+            if not response.success:
+                return f"Error: {response.error}", 0, 0
+            self._record_call(response.chat_completion)
+            return (
+                response.chat_completion.response,
+                *response.chat_completion.usage_summary.token_totals(),
+            )
+
+        def wait_for(futures: set[Future]) -> set[Future]:
+            timeout = self._get_lm_connection().timeout
+            with _working_dir_released():
+                return wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)[0]
+
+        return map_reduce(
+            submit,
+            collect,
+            prompt_template,
+            items,
+            reduce=reduce,
+            max_concurrency=max_concurrency,
+            reduce_max_tokens=reduce_max_tokens,
+            progress=progress,
+            wait_for=wait_for,
+        )
+
+    def load_context(self, context_payload: dict | list | str | MappedText | LazyContext):
         """Load context into the environment as context_0 (and 'context' alias)."""
         self.add_context(context_payload, 0)
 
     def add_context(
-        self, context_payload: dict | list | str, context_index: int | None = None
+        self,
+        context_payload: dict | list | str | MappedText | LazyContext,
+        context_index: int | None = None,
     ) -> int:
         """
         Add a context with versioned variable name.
 
+        Strings, MappedText and LazyContext are read-only and bound as-is. Dicts and lists are
+        bound as-is when share_context is set, and deep-copied otherwise.
+
         Args:
             context_payload: The context data to add
             context_index: Optional explicit index. If None, auto-increments.
@@ -271,30 +590,28 @@ class LocalREPL(NonIsolatedEnv):
 
         var_name = f"context_{context_index}"
 
-        if isinstance(context_payload, str):
-            context_path = os.path.join(self.temp_dir, f"context_{context_index}.txt")
-            with open(context_path, "w") as f:
-                f.write(context_payload)
-            self.execute_code(f"with open(r'{context_path}', 'r') as f:\n    {var_name} = f.read()")
-        else:
-            context_path = os.path.join(self.temp_dir, f"context_{context_index}.json")
-            with open(context_path, "w") as f:
-                json.dump(context_payload, f)
-            self.execute_code(
-                f"import json\nwith open(r'{context_path}', 'r') as f:\n    {var_name} = json.load(f)"
-            )
+        read_only = isinstance(context_payload, str | MappedText | LazyContext)
+        if not read_only and not self.share_context:
+            context_payload = copy.deepcopy(context_payload)
+        self.locals[var_name] = context_payload
 
         # Alias context_0 as 'context' for backward compatibility
         if context_index == 0:
-            self.execute_code(f"context = {var_name}")
+            self.locals["context"] = context_payload
 
         self._context_count = max(self._context_count, context_index + 1)
         return context_index
 
     def update_handler_address(self, address: tuple[str, int]) -> None:
         """Update the LM handler address for a new completion call."""
+        self._close_lm_connection()
         self.lm_handler_address = address
 
+    def _close_lm_connection(self) -> None:
+        if getattr(self, "_lm_connection", None) is not None:
+            self._lm_connection.close()
+            self._lm_connection = None
+
     def get_context_count(self) -> int:
         """Return the number of contexts loaded."""
         return self._context_count
@@ -331,44 +648,72 @@ class LocalREPL(NonIsolatedEnv):
         """Return the number of conversation histories stored."""
         return self._history_count
 
-    @contextmanager
-    def _capture_output(self):
-        """Thread-safe context manager to capture stdout/stderr."""
-        with self._lock:
-            old_stdout, old_stderr = sys.stdout, sys.stderr
-            stdout_buf, stderr_buf = io.StringIO(), io.StringIO()
+    def execute_code(self, code: str) -> REPLResult:
+        """Execute code in the persistent namespace and return result."""
+        # Clear pending LLM calls from previous execution
+        self._pending_llm_calls = []
+
+        result, updates = self._execute_forked(code)
+        self.locals.update(updates)
+        result.locals = self.locals.copy()
+        result.rlm_calls = self._pending_llm_calls.copy()
+        return result
+
+    def execute_code_parallel(self, code_blocks: list[str]) -> list[REPLResult]:
+        """Execute independent code blocks concurrently and return their results in order.
+
+        Each block runs in its own fork of the namespace; the variables it creates or rebinds
+        are merged back in block order once all blocks finish. The blocks must not depend on
+        each other (see rlm.utils.code_analysis.schedule_code_blocks). Sub-calls made from
+        threads the blocks start themselves are reported with the last block.
+
+        Only one block holds the working directory (see _working_dir) at a time, and it only
+        hands it over while waiting on a sub-call, so the blocks overlap in their LM calls but
+        their other code still runs one block at a time.
+        """
+        self._pending_llm_calls = []
+
+        def run(code: str) -> tuple[REPLResult, dict[str, Any]]:
+            self._calls_local.calls = []
             try:
-                sys.stdout, sys.stderr = stdout_buf, stderr_buf
-                yield stdout_buf, stderr_buf
+                result, updates = self._execute_forked(code)
+                result.rlm_calls = self._calls_local.calls
+                return result, updates
             finally:
-                sys.stdout, sys.stderr = old_stdout, old_stderr
+                del self._calls_local.calls
 
-    @contextmanager
-    def _temp_cwd(self):
-        """Temporarily change to temp directory for execution."""
-        old_cwd = os.getcwd()
-        try:
-            os.chdir(self.temp_dir)
-            yield
-        finally:
-            os.chdir(old_cwd)
+        with ThreadPoolExecutor(max_workers=len(code_blocks)) as pool:
+            outcomes = list(pool.map(run, code_blocks))
 
-    def execute_code(self, code: str) -> REPLResult:
-        """Execute code in the persistent namespace and return result."""
-        start_time = time.perf_counter()
+        for _, updates in outcomes:
+            self.locals.update(updates)
+        results = [result for result, _ in outcomes]
+        for result in results:
+            result.locals = self.locals.copy()
+        if results:
+            results[-1].rlm_calls.extend(self._pending_llm_calls)
+        return results
 
-        # Clear pending LLM calls from previous execution
-        self._pending_llm_calls = []
+    def _execute_forked(self, code: str) -> tuple[REPLResult, dict[str, Any]]:
+        """Run code in a copy of the namespace.
+
+        Returns the result (without locals) and the variables the code created or rebound,
+        for the caller to merge into self.locals. Nothing is merged if the code raised.
+        """
+        start_time = time.perf_counter()
+        updates: dict[str, Any] = {}
 
-        with self._capture_output() as (stdout_buf, stderr_buf), self._temp_cwd():
+        with _capture_output() as (stdout_buf, stderr_buf), _working_dir(self.temp_dir):
             try:
                 combined = {**self.globals, **self.locals}
                 exec(code, combined, combined)
 
-                # Update locals with new variables
+                # Collect new variables
                 for key, value in combined.items():
-                    if key not in self.globals and not key.startswith("_"):
-                        self.locals[key] = value
+                    if key in self.globals or key.startswith("_"):
+                        continue
+                    if key not in self.locals or self.locals[key] is not value:
+                        updates[key] = value
 
                 stdout = stdout_buf.getvalue()
                 stderr = stderr_buf.getvalue()
@@ -376,13 +721,13 @@ class LocalREPL(NonIsolatedEnv):
                 stdout = stdout_buf.getvalue()
                 stderr = stderr_buf.getvalue() + f"\n{type(e).__name__}: {e}"
 
-        return REPLResult(
+        result = REPLResult(
             stdout=stdout,
             stderr=stderr,
-            locals=self.locals.copy(),
+            locals={},
             execution_time=time.perf_counter() - start_time,
-            rlm_calls=self._pending_llm_calls.copy(),
         )
+        return result, updates
 
     def __enter__(self):
         return self
@@ -393,6 +738,8 @@ class LocalREPL(NonIsolatedEnv):
 
     def cleanup(self):
         """Clean up temp directory and reset state."""
+        self._close_lm_connection()
+        self._search_indexes.clear()
         try:
             shutil.rmtree(self.temp_dir)
         except Exception:
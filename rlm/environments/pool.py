@@ -0,0 +1,222 @@
+"""
+Warm pool of reusable environments.
+
+Creating a sandboxed REPL (Modal, Daytona, Prime, Docker) costs seconds to minutes, so a pool
+creates environments ahead of time and leases them to completions. A returned environment is
+reset to a clean namespace and kept for the next lease, until it has served `max_uses`
+completions, is older than `max_age` seconds, or fails its health check.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+from rlm.core.types import EnvironmentType
+from rlm.environments.base_env import BaseEnv, SupportsReuse
+
+
+@dataclass
+class _Slot:
+    environment: BaseEnv
+    created_at: float
+    uses: int = 0
+
+
+class EnvironmentPool:
+    """Leases environments of one type, keeping up to `size` idle ones warm.
+
+    Args:
+        environment: Environment type, as for get_environment().
+        environment_kwargs: Constructor kwargs shared by every environment (including
+            lm_handler_address and depth); each lease supplies its own context.
+        size: Number of idle environments to keep ready.
+        max_uses: Recycle an environment after this many leases (None = no limit).
+        max_age: Recycle an environment this many seconds after creation (None = no limit).
+        warm: Create `size` environments in the background right away, and replace
+            recycled ones as they are discarded.
+    """
+
+    def __init__(
+        self,
+        environment: EnvironmentType,
+        environment_kwargs: dict[str, Any] | None = None,
+        size: int = 4,
+        max_uses: int | None = 50,
+        max_age: float | None = 3600.0,
+        warm: bool = True,
+    ):
+        self.environment_type = environment
+        self.environment_kwargs = (environment_kwargs or {}).copy()
+        self.size = size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.warm_enabled = warm
+
+        self._lock = threading.Lock()
+        self._idle: list[_Slot] = []
+        self._leased: dict[int, _Slot] = {}
+        self._warming = 0
+        self._closed = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(size, 1), thread_name_prefix="rlm-env-pool"
+        )
+
+        # Counters for monitoring
+        self.created = 0
+        self.recycled = 0
+
+        if warm:
+            self.warm()
+
+    def warm(self, count: int | None = None) -> None:
+        """Create environments in the background until `count` (default: size) are idle or warming."""
+        target = self.size if count is None else count
+        with self._lock:
+            missing = target - len(self._idle) - self._warming
+            if self._closed or missing <= 0:
+                return
+            self._warming += missing
+        for _ in range(missing):
+            try:
+                self._executor.submit(self._create_idle)
+            except RuntimeError:  # closed concurrently
+                with self._lock:
+                    self._warming -= 1
+
+    def lease(self, context_payload: dict | list | str | None = None) -> BaseEnv:
+        """Take a healthy idle environment (or create one) and load `context_payload` into it."""
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("EnvironmentPool is closed")
+                slot = self._idle.pop() if self._idle else None
+            if slot is None:
+                slot = self._create(context_payload)
+                break
+            if self._expired(slot) or not self._healthy(slot.environment):
+                self._discard(slot)
+                continue
+            if context_payload is not None:
+                slot.environment.load_context(context_payload)
+            break
+
+        slot.uses += 1
+        with self._lock:
+            self._leased[id(slot.environment)] = slot
+        return slot.environment
+
+    def release(self, environment: BaseEnv, discard: bool = False) -> None:
+        """Return a leased environment: reset it for the next lease, or recycle it."""
+        with self._lock:
+            slot = self._leased.pop(id(environment), None)
+            keep = (
+                slot is not None
+                and not discard
+                and not self._closed
+                and len(self._idle) + self._warming < self.size
+            )
+        if slot is None:
+            return
+        if not keep or self._expired(slot) or not isinstance(environment, SupportsReuse):
+            self._discard(slot)
+            return
+        try:
+            environment.reset()
+        except Exception:
+            self._discard(slot)
+            return
+        with self._lock:
+            if not self._closed:
+                self._idle.append(slot)
+                return
+        self._cleanup(environment)
+
+    @contextmanager
+    def leased(self, context_payload: dict | list | str | None = None):
+        """Lease an environment for the duration of a `with` block."""
+        environment = self.lease(context_payload)
+        try:
+            yield environment
+        finally:
+            self.release(environment)
+
+    def close(self) -> None:
+        """Clean up idle environments; leased ones are cleaned up when released."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        # Environments that finished warming during shutdown were added to the idle list.
+        with self._lock:
+            idle.extend(self._idle)
+            self._idle = []
+        for slot in idle:
+            self._cleanup(slot.environment)
+
+    def __len__(self) -> int:
+        """Number of idle environments."""
+        return len(self._idle)
+
+    def __enter__(self) -> "EnvironmentPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        self.close()
+        return False
+
+    def _create(self, context_payload=None) -> _Slot:
+        from rlm.environments import get_environment  # rlm.environments imports this module
+
+        kwargs = self.environment_kwargs.copy()
+        if context_payload is not None:
+            kwargs["context_payload"] = context_payload
+        environment = get_environment(self.environment_type, kwargs)
+        with self._lock:
+            self.created += 1
+        return _Slot(environment=environment, created_at=time.monotonic())
+
+    def _create_idle(self) -> None:
+        try:
+            slot = self._create()
+        except Exception:
+            with self._lock:
+                self._warming -= 1
+            return
+        with self._lock:
+            self._warming -= 1
+            if not self._closed:
+                self._idle.append(slot)
+                return
+        self._cleanup(slot.environment)
+
+    def _expired(self, slot: _Slot) -> bool:
+        if self.max_uses is not None and slot.uses >= self.max_uses:
+            return True
+        return self.max_age is not None and time.monotonic() - slot.created_at >= self.max_age
+
+    @staticmethod
+    def _healthy(environment: BaseEnv) -> bool:
+        if not isinstance(environment, SupportsReuse):
+            return True
+        try:
+            return environment.is_healthy()
+        except Exception:
+            return False
+
+    def _discard(self, slot: _Slot) -> None:
+        with self._lock:
+            self.recycled += 1
+        self._cleanup(slot.environment)
+        if self.warm_enabled and not self._closed:
+            self.warm()
+
+    @staticmethod
+    def _cleanup(environment: BaseEnv) -> None:
+        if hasattr(environment, "cleanup"):
+            try:
+                environment.cleanup()
+            except Exception:
+                pass
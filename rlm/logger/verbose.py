@@ -15,7 +15,7 @@ from rich.style import Style
 from rich.table import Table
 from rich.text import Text
 
-from rlm.core.types import CodeBlock, RLMIteration, RLMMetadata
+from rlm.core.types import CodeBlock, HistoryCompaction, RLMIteration, RLMMetadata
 
 # ============================================================================
 # Tokyo Night Color Theme
@@ -297,6 +297,23 @@ class VerbosePrinter:
         )
         self.console.print(panel)
 
+    def print_compaction(self, compaction: HistoryCompaction) -> None:
+        """Print a compaction of the root message history."""
+        if not self.enabled:
+            return
+
+        text = Text()
+        text.append("  ⇣ ", style=STYLE_SECONDARY)
+        text.append("History compacted ", style=STYLE_SECONDARY)
+        text.append(f"({compaction.strategy}): ", style=STYLE_MUTED)
+        text.append(
+            f"{compaction.messages_before} → {compaction.messages_after} messages, "
+            f"~{compaction.tokens_saved:,} tokens saved",
+            style=STYLE_TEXT,
+        )
+        text.append(f"  ({compaction.compaction_time:.2f}s)", style=STYLE_MUTED)
+        self.console.print(text)
+
     def print_iteration(self, iteration: RLMIteration, iteration_num: int) -> None:
         """
         Print a complete iteration including response and code executions.
@@ -381,8 +398,14 @@ class VerbosePrinter:
                 m.get("total_output_tokens", 0)
                 for m in usage_summary.get("model_usage_summaries", {}).values()
             )
+            total_cached = sum(
+                m.get("cached_input_tokens", 0)
+                for m in usage_summary.get("model_usage_summaries", {}).values()
+            )
             if total_input or total_output:
                 summary_table.add_row("Input Tokens", f"{total_input:,}")
+                if total_cached:
+                    summary_table.add_row("Cached Input", f"{total_cached:,}")
                 summary_table.add_row("Output Tokens", f"{total_output:,}")
 
         # Wrap in rule
@@ -0,0 +1,281 @@
+"""
+Token-aware chunking of a REPL context.
+
+chunk_text splits one text into (start, end) offsets of at most about `max_tokens` tokens,
+cutting at the last paragraph break, markdown header or line break that fits (falling back to
+a line break, then a space). chunk_documents does the same for a whole context: documents of a
+list, dict or LazyContext are packed together while they fit, and larger ones are split. It
+returns Chunk views that only read their text when it is used.
+
+Tokens are estimated at CHARS_PER_TOKEN characters per token, as in estimate_tokens, so no
+tokenizer is needed and splitting runs at regex-scan speed.
+
+This module only uses the standard library: remote sandboxes exec its source (see
+sandbox_source) to get the same helper.
+"""
+
+import functools
+import inspect
+import json
+import re
+import sys
+from typing import Any
+
+CHARS_PER_TOKEN = 4
+DEFAULT_MAX_TOKENS = 25_000
+
+# Each boundary matches where a chunk may end; the ones after it are the fallbacks
+_BOUNDARIES = {
+    "header": (r"\n(?=#{1,6}[ \t])", r"\n[ \t]*\n", r"\n", r" "),
+    "paragraph": (r"\n[ \t]*\n", r"\n", r" "),
+    "line": (r"\n", r" "),
+}
+# (?s).* is greedy, so matching it from `low` to `high` ends at the last boundary in between
+_STR_CUTS = {
+    name: tuple(re.compile(r"(?s).*" + pattern) for pattern in patterns)
+    for name, patterns in _BOUNDARIES.items()
+}
+_BYTES_CUTS = {
+    name: tuple(re.compile(cut.pattern.encode()) for cut in cuts)
+    for name, cuts in _STR_CUTS.items()
+}
+_STR_SPACE = re.compile(r"\s")
+_BYTES_SPACE = re.compile(rb"\s")
+
+
+def _check(max_tokens: int, overlap: int, boundary: str) -> None:
+    if boundary not in _BOUNDARIES:
+        raise ValueError(f"boundary must be one of {list(_BOUNDARIES)}, got {boundary!r}")
+    if max_tokens < 1:
+        raise ValueError("max_tokens must be positive")
+    if not 0 <= overlap < max_tokens:
+        raise ValueError("overlap must be at least 0 and less than max_tokens")
+
+
+def chunk_text(
+    text: str | memoryview, max_tokens: int, overlap: int = 0, boundary: str = "paragraph"
+) -> list[tuple[int, int]]:
+    """(start, end) offsets of chunks of `text`, each at most about `max_tokens` tokens.
+
+    A chunk ends at the last `boundary` in its second half, or at a fallback boundary, or at
+    `max_tokens` if there is none. With `overlap`, each chunk starts about that many tokens
+    before the previous one ended, at a whitespace character. Bytes are cut between UTF-8
+    characters.
+    """
+    _check(max_tokens, overlap, boundary)
+    is_str = isinstance(text, str)
+    cuts = (_STR_CUTS if is_str else _BYTES_CUTS)[boundary]
+    space = _STR_SPACE if is_str else _BYTES_SPACE
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = overlap * CHARS_PER_TOKEN
+    size = len(text)
+
+    offsets: list[tuple[int, int]] = []
+    start = 0
+    while size - start > max_chars:
+        low, high = start + max_chars // 2, start + max_chars
+        for cut in cuts:
+            match = cut.match(text, low, high)
+            if match:
+                end = match.end()
+                break
+        else:
+            end = high
+            if not is_str:
+                # Back off to the first byte of a UTF-8 character
+                while end > low and text[end] & 0xC0 == 0x80:
+                    end -= 1
+        offsets.append((start, end))
+        if overlap_chars:
+            next_start = end - overlap_chars
+            match = space.search(text, next_start, end)
+            start = max(match.end() if match else next_start, start + 1)
+        else:
+            start = end
+    if start < size:
+        offsets.append((start, size))
+    return offsets
+
+
+def _document_text(value: Any) -> str | memoryview:
+    if isinstance(value, str):
+        return value
+    if isinstance(getattr(value, "buffer", None), memoryview):
+        # A MappedText (local only): its bytes are split in place
+        return value.buffer
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class _SplitText:
+    """The text of the last document split by one chunk_documents call, shared by its chunks.
+
+    Each chunk of a split document needs a slice of the document's text; without this, every
+    chunk would read (LazyContext) and serialize (json.dumps) the whole document again. Only
+    one document is kept, so reading the chunks in order reads each document once.
+    """
+
+    def __init__(self):
+        self._entry: tuple[Any, Any] | None = None
+
+    def _read(self, context: Any, key: Any) -> tuple[str | memoryview, Any]:
+        """(text to split, text to keep) of document `key`, now the kept one."""
+        document = context[key]
+        text = _document_text(document)
+        # A MappedText is kept as is: slicing it decodes just the slice
+        kept = document if isinstance(text, memoryview) else text
+        self._entry = (key, kept)
+        return text, kept
+
+    def load(self, context: Any, key: Any) -> str | memoryview:
+        """Read and keep document `key`, returning its text to split."""
+        return self._read(context, key)[0]
+
+    def get(self, context: Any, key: Any) -> Any:
+        """The kept text of document `key`, reading it first if another document is kept."""
+        entry = self._entry
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        return self._read(context, key)[1]
+
+
+class Chunk:
+    """A view of part of a context; its text is read when it is used.
+
+    Formatting, str() and + give the text, so a chunk can go straight into an f-string
+    prompt. `spans` holds (key, start, end) per document in the chunk: key is the list index
+    or dict key (None for a single-text context), and end is None for a whole document.
+    len() and `tokens` are estimates from offsets and document lengths.
+    """
+
+    def __init__(
+        self,
+        context: Any,
+        spans: list[tuple[Any, int, int | None]],
+        size: int,
+        split_text: _SplitText | None = None,
+    ):
+        self.context = context
+        self.spans = spans
+        self.size = size
+        # For part of a split document: its text, shared with the document's other chunks
+        self._split_text = split_text
+
+    @property
+    def tokens(self) -> int:
+        return self.size // CHARS_PER_TOKEN + 1
+
+    @property
+    def start(self) -> int:
+        return self.spans[0][1]
+
+    @property
+    def end(self) -> int | None:
+        return self.spans[-1][2]
+
+    @property
+    def text(self) -> str:
+        if self._split_text is not None:
+            key, start, end = self.spans[0]
+            return self._split_text.get(self.context, key)[start:end]
+        keys = [key for key, _, _ in self.spans]
+        if keys == [None]:
+            documents = [self.context]
+        elif isinstance(self.context, dict):
+            documents = [self.context[key] for key in keys]
+        else:
+            # Consecutive indices, so sequences (and LazyContexts) are read in one go
+            documents = self.context[keys[0] : keys[-1] + 1]
+        parts = []
+        for document, (_, start, end) in zip(documents, self.spans, strict=True):
+            if isinstance(getattr(document, "buffer", None), memoryview):
+                parts.append(document[start:end])  # decodes just the span
+            else:
+                parts.append(_document_text(document)[start:end])
+        return "\n".join(parts)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __format__(self, spec: str) -> str:
+        return format(self.text, spec)
+
+    def __add__(self, other: str) -> str:
+        return self.text + other
+
+    def __radd__(self, other: str) -> str:
+        return other + self.text
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getattr__(self, name: str) -> Any:
+        # Everything else behaves like the text
+        if name.startswith("_") or not hasattr(str, name):
+            raise AttributeError(f"'Chunk' object has no attribute '{name}'")
+        return getattr(self.text, name)
+
+    def __repr__(self) -> str:
+        if len(self.spans) == 1:
+            key, start, end = self.spans[0]
+            where = f"start={start}, end={end}" if key is None else f"key={key!r}"
+            if key is not None and end is not None:
+                where += f", start={start}, end={end}"
+        else:
+            where = f"keys={self.spans[0][0]!r}..{self.spans[-1][0]!r}"
+        return f"Chunk({where}, ~{self.tokens} tokens)"
+
+
+def _document_sizes(context: Any) -> list[tuple[Any, int]]:
+    """(key, size) per document of a list, dict or LazyContext context."""
+    if isinstance(context, dict):
+        return [(key, len(_document_text(value))) for key, value in context.items()]
+    if isinstance(context, list | tuple):
+        return [(i, len(_document_text(value))) for i, value in enumerate(context)]
+    # A LazyContext: sizes come from its index, without reading anything
+    return list(enumerate(context.lengths))
+
+
+def chunk_documents(
+    context: Any,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap: int = 0,
+    boundary: str = "paragraph",
+) -> list[Chunk]:
+    """Split a context into Chunks of at most about `max_tokens` tokens.
+
+    A str (or MappedText) is split with chunk_text. For a list, dict or LazyContext,
+    consecutive documents that fit are packed into one chunk (joined by newlines), and a
+    document larger than `max_tokens` is split on its own; `overlap` only applies within it.
+    """
+    _check(max_tokens, overlap, boundary)
+    if not isinstance(context, dict | list | tuple) and not hasattr(context, "lengths"):
+        return [
+            Chunk(context, [(None, start, end)], end - start)
+            for start, end in chunk_text(_document_text(context), max_tokens, overlap, boundary)
+        ]
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    split_text = _SplitText()
+    chunks: list[Chunk] = []
+    spans: list[tuple[Any, int, int | None]] = []
+    packed = 0
+    for key, size in _document_sizes(context):
+        if spans and (packed + size > max_chars or size > max_chars):
+            chunks.append(Chunk(context, spans, packed - 1))
+            spans, packed = [], 0
+        if size <= max_chars:
+            spans.append((key, 0, None))
+            packed += size + 1
+            continue
+        text = split_text.load(context, key)
+        for start, end in chunk_text(text, max_tokens, overlap, boundary):
+            chunks.append(Chunk(context, [(key, start, end)], end - start, split_text))
+    if spans:
+        chunks.append(Chunk(context, spans, packed - 1))
+    return chunks
+
+
+@functools.cache
+def sandbox_source() -> str:
+    """This module's source, for remote sandboxes' exec scripts (which can't import rlm)."""
+    return inspect.getsource(sys.modules[__name__])
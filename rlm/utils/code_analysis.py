@@ -0,0 +1,405 @@
+"""
+Dependency analysis of the REPL code blocks in one root response.
+
+Each block's top-level reads and writes are collected with `ast`; two blocks conflict if one
+writes a name the other reads or writes. Non-conflicting blocks can run concurrently. The
+analysis is conservative:
+
+- A name passed to a call may be mutated by it, unless the callee is a known builtin or REPL
+  helper (or a method known not to mutate, like str.split).
+- A method call not known to be safe mutates its object, and may touch the filesystem.
+  Filesystem access (open() included) is tracked as the FILESYSTEM pseudo-name, so blocks
+  that may touch files never run together.
+- Calling anything the analysis cannot follow (exec/eval, globals(), a callable not defined
+  in this response), star imports, `global` statements and unparsable code make the block a
+  barrier that runs on its own.
+"""
+
+import ast
+import builtins
+from dataclasses import dataclass, field
+
+# Calls that read or write names the analysis cannot see
+OPAQUE_CALLS = {
+    "exec",
+    "eval",
+    "compile",
+    "globals",
+    "locals",
+    "vars",
+    "__import__",
+    "setattr",
+    "delattr",
+    "FINAL_VAR",
+    "SHOW_VARS",
+}
+
+# Pseudo-name read and written by anything that may touch the filesystem
+FILESYSTEM = "<filesystem>"
+
+# Builtins and REPL helpers that neither mutate their arguments nor touch the filesystem
+SAFE_CALLS = {
+    "abs",
+    "all",
+    "any",
+    "bool",
+    "bytes",
+    "callable",
+    "chr",
+    "dict",
+    "divmod",
+    "enumerate",
+    "filter",
+    "float",
+    "format",
+    "frozenset",
+    "getattr",
+    "hasattr",
+    "hash",
+    "id",
+    "iter",
+    "int",
+    "isinstance",
+    "issubclass",
+    "len",
+    "list",
+    "map",
+    "max",
+    "min",
+    "ord",
+    "pow",
+    "print",
+    "range",
+    "repr",
+    "reversed",
+    "round",
+    "set",
+    "slice",
+    "sorted",
+    "str",
+    "sum",
+    "super",
+    "tuple",
+    "type",
+    "zip",
+    "llm_query",
+    "llm_query_batched",
+    "llm_query_batched_iter",
+    "search_context",
+    "grep_context",
+    "chunk_context",
+    "llm_map",
+} | {
+    # Exception classes, so `raise ValueError(x)` doesn't need a barrier
+    name
+    for name, value in vars(builtins).items()
+    if isinstance(value, type) and issubclass(value, BaseException)
+}
+
+# Methods (and module functions) that neither mutate their object or arguments nor touch the
+# filesystem. Only the attribute name is seen, so names that are also filesystem functions
+# (copy: shutil.copy, replace: os.replace and Path.replace) are left out.
+READ_ONLY_METHODS = {
+    "capitalize",
+    "casefold",
+    "count",
+    "decode",
+    "dumps",
+    "encode",
+    "endswith",
+    "find",
+    "findall",
+    "finditer",
+    "format",
+    "fullmatch",
+    "get",
+    "index",
+    "isalnum",
+    "isalpha",
+    "isdigit",
+    "islower",
+    "isspace",
+    "isupper",
+    "items",
+    "join",
+    "keys",
+    "loads",
+    "lower",
+    "lstrip",
+    "match",
+    "partition",
+    "rfind",
+    "rindex",
+    "rpartition",
+    "rsplit",
+    "rstrip",
+    "search",
+    "split",
+    "splitlines",
+    "startswith",
+    "strip",
+    "sub",
+    "title",
+    "upper",
+    "values",
+}
+
+# REPL helpers that read a namespace variable without naming it
+IMPLICIT_READS = {
+    "search_context": "context",
+    "grep_context": "context",
+    "chunk_context": "context",
+}
+
+# Methods that only mutate the object they are called on (not `remove`, which is also
+# os.remove)
+MUTATING_METHODS = {
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "popitem",
+    "clear",
+    "update",
+    "setdefault",
+    "add",
+    "discard",
+    "sort",
+    "reverse",
+}
+
+
+@dataclass
+class BlockNames:
+    """Namespace names a code block reads and writes; a barrier conflicts with every block."""
+
+    reads: set[str] = field(default_factory=set)
+    writes: set[str] = field(default_factory=set)
+    barrier: bool = False
+    # Names called that the analysis cannot follow unless this response defines them
+    calls: set[str] = field(default_factory=set)
+    # Names read and mutated by the functions (and classes) this block defines, which their
+    # callers inherit
+    functions: dict[str, "BlockNames"] = field(default_factory=dict)
+
+    def conflicts_with(self, other: "BlockNames") -> bool:
+        if self.barrier or other.barrier:
+            return True
+        return bool(self.writes & (other.reads | other.writes) or self.reads & other.writes)
+
+
+class _NameCollector(ast.NodeVisitor):
+    def __init__(self):
+        self.names = BlockNames()
+        self._scopes = 0  # depth of function / lambda / comprehension scopes
+        self._function: BlockNames | None = None
+
+    def _read(self, name: str) -> None:
+        self.names.reads.add(name)
+        if self._function is not None:
+            self._function.reads.add(name)
+
+    def _mutate(self, name: str) -> None:
+        self.names.writes.add(name)
+        if self._function is not None:
+            self._function.writes.add(name)
+
+    def _write(self, name: str) -> None:
+        # Names bound inside functions and comprehensions are local to them
+        if self._scopes == 0:
+            self.names.writes.add(name)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Load):
+            self._read(node.id)
+        else:
+            self._write(node.id)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        base = _base_name(node.target)
+        if base is not None:
+            self._read(base)
+            self._write(base)
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        self._mutation(node)
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node: ast.Subscript) -> None:
+        self._mutation(node)
+        self.generic_visit(node)
+
+    def _mutation(self, node: ast.Attribute | ast.Subscript) -> None:
+        # x.attr = ..., x[k] = ..., del x[k] mutate x
+        if not isinstance(node.ctx, ast.Load):
+            base = _base_name(node)
+            if base is not None:
+                self._read(base)
+                self._mutate(base)
+
+    def _call(self, name: str) -> None:
+        self.names.calls.add(name)
+        if self._function is not None:
+            self._function.calls.add(name)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        safe = False
+        if isinstance(node.func, ast.Name):
+            name = node.func.id
+            if name in OPAQUE_CALLS:
+                self.names.barrier = True
+            elif name in IMPLICIT_READS:
+                self._read(IMPLICIT_READS[name])
+            elif name == "open":
+                self._mutate(FILESYSTEM)
+            elif name not in SAFE_CALLS:
+                self._call(name)
+            safe = name in SAFE_CALLS
+        elif isinstance(node.func, ast.Attribute):
+            method = node.func.attr
+            safe = method in READ_ONLY_METHODS
+            if not safe:
+                base = _base_name(node.func.value)
+                if base is not None:
+                    self._mutate(base)
+                if method not in MUTATING_METHODS:
+                    self._mutate(FILESYSTEM)
+        else:
+            # e.g. handlers[0]() or (lambda: ...)(): nothing to follow
+            self.names.barrier = True
+        if not safe:
+            # The callee may mutate any object passed to it
+            for arg in [*node.args, *(keyword.value for keyword in node.keywords)]:
+                base = _base_name(arg)
+                if base is not None:
+                    self._mutate(base)
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self._write(alias.asname or alias.name.split(".")[0])
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        for alias in node.names:
+            if alias.name == "*":
+                self.names.barrier = True
+            else:
+                self._write(alias.asname or alias.name)
+
+    def visit_Global(self, node: ast.Global) -> None:
+        self.names.barrier = True
+
+    def visit_Nonlocal(self, node: ast.Nonlocal) -> None:
+        self.names.barrier = True
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        self._write(node.name)
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        outer = self._function
+        body = BlockNames()
+        self._function = body
+        self._scoped(node.args, *node.body)
+        self._function = outer
+        if outer is not None:
+            outer.reads |= body.reads
+            outer.writes |= body.writes
+            outer.calls |= body.calls
+        if self._scopes == 0:
+            self.names.functions[node.name] = body
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        # Calling a class runs its methods, so it is followed like a function
+        self._write(node.name)
+        for child in [*node.decorator_list, *node.bases, *node.keywords]:
+            self.visit(child)
+        outer = self._function
+        body = BlockNames()
+        self._function = body
+        self._scoped(*node.body)
+        self._function = outer
+        if outer is not None:
+            outer.reads |= body.reads
+            outer.writes |= body.writes
+            outer.calls |= body.calls
+        if self._scopes == 0:
+            self.names.functions[node.name] = body
+
+    def visit_Lambda(self, node: ast.Lambda) -> None:
+        self._scoped(node.args, node.body)
+
+    def visit_ListComp(self, node: ast.ListComp | ast.SetComp | ast.GeneratorExp) -> None:
+        self._scoped(*node.generators, node.elt)
+
+    visit_SetComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node: ast.DictComp) -> None:
+        self._scoped(*node.generators, node.key, node.value)
+
+    def _scoped(self, *nodes: ast.AST) -> None:
+        self._scopes += 1
+        for node in nodes:
+            self.visit(node)
+        self._scopes -= 1
+
+
+def _base_name(node: ast.AST) -> str | None:
+    """`x` for x, x.a, x[0], x.a[0].b, ..."""
+    while isinstance(node, ast.Attribute | ast.Subscript | ast.Starred):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def analyze_code_block(code: str) -> BlockNames:
+    """Collect the names a code block reads and writes in the REPL namespace."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return BlockNames(barrier=True)
+    collector = _NameCollector()
+    collector.visit(tree)
+    return collector.names
+
+
+def schedule_code_blocks(code_blocks: list[str]) -> list[list[int]]:
+    """
+    Group code blocks into waves that can each run concurrently.
+
+    A block goes in the wave after the latest earlier block it conflicts with, so running
+    the waves in order (merging each wave's results in block order) gives the same namespace
+    as running every block in sequence. Using a function defined by this or an earlier block
+    counts as reading and mutating what that function (and the functions it uses) does.
+    Calling anything else that isn't a known builtin or REPL helper makes the block a barrier.
+
+    Returns:
+        Waves of block indices, each in ascending order.
+    """
+    names = [analyze_code_block(code) for code in code_blocks]
+    functions: dict[str, BlockNames] = {}
+    levels: list[int] = []
+    for j, block in enumerate(names):
+        functions.update(block.functions)
+        followed: set[str] = set()
+        while unfollowed := (block.reads & functions.keys()) - followed:
+            for name in unfollowed:
+                block.reads |= functions[name].reads
+                block.writes |= functions[name].writes
+                block.calls |= functions[name].calls
+            followed |= unfollowed
+        if block.calls - functions.keys():
+            block.barrier = True
+
+        level = 0
+        for i in range(j):
+            if names[i].conflicts_with(block):
+                level = max(level, levels[i] + 1)
+        levels.append(level)
+
+    waves: list[list[int]] = [[] for _ in range(max(levels, default=-1) + 1)]
+    for index, level in enumerate(levels):
+        waves[level].append(index)
+    return waves
@@ -0,0 +1,360 @@
+"""
+Keyword search over a REPL context.
+
+The context is split into passages (paragraphs merged or cut to about `passage_chars`),
+and an inverted index maps each lowercased word to the passages it occurs in and how often.
+`search` ranks passages with BM25; `grep` runs a regex, first narrowing the passages to
+those that contain a whole word the pattern requires, when it has one.
+
+Indexes are built on first use and kept in a SearchIndexCache keyed by context fingerprint.
+An index holds its context, so each REPL owns its cache and clears it on cleanup; a persistent
+REPL reuses its indexes across completions.
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from rlm.core.lazy_context import LazyContext
+from rlm.core.mapped_text import MappedText
+
+try:  # Python 3.11+
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+# Word, paragraph-break and last-newline / last-space patterns, for str and for the raw bytes
+# of a MappedText (which are searched in place, without decoding)
+_STR_PATTERNS = (
+    re.compile(r"\w+"),
+    re.compile(r"\n[ \t]*\n"),
+    re.compile(r"(?s).*\n"),
+    re.compile(r"(?s).* "),
+)
+_BYTES_PATTERNS = tuple(re.compile(p.pattern.encode()) for p in _STR_PATTERNS)
+_WORD = _STR_PATTERNS[0]
+# Words of a MappedText, decoded as latin-1 so that offsets stay byte offsets
+_ASCII_WORD = re.compile(r"\w+", re.ASCII)
+
+# Postings pack (passage id << 8 | term frequency); BM25 saturates long before 255
+_TF_BITS = 8
+_TF_MAX = (1 << _TF_BITS) - 1
+
+# Indexes kept per cache; the least recently used is dropped beyond this
+MAX_CACHED_INDEXES = 4
+
+
+@dataclass
+class Passage:
+    """Where a passage lives: `key` is the list index or dict key of its document (None when
+    the context is a single string), and start/end are offsets into that document's text
+    (bytes for a MappedText)."""
+
+    key: Any
+    start: int
+    end: int
+
+
+def _document_text(value: Any) -> str | memoryview:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, MappedText):
+        return value.buffer
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _documents(context: Any) -> Iterator[tuple[Any, str | memoryview]]:
+    """(key, text) per document of the context."""
+    if isinstance(context, dict):
+        for key, value in context.items():
+            yield key, _document_text(value)
+    elif isinstance(context, list | tuple | LazyContext):
+        for i, value in enumerate(context):
+            yield i, _document_text(value)
+    else:
+        yield None, _document_text(context)
+
+
+def _split_passages(text: str | memoryview, passage_chars: int) -> Iterator[tuple[int, int]]:
+    """(start, end) offsets of passages: paragraphs, merged up to or cut at `passage_chars`."""
+    _, paragraph_break, _, _ = _STR_PATTERNS if isinstance(text, str) else _BYTES_PATTERNS
+    start = 0
+    for brk in paragraph_break.finditer(text):
+        if brk.start() - start >= passage_chars // 2:
+            yield from _cut(text, start, brk.start(), passage_chars)
+            start = brk.end()
+    if start < len(text):
+        yield from _cut(text, start, len(text), passage_chars)
+
+
+def _cut(
+    text: str | memoryview, start: int, end: int, passage_chars: int
+) -> Iterator[tuple[int, int]]:
+    """Cut text[start:end] into pieces of at most `passage_chars`, after a newline or space."""
+    _, _, last_newline, last_space = _STR_PATTERNS if isinstance(text, str) else _BYTES_PATTERNS
+    while end - start > passage_chars:
+        low, limit = start + passage_chars // 2, start + passage_chars
+        match = last_newline.match(text, low, limit) or last_space.match(text, low, limit)
+        cut = match.end() if match else limit
+        yield start, cut
+        start = cut
+    if end > start:
+        yield start, end
+
+
+def context_fingerprint(context: Any) -> str:
+    """A key identifying the context's contents, for caching.
+
+    Strings use Python's (cached) string hash; file-backed contexts use their paths, sizes
+    and modification times, so nothing is read.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    def add(value: Any) -> None:
+        if isinstance(value, str):
+            digest.update(f"s{len(value)}:{hash(value)};".encode())
+        elif isinstance(value, MappedText | LazyContext):
+            paths = [value.path] if isinstance(value, MappedText) else value.paths
+            digest.update(f"{type(value).__name__}{len(value)};".encode())
+            for path in paths:
+                stat = os.stat(path)
+                digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        elif isinstance(value, dict):
+            digest.update(f"d{len(value)};".encode())
+            for key, item in value.items():
+                add(str(key))
+                add(item)
+        elif isinstance(value, list | tuple):
+            digest.update(f"l{len(value)};".encode())
+            for item in value:
+                add(item)
+        else:
+            add(_document_text(value))
+
+    add(context)
+    return digest.hexdigest()
+
+
+class SearchIndex:
+    """An inverted word index over the passages of one context, with BM25 ranking.
+
+    Args:
+        context: A str, list, dict, MappedText or LazyContext.
+        passage_chars: Target passage size in characters.
+        k1, b: BM25 parameters.
+    """
+
+    def __init__(self, context: Any, passage_chars: int = 2000, k1: float = 1.5, b: float = 0.75):
+        self.context = context
+        self.k1 = k1
+        self.b = b
+        self.passages: list[Passage] = []
+        # Whether any document is searched as bytes (a MappedText), tokenized ASCII-only
+        self._has_bytes = False
+        self._lengths = array("I")  # words per passage
+        # word -> packed postings, in passage order
+        self._postings: dict[str, array] = defaultdict(lambda: array("Q"))
+
+        postings, lengths, tf_max = self._postings, self._lengths, _TF_MAX
+        for key, text in _documents(context):
+            self._has_bytes |= not isinstance(text, str)
+            for start, end in _split_passages(text, passage_chars):
+                # Lowercasing a passage at a time keeps the copies small
+                if isinstance(text, str):
+                    words = _WORD.findall(text[start:end].lower())
+                else:
+                    words = _ASCII_WORD.findall(bytes(text[start:end]).decode("latin-1").lower())
+                if not words:
+                    continue
+                base = len(self.passages) << _TF_BITS
+                self.passages.append(Passage(key, start, end))
+                lengths.append(len(words))
+                for word, count in Counter(words).items():
+                    postings[word].append(base | (count if count < tf_max else tf_max))
+
+        self._postings = dict(postings)
+        self._average_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    def _document(self, key: Any) -> Any:
+        return self.context if key is None else self.context[key]
+
+    def passage_text(self, passage: Passage, texts: dict[Any, Any] | None = None) -> str:
+        """The passage's text. `texts` caches documents' text by key across calls, so several
+        passages of one JSON document only serialize it once."""
+        document = self._document(passage.key)
+        if isinstance(document, MappedText):
+            return document[passage.start : passage.end]
+        if texts is None:
+            return _document_text(document)[passage.start : passage.end]
+        text = texts.get(passage.key)
+        if text is None:
+            text = texts[passage.key] = _document_text(document)
+        return text[passage.start : passage.end]
+
+    def _hit(self, passage_id: int, texts: dict[Any, Any], **fields: Any) -> dict[str, Any]:
+        passage = self.passages[passage_id]
+        return {
+            **fields,
+            "key": passage.key,
+            "start": passage.start,
+            "end": passage.end,
+            "text": self.passage_text(passage, texts),
+        }
+
+    def search(self, query: str, k: int = 10) -> list[dict[str, Any]]:
+        """The `k` passages that best match the query's words, best first."""
+        total = len(self.passages)
+        scores: dict[int, float] = {}
+        for word in set(_WORD.findall(query.lower())):
+            entry = self._postings.get(word)
+            if entry is None:
+                continue
+            idf = math.log(1 + (total - len(entry) + 0.5) / (len(entry) + 0.5))
+            k1, norm = self.k1, self.k1 * (1 - self.b)
+            scale = self.k1 * self.b / (self._average_length or 1)
+            lengths = self._lengths
+            for packed in entry:
+                passage_id, count = packed >> _TF_BITS, packed & _TF_MAX
+                score = idf * count * (k1 + 1) / (count + norm + scale * lengths[passage_id])
+                scores[passage_id] = scores.get(passage_id, 0.0) + score
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        texts: dict[Any, Any] = {}
+        return [self._hit(passage_id, texts, score=score) for passage_id, score in best]
+
+    def candidates(self, pattern: str, flags: int = 0) -> list[int] | None:
+        """Passages that can match `pattern`, or None if the index can't narrow it down."""
+        words = _required_words(pattern, flags)
+        if not words or (self._has_bytes and not all(word.isascii() for word in words)):
+            # Bytes documents are indexed by ASCII words only, so a non-ASCII word isn't there
+            return None
+        # The rarest required word narrows the most
+        entries = [self._postings.get(word) for word in words]
+        if any(entry is None for entry in entries):
+            return []
+        return [packed >> _TF_BITS for packed in min(entries, key=len)]
+
+    def grep(self, pattern: str, max_results: int = 100, flags: int = 0) -> list[dict[str, Any]]:
+        """Regex matches in passage order, with the passage each one is in.
+
+        Matches do not span passages. A MappedText is searched as raw bytes, so `\\w` and
+        case folding only cover ASCII there.
+        """
+        regexes: dict[type, re.Pattern] = {}
+        passage_ids = self.candidates(pattern, flags)
+        if passage_ids is None:
+            passage_ids = range(len(self.passages))
+        hits: list[dict[str, Any]] = []
+        texts: dict[Any, Any] = {}
+        for passage_id in passage_ids:
+            passage = self.passages[passage_id]
+            text = texts.get(passage.key)
+            if text is None:
+                text = texts[passage.key] = _document_text(self._document(passage.key))
+            if type(text) not in regexes:
+                source = pattern if isinstance(text, str) else pattern.encode()
+                regexes[type(text)] = re.compile(source, flags)
+            for match in regexes[type(text)].finditer(text, passage.start, passage.end):
+                found = match.group(0)
+                if not isinstance(found, str):
+                    found = found.decode(errors="replace")
+                hits.append(self._hit(passage_id, texts, match=found))
+                if len(hits) >= max_results:
+                    return hits
+        return hits
+
+
+def _required_words(pattern: str, flags: int) -> list[str]:
+    """Lowercased whole words every match of `pattern` contains.
+
+    Only literal runs at the top level of the pattern count, and only the words inside a run
+    that are bounded by non-word characters on both sides (or by `\\b`), so that they are
+    whole words in the text too. Returns [] when nothing is certain (alternation, verbose mode,
+    no literals).
+    """
+    if flags & re.VERBOSE:
+        return []
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return []
+
+    words: list[str] = []
+    run: list[str] = []
+    # Whether the run starts / ends at a word boundary
+    bounded_start = False
+
+    def flush(bounded_end: bool) -> None:
+        text = "".join(run)
+        for match in _WORD.finditer(text):
+            starts_ok = match.start() > 0 or bounded_start
+            ends_ok = match.end() < len(text) or bounded_end
+            if starts_ok and ends_ok:
+                words.append(match.group(0).lower())
+        run.clear()
+
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(value))
+        elif op is sre_parse.AT and value is sre_parse.AT_BOUNDARY:
+            if run:
+                flush(True)
+            bounded_start = True
+        else:
+            if run:
+                flush(False)
+            bounded_start = False
+    if run:
+        flush(False)
+    return words
+
+
+class SearchIndexCache:
+    """Search indexes by context fingerprint, dropping the least recently used beyond
+    `max_indexes`. Each index holds its context, so clear() the cache when the contexts go.
+
+    Concurrent callers wait for one build instead of each building their own.
+    """
+
+    def __init__(self, max_indexes: int = MAX_CACHED_INDEXES):
+        self.max_indexes = max_indexes
+        self._indexes: dict[str, SearchIndex] = {}
+        self._lock = threading.Lock()
+        self._build_locks: dict[str, threading.Lock] = {}
+
+    def get(self, context: Any, passage_chars: int = 2000) -> SearchIndex:
+        """The index for this context, building it on first use."""
+        key = f"{context_fingerprint(context)}:{passage_chars}"
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes[key] = self._indexes.pop(key)  # most recently used last
+                return index
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                index = self._indexes.get(key)
+            if index is None:
+                index = SearchIndex(context, passage_chars)
+                with self._lock:
+                    self._indexes[key] = index
+                    while len(self._indexes) > self.max_indexes:
+                        self._indexes.pop(next(iter(self._indexes)))
+                    self._build_locks.pop(key, None)
+        return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    def __len__(self) -> int:
+        return len(self._indexes)
@@ -0,0 +1,245 @@
+"""
+Map-reduce over sub-LM calls, behind the REPL's llm_map helper.
+
+map_reduce formats one prompt per item and keeps at most `max_concurrency` of them in flight:
+items are only read (and their prompts built) when a slot frees up, so a lazy iterable of
+chunks streams through without materializing. Results come back in item order.
+
+With a `reduce` prompt, the results are then combined as a tree: each level packs as many
+results as fit in `reduce_max_tokens` into one reduce prompt, until one result is left. Every
+reduce prompt holds at least two results, so each level shrinks. For a str `reduce`, no reduce
+prompt is larger than `reduce_max_tokens`, however many items were mapped (results that would
+not fit are truncated); a callable `reduce` is only given results that fit, and its own text
+is not counted.
+
+Each stage (the map, then each reduce level) prints a line with its progress and token
+usage. The caller supplies how prompts are sent: `submit(prompt)` returns a Future and
+`collect(future)` returns (response, input_tokens, output_tokens), with None for usage it
+can't report (it is then estimated at CHARS_PER_TOKEN characters per token).
+
+This module only uses the standard library: remote sandboxes exec its source (see
+sandbox_source) to get the same helper.
+"""
+
+import functools
+import inspect
+import sys
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any
+
+# Same estimate as rlm.utils.chunking, which a sandbox can't import this from
+CHARS_PER_TOKEN = 4
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REDUCE_MAX_TOKENS = 25_000
+
+_TRUNCATED = "\n[truncated]"
+
+
+class StageStats:
+    """Progress and token usage of one stage of a map_reduce."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.prompts = 0
+        self.errors = 0
+        self.truncated = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.estimated = False
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def __str__(self) -> str:
+        approx = "~" if self.estimated else ""
+        line = (
+            f"llm_map {self.name}: {self.prompts} prompts, "
+            f"{approx}{self.input_tokens} input + {approx}{self.output_tokens} output tokens, "
+            f"{self.seconds:.1f}s"
+        )
+        if self.errors:
+            line += f", {self.errors} errors"
+        if self.truncated:
+            line += f", {self.truncated} results truncated to fit"
+        return line
+
+
+def _fill(template: str | Callable[[Any], str], placeholder: str, value: Any) -> str:
+    if callable(template):
+        return template(value)
+    text = value if isinstance(value, str) else str(value)
+    if placeholder in template:
+        # Not str.format: templates often contain other braces (JSON, code)
+        return template.replace(placeholder, text)
+    return f"{template}\n\n{text}"
+
+
+def _first_completed(futures: set[Future]) -> set[Future]:
+    return wait(futures, return_when=FIRST_COMPLETED)[0]
+
+
+def _run_stage(
+    stats: StageStats,
+    prompts: Iterable[str],
+    submit: Callable[[str], Future],
+    collect: Callable[[Future], tuple[str, int | None, int | None]],
+    max_concurrency: int,
+    wait_for: Callable[[set[Future]], set[Future]],
+    progress: bool,
+) -> list[str]:
+    """Send prompts with at most `max_concurrency` in flight; responses in prompt order."""
+    results: dict[int, str] = {}
+    in_flight: dict[Future, tuple[int, str]] = {}
+    pending = enumerate(prompts)
+    exhausted = False
+
+    def record(index: int, prompt: str, response: str, usage: tuple) -> None:
+        input_tokens, output_tokens = usage
+        if input_tokens is None or output_tokens is None:
+            stats.estimated = True
+            input_tokens = len(prompt) // CHARS_PER_TOKEN + 1
+            output_tokens = len(response) // CHARS_PER_TOKEN + 1
+        if response.startswith("Error:"):
+            stats.errors += 1
+        stats.input_tokens += input_tokens
+        stats.output_tokens += output_tokens
+        results[index] = response
+
+    while True:
+        # Only pull the next item when a slot is free
+        while not exhausted and len(in_flight) < max_concurrency:
+            item = next(pending, None)
+            if item is None:
+                exhausted = True
+                break
+            index, prompt = item
+            stats.prompts += 1
+            try:
+                in_flight[submit(prompt)] = (index, prompt)
+            except Exception as e:
+                record(index, prompt, f"Error: LM query failed - {e}", (0, 0))
+        if not in_flight:
+            break
+        done = wait_for(set(in_flight))
+        if not done:
+            # Fail everything left, so the results still line up with the items
+            for index, prompt in [*in_flight.values(), *pending]:
+                record(index, prompt, "Error: LM query timed out", (0, 0))
+            break
+        for future in done:
+            index, prompt = in_flight.pop(future)
+            try:
+                response, *usage = collect(future)
+            except Exception as e:
+                response, usage = f"Error: LM query failed - {e}", (0, 0)
+            record(index, prompt, response, tuple(usage))
+
+    stats.seconds = time.perf_counter() - stats.started
+    if progress:
+        print(stats)
+    return [results[i] for i in range(len(results))]
+
+
+def _result_limit(template: str | Callable, max_chars: int) -> int:
+    """Longest result that still lets two results (and a separator) fit in a reduce prompt."""
+    overhead = 0 if callable(template) else len(template)
+    return (max_chars - overhead - 2) // 2
+
+
+def _reduce_groups(
+    results: list[str], template: str | Callable, max_chars: int, stats: StageStats
+) -> list[list[str]]:
+    """Pack consecutive results into groups that fit one reduce prompt of `max_chars`.
+
+    A result longer than _result_limit is truncated, and a group is only closed once it holds
+    two results, so each level at least halves the count.
+    """
+    half = _result_limit(template, max_chars)
+    room = 2 * half + 2
+    groups: list[list[str]] = []
+    group: list[str] = []
+    size = 0
+    for result in results:
+        if len(result) > half:
+            stats.truncated += 1
+            result = result[: max(half - len(_TRUNCATED), 0)] + _TRUNCATED
+        if len(group) >= 2 and size + len(result) > room:
+            groups.append(group)
+            group, size = [], 0
+        group.append(result)
+        size += len(result) + 2
+    if group:
+        groups.append(group)
+    return groups
+
+
+def map_reduce(
+    submit: Callable[[str], Future],
+    collect: Callable[[Future], tuple[str, int | None, int | None]],
+    prompt_template: str | Callable[[Any], str],
+    items: Iterable[Any],
+    reduce: str | Callable[[list[str]], str] | None = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    reduce_max_tokens: int = DEFAULT_REDUCE_MAX_TOKENS,
+    progress: bool = True,
+    wait_for: Callable[[set[Future]], set[Future]] = _first_completed,
+) -> list[str] | str:
+    """Run `prompt_template` over `items`, then optionally reduce the results as a tree.
+
+    Args:
+        submit: Sends one prompt, returning a Future.
+        collect: Turns a finished Future into (response, input_tokens, output_tokens).
+        prompt_template: A str with an `{item}` placeholder (the item is appended if there is
+            none), or a function from an item to a prompt.
+        items: Any iterable; it is read lazily as slots free up.
+        reduce: A str with a `{results}` placeholder, or a function from a list of results to
+            a prompt. None returns the mapped results.
+        max_concurrency: Most prompts in flight at once.
+        reduce_max_tokens: Largest reduce prompt, in (estimated) tokens. Raises ValueError if
+            a str `reduce` leaves no room for two results.
+        progress: Print a progress and token usage line per stage.
+        wait_for: Blocks until at least one Future is done and returns the done ones (or an
+            empty set on timeout).
+
+    Returns:
+        The mapped results in item order if `reduce` is None, else the final reduced result.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    max_chars = reduce_max_tokens * CHARS_PER_TOKEN
+    if reduce is not None and _result_limit(reduce, max_chars) <= len(_TRUNCATED):
+        raise ValueError("reduce_max_tokens leaves no room for results in the reduce prompt")
+
+    run = functools.partial(
+        _run_stage,
+        submit=submit,
+        collect=collect,
+        max_concurrency=max_concurrency,
+        wait_for=wait_for,
+        progress=progress,
+    )
+    results = run(StageStats("map"), (_fill(prompt_template, "{item}", item) for item in items))
+    if reduce is None:
+        return results
+    if not results:
+        return ""
+
+    level = 0
+    # Reduce at least once, so a single result still goes through the reduce prompt
+    while level == 0 or len(results) > 1:
+        level += 1
+        stats = StageStats(f"reduce level {level}")
+        groups = _reduce_groups(results, reduce, max_chars, stats)
+        if callable(reduce):
+            prompts = (reduce(group) for group in groups)
+        else:
+            prompts = (_fill(reduce, "{results}", "\n\n".join(group)) for group in groups)
+        results = run(stats, prompts)
+    return results[0]
+
+
+@functools.cache
+def sandbox_source() -> str:
+    """This module's source, for remote sandboxes' exec scripts (which can't import rlm)."""
+    return inspect.getsource(sys.modules[__name__])
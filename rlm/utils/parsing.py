@@ -11,21 +11,74 @@ if TYPE_CHECKING:
     from rlm.environments.base_env import BaseEnv
 
 
+CODE_BLOCK_PATTERN = re.compile(r"```repl\s*\n(.*?)\n```", re.DOTALL)
+FINAL_VAR_LINE_PATTERN = re.compile(r"^\s*FINAL_VAR\((.*?)\)", re.MULTILINE | re.DOTALL)
+FINAL_START_PATTERN = re.compile(r"^\s*FINAL\(", re.MULTILINE)
+
+
 def find_code_blocks(text: str) -> list[str]:
     """
     Find REPL code blocks in text wrapped in triple backticks and return List of content(s).
     Returns None if no code blocks are found.
     """
-    pattern = r"```repl\s*\n(.*?)\n```"
     results = []
 
-    for match in re.finditer(pattern, text, re.DOTALL):
+    for match in CODE_BLOCK_PATTERN.finditer(text):
         code_content = match.group(1).strip()
         results.append(code_content)
 
     return results
 
 
+class StreamingResponseParser:
+    """
+    Incremental version of find_code_blocks() for a streamed response.
+
+    feed() returns each REPL code block as soon as its closing fence arrives (the same blocks,
+    in the same order, as find_code_blocks() on the full text). final_complete becomes True
+    once, outside any open code block, a FINAL_VAR(...) line or a FINAL(...) whose
+    parentheses close at the end of a line has arrived, i.e. once generating more text can
+    no longer change the final answer.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.final_complete = False
+        self._scan = 0
+
+    def feed(self, chunk: str) -> list[str]:
+        self.text += chunk
+        blocks = []
+        for match in CODE_BLOCK_PATTERN.finditer(self.text, self._scan):
+            blocks.append(match.group(1).strip())
+            self._scan = match.end()
+        if not self.final_complete:
+            self.final_complete = self._final_is_complete()
+        return blocks
+
+    def _final_is_complete(self) -> bool:
+        if self.text.count("```") % 2:
+            return False
+        if FINAL_VAR_LINE_PATTERN.search(self.text):
+            return True
+        match = FINAL_START_PATTERN.search(self.text)
+        if match is None:
+            return False
+
+        depth = 1
+        for i in range(match.end(), len(self.text)):
+            char = self.text[i]
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth <= 0:
+                    line_end = self.text.find("\n", i)
+                    if line_end != -1 and not self.text[i + 1 : line_end].strip():
+                        return True
+        return False
+
+
 def find_final_answer(text: str, environment: "BaseEnv | None" = None) -> str | None:
     """
     Find FINAL(...) or FINAL_VAR(...) statement in response and return the final answer string.
@@ -41,8 +94,7 @@ def find_final_answer(text: str, environment: "BaseEnv | None" = None) -> str |
         The final answer string, or None if no final answer pattern is found
     """
     # Check for FINAL_VAR pattern first - must be at start of line
-    final_var_pattern = r"^\s*FINAL_VAR\((.*?)\)"
-    match = re.search(final_var_pattern, text, re.MULTILINE | re.DOTALL)
+    match = FINAL_VAR_LINE_PATTERN.search(text)
     if match:
         variable_name = match.group(1).strip().strip('"').strip("'")
         if environment is not None:
@@ -9,9 +9,11 @@ RLM_SYSTEM_PROMPT = textwrap.dedent(
 The REPL environment is initialized with:
 1. A `context` variable that contains extremely important information about your query. You should check the content of the `context` variable to understand what you are working with. Make sure you look through it sufficiently as you answer your query.
 2. A `llm_query` function that allows you to query an LLM (that can handle around 500K chars) inside your REPL environment.
-3. A `llm_query_batched` function that allows you to query multiple prompts concurrently: `llm_query_batched(prompts: List[str]) -> List[str]`. This is much faster than sequential `llm_query` calls when you have multiple independent queries. Results are returned in the same order as the input prompts.
-4. A `SHOW_VARS()` function that returns all variables you have created in the REPL. Use this to check what variables exist before using FINAL_VAR.
-5. The ability to use `print()` statements to view the output of your REPL code and continue your reasoning.
+3. A `llm_query_batched` function that allows you to query multiple prompts concurrently: `llm_query_batched(prompts: List[str]) -> List[str]`. This is much faster than sequential `llm_query` calls when you have multiple independent queries. Results are returned in the same order as the input prompts. To process results as soon as each one finishes, iterate over `llm_query_batched_iter(prompts)`, which yields `(index, response)` pairs in completion order.
+4. A `chunk_context` function that splits the context into chunks sized for sub-LLM queries: `chunk_context(max_tokens=25000, overlap=0, boundary="paragraph") -> List[Chunk]`. Chunks hold at most about `max_tokens` tokens and end at a paragraph break (`boundary="paragraph"`), a Markdown header (`"header"`) or a line break (`"line"`). If the context is a list or dict, small documents are packed together and large ones are split. A chunk works like a string: put it straight into an f-string prompt.
+5. A `llm_map` function that runs one sub-LLM query per item and can combine the answers: `llm_map(prompt_template, items, reduce=None, max_concurrency=8) -> List[str] | str`. `{item}` in `prompt_template` is replaced by each item. The answers come back in item order. If you pass a `reduce` prompt, `{results}` in it is replaced by the answers, and you get back one combined answer. When there are too many answers for one prompt, they are combined in several rounds. It prints the number of queries and tokens used at each stage.
+6. A `SHOW_VARS()` function that returns all variables you have created in the REPL. Use this to check what variables exist before using FINAL_VAR.
+7. The ability to use `print()` statements to view the output of your REPL code and continue your reasoning.
 
 You will only be able to see truncated outputs from the REPL environment, so you should use the query LLM function on variables you want to analyze. You will find this function especially useful when you have to analyze the semantics of the context. Use these variables as buffers to build up your final answer.
 Make sure to explicitly look through the entire context in REPL before answering your query. An example strategy is to first look at the context and figure out a chunking strategy, then break up the context into smart chunks, and query an LLM per chunk with a particular question and save the answers to a buffer, then query an LLM with all the buffers to produce your final answer.
@@ -40,15 +42,10 @@ for i, section in enumerate(context):
 As another example, when the context isn't that long (e.g. >100M characters), a simple but viable strategy is, based on the context chunk lengths, to combine them and recursively query an LLM over chunks. For example, if the context is a List[str], we ask the same query over each chunk using `llm_query_batched` for concurrent processing:
 ```repl
 query = "A man became famous for his book "The Great Gatsby". How many jobs did he have?"
-# Suppose our context is ~1M chars, and we want each sub-LLM query to be ~0.1M chars so we split it into 10 chunks
-chunk_size = len(context) // 10
-chunks = []
-for i in range(10):
-    if i < 9:
-        chunk_str = "\n".join(context[i*chunk_size:(i+1)*chunk_size])
-    else:
-        chunk_str = "\n".join(context[i*chunk_size:])
-    chunks.append(chunk_str)
+# Suppose our context is ~1M chars (~250K tokens), and we want each sub-LLM query to be ~25K tokens.
+# chunk_context packs the documents into chunks of that size, cut at paragraph breaks.
+chunks = chunk_context(max_tokens=25000)
+print(len(chunks), chunks[:3])
 
 # Use batched query for concurrent processing - much faster than sequential calls!
 prompts = [f"Try to answer the following query: {{query}}. Here are the documents:\n{{chunk}}. Only answer if you are confident in your answer based on the evidence." for chunk in chunks]
@@ -58,6 +55,15 @@ for i, answer in enumerate(answers):
 final_answer = llm_query(f"Aggregating all the answers per chunk, answer the original query about total number of jobs: {{query}}\\n\\nAnswers:\\n" + "\\n".join(answers))
 ```
 
+The same map-reduce can be written with `llm_map`, which streams the chunks to the sub-LLMs and combines the answers in rounds when they are too many for one prompt. Its templates are plain strings with `{item}` and `{results}` placeholders:
+```repl
+final_answer = llm_map(
+    "Try to answer the following query: " + query + ". Here are the documents:\\n{item}\\nOnly answer if you are confident in your answer based on the evidence.",
+    chunk_context(max_tokens=25000),
+    reduce="Aggregating all the answers per chunk, answer the original query about total number of jobs: " + query + "\\n\\nAnswers:\\n{results}",
+)
+```
+
 As a final example, after analyzing the context and realizing its separated by Markdown headers, we can maintain state through buffers by chunking the context by headers, and iteratively querying an LLM over it:
 ```repl
 # After finding out the context is separated by Markdown headers, we can chunk, summarize, and answer
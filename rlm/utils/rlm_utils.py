@@ -1,3 +1,5 @@
+import hashlib
+import json
 from typing import Any
 
 
@@ -10,3 +12,20 @@ def filter_sensitive_keys(kwargs: dict[str, Any]) -> dict[str, Any]:
             continue
         filtered[key] = value
     return filtered
+
+
+def estimate_tokens(prompt: str | dict[str, Any] | list[dict[str, Any]]) -> int:
+    """Cheap token estimate for a prompt (~4 characters per token), without a tokenizer."""
+    if isinstance(prompt, str):
+        return len(prompt) // 4 + 1
+    if isinstance(prompt, dict):
+        return estimate_tokens(str(prompt.get("content", prompt)))
+    if isinstance(prompt, list):
+        return sum(estimate_tokens(message) for message in prompt)
+    return estimate_tokens(str(prompt))
+
+
+def prompt_hash(prompt: str | dict[str, Any] | list[dict[str, Any]]) -> str:
+    """Stable content hash of a prompt, used to refer to it without sending it back."""
+    encoded = json.dumps(prompt, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
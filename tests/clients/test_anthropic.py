@@ -0,0 +1,76 @@
+"""Tests for the Anthropic client."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from rlm.clients.anthropic import CACHE_CONTROL, AnthropicClient
+
+MESSAGES = [
+    {"role": "system", "content": "system prompt"},
+    {"role": "assistant", "content": "metadata"},
+    {"role": "user", "content": "history"},
+    {"role": "user", "content": "next step"},
+]
+
+
+def _response(input_tokens=10, output_tokens=5, cache_read=None, cache_creation=None):
+    return SimpleNamespace(
+        content=[SimpleNamespace(text="ok")],
+        usage=SimpleNamespace(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cache_read_input_tokens=cache_read,
+            cache_creation_input_tokens=cache_creation,
+        ),
+    )
+
+
+def _client(**kwargs):
+    with patch("rlm.clients.anthropic.anthropic"):
+        return AnthropicClient(api_key="test-key", model_name="claude-test", **kwargs)
+
+
+class TestAnthropicPromptCaching:
+    def test_breakpoints_on_system_and_stable_prefix(self):
+        messages, system = _client()._prepare_messages(MESSAGES)
+
+        assert system == [{"type": "text", "text": "system prompt", "cache_control": CACHE_CONTROL}]
+        assert messages[-2]["content"] == [
+            {"type": "text", "text": "history", "cache_control": CACHE_CONTROL}
+        ]
+        # The per-iteration suffix and earlier messages are left alone
+        assert messages[-1] == MESSAGES[-1]
+        assert messages[0] == MESSAGES[1]
+        assert MESSAGES[2]["content"] == "history"
+
+    def test_no_breakpoints_for_string_prompts_or_when_disabled(self):
+        assert _client()._prepare_messages("hi") == ([{"role": "user", "content": "hi"}], None)
+        messages, system = _client(prompt_caching=False)._prepare_messages(MESSAGES)
+        assert system == "system prompt"
+        assert messages == MESSAGES[1:]
+
+    def test_cached_tokens_tracked(self):
+        client = _client()
+        client.client = MagicMock()
+        client.client.messages.create.return_value = _response(
+            10, 5, cache_read=900, cache_creation=100
+        )
+
+        client.completion(MESSAGES)
+        usage = client.get_last_usage()
+
+        assert usage.total_input_tokens == 1010
+        assert usage.cached_input_tokens == 900
+        assert usage.cache_write_tokens == 100
+        summary = client.get_usage_summary().model_usage_summaries["claude-test"]
+        assert summary.cached_input_tokens == 900
+
+    def test_usage_without_cache_fields(self):
+        client = _client()
+        client.client = MagicMock()
+        client.client.messages.create.return_value = _response(10, 5)
+
+        client.completion("hi")
+
+        usage = client.get_last_usage()
+        assert (usage.total_input_tokens, usage.cached_input_tokens) == (10, 0)
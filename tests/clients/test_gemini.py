@@ -1,7 +1,8 @@
 """Tests for the Gemini client."""
 
+import asyncio
 import os
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from dotenv import load_dotenv
@@ -121,6 +122,7 @@ class TestGeminiClientUnit:
         mock_response.text = "Hello from Gemini!"
         mock_response.usage_metadata.prompt_token_count = 10
         mock_response.usage_metadata.candidates_token_count = 5
+        mock_response.usage_metadata.cached_content_token_count = None
 
         with patch("rlm.clients.gemini.genai.Client") as mock_client_class:
             mock_client = MagicMock()
@@ -135,6 +137,83 @@ class TestGeminiClientUnit:
             assert client.model_input_tokens["gemini-2.5-flash"] == 10
             assert client.model_output_tokens["gemini-2.5-flash"] == 5
 
+    def test_acompletion_with_usage_returns_per_call_usage(self):
+        """Test async completion returns the usage of that call alongside the content."""
+        mock_response = MagicMock()
+        mock_response.text = "Hi"
+        mock_response.usage_metadata.prompt_token_count = 7
+        mock_response.usage_metadata.candidates_token_count = 3
+        mock_response.usage_metadata.cached_content_token_count = None
+
+        with patch("rlm.clients.gemini.genai.Client") as mock_client_class:
+            mock_client = MagicMock()
+            mock_client.aio.models.generate_content = AsyncMock(return_value=mock_response)
+            mock_client_class.return_value = mock_client
+
+            client = GeminiClient(api_key="test-key", model_name="gemini-2.5-flash")
+            content, usage = asyncio.run(client.acompletion_with_usage("Hello"))
+
+            assert content == "Hi"
+            assert usage == ModelUsageSummary(
+                total_calls=1, total_input_tokens=7, total_output_tokens=3
+            )
+
+    def test_cached_tokens_tracked(self):
+        """Test cached prompt tokens are reported in the usage."""
+        mock_response = MagicMock()
+        mock_response.text = "Hi"
+        mock_response.usage_metadata.prompt_token_count = 100
+        mock_response.usage_metadata.candidates_token_count = 3
+        mock_response.usage_metadata.cached_content_token_count = 80
+
+        with patch("rlm.clients.gemini.genai.Client") as mock_client_class:
+            mock_client_class.return_value.models.generate_content.return_value = mock_response
+            client = GeminiClient(api_key="test-key")
+            client.completion("Hello")
+
+            assert client.get_last_usage().cached_input_tokens == 80
+            summary = client.get_usage_summary().model_usage_summaries["gemini-2.5-flash"]
+            assert summary.cached_input_tokens == 80
+
+    def test_prompt_caching_reuses_cached_content(self):
+        """Test the system instruction is cached once and referenced by later calls."""
+        mock_response = MagicMock()
+        mock_response.usage_metadata = None
+        messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}]
+
+        with patch("rlm.clients.gemini.genai.Client") as mock_client_class:
+            mock_client = mock_client_class.return_value
+            mock_client.models.generate_content.return_value = mock_response
+            mock_client.caches.create.return_value.name = "cachedContents/abc"
+
+            client = GeminiClient(api_key="test-key", prompt_caching=True)
+            client.completion(messages)
+            client.completion(messages)
+
+            assert mock_client.caches.create.call_count == 1
+            config = mock_client.models.generate_content.call_args.kwargs["config"]
+            assert config.cached_content == "cachedContents/abc"
+            assert config.system_instruction is None
+
+    def test_prompt_caching_falls_back_when_not_cacheable(self):
+        """Test an instruction the API refuses to cache is sent inline, without retrying."""
+        mock_response = MagicMock()
+        mock_response.usage_metadata = None
+        messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}]
+
+        with patch("rlm.clients.gemini.genai.Client") as mock_client_class:
+            mock_client = mock_client_class.return_value
+            mock_client.models.generate_content.return_value = mock_response
+            mock_client.caches.create.side_effect = RuntimeError("too small to cache")
+
+            client = GeminiClient(api_key="test-key", prompt_caching=True)
+            client.completion(messages)
+            client.completion(messages)
+
+            assert mock_client.caches.create.call_count == 1
+            config = mock_client.models.generate_content.call_args.kwargs["config"]
+            assert config.system_instruction == "sys"
+
 
 class TestGeminiClientIntegration:
     """Integration tests that require a real API key."""
@@ -0,0 +1,122 @@
+"""Tests for the OpenAI client."""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from rlm.clients.openai import OpenAIClient
+
+MESSAGES = [
+    {"role": "system", "content": "system prompt"},
+    {"role": "assistant", "content": "metadata"},
+    {"role": "user", "content": "next step"},
+]
+
+
+def _response(cached_tokens=None):
+    details = SimpleNamespace(cached_tokens=cached_tokens) if cached_tokens is not None else None
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+        usage=SimpleNamespace(
+            prompt_tokens=1000,
+            completion_tokens=5,
+            total_tokens=1005,
+            prompt_tokens_details=details,
+        ),
+    )
+
+
+def _client(**kwargs):
+    with patch("rlm.clients.openai.openai"):
+        client = OpenAIClient(api_key="test-key", model_name="gpt-test", **kwargs)
+    client.client = MagicMock()
+    return client
+
+
+class TestOpenAIPromptCaching:
+    def test_prompt_cache_key_follows_stable_prefix(self):
+        client = _client()
+        client.client.chat.completions.create.return_value = _response()
+
+        client.completion(MESSAGES)
+        client.completion(MESSAGES[:2] + [{"role": "user", "content": "another step"}])
+        first, second = client.client.chat.completions.create.call_args_list
+
+        assert first.kwargs["prompt_cache_key"] == second.kwargs["prompt_cache_key"]
+
+    def test_no_prompt_cache_key_for_other_servers_or_string_prompts(self):
+        vllm = _client(base_url="http://localhost:8000/v1")
+        vllm.client.chat.completions.create.return_value = _response()
+        vllm.completion(MESSAGES)
+        assert "prompt_cache_key" not in vllm.client.chat.completions.create.call_args.kwargs
+
+        client = _client()
+        client.client.chat.completions.create.return_value = _response()
+        client.completion("hi")
+        assert "prompt_cache_key" not in client.client.chat.completions.create.call_args.kwargs
+
+    def test_cached_tokens_tracked(self):
+        client = _client()
+        client.client.chat.completions.create.return_value = _response(cached_tokens=768)
+
+        client.completion(MESSAGES)
+
+        assert client.get_last_usage().cached_input_tokens == 768
+        summary = client.get_usage_summary().model_usage_summaries["gpt-test"]
+        assert (summary.total_input_tokens, summary.cached_input_tokens) == (1000, 768)
+
+    def test_call_usage_comes_from_its_own_response(self):
+        client = _client()
+        client.async_client = MagicMock()
+        client.async_client.chat.completions.create = AsyncMock(return_value=_response(768))
+        # Another thread's call may have replaced the last usage in between
+        with patch.object(client, "get_last_usage", side_effect=AssertionError("shared state")):
+            _, usage = asyncio.run(client.acompletion_with_usage(MESSAGES))
+        assert (usage.total_input_tokens, usage.cached_input_tokens) == (1000, 768)
+
+
+def _chunk(text=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class _Stream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class TestOpenAIStreaming:
+    def test_stream_reports_provider_usage(self):
+        client = _client()
+        usage = SimpleNamespace(
+            prompt_tokens=50, completion_tokens=2, total_tokens=52, prompt_tokens_details=None
+        )
+        client.client.chat.completions.create.return_value = _Stream(
+            [_chunk("Hel"), _chunk("lo"), _chunk(usage=usage)]
+        )
+
+        stream = client.stream_completion(MESSAGES)
+        assert "".join(stream) == "Hello"
+        assert stream.usage == client.get_last_usage()
+        assert (stream.usage.total_input_tokens, stream.usage.total_output_tokens) == (50, 2)
+        assert client.client.chat.completions.create.call_args.kwargs["stream"] is True
+
+    def test_closing_early_stops_generation_and_estimates_usage(self):
+        client = _client()
+        response = _Stream([_chunk("a" * 40), _chunk("b" * 40), _chunk("c" * 40)])
+        client.client.chat.completions.create.return_value = response
+
+        stream = client.stream_completion(MESSAGES)
+        assert next(stream) == "a" * 40
+        stream.close()
+
+        assert response.closed
+        assert stream.usage.total_output_tokens == 11
+        assert client.model_call_counts["gpt-test"] == 1
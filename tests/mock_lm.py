@@ -24,4 +24,4 @@ class MockLM(BaseLM):
         )
 
     def get_last_usage(self):
-        return self.get_usage_summary()
+        return ModelUsageSummary(total_calls=1, total_input_tokens=10, total_output_tokens=10)
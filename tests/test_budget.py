@@ -0,0 +1,158 @@
+"""Tests for per-trajectory budgets."""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+import rlm.core.rlm as rlm_module
+from rlm import RLM
+from rlm.core.budget import Budget, BudgetExceededError, BudgetTracker, ModelPricing
+from rlm.core.compaction import SummarizeCompactor
+from rlm.core.types import ModelUsageSummary
+from tests.mock_lm import MockLM
+
+LOOP = "```repl\nresults = [llm_query(f'q{i}') for i in range(5)]\nprint(results)\n```"
+
+
+class ScriptedLM(MockLM):
+    """Answers every root prompt with `response`; sub-calls take `delay` seconds."""
+
+    def __init__(self, response, delay=0.0):
+        super().__init__()
+        self.response = response
+        self.delay = delay
+
+    def completion(self, prompt):
+        if isinstance(prompt, str):
+            time.sleep(self.delay)
+            return super().completion(prompt)
+        return self.response
+
+    async def acompletion(self, prompt):
+        if isinstance(prompt, str):
+            await asyncio.sleep(self.delay)
+            return super().completion(prompt)
+        return self.response
+
+
+def _rlm(budget, max_iterations=3, **kwargs):
+    return RLM(
+        backend="openai",
+        backend_kwargs={"model_name": "mock-model"},
+        max_iterations=max_iterations,
+        budget=budget,
+        **kwargs,
+    )
+
+
+class TestBudgetTracker:
+    def test_admit_refuses_once_sub_calls_are_used_up(self):
+        tracker = BudgetTracker(Budget(max_subcalls=2))
+        tracker.admit()
+        tracker.admit()
+        with pytest.raises(BudgetExceededError, match="max_subcalls \\(2\\)"):
+            tracker.admit()
+        report = tracker.report()
+        assert (report.subcalls, report.refused_subcalls) == (2, 1)
+        assert report.exhausted == "max_subcalls (2)"
+
+    def test_cost_from_pricing_table(self):
+        tracker = BudgetTracker(Budget(max_cost=1.0, pricing={"my-model": ModelPricing(2.0, 8.0)}))
+        tracker.charge("my-model", ModelUsageSummary(1, 250_000, 50_000))
+        assert tracker.report().cost == pytest.approx(0.9)
+        assert tracker.exhausted() is None
+        tracker.charge("my-model", ModelUsageSummary(1, 50_000, 0))
+        assert tracker.exhausted() == "max_cost ($1)"
+
+    def test_default_pricing_matches_dated_model_names_and_cached_input(self):
+        pricing = Budget().price_for("gpt-4o-mini-2024-07-18")
+        assert pricing == Budget().price_for("gpt-4o-mini")
+        usage = ModelUsageSummary(1, 1_000_000, 0, cached_input_tokens=1_000_000)
+        assert pricing.cost(usage) == pytest.approx(0.075)
+
+    def test_unpriced_models_are_reported(self):
+        tracker = BudgetTracker(Budget(max_cost=1.0))
+        tracker.charge("mystery-model", ModelUsageSummary(1, 10, 10))
+        assert tracker.report().unpriced_models == ["mystery-model"]
+
+    def test_wall_time(self):
+        tracker = BudgetTracker(Budget(max_wall_time=0.05))
+        assert tracker.remaining_time() > 0
+        time.sleep(0.06)
+        assert tracker.exhausted() == "max_wall_time (0.05s)"
+
+
+class TestRLMBudget:
+    def test_sub_calls_fail_fast_and_rlm_falls_back_to_default_answer(self):
+        lm = ScriptedLM(LOOP)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            result = _rlm(Budget(max_subcalls=2)).completion("ctx")
+
+        # One iteration, then the final-answer call instead of a second iteration
+        usage = result.usage_summary.model_usage_summaries["mock-model"]
+        assert usage.total_calls == 4
+        assert result.budget.subcalls == 2
+        assert result.budget.refused_subcalls == 3
+        assert result.budget.exhausted == "max_subcalls (2)"
+        assert result.to_dict()["budget"]["subcalls"] == 2
+
+    def test_refused_sub_calls_return_an_error_string(self):
+        response = "```repl\nanswers = [llm_query('a'), llm_query('b')]\n```\nFINAL_VAR(answers)"
+        with patch.object(rlm_module, "get_client", return_value=ScriptedLM(response)):
+            result = _rlm(Budget(max_subcalls=1)).completion("ctx")
+        first, second = eval(result.response)
+        assert first.startswith("Mock response")
+        assert second == "Error: Budget exhausted: max_subcalls (1) reached"
+
+    def test_tokens_include_root_calls(self):
+        lm = ScriptedLM(LOOP)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            result = _rlm(Budget(max_output_tokens=15)).completion("ctx")
+        # The root call (10 tokens) and the first sub-call (10) use it up
+        assert (result.budget.subcalls, result.budget.refused_subcalls) == (1, 4)
+        assert result.budget.exhausted == "max_output_tokens (15)"
+
+    @pytest.mark.parametrize("streaming", [False, True])
+    def test_no_root_call_once_compaction_uses_the_budget_up(self, streaming):
+        lm = ScriptedLM("still thinking")
+        compactor = SummarizeCompactor(max_tokens=1, keep_last=0)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            result = _rlm(
+                Budget(max_output_tokens=15), history_compactor=compactor, streaming=streaming
+            ).completion("ctx")
+        # The first root call (10 tokens) and the summary (10) use it up: only the final answer
+        # follows
+        assert result.usage_summary.model_usage_summaries["mock-model"].total_calls == 3
+        assert result.budget.exhausted == "max_output_tokens (15)"
+
+    def test_wall_time_caps_sub_call_waits(self):
+        lm = ScriptedLM(LOOP, delay=1.0)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            start = time.perf_counter()
+            result = _rlm(Budget(max_wall_time=0.2)).completion("ctx")
+        assert time.perf_counter() - start < 0.8
+        assert result.budget.exhausted == "max_wall_time (0.2s)"
+
+    def test_no_budget(self):
+        with patch.object(rlm_module, "get_client", return_value=ScriptedLM(LOOP)):
+            result = _rlm(None, max_iterations=1).completion("ctx")
+        assert result.budget is None
+        assert "budget" not in result.to_dict()
+
+    def test_async_completion_and_child_rlms_share_the_budget(self):
+        response = (
+            "```repl\n"
+            "if context == 'q':\n"
+            "    answer = llm_query_batched(['a', 'b'])\n"
+            "else:\n"
+            "    answer = [llm_query(context + str(i)) for i in range(3)]\n"
+            "```\nFINAL_VAR(answer)"
+        )
+        with patch.object(rlm_module, "get_client", return_value=ScriptedLM(response)):
+            rlm = _rlm(Budget(max_subcalls=5), max_depth=2)
+            result = asyncio.run(rlm.acompletion("q"))
+        # 2 children + the first 3 of their 6 plain sub-calls
+        assert result.budget.subcalls == 5
+        assert result.budget.refused_subcalls == 3
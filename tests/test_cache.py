@@ -0,0 +1,92 @@
+"""Tests for the sub-LM response cache."""
+
+import time
+
+from rlm.core.cache import ResponseCache, cache_key
+from rlm.core.comms_utils import LMRequest, send_lm_request, send_lm_request_batched
+from rlm.core.lm_handler import LMHandler
+from tests.mock_lm import MockLM
+
+
+class CountingMockLM(MockLM):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def acompletion(self, prompt):
+        self.calls += 1
+        return self.completion(prompt)
+
+
+class TestCacheKey:
+    def test_string_and_single_user_message_match(self):
+        assert cache_key("m", "hello ") == cache_key("m", [{"role": "user", "content": "hello"}])
+
+    def test_model_and_params_are_part_of_key(self):
+        assert cache_key("a", "hi") != cache_key("b", "hi")
+        assert cache_key("m", "hi", {"temperature": 0}) != cache_key("m", "hi", {"temperature": 1})
+
+
+class TestResponseCache:
+    def test_memory_lru_eviction(self):
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert cache.get("c") == "3"
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        cache = ResponseCache(path=path)
+        cache.put("k", "v")
+        cache.close()
+
+        reopened = ResponseCache(path=path)
+        assert reopened.get("k") == "v"
+        reopened.close()
+
+    def test_disk_tier_evicts_least_recently_used(self, tmp_path):
+        cache = ResponseCache(max_entries=1, path=str(tmp_path / "c.sqlite"), max_disk_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+
+    def test_max_age(self, tmp_path):
+        cache = ResponseCache(path=str(tmp_path / "c.sqlite"), max_age=0.05)
+        cache.put("k", "v")
+        assert cache.get("k") == "v"
+        time.sleep(0.1)
+        assert cache.get("k") is None
+        assert len(cache) == 0
+
+
+class TestHandlerCache:
+    def test_repeated_prompts_are_served_from_cache(self):
+        lm = CountingMockLM()
+        with LMHandler(lm, cache=ResponseCache()) as handler:
+            first = send_lm_request(handler.address, LMRequest(prompt="hello"))
+            second = send_lm_request(handler.address, LMRequest(prompt="hello"))
+            batched = send_lm_request_batched(handler.address, ["hello", "other"])
+            usage = handler.get_usage_summary()
+
+        assert lm.calls == 2
+        assert second.chat_completion.response == first.chat_completion.response
+        hit_usage = second.chat_completion.usage_summary
+        assert hit_usage.model_usage_summaries["mock-model"].total_calls == 0
+        assert hit_usage.handler_stats["mock-model"].cache_hits == 1
+        assert batched[0].chat_completion.usage_summary.handler_stats["mock-model"].cache_hits
+        assert usage.handler_stats["mock-model"].cache_hits == 2
+
+    def test_no_cache_by_default(self):
+        lm = CountingMockLM()
+        with LMHandler(lm) as handler:
+            send_lm_request(handler.address, LMRequest(prompt="hello"))
+            send_lm_request(handler.address, LMRequest(prompt="hello"))
+        assert lm.calls == 2
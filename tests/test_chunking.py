@@ -0,0 +1,135 @@
+"""Tests for the REPL's chunk_context helper."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from rlm.core.lazy_context import LazyContext
+from rlm.core.mapped_text import MappedText
+from rlm.environments.local_repl import LocalREPL
+from rlm.utils.chunking import (
+    CHARS_PER_TOKEN,
+    Chunk,
+    chunk_documents,
+    chunk_text,
+    sandbox_source,
+)
+
+TEXT = "\n\n".join(f"Paragraph {i}.\n" + "word " * (i % 7 + 3) for i in range(200))
+
+
+def _joined(text, offsets):
+    return "".join(text[start:end] for start, end in offsets)
+
+
+class TestChunkText:
+    @pytest.mark.parametrize("boundary", ["paragraph", "line", "header"])
+    def test_chunks_cover_the_text_within_the_budget(self, boundary):
+        offsets = chunk_text(TEXT, max_tokens=50, boundary=boundary)
+        assert _joined(TEXT, offsets) == TEXT
+        assert all(end - start <= 50 * CHARS_PER_TOKEN for start, end in offsets)
+
+    def test_cuts_at_the_requested_boundary(self):
+        offsets = chunk_text(TEXT, max_tokens=50)
+        assert all(TEXT[start:end].endswith("\n\n") for start, end in offsets[:-1])
+
+        text = "".join(f"# Section {i}\nline one\nline two\n" for i in range(50))
+        offsets = chunk_text(text, max_tokens=30, boundary="header")
+        assert all(text[start:end].startswith("# Section") for start, end in offsets)
+
+    def test_falls_back_to_a_hard_cut(self):
+        assert chunk_text("x" * 100, max_tokens=10) == [(0, 40), (40, 80), (80, 100)]
+        assert chunk_text("", max_tokens=10) == []
+
+    def test_overlap(self):
+        offsets = chunk_text(TEXT, max_tokens=50, overlap=10)
+        for (_, end), (start, _) in zip(offsets, offsets[1:], strict=False):
+            assert 0 < end - start <= 10 * CHARS_PER_TOKEN
+            assert TEXT[start - 1].isspace()
+
+    def test_bytes_are_cut_between_characters(self):
+        data = memoryview(("é" * 100).encode())
+        for start, end in chunk_text(data, max_tokens=5):
+            bytes(data[start:end]).decode()
+
+    @pytest.mark.parametrize(
+        "kwargs", [{"max_tokens": 0}, {"max_tokens": 10, "overlap": 10}, {"boundary": "page"}]
+    )
+    def test_rejects_bad_arguments(self, kwargs):
+        with pytest.raises(ValueError):
+            chunk_text(TEXT, **{"max_tokens": 10, **kwargs})
+
+
+class TestChunkDocuments:
+    def test_str_chunks_are_views(self):
+        chunks = chunk_documents(TEXT, max_tokens=50)
+        assert all(isinstance(chunk, Chunk) for chunk in chunks)
+        assert "".join(str(chunk) for chunk in chunks) == TEXT
+        chunk = chunks[1]
+        assert chunk.context is TEXT
+        assert f"<{chunk}>" == "<" + chunk + ">" == f"<{TEXT[chunk.start : chunk.end]}>"
+        assert len(chunk) == chunk.end - chunk.start
+        assert chunk.split() == TEXT[chunk.start : chunk.end].split()
+
+    def test_documents_are_packed_and_large_ones_split(self):
+        docs = ["a" * 30, "b" * 30, "c" * 30, "d" * 100, {"e": 1}]
+        chunks = chunk_documents(docs, max_tokens=20)
+        assert [chunk.spans for chunk in chunks] == [
+            [(0, 0, None), (1, 0, None)],
+            [(2, 0, None)],
+            [(3, 0, 80)],
+            [(3, 80, 100)],
+            [(4, 0, None)],
+        ]
+        assert str(chunks[0]) == "a" * 30 + "\n" + "b" * 30
+        assert str(chunks[-1]) == '{"e": 1}'
+
+    def test_split_document_is_serialized_once(self):
+        document = {"text": TEXT}
+        chunks = chunk_documents([document], max_tokens=50)
+        with patch("rlm.utils.chunking.json.dumps", wraps=json.dumps) as dumps:
+            texts = [str(chunk) for chunk in chunks]
+        # The split kept its serialization for all of the document's chunks
+        assert len(chunks) > 10
+        assert dumps.call_count == 0
+        assert "".join(texts) == json.dumps(document, ensure_ascii=False)
+
+    def test_dict(self):
+        chunks = chunk_documents({"x": "one", "y": "two"}, max_tokens=20)
+        assert [str(chunk) for chunk in chunks] == ["one\ntwo"]
+
+    def test_lazy_context_packs_from_its_index(self, tmp_path):
+        path = tmp_path / "docs.jsonl"
+        path.write_text("\n".join(json.dumps({"id": i}) for i in range(100)))
+        lazy = LazyContext.from_jsonl(path)
+        with patch.object(LazyContext, "chunks", side_effect=AssertionError("read a chunk")):
+            chunks = chunk_documents(lazy, max_tokens=50)
+        assert len(chunks) > 1
+        assert [json.loads(line) for chunk in chunks for line in str(chunk).splitlines()] == [
+            {"id": i} for i in range(100)
+        ]
+
+    def test_mapped_text_is_split_in_place(self, tmp_path):
+        path = tmp_path / "log.txt"
+        path.write_text(TEXT)
+        chunks = chunk_documents(MappedText(path), max_tokens=50)
+        assert "".join(str(chunk) for chunk in chunks) == TEXT
+
+
+class TestREPLHelper:
+    def test_local_repl(self):
+        repl = LocalREPL(context_payload=TEXT)
+        result = repl.execute_code(
+            "chunks = chunk_context(max_tokens=100)\n"
+            "print(len(chunks), ''.join(str(c) for c in chunks) == context)"
+        )
+        assert result.stdout == f"{len(chunk_text(TEXT, 100))} True\n"
+        assert "No context loaded" in LocalREPL().execute_code("chunk_context()").stderr
+        repl.cleanup()
+
+    def test_sandbox_source_runs_standalone(self):
+        sandbox = {"__name__": "sandbox"}
+        exec(sandbox_source(), sandbox)
+        chunks = sandbox["chunk_documents"](["one", "two"], max_tokens=10)
+        assert [str(chunk) for chunk in chunks] == ["one\ntwo"]
@@ -0,0 +1,124 @@
+"""Tests for root message-history compaction."""
+
+import asyncio
+from unittest.mock import patch
+
+import rlm.core.rlm as rlm_module
+from rlm import RLM
+from rlm.core.compaction import (
+    DropOutputsCompactor,
+    SlidingWindowCompactor,
+    SummarizeCompactor,
+)
+from tests.test_rlm_async import SleepyLM
+
+PREFIX = [{"role": "system", "content": "sys"}, {"role": "assistant", "content": "meta"}]
+NOISY = "```repl\nprint('x' * 4000)\n```"
+
+
+def _iteration(i):
+    return [
+        {"role": "assistant", "content": f"response {i}"},
+        {
+            "role": "user",
+            "content": f"Code executed:\n```python\ncode_{i}()\n```\n\nREPL output:\n{'y' * 400}",
+        },
+    ]
+
+
+def _history(n):
+    return PREFIX + [m for i in range(n) for m in _iteration(i)]
+
+
+class RecordingLM(SleepyLM):
+    """Records the size of every root prompt."""
+
+    def __init__(self, response=NOISY):
+        super().__init__(response=response)
+        self.root_prompt_chars = []
+
+    def _respond(self, prompt):
+        if not isinstance(prompt, str):
+            self.root_prompt_chars.append(sum(len(m["content"]) for m in prompt))
+        return super()._respond(prompt)
+
+
+def _rlm(**kwargs):
+    return RLM(
+        backend="openai", backend_kwargs={"model_name": "mock-model"}, max_iterations=8, **kwargs
+    )
+
+
+class TestStrategies:
+    def test_split_keeps_prefix_and_last_iterations(self):
+        prefix, old, recent = SlidingWindowCompactor(keep_last=2).split(_history(5), len(PREFIX))
+        assert prefix == PREFIX
+        assert old == [m for i in range(3) for m in _iteration(i)]
+        assert recent == [m for i in range(3, 5) for m in _iteration(i)]
+
+    def test_split_with_too_few_iterations(self):
+        _, old, recent = SlidingWindowCompactor(keep_last=3).split(_history(2), len(PREFIX))
+        assert old == []
+        assert len(recent) == 4
+
+    def test_should_compact_on_budget(self):
+        compactor = SlidingWindowCompactor(max_tokens=500)
+        assert not compactor.should_compact(_history(2))
+        assert compactor.should_compact(_history(10))
+
+    def test_sliding_window_leaves_note(self):
+        (note,) = SlidingWindowCompactor().rewrite(_history(3)[2:], None)
+        assert note["role"] == "user"
+        assert "SHOW_VARS()" in note["content"]
+
+    def test_drop_outputs_keeps_code(self):
+        compactor = DropOutputsCompactor()
+        rewritten = compactor.rewrite(_iteration(0), None)
+        assert rewritten[0] == _iteration(0)[0]
+        assert "code_0()" in rewritten[1]["content"]
+        assert "y" * 400 not in rewritten[1]["content"]
+        assert "[400 chars omitted" in rewritten[1]["content"]
+        assert compactor.rewrite(rewritten, None) == rewritten
+
+    def test_summarize_prompt_and_rewrite(self):
+        compactor = SummarizeCompactor(model="cheap", max_summary_chars=10)
+        assert "response 0" in compactor.summary_prompt(_iteration(0))
+        (summary,) = compactor.rewrite(_iteration(0), "s" * 50)
+        assert summary["content"].endswith("\n" + "s" * 10)
+
+
+class TestRLMCompaction:
+    def test_history_stays_within_budget(self):
+        uncompacted, compacted = RecordingLM(), RecordingLM()
+        with patch.object(rlm_module, "get_client", return_value=uncompacted):
+            _rlm().completion("ctx")
+        with patch.object(rlm_module, "get_client", return_value=compacted):
+            _rlm(history_compactor=SlidingWindowCompactor(max_tokens=3000, keep_last=1)).completion(
+                "ctx"
+            )
+
+        assert compacted.root_prompt_chars[-1] < uncompacted.root_prompt_chars[-1] / 2
+
+    def test_compaction_is_logged_on_iteration(self):
+        iterations = []
+        with patch.object(rlm_module, "get_client", return_value=RecordingLM()):
+            rlm = _rlm(history_compactor=DropOutputsCompactor(max_tokens=2000, keep_last=1))
+            with patch.object(
+                rlm, "_record_iteration", side_effect=lambda it, *a: iterations.append(it)
+            ):
+                rlm.completion("ctx")
+
+        compactions = [it.compaction for it in iterations if it.compaction is not None]
+        assert compactions
+        assert all(c.tokens_saved > 0 and c.compaction_time >= 0 for c in compactions)
+        assert compactions[0].to_dict()["strategy"] == "drop_outputs"
+
+    def test_summary_call_counts_towards_usage(self):
+        lm = RecordingLM()
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            compactor = SummarizeCompactor(max_tokens=3000, keep_last=1)
+            result = asyncio.run(_rlm(history_compactor=compactor).acompletion("ctx"))
+
+        summaries = lm.calls - len(lm.root_prompt_chars)
+        assert summaries > 0
+        assert result.usage_summary.model_usage_summaries["mock-model"].total_calls == lm.calls
@@ -0,0 +1,130 @@
+"""Tests for the REPL's context search index."""
+
+import json
+import re
+from unittest.mock import patch
+
+import pytest
+
+from rlm.core.lazy_context import LazyContext
+from rlm.core.mapped_text import MappedText
+from rlm.environments.local_repl import LocalREPL
+from rlm.utils.code_analysis import analyze_code_block
+from rlm.utils.context_search import SearchIndex, SearchIndexCache, _required_words
+
+TEXT = "\n\n".join(
+    [
+        "The harbour master logged three ships at dawn.",
+        "Lunch was soup. The soup was cold.",
+        "Error 42: the lighthouse lamp failed at midnight.",
+        "Ships ships ships, the harbour was busy all week.",
+    ]
+)
+
+
+class TestSearchIndex:
+    def test_bm25_ranks_passages(self):
+        index = SearchIndex(TEXT, passage_chars=40)
+        hits = index.search("ships harbour", k=2)
+        assert [hit["text"].split()[0] for hit in hits] == ["Ships", "The"]
+        assert hits[0]["score"] > hits[1]["score"]
+        assert TEXT[hits[0]["start"] : hits[0]["end"]] == hits[0]["text"]
+        assert index.search("submarine") == []
+
+    def test_long_paragraphs_are_cut(self):
+        text = "word " * 1000
+        index = SearchIndex(text, passage_chars=100)
+        assert all(p.end - p.start <= 100 for p in index.passages)
+        assert "".join(index.passage_text(p) for p in index.passages) == text
+
+    def test_documents_keep_their_keys(self):
+        docs = {"a": "cats and dogs", "b": {"note": "only dogs here"}}
+        hits = SearchIndex(docs).search("cats")
+        assert [hit["key"] for hit in hits] == ["a"]
+        hits = SearchIndex(["x", "y", "dogs"]).search("dogs")
+        assert hits[0]["key"] == 2 and hits[0]["text"] == "dogs"
+
+    @pytest.mark.parametrize(
+        "pattern, words",
+        [
+            (r"\blighthouse\b", ["lighthouse"]),
+            (r"the lighthouse lamp", ["lighthouse"]),
+            (r"Error \d+: the", []),
+            (r"lamp|ships", []),
+            (r"(lamp) failed", []),
+        ],
+    )
+    def test_required_words(self, pattern, words):
+        assert _required_words(pattern, 0) == words
+
+    def test_grep_matches_a_plain_scan(self):
+        index = SearchIndex(TEXT, passage_chars=40)
+        for pattern in [r"\bships\b", r"the lighthouse lamp", r"s\w+p", r"(?i)SHIPS"]:
+            hits = index.grep(pattern)
+            assert [hit["match"] for hit in hits] == re.findall(pattern, TEXT)
+        assert index.candidates(r"\bsubmarine\b") == []
+
+    def test_mapped_text(self, tmp_path):
+        path = tmp_path / "log.txt"
+        path.write_bytes(TEXT.encode())
+        mapped = MappedText(path)
+        index = SearchIndex(mapped, passage_chars=40)
+        hit = index.search("lighthouse")[0]
+        assert hit["text"].startswith("Error 42")
+        assert mapped[hit["start"] : hit["end"]] == hit["text"]
+        assert [hit["match"] for hit in index.grep(r"\d+")] == ["42"]
+
+    def test_mapped_text_grep_with_a_non_ascii_word(self, tmp_path):
+        path = tmp_path / "menu.txt"
+        path.write_bytes("Un café noir.\n\nUn thé vert.".encode())
+        index = SearchIndex(MappedText(path))
+        assert index.candidates(r"\bcafé noir") is None
+        assert [hit["match"] for hit in index.grep(r"\bcafé noir")] == ["café noir"]
+
+    def test_hits_serialize_each_document_once(self):
+        docs = [{"note": "alpha " * 50 + "\n\n" + "alpha " * 50}]
+        index = SearchIndex(docs, passage_chars=100)
+        with patch("rlm.utils.context_search.json.dumps", wraps=json.dumps) as dumps:
+            hits = index.grep(r"\balpha\b")
+            assert len({hit["start"] for hit in hits}) > 1
+            assert len(index.search("alpha")) > 1
+        assert dumps.call_count == 2
+
+    def test_cached_per_context(self, tmp_path):
+        cache = SearchIndexCache()
+        first = cache.get(TEXT)
+        assert cache.get("".join(TEXT)) is first
+        assert cache.get(TEXT + ".") is not first
+
+        path = tmp_path / "docs.jsonl"
+        path.write_text('{"t": "alpha"}\n{"t": "beta"}\n')
+        lazy = cache.get(LazyContext.from_jsonl(path))
+        assert cache.get(LazyContext.from_jsonl(path)) is lazy
+        assert lazy.search("beta")[0]["key"] == 1
+
+        cache.clear()
+        assert len(cache) == 0 and cache.get(TEXT) is not first
+
+
+class TestREPLHelpers:
+    def test_search_and_grep_context(self):
+        repl = LocalREPL(context_payload=TEXT)
+        result = repl.execute_code(
+            "hits = search_context('lighthouse', k=1)\n"
+            "print(hits[0]['start'], hits[0]['end'])\n"
+            "print([h['match'] for h in grep_context(r'\\bsoup\\b')])"
+        )
+        # Short paragraphs are merged into one passage
+        assert result.stdout == f"0 {len(TEXT)}\n['soup', 'soup']\n"
+        # The REPL's indexes (and the contexts they hold) go with it
+        assert len(repl._search_indexes) == 1
+        repl.cleanup()
+        assert len(repl._search_indexes) == 0
+
+    def test_no_context(self):
+        repl = LocalREPL()
+        assert "No context loaded" in repl.execute_code("search_context('x')").stderr
+        repl.cleanup()
+
+    def test_code_analysis_sees_the_implicit_context_read(self):
+        assert "context" in analyze_code_block("hits = search_context('x')").reads
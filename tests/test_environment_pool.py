@@ -0,0 +1,164 @@
+"""Tests for EnvironmentPool and pooled environments in RLM."""
+
+import shutil
+import subprocess
+import time
+from unittest.mock import patch
+
+import pytest
+
+import rlm.core.rlm as rlm_module
+from rlm import RLM
+from rlm.environments import EnvironmentPool, LocalREPL, SupportsReuse
+from tests.test_rlm_async import SleepyLM
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class TestLocalREPLReuse:
+    def test_supports_reuse(self):
+        with LocalREPL() as repl:
+            assert isinstance(repl, SupportsReuse)
+            assert repl.is_healthy()
+        assert not repl.is_healthy()
+
+
+class TestEnvironmentPool:
+    def test_warms_in_background(self):
+        with EnvironmentPool("local", size=2) as pool:
+            _wait_for(lambda: len(pool) == 2)
+            assert pool.created == 2
+
+    def test_reuses_released_environment(self):
+        with EnvironmentPool("local", size=1, warm=False) as pool:
+            first = pool.lease("ctx-1")
+            pool.release(first)
+            second = pool.lease("ctx-2")
+            assert second is first
+            assert second.execute_code("print(context)").stdout.strip() == "ctx-2"
+            pool.release(second)
+            assert pool.created == 1
+
+    def test_release_resets_namespace(self):
+        with EnvironmentPool("local", size=1, warm=False) as pool:
+            with pool.leased("ctx") as repl:
+                repl.execute_code("secret = 42")
+                repl.execute_code("open('scratch.txt', 'w').write('x')")
+            with pool.leased("other") as repl:
+                result = repl.execute_code("print(secret)")
+                assert "NameError" in result.stderr
+                assert "FileNotFoundError" in repl.execute_code("open('scratch.txt')").stderr
+
+    def test_release_reruns_setup_code(self):
+        with EnvironmentPool("local", {"setup_code": "HELPER = 1"}, size=1, warm=False) as pool:
+            for _ in range(2):
+                with pool.leased("ctx") as repl:
+                    assert repl.execute_code("print(HELPER)").stdout.strip() == "1"
+            assert pool.created == 1
+
+    def test_recycles_after_max_uses(self):
+        with EnvironmentPool("local", size=1, max_uses=2, warm=False) as pool:
+            first = pool.lease()
+            pool.release(first)
+            assert pool.lease() is first
+            pool.release(first)
+            third = pool.lease()
+            assert third is not first
+            assert pool.recycled == 1
+            pool.release(third)
+
+    def test_recycles_after_max_age(self):
+        with EnvironmentPool("local", size=1, max_age=0.05, warm=False) as pool:
+            first = pool.lease()
+            pool.release(first)
+            time.sleep(0.1)
+            second = pool.lease()
+            assert second is not first
+            pool.release(second)
+
+    def test_discards_unhealthy(self):
+        with EnvironmentPool("local", size=1, warm=False) as pool:
+            first = pool.lease()
+            pool.release(first)
+            shutil.rmtree(first.temp_dir)
+            second = pool.lease()
+            assert second is not first
+            assert pool.recycled == 1
+            pool.release(second)
+
+    def test_release_discard(self):
+        with EnvironmentPool("local", size=1, warm=False) as pool:
+            repl = pool.lease()
+            pool.release(repl, discard=True)
+            assert len(pool) == 0
+            assert not repl.is_healthy()
+
+    def test_keeps_at_most_size_idle(self):
+        with EnvironmentPool("local", size=1, warm=False) as pool:
+            first, second = pool.lease(), pool.lease()
+            pool.release(first)
+            pool.release(second)
+            assert len(pool) == 1
+            assert not second.is_healthy()
+
+    def test_close_cleans_up(self):
+        pool = EnvironmentPool("local", size=2)
+        _wait_for(lambda: len(pool) == 2)
+        idle = [slot.environment for slot in pool._idle]
+        pool.close()
+        assert not any(repl.is_healthy() for repl in idle)
+        with pytest.raises(RuntimeError, match="closed"):
+            pool.lease()
+
+
+class TestRLMEnvironmentPool:
+    def _rlm(self, **kwargs):
+        return RLM(
+            backend="openai",
+            backend_kwargs={"model_name": "mock-model"},
+            environment_pool_kwargs={"size": 1, "warm": False},
+            **kwargs,
+        )
+
+    def test_completions_share_pooled_environment(self):
+        code = "```repl\nprint(context)\nleak = 1\n```\nFINAL(done)"
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM(response=code)):
+            with self._rlm() as rlm:
+                rlm.completion("first")
+                rlm.completion("second")
+                pool = rlm._environment_pool
+                assert pool.created == 1
+                repl = pool._idle[0].environment
+                assert "leak" not in repl.locals
+            assert rlm._environment_pool is None
+            assert not repl.is_healthy()
+
+    def test_completion_many_uses_configured_pool(self):
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM()):
+            with self._rlm() as rlm:
+                batch = rlm.completion_many(["a", "b", "c"], concurrency=1)
+                assert [c.response for c in batch.completions] == ["a", "b", "c"]
+                assert rlm._environment_pool.created == 1
+
+
+@pytest.mark.skipif(shutil.which("docker") is None, reason="docker not available")
+class TestDockerPool:
+    @pytest.fixture(autouse=True)
+    def _docker_running(self):
+        if subprocess.run(["docker", "info"], capture_output=True).returncode != 0:
+            pytest.skip("docker daemon not running")
+
+    def test_lease_reset_reuse(self):
+        with EnvironmentPool("docker", size=1, warm=False) as pool:
+            with pool.leased("ctx") as repl:
+                assert repl.is_healthy()
+                repl.execute_code("secret = 42")
+            with pool.leased("other") as again:
+                assert again is repl
+                assert "NameError" in again.execute_code("print(secret)").stderr
+                assert again.execute_code("print(context)").stdout.strip() == "other"
@@ -0,0 +1,118 @@
+"""Tests for hedged and deadline-aware sub-calls in LMHandler."""
+
+import asyncio
+import time
+
+from rlm.core.comms_utils import LMRequest, send_lm_request, send_lm_request_batched
+from rlm.core.hedging import HedgePolicy, LatencyTracker
+from rlm.core.lm_handler import LMHandler
+from rlm.core.types import ModelUsageSummary
+from tests.mock_lm import MockLM
+
+
+class ScriptedLM(MockLM):
+    """Sleeps for the next delay in `delays` on each call (the last one repeats)."""
+
+    def __init__(self, delays, model_name="mock-model"):
+        super().__init__()
+        self.model_name = model_name
+        self.delays = list(delays)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def acompletion_with_usage(self, prompt):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"{self.model_name}: {prompt}", ModelUsageSummary(1, 10, 1)
+
+
+class TestLatencyTracker:
+    def test_no_hedging_until_min_samples(self):
+        tracker = LatencyTracker(HedgePolicy(min_samples=3))
+        tracker.record("m", 1.0)
+        tracker.record("m", 2.0)
+        assert tracker.hedge_delay("m") is None
+        tracker.record("m", 3.0)
+        assert tracker.hedge_delay("m") == 3.0
+
+    def test_percentile_and_min_delay(self):
+        tracker = LatencyTracker(HedgePolicy(percentile=50, min_samples=1, min_delay=0.5))
+        for latency in [0.1, 0.2, 0.3, 0.4]:
+            tracker.record("m", latency)
+        assert tracker.hedge_delay("m") == 0.5
+        tracker.policy.min_delay = 0.0
+        assert tracker.hedge_delay("m") == 0.2
+
+
+class TestDeadlines:
+    def test_late_call_fails_and_is_cancelled(self):
+        lm = ScriptedLM([2.0])
+        with LMHandler(lm) as handler:
+            start = time.perf_counter()
+            response = send_lm_request(handler.address, LMRequest(prompt="p", deadline=0.1))
+            elapsed = time.perf_counter() - start
+            time.sleep(0.05)
+            stats = handler.get_usage_summary().handler_stats["mock-model"]
+
+        assert not response.success
+        assert "deadline" in response.error
+        assert elapsed < 1.0
+        assert lm.cancelled == 1
+        assert stats.deadline_exceeded == 1
+
+    def test_default_deadline(self):
+        with LMHandler(ScriptedLM([2.0]), default_deadline=0.1) as handler:
+            responses = send_lm_request_batched(handler.address, ["a", "b"])
+        assert all("deadline" in r.error for r in responses)
+
+    def test_call_within_deadline_succeeds(self):
+        with LMHandler(ScriptedLM([0.0])) as handler:
+            response = send_lm_request(handler.address, LMRequest(prompt="p", deadline=1.0))
+        assert response.success
+
+
+class TestHedging:
+    POLICY = HedgePolicy(percentile=95, min_samples=1, min_delay=0.05)
+
+    def test_slow_call_is_hedged_and_hedge_wins(self):
+        lm = ScriptedLM([0.0, 2.0, 0.0])  # warm-up, slow primary, fast hedge
+        with LMHandler(lm, hedge=self.POLICY) as handler:
+            send_lm_request(handler.address, LMRequest(prompt="warm-up"))
+            start = time.perf_counter()
+            response = send_lm_request(handler.address, LMRequest(prompt="p"))
+            elapsed = time.perf_counter() - start
+            stats = handler.get_usage_summary().handler_stats["mock-model"]
+
+        assert response.success
+        assert elapsed < 1.0
+        assert lm.calls == 3
+        assert lm.cancelled == 1  # the losing primary
+        assert stats.hedged_requests == 1
+        assert stats.hedge_wins == 1
+        assert stats.hedge_estimated_input_tokens > 0
+
+    def test_fast_calls_are_not_hedged(self):
+        lm = ScriptedLM([0.0])
+        with LMHandler(lm, hedge=self.POLICY) as handler:
+            for _ in range(3):
+                send_lm_request(handler.address, LMRequest(prompt="p"))
+            stats = handler.get_usage_summary().handler_stats["mock-model"]
+        assert lm.calls == 3
+        assert stats.hedged_requests == 0
+
+    def test_hedge_to_alternate_client(self):
+        primary = ScriptedLM([0.0, 2.0])
+        alternate = ScriptedLM([0.0], model_name="backup-model")
+        policy = HedgePolicy(min_samples=1, min_delay=0.05, alternate_model="backup-model")
+        with LMHandler(primary, hedge=policy) as handler:
+            handler.register_client("backup-model", alternate)
+            send_lm_request(handler.address, LMRequest(prompt="warm-up"))
+            response = send_lm_request(handler.address, LMRequest(prompt="p"))
+
+        assert response.chat_completion.response == "backup-model: p"
+        assert "backup-model" in response.chat_completion.usage_summary.model_usage_summaries
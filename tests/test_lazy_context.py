@@ -0,0 +1,118 @@
+"""Tests for lazily loaded, file-backed contexts."""
+
+import json
+import threading
+import urllib.request
+from http.server import HTTPServer
+from unittest.mock import patch
+
+import pytest
+
+import rlm.core.rlm as rlm_module
+from rlm import RLM
+from rlm.core.lazy_context import SANDBOX_LAZY_CONTEXT, LazyContext
+from rlm.core.types import QueryMetadata
+from rlm.environments.docker_repl import LLMProxyHandler
+from rlm.environments.local_repl import LocalREPL
+from tests.mock_lm import MockLM
+
+LINES = [json.dumps({"id": i, "text": "word " * i}) for i in range(50)]
+
+
+@pytest.fixture
+def jsonl(tmp_path):
+    path = tmp_path / "docs.jsonl"
+    # Blank lines in the middle (one of them long) and no trailing newline
+    path.write_text("\n".join(LINES[:10] + ["", " \t" * 20 + "\r"] + LINES[10:]))
+    return LazyContext.from_jsonl(path)
+
+
+class TestLazyContext:
+    def test_jsonl_index(self, jsonl):
+        assert len(jsonl) == 50
+        assert jsonl.lengths == [len(line) for line in LINES]
+        assert jsonl[0] == {"id": 0, "text": ""}
+        assert jsonl[-1]["id"] == 49
+        assert [doc["id"] for doc in jsonl[10:40:10]] == [10, 20, 30]
+        assert [doc["id"] for doc in jsonl] == list(range(50))
+        with pytest.raises(IndexError):
+            jsonl[50]
+
+    def test_directory(self, tmp_path):
+        (tmp_path / "sub").mkdir()
+        for name, text in [("b.txt", "bee"), ("a.txt", "ay"), ("sub/c.txt", "sea"), ("d.md", "")]:
+            (tmp_path / name).write_text(text)
+
+        context = LazyContext.from_directory(tmp_path, "*.txt")
+        assert list(context) == ["ay", "bee"]
+        assert context.lengths == [2, 3]
+
+        context = LazyContext.from_directory(tmp_path, "*.txt", recursive=True)
+        assert list(context) == ["ay", "bee", "sea"]
+
+    def test_query_metadata_uses_the_index(self, jsonl):
+        with patch.object(LazyContext, "chunks", side_effect=AssertionError("read a chunk")):
+            metadata = QueryMetadata(jsonl)
+        assert metadata.context_lengths == jsonl.lengths
+        assert metadata.context_total_length == jsonl.total_length
+        assert metadata.context_type.startswith("LazyContext")
+
+    def test_local_repl_binds_it_as_is(self, jsonl):
+        repl = LocalREPL(context_payload=jsonl)
+        assert repl.locals["context"] is jsonl
+        result = repl.execute_code("print(len(context), context[3]['id'])")
+        assert result.stdout == "50 3\n"
+        repl.cleanup()
+
+    def test_rlm_completion(self, jsonl):
+        class ScriptedLM(MockLM):
+            def completion(self, prompt):
+                return "```repl\nanswer = context[7]['id']\n```\nFINAL_VAR(answer)"
+
+        with patch.object(rlm_module, "get_client", return_value=ScriptedLM()):
+            result = RLM(backend="openai", backend_kwargs={"model_name": "mock-model"}).completion(
+                jsonl
+            )
+        assert result.response == "7"
+        assert json.loads(json.dumps(result.to_dict()))["prompt"] == repr(jsonl)
+
+
+class TestSandboxLazyContext:
+    def test_stand_in_fetches_from_the_host_and_survives_saved_state(self, jsonl, tmp_path):
+        fetched = []
+
+        def fetch(start, stop):
+            fetched.append((start, stop))
+            return jsonl.chunks(start, stop)
+
+        metadata_file = tmp_path / "lazy_context.json"
+        metadata_file.write_text(json.dumps(jsonl.metadata()))
+        sandbox = {"json": json, "_fetch_context": fetch, "LAZY_CONTEXT_FILE": str(metadata_file)}
+        exec(SANDBOX_LAZY_CONTEXT, sandbox)
+
+        context = sandbox["LazyContext"].from_host()
+        assert len(context) == 50 and context[5] == jsonl[5]
+        assert [doc["id"] for doc in context] == list(range(50))
+        assert fetched[0] == (5, 6) and (32, 50) in fetched
+
+        state = {"context": context, "docs": context, "n": 1}
+        saved = {k: sandbox["_persistable"](v) for k, v in state.items()}
+        assert saved["n"] == 1 and isinstance(saved["context"], str)
+        restored = sandbox["_restore_lazy_contexts"](saved)
+        assert restored["docs"][1] == jsonl[1]
+
+    def test_docker_proxy_serves_chunks(self, jsonl):
+        handler = type("Handler", (LLMProxyHandler,), {"lazy_context": jsonl})
+        server = HTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{server.server_address[1]}/context",
+                data=json.dumps({"start": 2, "stop": 4}).encode(),
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(request) as response:
+                assert json.loads(response.read()) == {"chunks": jsonl[2:4]}
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,374 @@
+"""Tests for LMHandler and the socket protocol helpers in comms_utils."""
+
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from rlm.core.comms_utils import (
+    LMConnection,
+    LMRequest,
+    send_lm_request,
+    send_lm_request_batched,
+    send_lm_request_batched_iter,
+    socket_recv,
+    socket_recv_frame,
+    socket_send,
+)
+from rlm.core.lm_handler import LMHandler
+from rlm.core.types import ModelUsageSummary
+from rlm.environments.local_repl import LocalREPL
+from tests.mock_lm import MockLM
+
+
+class SlowMockLM(MockLM):
+    """Mock LM that sleeps for the number of seconds given at the start of the prompt."""
+
+    async def acompletion(self, prompt):
+        await asyncio.sleep(float(prompt.split()[0]))
+        return self.completion(prompt)
+
+
+class CountingSlowMockLM(SlowMockLM):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def acompletion(self, prompt):
+        self.calls += 1
+        return await super().acompletion(prompt)
+
+
+class TestFraming:
+    """Length-prefixed frames in JSON or msgpack."""
+
+    @pytest.mark.parametrize("codec", ["json", "msgpack"])
+    def test_large_frame_roundtrip(self, codec):
+        if codec == "msgpack":
+            pytest.importorskip("msgpack")
+        data = {"prompt": "x" * 3_000_000, "depth": 1}
+        a, b = socket.socketpair()
+        with a, b:
+            sender = threading.Thread(target=socket_send, args=(a, data, codec))
+            sender.start()
+            assert socket_recv(b) == data
+            sender.join()
+
+    def test_recv_returns_empty_on_clean_close(self):
+        a, b = socket.socketpair()
+        a.close()
+        with b:
+            assert socket_recv(b) == {}
+
+    def test_handler_answers_in_request_codec(self):
+        pytest.importorskip("msgpack")
+        with LMHandler(MockLM()) as handler:
+            for codec in ("json", "msgpack"):
+                with socket.create_connection(handler.address) as sock:
+                    socket_send(sock, LMRequest(prompt=f"via {codec}").to_dict(), codec)
+                    response, response_codec = socket_recv_frame(sock)
+                assert response_codec == codec
+                assert response["chat_completion"]["response"].endswith(codec)
+            with LMConnection(handler.address, codec="json") as conn:
+                assert conn.request(LMRequest(prompt="p").to_dict())["chat_completion"]
+
+
+class TestOneShotConnections:
+    """One request per socket (legacy clients, e.g. REPL scripts)."""
+
+    def test_single_request(self):
+        with LMHandler(MockLM()) as handler:
+            response = send_lm_request(handler.address, LMRequest(prompt="hello"))
+        assert response.success
+        assert response.chat_completion.response == "Mock response to: hello"
+        assert response.request_id is None
+
+    def test_batched_request(self):
+        with LMHandler(MockLM()) as handler:
+            responses = send_lm_request_batched(handler.address, ["a", "b", "c"])
+        assert [r.chat_completion.response for r in responses] == [
+            "Mock response to: a",
+            "Mock response to: b",
+            "Mock response to: c",
+        ]
+
+
+class TestAsyncServer:
+    """The handler serves every connection from one event loop."""
+
+    def test_batched_prompts_run_concurrently(self):
+        with LMHandler(SlowMockLM()) as handler:
+            start = time.perf_counter()
+            responses = send_lm_request_batched(handler.address, [f"0.3 p{i}" for i in range(20)])
+            elapsed = time.perf_counter() - start
+        assert all(r.success for r in responses)
+        assert elapsed < 1.5
+
+    def test_many_one_shot_connections_concurrently(self):
+        results = {}
+
+        with LMHandler(SlowMockLM()) as handler:
+
+            def worker(i):
+                response = send_lm_request(handler.address, LMRequest(prompt=f"0.2 one-shot-{i}"))
+                results[i] = response.chat_completion.response
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(25)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+
+        assert elapsed < 2.0
+        assert all(results[i].endswith(f"one-shot-{i}") for i in range(25))
+
+    def test_restart_after_stop(self):
+        handler = LMHandler(MockLM())
+        handler.start()
+        handler.stop()
+        handler.start()
+        assert send_lm_request(handler.address, LMRequest(prompt="again")).success
+        handler.stop()
+
+    def test_invalid_request(self):
+        with LMHandler(MockLM()) as handler:
+            response = send_lm_request(handler.address, LMRequest())
+        assert not response.success
+        assert "Missing" in response.error
+
+    def test_run_waits_for_a_coroutine_on_the_loop(self):
+        async def loop_thread():
+            await asyncio.sleep(0)
+            return threading.current_thread()
+
+        async def nested():
+            # From the loop itself, run() would deadlock
+            return handler.run(loop_thread())
+
+        with LMHandler(MockLM()) as handler:
+            assert handler.run(loop_thread()) is handler._thread
+            with pytest.raises(RuntimeError, match="own loop"):
+                handler.run(nested())
+        with pytest.raises(RuntimeError):
+            handler.run(loop_thread())
+
+
+class TestMultiplexedConnections:
+    """Many requests sharing one long-lived LMConnection."""
+
+    def test_sequential_requests_reuse_socket(self):
+        with LMHandler(MockLM()) as handler, LMConnection(handler.address) as conn:
+            first = send_lm_request(handler.address, LMRequest(prompt="one"), connection=conn)
+            sock = conn._sock
+            second = send_lm_request(handler.address, LMRequest(prompt="two"), connection=conn)
+            assert conn._sock is sock
+        assert first.chat_completion.response == "Mock response to: one"
+        assert second.chat_completion.response == "Mock response to: two"
+
+    def test_responses_arrive_out_of_order(self):
+        with LMHandler(SlowMockLM()) as handler, LMConnection(handler.address) as conn:
+            slow = conn.submit(LMRequest(prompt="0.5 slow").to_dict())
+            fast = conn.submit(LMRequest(prompt="0 fast").to_dict())
+
+            fast_result = fast.result(timeout=5)
+            assert not slow.done()
+            slow_result = slow.result(timeout=5)
+
+        assert fast_result["chat_completion"]["response"].endswith("fast")
+        assert slow_result["chat_completion"]["response"].endswith("slow")
+
+    def test_concurrent_threads_share_connection(self):
+        results = {}
+
+        with LMHandler(SlowMockLM()) as handler, LMConnection(handler.address) as conn:
+
+            def worker(i):
+                request = LMRequest(prompt=f"0.2 prompt-{i}")
+                response = send_lm_request(handler.address, request, connection=conn)
+                results[i] = response.chat_completion.response
+
+            start = time.perf_counter()
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(10)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+
+        assert elapsed < 1.5  # requests were served concurrently, not one after another
+        for i in range(10):
+            assert results[i].endswith(f"prompt-{i}")
+
+    def test_requests_fail_after_handler_stop(self):
+        handler = LMHandler(MockLM())
+        handler.start()
+        conn = LMConnection(handler.address)
+        assert send_lm_request(handler.address, LMRequest(prompt="x"), connection=conn).success
+
+        handler.stop()
+        failed = send_lm_request(handler.address, LMRequest(prompt="y"), connection=conn)
+        assert not failed.success
+        conn.close()
+
+
+class TestStreamedBatches:
+    """llm_query_batched_iter: one frame per prompt, in completion order."""
+
+    PROMPTS = ["0.4 slow", "0 fast", "0.2 medium"]
+
+    def test_one_shot_stream_yields_in_completion_order(self):
+        with LMHandler(SlowMockLM()) as handler:
+            results = list(send_lm_request_batched_iter(handler.address, self.PROMPTS))
+        assert [index for index, _ in results] == [1, 2, 0]
+        for index, response in results:
+            assert response.index == index
+            assert response.chat_completion.response.endswith(self.PROMPTS[index])
+        # Each frame is timed individually, not as a share of the whole batch.
+        assert dict(results)[1].chat_completion.execution_time < 0.1
+
+    def test_multiplexed_stream_interleaves_with_other_requests(self):
+        with LMHandler(SlowMockLM()) as handler, LMConnection(handler.address) as conn:
+            stream = send_lm_request_batched_iter(handler.address, self.PROMPTS, connection=conn)
+            first_index, _ = next(stream)
+            single = send_lm_request(handler.address, LMRequest(prompt="0 single"), connection=conn)
+            rest = [index for index, _ in stream]
+        assert first_index == 1
+        assert single.chat_completion.response.endswith("single")
+        assert rest == [2, 0]
+
+    def test_stream_failure_yields_errors_for_remaining_prompts(self):
+        results = list(send_lm_request_batched_iter(("127.0.0.1", 1), ["a", "b"]))
+        assert [index for index, _ in results] == [0, 1]
+        assert all(not response.success for _, response in results)
+
+    def test_local_repl_iterator(self):
+        with LMHandler(SlowMockLM()) as handler:
+            repl = LocalREPL(lm_handler_address=handler.address)
+            result = repl.execute_code(
+                "order = [i for i, _ in llm_query_batched_iter(['0.3 a', '0 b'])]"
+            )
+            repl.cleanup()
+        assert result.locals["order"] == [1, 0]
+        assert len(result.rlm_calls) == 2
+
+
+class TestCoalescing:
+    """With coalesce=True, identical prompts in flight at the same time share one upstream call."""
+
+    def test_duplicate_prompts_in_batch_share_one_call(self):
+        lm = CountingSlowMockLM()
+        with LMHandler(lm, coalesce=True) as handler:
+            responses = send_lm_request_batched(handler.address, ["0.1 a", "0.1 a", "0.1 b"])
+            usage = handler.get_usage_summary()
+
+        assert lm.calls == 2
+        assert [r.chat_completion.response for r in responses[:2]] == [
+            "Mock response to: 0.1 a"
+        ] * 2
+        usages = [r.chat_completion.usage_summary for r in responses[:2]]
+        assert sum(bool(u.handler_stats) for u in usages) == 1  # only the follower is local
+        assert usage.handler_stats["mock-model"].coalesced_calls == 1
+
+    def test_concurrent_single_requests_coalesce(self):
+        lm = CountingSlowMockLM()
+        with LMHandler(lm, coalesce=True) as handler:
+            threads = [
+                threading.Thread(
+                    target=send_lm_request, args=(handler.address, LMRequest(prompt="0.2 same"))
+                )
+                for _ in range(5)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        assert lm.calls == 1
+
+    def test_duplicates_are_sampled_independently_by_default(self):
+        lm = CountingSlowMockLM()
+        with LMHandler(lm) as handler:
+            send_lm_request_batched(handler.address, ["0 a", "0 a"])
+        assert lm.calls == 2
+
+    def test_sequential_duplicates_are_not_coalesced(self):
+        lm = CountingSlowMockLM()
+        with LMHandler(lm, coalesce=True) as handler:
+            send_lm_request(handler.address, LMRequest(prompt="0 a"))
+            send_lm_request(handler.address, LMRequest(prompt="0 a"))
+        assert lm.calls == 2
+
+
+class TestCompactResponses:
+    """compact=True returns prompt hashes; the handler keeps the prompts for logging."""
+
+    def test_compact_single_and_batched(self):
+        big = "context " * 10_000
+        with LMHandler(MockLM()) as handler:
+            single = send_lm_request(handler.address, LMRequest(prompt=big, compact=True))
+            batched = send_lm_request_batched(handler.address, [big, "small"], compact=True)
+
+            calls = [single.chat_completion] + [r.chat_completion for r in batched]
+            assert all(call.prompt is None and call.prompt_hash for call in calls)
+            assert "prompt_hash" in single.to_dict()["chat_completion"]
+
+            handler.resolve_prompts(calls)
+        assert [call.prompt for call in calls] == [big, big, "small"]
+
+    def test_full_prompts_by_default(self):
+        with LMHandler(MockLM()) as handler:
+            response = send_lm_request(handler.address, LMRequest(prompt="hello"))
+        assert response.chat_completion.prompt == "hello"
+        assert response.chat_completion.prompt_hash is None
+
+    def test_local_repl_uses_compact_records(self):
+        with LMHandler(MockLM()) as handler:
+            repl = LocalREPL(lm_handler_address=handler.address)
+            result = repl.execute_code("answers = llm_query_batched(['a', 'b'])")
+            repl.cleanup()
+            assert [call.prompt for call in result.rlm_calls] == [None, None]
+            handler.resolve_prompts(result.rlm_calls)
+        assert [call.prompt for call in result.rlm_calls] == ["a", "b"]
+
+    def test_released_once_no_record_refers_to_prompt(self):
+        with LMHandler(MockLM()) as handler:
+            first, second = send_lm_request_batched(handler.address, ["a", "a"], compact=True)
+            handler.release_prompts([first.chat_completion])
+            assert handler.get_prompt(first.chat_completion.prompt_hash) == "a"
+            handler.release_prompts([second.chat_completion])
+            assert handler.get_prompt(first.chat_completion.prompt_hash) is None
+
+
+class UsageMockLM(SlowMockLM):
+    """Reports input tokens equal to the prompt length, per call."""
+
+    async def acompletion_with_usage(self, prompt):
+        content = await self.acompletion(prompt)
+        return content, ModelUsageSummary(1, len(prompt), 1)
+
+    def completion_with_usage(self, prompt):
+        return self.completion(prompt), ModelUsageSummary(1, len(prompt), 1)
+
+    def get_last_usage(self):
+        raise AssertionError("per-call usage must not come from shared state")
+
+
+class TestPerCallUsage:
+    def test_batched_calls_get_their_own_usage_and_latency(self):
+        prompts = ["0.3 a", "0 bbbbbbbb", "0.1 cccc"]
+        with LMHandler(UsageMockLM()) as handler:
+            responses = send_lm_request_batched(handler.address, prompts)
+
+        for prompt, response in zip(prompts, responses, strict=True):
+            usage = response.chat_completion.usage_summary.model_usage_summaries["mock-model"]
+            assert usage.total_input_tokens == len(prompt)
+        times = [r.chat_completion.execution_time for r in responses]
+        assert times[1] < 0.1 < times[2] < 0.3 <= times[0]
+
+    def test_direct_completion_gets_its_own_usage(self):
+        with LMHandler(UsageMockLM()) as handler:
+            _, usage = handler.completion_with_usage("0 abc")
+        assert usage.total_input_tokens == 5
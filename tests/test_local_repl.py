@@ -174,6 +174,28 @@ class TestLocalREPLContext:
         assert repl.locals["context"] == [1, 2, 3, "four"]
         repl.cleanup()
 
+    def test_string_context_is_not_copied(self):
+        """Strings are bound as-is, without a temp file."""
+        payload = "x" * 1000
+        repl = LocalREPL(context_payload=payload)
+        assert repl.locals["context"] is payload
+        assert os.listdir(repl.temp_dir) == []
+        repl.cleanup()
+
+    def test_container_context_is_copied_unless_shared(self):
+        """Dicts and lists are deep-copied unless share_context is set."""
+        payload = {"docs": ["a", "b"]}
+        repl = LocalREPL(context_payload=payload)
+        repl.execute_code("context['docs'].append('c')")
+        assert payload == {"docs": ["a", "b"]}
+        repl.cleanup()
+
+        repl = LocalREPL(context_payload=payload, share_context=True)
+        assert repl.locals["context"] is payload
+        repl.execute_code("context_0['docs'].append('c')")
+        assert payload == {"docs": ["a", "b", "c"]}
+        repl.cleanup()
+
 
 class TestLocalREPLCleanup:
     """Tests for cleanup behavior."""
@@ -243,3 +265,19 @@ class TestLocalREPLSimulatingRLMNoPersistence:
         assert "NameError" in result.stderr
         assert "my_helper" in result.stderr
         completion_2_env.cleanup()
+
+    def test_reset_clears_state_for_reuse(self):
+        """A reset environment can serve another completion without leaking state."""
+        repl = LocalREPL(context_payload="first")
+        repl.execute_code("important_result = 42\nopen('scratch.txt', 'w').write('x')")
+        repl.add_history([{"role": "user", "content": "hi"}])
+
+        repl.reset()
+        repl.load_context("second")
+
+        assert "NameError" in repl.execute_code("print(important_result)").stderr
+        assert repl.execute_code("print(context)").stdout.strip() == "second"
+        assert repl.get_context_count() == 1
+        assert repl.get_history_count() == 0
+        assert os.listdir(repl.temp_dir) == []
+        repl.cleanup()
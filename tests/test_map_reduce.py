@@ -0,0 +1,201 @@
+"""Tests for the REPL's llm_map helper."""
+
+import json
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from rlm.core.comms_utils import LMConnection
+from rlm.core.lm_handler import LMHandler
+from rlm.environments.docker_repl import LLMProxyHandler, _build_exec_script
+from rlm.environments.local_repl import LocalREPL
+from rlm.utils.map_reduce import CHARS_PER_TOKEN, map_reduce
+from tests.mock_lm import MockLM
+
+
+class FakeLM:
+    """submit/collect pair answering with `answer(prompt)` on a thread pool."""
+
+    def __init__(self, answer=lambda prompt: prompt.upper(), workers=8):
+        self.answer = answer
+        self.prompts: list[str] = []
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(workers)
+
+    def _run(self, prompt: str) -> str:
+        try:
+            return self.answer(prompt)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def submit(self, prompt: str) -> Future:
+        with self._lock:
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        return self._pool.submit(self._run, prompt)
+
+    @staticmethod
+    def collect(future: Future) -> tuple[str, int | None, int | None]:
+        return future.result(), None, None
+
+    def run(self, *args, **kwargs):
+        return map_reduce(self.submit, self.collect, *args, **kwargs)
+
+
+class TestMap:
+    def test_results_are_in_item_order(self):
+        def answer(prompt):
+            # Later items finish first
+            threading.Event().wait(0.002 * (20 - int(prompt.split()[-1])))
+            return prompt
+
+        lm = FakeLM(answer)
+        assert lm.run("item {item}", range(20), progress=False) == [f"item {i}" for i in range(20)]
+
+    def test_items_are_pulled_as_slots_free_up(self):
+        lm = FakeLM()
+        pulled = []
+
+        def items():
+            for i in range(30):
+                # Never more than max_concurrency prompts ahead of the answers
+                assert len(pulled) - (len(lm.prompts) - lm.in_flight) <= 3
+                pulled.append(i)
+                yield i
+
+        lm.run("{item}", items(), max_concurrency=3, progress=False)
+        assert lm.most_in_flight <= 3
+        assert len(lm.prompts) == 30
+
+    def test_templates(self):
+        lm = FakeLM(lambda prompt: prompt)
+        assert lm.run('{"json": true} {item}', ["a"], progress=False) == ['{"json": true} a']
+        assert lm.run("Summarize:", ["a"], progress=False) == ["Summarize:\n\na"]
+        assert lm.run(lambda item: f"<{item}>", ["a"], progress=False) == ["<a>"]
+
+    def test_errors_are_reported_in_place(self, capsys):
+        def answer(prompt):
+            if prompt == "2":
+                raise RuntimeError("boom")
+            return prompt
+
+        def submit(prompt):
+            if prompt == "4":
+                raise ConnectionError("down")
+            return lm.submit(prompt)
+
+        lm = FakeLM(answer)
+        results = map_reduce(submit, lm.collect, "{item}", range(5))
+        assert results[:2] == ["0", "1"] and results[3] == "3"
+        assert results[2].startswith("Error:") and "boom" in results[2]
+        assert results[4].startswith("Error:") and "down" in results[4]
+        out = capsys.readouterr().out
+        assert "5 prompts" in out and "2 errors" in out
+
+    def test_rejects_zero_concurrency(self):
+        with pytest.raises(ValueError):
+            FakeLM().run("{item}", [1], max_concurrency=0)
+
+
+class TestReduce:
+    def test_tree_reduction_keeps_every_prompt_in_the_window(self, capsys):
+        lm = FakeLM(lambda prompt: "x" * 30 if prompt.startswith("map") else f"r{len(prompt)}")
+        result = lm.run("map {item}", range(40), reduce="sum {results}", reduce_max_tokens=50)
+        reduce_prompts = [p for p in lm.prompts if p.startswith("sum")]
+        assert all(len(p) <= 50 * CHARS_PER_TOKEN for p in reduce_prompts)
+        assert result.startswith("r")
+
+        out = capsys.readouterr().out.splitlines()
+        assert out[0].startswith("llm_map map: 40 prompts")
+        assert out[1].startswith("llm_map reduce level 1:")
+        assert out[-1].startswith(f"llm_map reduce level {len(out) - 1}: 1 prompts")
+
+    def test_single_result_is_still_reduced(self):
+        assert FakeLM().run("{item}", ["a"], reduce="sum {results}", progress=False) == "SUM A"
+        assert FakeLM().run("{item}", [], reduce="sum {results}", progress=False) == ""
+
+    def test_oversized_results_are_truncated(self, capsys):
+        lm = FakeLM(lambda prompt: "y" * 1000 if prompt.startswith("map") else "done")
+        assert lm.run("map {item}", range(3), reduce="{results}", reduce_max_tokens=50) == "done"
+        assert all(len(p) <= 200 for p in lm.prompts if not p.startswith("map"))
+        assert "3 results truncated" in capsys.readouterr().out
+
+    def test_a_window_too_small_for_two_results_is_rejected(self):
+        lm = FakeLM()
+        with pytest.raises(ValueError):
+            lm.run("{item}", range(3), reduce="x" * 200 + "{results}", reduce_max_tokens=50)
+        assert lm.prompts == []
+
+    def test_every_level_shrinks_with_a_tight_window(self):
+        lm = FakeLM(lambda prompt: "z" * 500)
+        lm.run("{item}", range(16), reduce="{results}", reduce_max_tokens=10, progress=False)
+        # 16 -> 8 -> 4 -> 2 -> 1
+        assert len(lm.prompts) == 16 + 8 + 4 + 2 + 1
+
+    def test_callable_reduce(self):
+        lm = FakeLM(lambda prompt: prompt)
+        assert lm.run("{item}", "abc", reduce=lambda results: "+".join(results)) == "a+b+c"
+
+
+class TestREPLHelper:
+    def test_local_repl_streams_through_the_handler(self):
+        with LMHandler(MockLM()) as handler:
+            repl = LocalREPL(lm_handler_address=handler.address, context_payload="alpha beta")
+            result = repl.execute_code(
+                "answers = llm_map('about {item}', context.split(), max_concurrency=2)\n"
+                "final = llm_map('{item}', answers, reduce='combine {results}', progress=False)"
+            )
+            assert result.stderr == ""
+            assert repl.locals["answers"] == [
+                "Mock response to: about alpha",
+                "Mock response to: about beta",
+            ]
+            assert repl.locals["final"].startswith("Mock response to: combine")
+            # Real token usage from the handler, and every sub-call recorded on the block
+            assert result.stdout.startswith("llm_map map: 2 prompts, 20 input + 20 output tokens")
+            assert len(result.rlm_calls) == 5
+            repl.cleanup()
+
+    def test_without_a_handler(self):
+        repl = LocalREPL()
+        result = repl.execute_code("answers = llm_map('{item}', [1, 2], progress=False)")
+        assert repl.locals["answers"] == ["Error: LM query failed - No LM handler configured"] * 2
+        assert result.stderr == ""
+        repl.cleanup()
+
+    def test_sandbox_reports_the_handlers_usage(self, tmp_path):
+        with LMHandler(MockLM()) as handler:
+            proxy = type(
+                "Handler",
+                (LLMProxyHandler,),
+                {
+                    "lm_handler_address": handler.address,
+                    "lm_connection": LMConnection(handler.address),
+                    "pending_calls": [],
+                },
+            )
+            server = ThreadingHTTPServer(("127.0.0.1", 0), proxy)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                script = _build_exec_script(
+                    "answers = llm_map('about {item}', ['a', 'b'])", server.server_address[1]
+                )
+                script = script.replace("host.docker.internal", "127.0.0.1")
+                script = script.replace("/workspace/", f"{tmp_path}/")
+                output = subprocess.run(
+                    [sys.executable, "-c", script], capture_output=True, text=True, check=True
+                ).stdout
+            finally:
+                server.shutdown()
+                server.server_close()
+        result = json.loads(output)
+        assert result["stderr"] == ""
+        assert result["stdout"].startswith("llm_map map: 2 prompts, 20 input + 20 output tokens")
@@ -0,0 +1,61 @@
+"""Tests for memory-mapped text contexts."""
+
+import copy
+import pickle
+
+import pytest
+
+from rlm.core.mapped_text import MappedText
+from rlm.core.types import QueryMetadata
+from rlm.environments.local_repl import LocalREPL
+
+TEXT = "alpha beta\r\ngamma beta\ndelta"
+
+
+@pytest.fixture
+def mapped(tmp_path):
+    path = tmp_path / "context.txt"
+    path.write_bytes(TEXT.encode())
+    text = MappedText(path)
+    yield text
+    text.close()
+
+
+class TestMappedText:
+    def test_behaves_like_the_text(self, mapped):
+        assert len(mapped) == len(TEXT)
+        assert mapped[6:10] == "beta" and mapped[-1] == "a"
+        assert mapped == TEXT and str(mapped) == TEXT
+        assert "gamma" in mapped and "omega" not in mapped
+        assert (mapped.find("beta"), mapped.rfind("beta"), mapped.count("beta")) == (6, 18, 2)
+        assert list(mapped.lines()) == ["alpha beta", "gamma beta", "delta"]
+        assert mapped.upper().startswith("ALPHA")
+        assert mapped.split() == TEXT.split()
+        assert bytes(mapped.buffer[:5]) == b"alpha"
+
+    def test_index_errors(self, mapped):
+        with pytest.raises(IndexError):
+            mapped[len(TEXT)]
+        with pytest.raises(AttributeError):
+            _ = mapped.not_a_str_method
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.txt"
+        path.write_text("")
+        assert len(MappedText(path)) == 0 and str(MappedText(path)) == ""
+
+    def test_copies_share_the_mapping(self, mapped):
+        assert copy.deepcopy(mapped) is mapped
+        assert pickle.loads(pickle.dumps(mapped)) == mapped
+
+    def test_query_metadata(self, mapped):
+        metadata = QueryMetadata(mapped)
+        assert metadata.context_lengths == [len(TEXT)]
+        assert metadata.context_type == "memory-mapped str"
+
+    def test_local_repl_context(self, mapped):
+        repl = LocalREPL(context_payload=mapped)
+        assert repl.locals["context"] is mapped
+        result = repl.execute_code("print(context[:5], context.count('beta'))")
+        assert result.stdout == "alpha 2\n"
+        repl.cleanup()
@@ -8,7 +8,7 @@ Tests that multiple LM completion calls in one RLM session:
 5. Properly inform the model about available contexts/histories
 """
 
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
@@ -26,7 +26,12 @@ def create_mock_lm(responses: list[str]) -> Mock:
             "mock": ModelUsageSummary(total_calls=1, total_input_tokens=100, total_output_tokens=50)
         }
     )
-    mock.get_last_usage.return_value = mock.get_usage_summary.return_value
+    mock.get_last_usage.return_value = ModelUsageSummary(
+        total_calls=1, total_input_tokens=100, total_output_tokens=50
+    )
+    mock.acompletion_with_usage = AsyncMock(
+        side_effect=lambda prompt: (mock.completion(prompt), mock.get_last_usage())
+    )
     return mock
 
 
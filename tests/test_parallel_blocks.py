@@ -0,0 +1,194 @@
+"""Tests for running independent code blocks of one response concurrently."""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+import rlm.core.rlm as rlm_module
+from rlm import RLM
+from rlm.environments.local_repl import LocalREPL
+from rlm.utils.code_analysis import FILESYSTEM, analyze_code_block, schedule_code_blocks
+from tests.mock_lm import MockLM
+
+
+class TestCodeAnalysis:
+    def test_reads_and_writes(self):
+        names = analyze_code_block("import json\ny = len(x)\nz += 1\nitems.append(y)\nd['k'] = 1")
+        assert names.writes == {"json", "y", "z", "items", "d"}
+        assert {"x", "z", "items", "y", "d"} <= names.reads
+        assert not names.barrier
+
+    def test_arguments_to_calls_may_be_mutated(self):
+        names = analyze_code_block("r = obj.run(a, key=b)\nn = len(c)\nparts = text.split(sep)")
+        assert {"obj", "a", "b"} <= names.writes
+        assert not {"c", "text", "sep"} & names.writes
+
+    def test_filesystem_access_is_tracked(self):
+        assert FILESYSTEM in analyze_code_block("data = open('f.txt').read()").writes
+        assert FILESYSTEM in analyze_code_block("import os\nos.remove('f.txt')").writes
+        assert FILESYSTEM not in analyze_code_block("items.append(1)").writes
+
+    def test_function_and_comprehension_locals_are_not_writes(self):
+        names = analyze_code_block("def f(a):\n    b = a + c\n    return b\nr = [i for i in x]")
+        assert names.writes == {"f", "r"}
+        assert names.functions["f"].reads >= {"a", "c"}
+
+    @pytest.mark.parametrize(
+        "code",
+        ["exec('x = 1')", "print(globals())", "from os import *", "def f():\n    global x", "x ="],
+    )
+    def test_barriers(self, code):
+        assert analyze_code_block(code).barrier
+
+    def test_schedule(self):
+        blocks = [
+            "a = llm_query('1')",
+            "b = llm_query('2')",
+            "c = a + b",
+            "d = llm_query('3')",
+            "print(c, d)",
+        ]
+        assert schedule_code_blocks(blocks) == [[0, 1, 3], [2], [4]]
+
+    def test_schedule_follows_function_calls(self):
+        blocks = ["def f():\n    log.append(total)", "total = 1", "f()", "print(log)"]
+        # f() reads total and mutates log, so it waits for block 1 and block 3 waits for it
+        assert schedule_code_blocks(blocks) == [[0], [1], [2], [3]]
+
+    def test_schedule_keeps_file_access_in_order(self):
+        blocks = [
+            "open('out.txt', 'w').write(x)",
+            "y = llm_query('1')",
+            "print(open('out.txt').read())",
+        ]
+        assert schedule_code_blocks(blocks) == [[0, 1], [2]]
+
+    @pytest.mark.parametrize(
+        "code",
+        ["import shutil\nshutil.copy('a.txt', 'b.txt')", "import os\nos.replace('a.txt', 'b.txt')"],
+    )
+    def test_file_functions_named_like_str_methods_keep_their_order(self, code):
+        assert schedule_code_blocks([code, "data = open('b.txt').read()"]) == [[0], [1]]
+
+    def test_unknown_callables_are_barriers(self):
+        # helper comes from an earlier turn, so what it touches is unknown
+        assert schedule_code_blocks(["a = 1", "helper(a)", "b = 2"]) == [[0], [1], [2]]
+        assert schedule_code_blocks(["a = 1", "handlers[0]()", "b = 2"]) == [[0], [1], [2]]
+        # Functions and classes defined in the response are followed instead
+        blocks = ["class C:\n    def __init__(self):\n        log.append(1)", "c = C()", "x = 1"]
+        assert schedule_code_blocks(blocks) == [[0, 2], [1]]
+
+    def test_schedule_follows_functions_called_by_functions(self):
+        blocks = ["def g():\n    log.append(1)\ndef f():\n    g()", "f()", "print(log)"]
+        assert schedule_code_blocks(blocks) == [[0], [1], [2]]
+
+    def test_barrier_runs_alone(self):
+        blocks = ["a = 1", "exec('b = a')", "c = 2"]
+        assert schedule_code_blocks(blocks) == [[0], [1], [2]]
+
+
+class TestLocalREPLParallel:
+    def test_merges_in_block_order(self):
+        repl = LocalREPL()
+        repl.execute_code("shared = 0")
+        results = repl.execute_code_parallel(["a = shared + 1\nprint('a')", "b = 2\nprint('b')"])
+
+        assert [r.stdout for r in results] == ["a\n", "b\n"]
+        assert (repl.locals["a"], repl.locals["b"], repl.locals["shared"]) == (1, 2, 0)
+        assert results[0].locals == repl.locals
+        repl.cleanup()
+
+    def test_unchanged_variables_are_not_written_back(self):
+        repl = LocalREPL()
+        repl.execute_code("x = 1")
+        # The first block rebinds x; the second still sees the old value and must not undo it
+        repl.execute_code_parallel(["x = 2", "y = 3"])
+        assert repl.locals["x"] == 2
+        repl.cleanup()
+
+    def test_failing_block_does_not_merge(self):
+        repl = LocalREPL()
+        results = repl.execute_code_parallel(["a = 1\nraise ValueError('boom')", "b = 2"])
+        assert "ValueError: boom" in results[0].stderr
+        assert "a" not in repl.locals and repl.locals["b"] == 2
+        repl.cleanup()
+
+
+class SlowSubcallLM(MockLM):
+    """Answers the root prompt with `response`; each sub-call takes `delay` seconds."""
+
+    def __init__(self, response, delay=0.2):
+        super().__init__()
+        self.response = response
+        self.delay = delay
+
+    def completion(self, prompt):
+        if isinstance(prompt, str):
+            time.sleep(self.delay)
+            return prompt.upper()
+        return self.response
+
+    async def acompletion(self, prompt):
+        if isinstance(prompt, str):
+            await asyncio.sleep(self.delay)
+            return prompt.upper()
+        return self.response
+
+
+RESPONSE = (
+    "```repl\na = llm_query('one')\n```\n"
+    "```repl\nb = llm_query('two')\n```\n"
+    "```repl\nc = llm_query('three')\n```\n"
+    "```repl\nanswer = ' '.join([a, b, c])\nprint(answer)\n```\n"
+    "FINAL_VAR(answer)"
+)
+
+
+def _rlm(**kwargs):
+    return RLM(
+        backend="openai",
+        backend_kwargs={"model_name": "mock-model"},
+        max_iterations=1,
+        parallel_code_blocks=True,
+        **kwargs,
+    )
+
+
+class TestParallelCodeBlocks:
+    def test_independent_sub_calls_overlap(self):
+        with patch.object(rlm_module, "get_client", return_value=SlowSubcallLM(RESPONSE)):
+            start = time.perf_counter()
+            result = _rlm().completion("ctx")
+            elapsed = time.perf_counter() - start
+
+        assert result.response == "ONE TWO THREE"
+        assert elapsed < 0.5  # three sequential sub-calls would take 0.6s
+
+    def test_results_and_usage_stay_in_order(self):
+        captured = []
+        rlm = _rlm()
+        original = rlm._execute_code_blocks
+
+        def record(*args):
+            code_blocks = original(*args)
+            captured.extend(code_blocks)
+            return code_blocks
+
+        with (
+            patch.object(rlm_module, "get_client", return_value=SlowSubcallLM(RESPONSE, 0.01)),
+            patch.object(rlm, "_execute_code_blocks", side_effect=record),
+        ):
+            result = rlm.completion("ctx")
+
+        assert [b.code.split(" = ")[0] for b in captured] == ["a", "b", "c", "answer"]
+        assert [len(b.result.rlm_calls) for b in captured] == [1, 1, 1, 0]
+        assert [b.result.rlm_calls[0].response for b in captured[:3]] == ["ONE", "TWO", "THREE"]
+        assert captured[3].result.stdout == "ONE TWO THREE\n"
+        assert result.usage_summary.model_usage_summaries["mock-model"].total_calls == 4
+
+    def test_async_completion(self):
+        with patch.object(rlm_module, "get_client", return_value=SlowSubcallLM(RESPONSE, 0.01)):
+            result = asyncio.run(_rlm().acompletion("ctx"))
+        assert result.response == "ONE TWO THREE"
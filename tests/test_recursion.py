@@ -0,0 +1,115 @@
+"""Tests for child RLM trajectories at max_depth > 1."""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import rlm.core.rlm as rlm_module
+from rlm import RLM
+from rlm.core.types import UsageSummary
+from tests.mock_lm import MockLM
+
+# Recurse on a longer prompt until the context is 3 characters long
+RECURSE = (
+    "```repl\n"
+    "if len(context) < 3:\n"
+    "    answer = llm_query('x' + context)\n"
+    "else:\n"
+    "    answer = 'leaf:' + context\n"
+    "```\n"
+    "FINAL_VAR(answer)"
+)
+
+FAN_OUT = (
+    "```repl\n"
+    "if context == 'q':\n"
+    "    answer = ','.join(llm_query_batched(['a', 'b', 'c', 'd']))\n"
+    "else:\n"
+    "    answer = context.upper()\n"
+    "```\n"
+    "FINAL_VAR(answer)"
+)
+
+
+class ScriptedLM(MockLM):
+    """Answers every root prompt with `response` after `delay` seconds."""
+
+    def __init__(self, response, delay=0.0):
+        super().__init__()
+        self.response = response
+        self.delay = delay
+
+    def completion(self, prompt):
+        if isinstance(prompt, str):
+            return super().completion(prompt)
+        time.sleep(self.delay)
+        return self.response
+
+    async def acompletion(self, prompt):
+        if isinstance(prompt, str):
+            return super().completion(prompt)
+        await asyncio.sleep(self.delay)
+        return self.response
+
+
+def _rlm(**kwargs):
+    return RLM(
+        backend="openai", backend_kwargs={"model_name": "mock-model"}, max_iterations=2, **kwargs
+    )
+
+
+class TestRecursion:
+    def test_max_depth_one_makes_plain_sub_calls(self):
+        lm = ScriptedLM(RECURSE)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            result = _rlm().completion("q")
+        assert result.response == "Mock response to: xq"
+        assert result.usage_summary.children == []
+
+    def test_sub_calls_below_max_depth_run_child_trajectories(self):
+        lm = ScriptedLM(RECURSE)
+        with patch.object(rlm_module, "get_client", return_value=lm), _rlm(max_depth=3) as rlm:
+            result = rlm.completion("q")
+            assert set(rlm._children) == {(1, "mock-model"), (2, "mock-model")}
+
+        assert result.response == "leaf:xxq"
+
+    def test_leaf_depth_falls_back_to_lm(self):
+        lm = ScriptedLM(RECURSE)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            result = _rlm(max_depth=2).completion("q")
+        assert result.response == "Mock response to: xxq"
+
+    def test_usage_rolls_up_as_a_tree(self):
+        lm = ScriptedLM(RECURSE)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            usage = _rlm(max_depth=3).completion("q").usage_summary
+
+        assert usage.model_usage_summaries["mock-model"].total_calls == 3
+        (child,) = usage.children
+        assert child.model_usage_summaries["mock-model"].total_calls == 2
+        (grandchild,) = child.children
+        assert grandchild.model_usage_summaries["mock-model"].total_calls == 1
+        assert grandchild.children == []
+        assert UsageSummary.from_dict(usage.to_dict()) == usage
+
+    def test_children_run_concurrently_up_to_the_limit(self):
+        lm = ScriptedLM(FAN_OUT, delay=0.1)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            start = time.perf_counter()
+            result = _rlm(max_depth=2).completion("q")
+            concurrent = time.perf_counter() - start
+
+            start = time.perf_counter()
+            _rlm(max_depth=2, max_concurrent_children=1).completion("q")
+            serial = time.perf_counter() - start
+
+        assert result.response == "A,B,C,D"
+        assert len(result.usage_summary.children) == 4
+        assert concurrent < 0.4 < serial
+
+    def test_async_completion(self):
+        lm = ScriptedLM(RECURSE)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            result = asyncio.run(_rlm(max_depth=3).acompletion("q"))
+        assert result.response == "leaf:xxq"
@@ -0,0 +1,177 @@
+"""Tests for RLM.acompletion, RLM.completion_many and concurrent trajectories."""
+
+import asyncio
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+import rlm.core.rlm as rlm_module
+from rlm import RLM
+from rlm.core.types import ModelUsageSummary, UsageSummary
+from rlm.environments.local_repl import LocalREPL, _capture_output
+from tests.mock_lm import MockLM
+
+ANSWER_FROM_CONTEXT = "```repl\nresult = context\nprint(result)\n```\nFINAL_VAR(result)"
+
+
+class SleepyLM(MockLM):
+    """Takes `delay` seconds per call and answers from the REPL's context."""
+
+    def __init__(self, delay=0.0, response=ANSWER_FROM_CONTEXT):
+        super().__init__()
+        self.delay = delay
+        self.response = response
+
+        self.calls = 0
+
+    def _respond(self, prompt):
+        self.calls += 1
+        # Sub-calls from the REPL send plain strings; root calls send message lists.
+        return f"echo: {prompt}" if isinstance(prompt, str) else self.response
+
+    def completion(self, prompt):
+        time.sleep(self.delay)
+        return self._respond(prompt)
+
+    async def acompletion(self, prompt):
+        await asyncio.sleep(self.delay)
+        return self._respond(prompt)
+
+    def get_usage_summary(self):
+        return UsageSummary({"mock-model": ModelUsageSummary(self.calls, 10 * self.calls, 1)})
+
+    def get_last_usage(self):
+        return ModelUsageSummary(1, 10, 1)
+
+
+def _rlm(**kwargs):
+    return RLM(backend="openai", backend_kwargs={"model_name": "mock-model"}, **kwargs)
+
+
+class TestAsyncCompletion:
+    def test_matches_sync_completion(self):
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM()):
+            sync_result = _rlm().completion("the answer")
+            async_result = asyncio.run(_rlm().acompletion("the answer"))
+
+        assert sync_result.response == async_result.response == "the answer"
+        assert "mock-model" in async_result.usage_summary.model_usage_summaries
+
+    def test_concurrent_trajectories_overlap_and_stay_separate(self):
+        async def run_all():
+            return await asyncio.gather(*(_rlm().acompletion(f"task-{i}") for i in range(10)))
+
+        with patch.object(rlm_module, "get_client", side_effect=lambda *a: SleepyLM(delay=0.3)):
+            start = time.perf_counter()
+            results = asyncio.run(run_all())
+            elapsed = time.perf_counter() - start
+
+        assert [r.response for r in results] == [f"task-{i}" for i in range(10)]
+        assert elapsed < 10 * 0.3 / 2
+
+    def test_default_answer_after_max_iterations(self):
+        lm = SleepyLM(response="still thinking")
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            result = asyncio.run(_rlm(max_iterations=2).acompletion("ctx"))
+        assert result.response == "still thinking"
+
+    def test_fallback_at_max_depth(self):
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM()):
+            result = asyncio.run(_rlm(depth=1, max_depth=1).acompletion("ctx"))
+        assert result == "echo: ctx"
+
+
+class TestCompletionMany:
+    SUB_CALL = "```repl\nresult = llm_query(context)\n```\nFINAL_VAR(result)"
+
+    def test_results_in_order_with_per_item_usage(self):
+        lm = SleepyLM(delay=0.05, response=self.SUB_CALL)
+        prompts = [f"task-{i}" for i in range(6)]
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            batch = _rlm().completion_many(prompts, root_prompts="q", concurrency=3)
+
+        assert [c.response for c in batch.completions] == [f"echo: {p}" for p in prompts]
+        for completion in batch.completions:
+            # One root call and one sub-call, regardless of what ran alongside it.
+            assert completion.usage_summary.model_usage_summaries["mock-model"].total_calls == 2
+        assert batch.usage_summary.model_usage_summaries["mock-model"].total_calls == 12
+
+    def test_reuses_handler_and_environments(self):
+        with (
+            patch.object(rlm_module, "get_client", return_value=SleepyLM()) as get_client,
+            patch.object(
+                rlm_module, "get_environment", wraps=rlm_module.get_environment
+            ) as get_environment,
+        ):
+            batch = _rlm().completion_many([f"task-{i}" for i in range(8)], concurrency=2)
+
+        assert [c.response for c in batch.completions] == [f"task-{i}" for i in range(8)]
+        assert get_client.call_count == 1
+        assert get_environment.call_count <= 2
+
+    def test_reused_environments_keep_setup_code(self):
+        response = "```repl\nresult = f'{HELPER} {context}'\n```\nFINAL_VAR(result)"
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM(response=response)):
+            batch = _rlm(environment_kwargs={"setup_code": "HELPER = 'set up'"}).completion_many(
+                ["a", "b", "c"], concurrency=1
+            )
+
+        assert [c.response for c in batch.completions] == ["set up a", "set up b", "set up c"]
+
+    def test_timings(self):
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM(delay=0.1)):
+            batch = _rlm().completion_many(["a", "b", "c"], concurrency=1)
+
+        assert [t.iterations for t in batch.timings] == [1, 1, 1]
+        for timing in batch.timings:
+            assert timing.lm_time >= 0.1
+            assert timing.total_time >= timing.setup_time + timing.lm_time
+        assert batch.timings[-1].queue_time >= 0.2
+        assert batch.execution_time >= 0.3
+
+    def test_root_prompts_must_match_prompts(self):
+        with pytest.raises(ValueError, match="one entry per prompt"):
+            _rlm().completion_many(["a", "b"], root_prompts=["only one"])
+
+
+class TestConcurrentExecution:
+    def test_output_capture_is_per_thread(self):
+        barrier = threading.Barrier(4)
+        outputs = [None] * 4
+
+        def run(index):
+            with _capture_output() as (stdout_buf, _):
+                barrier.wait()  # all four captures are active at once
+                for _ in range(100):
+                    print(f"thread-{index}")
+                barrier.wait()
+            outputs[index] = stdout_buf.getvalue()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for index, output in enumerate(outputs):
+            assert output.split() == [f"thread-{index}"] * 100
+
+    def test_executions_restore_working_directory(self):
+        cwd = os.getcwd()
+        repls = [LocalREPL() for _ in range(3)]
+        threads = [
+            threading.Thread(target=repl.execute_code, args=("import os\ncwd = os.getcwd()",))
+            for repl in repls
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert os.getcwd() == cwd
+        for repl in repls:
+            assert repl.locals["cwd"] == os.path.realpath(repl.temp_dir)
+            repl.cleanup()
@@ -0,0 +1,74 @@
+"""Tests for the LM clients and handler an RLM shares across completions."""
+
+import asyncio
+import gc
+from unittest.mock import patch
+
+import rlm.core.rlm as rlm_module
+from rlm import RLM
+from tests.test_rlm_async import SleepyLM
+
+SUB_CALL = "```repl\nresult = llm_query(context)\n```\nFINAL_VAR(result)"
+
+
+def _rlm(**kwargs):
+    return RLM(backend="openai", backend_kwargs={"model_name": "mock-model"}, **kwargs)
+
+
+class TestSharedHandler:
+    def test_clients_and_handler_created_once(self):
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM()) as get_client:
+            with _rlm() as rlm:
+                rlm.completion("first")
+                handler = rlm._lm_handler
+                rlm.completion("second")
+                asyncio.run(rlm.acompletion("third"))
+
+                assert rlm._lm_handler is handler
+                assert get_client.call_count == 1
+            assert rlm._lm_handler is None
+
+    def test_other_backends_created_once(self):
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM()) as get_client:
+            with _rlm(other_backends=["openai"], other_backend_kwargs=[{"model_name": "x"}]) as rlm:
+                rlm.completion("first")
+                rlm.completion("second")
+        assert get_client.call_count == 2
+
+    def test_usage_is_scoped_to_each_completion(self):
+        lm = SleepyLM(response=SUB_CALL)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            with _rlm() as rlm:
+                first = rlm.completion("first")
+                second = rlm.completion("second")
+
+        for result in (first, second):
+            assert result.usage_summary.model_usage_summaries["mock-model"].total_calls == 2
+        assert lm.calls == 4
+
+    def test_close_then_reuse(self):
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM()):
+            rlm = _rlm()
+            rlm.completion("first")
+            rlm.close()
+            assert rlm.completion("second").response == "second"
+            rlm.close()
+
+    def test_prompt_store_is_released(self):
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM(response=SUB_CALL)):
+            with _rlm() as rlm:
+                rlm.completion("first")
+                rlm.completion("second")
+                assert rlm._lm_handler._prompts == {}
+
+    def test_unclosed_rlm_stops_its_handler_when_collected(self):
+        with patch.object(rlm_module, "get_client", return_value=SleepyLM(response=SUB_CALL)):
+            rlm = _rlm(max_depth=2)
+            rlm.completion("first")
+            handler = rlm._lm_handler
+            thread = handler._thread
+            del rlm
+            gc.collect()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert handler._loop is None
@@ -0,0 +1,183 @@
+"""Tests for the LMHandler request scheduler."""
+
+import asyncio
+
+import pytest
+
+from rlm.core.comms_utils import send_lm_request_batched
+from rlm.core.lm_handler import LMHandler
+from rlm.core.scheduler import RateLimit, RequestScheduler, is_rate_limit_error
+from tests.mock_lm import MockLM
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class TestConcurrencyLimits:
+    def test_per_model_max_concurrent(self):
+        peak = 0
+        running = 0
+
+        async def call():
+            nonlocal peak, running
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return "ok"
+
+        async def main():
+            scheduler = RequestScheduler(rate_limit=RateLimit(max_concurrent=3))
+            group = object()
+            return await asyncio.gather(
+                *[scheduler.submit("m", group, call) for _ in range(20)]
+            ), scheduler
+
+        results, scheduler = asyncio.run(main())
+        assert results == ["ok"] * 20
+        assert peak == 3
+        stats = scheduler.get_stats()["m"]
+        assert stats.queued_requests == 20
+        assert stats.max_queue_depth == 17  # 3 admitted immediately
+        assert stats.total_queue_wait_time > 0
+
+    def test_global_max_concurrent_across_models(self):
+        peak = 0
+        running = 0
+
+        async def call():
+            nonlocal peak, running
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        async def main():
+            scheduler = RequestScheduler(max_concurrent=2)
+            await asyncio.gather(
+                *[scheduler.submit(f"m{i % 3}", object(), call) for i in range(12)]
+            )
+
+        asyncio.run(main())
+        assert peak == 2
+
+    def test_groups_are_served_round_robin(self):
+        order = []
+
+        def make_call(name):
+            async def call():
+                order.append(name)
+                await asyncio.sleep(0.001)
+
+            return call
+
+        async def main():
+            scheduler = RequestScheduler(rate_limit=RateLimit(max_concurrent=1))
+            batch = object()
+            tasks = [
+                asyncio.create_task(scheduler.submit("m", batch, make_call(f"batch-{i}")))
+                for i in range(10)
+            ]
+            await asyncio.sleep(0)
+            single = asyncio.create_task(scheduler.submit("m", object(), make_call("single")))
+            await asyncio.gather(*tasks, single)
+
+        asyncio.run(main())
+        # The single call does not wait behind the whole batch.
+        assert order.index("single") <= 2
+
+
+class TestRateWindows:
+    def test_requests_per_minute_delays_excess_requests(self):
+        async def main():
+            scheduler = RequestScheduler(rate_limit=RateLimit(requests_per_minute=2))
+
+            async def call():
+                return "ok"
+
+            await scheduler.submit("m", object(), call)
+            await scheduler.submit("m", object(), call)
+            third = asyncio.create_task(scheduler.submit("m", object(), call))
+            await asyncio.sleep(0.05)
+            assert not third.done()
+            third.cancel()
+
+        asyncio.run(main())
+
+    def test_tokens_per_minute(self):
+        async def main():
+            scheduler = RequestScheduler(rate_limit=RateLimit(tokens_per_minute=100))
+
+            async def call():
+                return "ok"
+
+            await scheduler.submit("m", object(), call, tokens=80)
+            second = asyncio.create_task(scheduler.submit("m", object(), call, tokens=30))
+            small = asyncio.create_task(scheduler.submit("n", object(), call, tokens=30))
+            await asyncio.sleep(0.05)
+            assert not second.done()
+            assert small.done()  # limits are per model
+            second.cancel()
+
+        asyncio.run(main())
+
+
+class TestRetries:
+    def test_retries_rate_limit_errors(self):
+        attempts = 0
+
+        async def call():
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise RateLimitError("slow down")
+            return "ok"
+
+        async def main():
+            scheduler = RequestScheduler(rate_limit=RateLimit(initial_backoff=0.001))
+            return await scheduler.submit("m", object(), call), scheduler
+
+        result, scheduler = asyncio.run(main())
+        assert result == "ok"
+        assert attempts == 3
+        assert scheduler.get_stats()["m"].rate_limit_retries == 2
+
+    def test_gives_up_after_max_retries(self):
+        async def call():
+            raise RateLimitError("slow down")
+
+        async def main():
+            scheduler = RequestScheduler(rate_limit=RateLimit(max_retries=2, initial_backoff=0.001))
+            await scheduler.submit("m", object(), call)
+
+        with pytest.raises(RateLimitError):
+            asyncio.run(main())
+
+    def test_other_errors_are_not_retried(self):
+        attempts = 0
+
+        async def call():
+            nonlocal attempts
+            attempts += 1
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            asyncio.run(RequestScheduler().submit("m", object(), call))
+        assert attempts == 1
+
+    def test_is_rate_limit_error(self):
+        assert is_rate_limit_error(RateLimitError())
+        assert not is_rate_limit_error(ValueError())
+
+
+class TestHandlerIntegration:
+    def test_handler_reports_queue_stats(self):
+        with LMHandler(MockLM(), rate_limit=RateLimit(max_concurrent=2)) as handler:
+            responses = send_lm_request_batched(handler.address, [f"p{i}" for i in range(8)])
+            usage = handler.get_usage_summary()
+
+        assert all(r.success for r in responses)
+        stats = usage.handler_stats["mock-model"]
+        assert stats.queued_requests == 8
+        assert "handler_stats" in usage.to_dict()
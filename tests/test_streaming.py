@@ -0,0 +1,142 @@
+"""Tests for streamed root responses with early code execution."""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+import rlm.core.rlm as rlm_module
+from rlm import RLM
+from rlm.clients.base_lm import CompletionStream
+from rlm.core.types import ModelUsageSummary
+from rlm.utils.parsing import StreamingResponseParser, find_code_blocks
+from tests.mock_lm import MockLM
+
+RESPONSES = [
+    "Let me look.\n```repl\nx = 1\nprint(x)\n```\nThen:\n```repl\ny = x + 1\n```\nFINAL_VAR(y)",
+    "```repl  \n\nprint('a')\n```\n```python\nignored\n```\n```repl\nprint('b')\n```",
+    "No code here, FINAL(done)",
+]
+
+
+def _feed_chars(parser, text):
+    blocks = []
+    for char in text:
+        blocks.extend(parser.feed(char))
+    return blocks
+
+
+class TestStreamingResponseParser:
+    @pytest.mark.parametrize("text", RESPONSES)
+    def test_same_blocks_as_find_code_blocks(self, text):
+        assert _feed_chars(StreamingResponseParser(), text) == find_code_blocks(text)
+
+    def test_block_emitted_at_closing_fence(self):
+        parser = StreamingResponseParser()
+        assert parser.feed("```repl\nx = 1\n") == []
+        assert parser.feed("```") == ["x = 1"]
+        assert parser.feed("\nmore text") == []
+
+    def test_final_var_complete(self):
+        parser = StreamingResponseParser()
+        parser.feed("Done.\nFINAL_VAR(ans")
+        assert not parser.final_complete
+        parser.feed("wer)")
+        assert parser.final_complete
+
+    def test_final_complete_at_end_of_line_with_balanced_parens(self):
+        parser = StreamingResponseParser()
+        parser.feed("FINAL(f(x) = (1")
+        assert not parser.final_complete
+        parser.feed("))")
+        assert not parser.final_complete  # the line could still go on
+        parser.feed("\n")
+        assert parser.final_complete
+
+    def test_final_inside_open_code_block_is_ignored(self):
+        parser = StreamingResponseParser()
+        parser.feed("```repl\nFINAL_VAR(x)\n")
+        assert not parser.final_complete
+        parser.feed("```\n")
+        assert parser.final_complete
+
+
+class StreamingLM(MockLM):
+    """Streams `response` in small chunks, `delay` seconds apart, recording what was sent."""
+
+    def __init__(self, response, chunk_size=4, delay=0.0):
+        super().__init__()
+        self.response = response
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.sent = 0
+        self.closed = False
+        self.chunk_times = []
+
+    def stream_completion(self, prompt, model=None):
+        if isinstance(prompt, str):
+            return super().stream_completion(prompt)
+        stream = CompletionStream()
+
+        def chunks():
+            try:
+                for i in range(0, len(self.response), self.chunk_size):
+                    time.sleep(self.delay)
+                    self.sent = i + self.chunk_size
+                    self.chunk_times.append(time.perf_counter())
+                    yield self.response[i : i + self.chunk_size]
+            finally:
+                self.closed = True
+                stream.usage = ModelUsageSummary(1, 100, self.sent // 4)
+
+        return stream.attach(chunks())
+
+
+def _rlm(**kwargs):
+    return RLM(
+        backend="openai", backend_kwargs={"model_name": "mock-model"}, streaming=True, **kwargs
+    )
+
+
+class TestStreamingCompletion:
+    def test_code_runs_while_response_is_generated(self):
+        response = "```repl\nimport time\nstarted = time.perf_counter()\n```\n" + "x" * 200
+        response += "\nFINAL_VAR(started)\n"
+        lm = StreamingLM(response, chunk_size=8, delay=0.005)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            result = _rlm().completion("ctx")
+
+        assert float(result.response) < lm.chunk_times[-1]
+
+    def test_generation_stops_at_final_answer(self):
+        response = (
+            "```repl\nanswer = 6 * 7\n```\nFINAL_VAR(answer)\nAnd some more text " + "z" * 400
+        )
+        lm = StreamingLM(response)
+        with patch.object(rlm_module, "get_client", return_value=lm):
+            result = _rlm().completion("ctx")
+
+        assert result.response == "42"
+        assert lm.closed
+        assert lm.sent < len(response) - 300
+        usage = result.usage_summary.model_usage_summaries["mock-model"]
+        assert usage.total_calls == 1
+        assert usage.total_output_tokens == lm.sent // 4
+
+    def test_code_blocks_run_in_order(self):
+        response = "```repl\nlog = ['a']\n```\n```repl\nlog.append('b')\n```\nFINAL_VAR(log)\n"
+        with patch.object(rlm_module, "get_client", return_value=StreamingLM(response)):
+            result = _rlm().completion("ctx")
+        assert result.response == "['a', 'b']"
+
+    def test_async_completion(self):
+        response = "```repl\nanswer = context.upper()\n```\nFINAL_VAR(answer)\n"
+        with patch.object(rlm_module, "get_client", return_value=StreamingLM(response)):
+            result = asyncio.run(_rlm().acompletion("ctx"))
+        assert result.response == "CTX"
+
+    def test_client_without_streaming_support(self):
+        with patch.object(rlm_module, "get_client", return_value=MockLM()):
+            result = _rlm(max_iterations=1).completion("ctx")
+        assert result.response.startswith("Mock response")